@@ -22,6 +22,7 @@ class Settings(BaseSettings):
     openai_api_key: str = ""
     gemini_api_key: str = ""
     tripo_api_key: str = ""  # Tripo3D API for 3D model generation
+    tripo_api_base_url: str = "https://api.tripo3d.ai/v2/openapi"  # Point at a stand-in for local testing
 
     # AWS Settings
     aws_access_key_id: str = ""
@@ -49,25 +50,117 @@ class Settings(BaseSettings):
     image_quality: str = "hd"
     image_size: str = "1024x1024"
     max_images_per_generation: int = 4
+    openai_max_concurrency: int = 4  # Concurrent DALL-E calls per worker
+    anthropic_max_concurrency: int = 8  # Concurrent Claude analysis calls per worker
+    design_generation_concurrency: int = 4  # Parallel image generations per design request
+
+    # Virtual Try-On
+    tryon_max_image_dimension: int = 2048  # Longest side sent to Gemini
+    tryon_inline_max_bytes: int = 4 * 1024 * 1024  # Larger uploads are re-encoded before sending
+
+    # Image processing pool (PIL decode/resize/encode for try-on)
+    image_executor_workers: int = 4
+    image_executor_max_pending: int = 16  # Running + queued jobs before requests get 429
+    image_executor_retry_after_seconds: int = 2
+
+    # Try-on result cache (keyed on perceptual hashes of the input photos)
+    tryon_cache_enabled: bool = True
+    tryon_cache_max_entries: int = 512
+    tryon_cache_ttl_seconds: int = 7 * 86400
+    tryon_cache_max_distance: int = 4  # Hash bits (of 64 per photo) two uploads may differ by and still match
+
+    # Gemini try-on admission control and retries
+    tryon_max_in_flight: int = 4  # Concurrent Gemini try-on calls per worker
+    tryon_max_queue: int = 50  # Waiting requests before new ones get 429
+    tryon_max_per_user: int = 2  # Queued + running try-ons per user
+    tryon_expected_seconds: float = 20.0  # Initial service-time estimate for queue ETAs
+    tryon_max_retries: int = 3  # Retries on Gemini 429/503
+    tryon_retry_base_delay_seconds: float = 1.0
+    tryon_retry_max_delay_seconds: float = 30.0
+
+    # Local try-on previews (composite-tryon mode=preview)
+    tryon_preview_max_dimension: int = 1280
+    tryon_preview_jpeg_quality: int = 85
+
+    # Batch try-on (one body photo, many jewelry pieces)
+    tryon_batch_max_items: int = 50
+    tryon_batch_concurrency: int = 4  # Also bounded by tryon_max_per_user
+    tryon_batch_retained_jobs: int = 100  # Finished jobs kept in memory for GET /batch/{job_id}
 
     # QC Inspector
-    qc_mode: str = "simulated"  # simulated or ml
+    qc_mode: str = "simulated"  # simulated, classical (deterministic OpenCV detector) or ml
     qc_confidence_threshold: float = 0.7
+    qc_classical_max_dimension: int = 1024  # Longest side the classical detector analyzes at
+    qc_pool_workers: int = 2  # Processes for QC image analysis (decode, stats, detection)
+    qc_pool_max_pending: int = 16  # Running + queued analyses before /api/qc/inspect returns 429
+    qc_pool_retry_after_seconds: int = 2
+    qc_worker_threads: int = 1  # OpenCV threads per QC worker process
+    qc_stats_max_pixels: int = 1_000_000  # Lighting stats use a strided proxy above this size (0 = full resolution)
+    qc_batch_max_items: int = 100  # Files (or zip entries) per /api/qc/inspect-batch request
+    qc_batch_concurrency: int = 4  # Items of one batch analyzed at a time
+    qc_batch_max_archive_mb: int = 500  # Uncompressed size of all zip entries in one batch
     qc_model_path: str = "./models/qc_model.h5"
 
     # File Upload
     max_upload_size_mb: int = 10
     allowed_image_types: str = "image/jpeg,image/png,image/webp"
 
+    # Storage
+    storage_backend: str = "s3"  # s3 or local (uploads/ directory, for development)
+    storage_stream_part_size_mb: int = 8  # Multipart part size for streamed S3 uploads (min 5)
+
+    # Image renditions (downscaled WebP/AVIF copies stored next to each image)
+    renditions_enabled: bool = True
+    rendition_widths: str = "160,320,640,1280"  # Longest side of each rendition
+    rendition_formats: str = "webp,avif"  # AVIF is skipped when Pillow can't encode it
+    rendition_webp_quality: int = 80
+    rendition_avif_quality: int = 60
+    rendition_list_width: int = 320  # Default image width for list/gallery endpoints
+
     # Rate Limiting
     rate_limit_per_minute: int = 60
 
+    # 3D Generation Jobs
+    generation_3d_workers: int = 2  # Concurrent 3D generation jobs per API process
+    generation_3d_stale_seconds: int = 120  # A running job not updated for this long is taken over by another process
+    generation_3d_max_attempts: int = 3  # Claims (first run plus takeovers) before a job that keeps killing its worker is failed
+
+    mesh_analysis_workers: int = 2  # Processes used to parse generated meshes for stats
+
+    # Tripo task polling (one shared poller; interval backs off while a task reports no progress)
+    tripo_poll_min_interval_seconds: float = 2.0
+    tripo_poll_max_interval_seconds: float = 20.0
+    tripo_poll_backoff_factor: float = 1.6
+    tripo_poll_jitter: float = 0.2  # +/- fraction applied to each interval
+    tripo_poll_max_concurrent_checks: int = 10
+    tripo_poll_max_errors: int = 5  # Consecutive poll failures before a task is given up
+
+    # Server-Sent Events
+    sse_timeout_seconds: float = 120.0  # Max idle time before an SSE stream is closed
+
+    # Outbound HTTP (shared connection pools for AI/provider calls)
+    http_max_connections_per_pool: int = 50  # Limit per provider pool (across all hosts it talks to)
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http_default_timeout_seconds: float = 120.0
+    http_connect_timeout_seconds: float = 30.0
+    http_enable_http2: bool = True
+
     # Logging
     log_level: str = "INFO"
 
     # Optional: Redis
     redis_url: str = "redis://localhost:6379"
     cache_ttl_seconds: int = 3600
+    cache_use_redis: bool = True  # Back the in-process caches with Redis when reachable
+
+    # AI Designer generation cache (opt-in: identical prompts reuse stored images)
+    design_cache_enabled: bool = False
+    design_cache_max_entries: int = 256
+
+    # Template gallery (pre-generated template preview images)
+    template_warmup_enabled: bool = False  # Warm the gallery on startup
+    template_warmup_concurrency: int = 2
 
     # Email/SMTP Settings
     smtp_host: str = Field(default="smtp.gmail.com", validation_alias="SMTP_HOST")
@@ -93,6 +186,16 @@ class Settings(BaseSettings):
         """Parse allowed image types from comma-separated string"""
         return [mime.strip() for mime in self.allowed_image_types.split(",")]
 
+    @property
+    def rendition_width_list(self) -> List[int]:
+        """Parse rendition widths from comma-separated string (ascending)"""
+        return sorted(int(width) for width in self.rendition_widths.split(",") if width.strip())
+
+    @property
+    def rendition_format_list(self) -> List[str]:
+        """Parse rendition formats from comma-separated string"""
+        return [fmt.strip().lower() for fmt in self.rendition_formats.split(",") if fmt.strip()]
+
 
 # Global settings instance
 settings = Settings()
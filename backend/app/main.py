@@ -80,6 +80,10 @@ async def startup_event():
     """Initialize application on startup"""
     logger.info("Starting JewelTech API...")
 
+    # Open shared outbound HTTP connection pools
+    from backend.services.http_client_service import http_client_service
+    await http_client_service.startup()
+
     # Initialize SQLite database (for existing features)
     try:
         init_db()
@@ -100,6 +104,20 @@ async def startup_event():
         logger.error(f"Error initializing MongoDB: {e}")
         logger.error("Make sure MongoDB is running and accessible")
 
+    # Start the 3D job workers (requeues jobs interrupted by a restart)
+    try:
+        from backend.services.model_3d_job_service import model_3d_job_service
+        await model_3d_job_service.start()
+        logger.info("3D job workers started")
+    except Exception as e:
+        logger.error(f"Error starting 3D job workers: {e}")
+
+    # Pre-generate template preview images (resumes where a previous run stopped)
+    if settings.template_warmup_enabled:
+        from backend.services.template_gallery_service import template_gallery_service
+        template_gallery_service.start()
+        logger.info("Template gallery warm-up started")
+
     logger.info(f"API running on {settings.backend_url}")
 
 
@@ -109,6 +127,26 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down JewelTech API...")
 
+    # Stop background jobs
+    from backend.services.template_gallery_service import template_gallery_service
+    await template_gallery_service.stop()
+
+    from backend.services.model_3d_job_service import model_3d_job_service
+    await model_3d_job_service.stop()
+
+    from backend.services.mesh_analysis_service import mesh_analysis_service
+    mesh_analysis_service.shutdown()
+
+    from backend.services.qc_pool_service import qc_pool_service
+    qc_pool_service.shutdown()
+
+    from backend.services.image_executor_service import image_executor_service
+    image_executor_service.shutdown()
+
+    # Close shared outbound HTTP connection pools
+    from backend.services.http_client_service import http_client_service
+    await http_client_service.shutdown()
+
 
 # Health check endpoint
 @app.get("/")
@@ -136,6 +174,39 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Runtime performance metrics (connection pools, caches, queues)"""
+    from backend.services.http_client_service import http_client_service
+    from backend.services.cache_service import get_cache_metrics
+    from backend.services.template_gallery_service import template_gallery_service
+    from backend.services.model_3d_job_service import model_3d_job_service
+    from backend.services.model_3d_service import model_3d_service
+    from backend.services.mesh_analysis_service import mesh_analysis_service
+    from backend.services.image_executor_service import image_executor_service
+    from backend.services.virtual_tryon_service import tryon_admission, virtual_tryon_service
+    from backend.services.tryon_batch_service import tryon_batch_service
+    from backend.services.tryon_progress_service import tryon_progress_service
+    from backend.services.rendition_service import rendition_service
+    from backend.services.qc_pool_service import qc_pool_service
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "http_pools": http_client_service.get_metrics(),
+        "caches": get_cache_metrics(),
+        "template_gallery": template_gallery_service.state,
+        "model_3d_jobs": model_3d_job_service.get_metrics(),
+        "tripo_polling": model_3d_service.poller.get_metrics(),
+        "mesh_analysis": mesh_analysis_service.get_metrics(),
+        "image_executor": image_executor_service.get_metrics(),
+        "tryon_admission": {**tryon_admission.get_metrics(), **virtual_tryon_service.stats},
+        "tryon_batches": tryon_batch_service.get_metrics(),
+        "tryon_stages": tryon_progress_service.get_metrics(),
+        "renditions": rendition_service.get_metrics(),
+        "qc_pool": qc_pool_service.get_metrics()
+    }
+
+
 # Import and include routers
 from backend.routers import designer, tryon, qc_inspector, analytics, auth, waitlist, admin
 
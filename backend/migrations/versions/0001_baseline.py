@@ -0,0 +1,157 @@
+"""Baseline: schema created by Base.metadata.create_all before migrations were introduced
+
+Databases that predate Alembic already have these tables; init_db stamps them
+with this revision instead of running it.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('rework_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('defect_type', sa.String(), nullable=True),
+    sa.Column('defect_severity', sa.String(), nullable=True),
+    sa.Column('defect_description', sa.Text(), nullable=True),
+    sa.Column('evidence_images', sa.JSON(), nullable=True),
+    sa.Column('assigned_to_station', sa.String(), nullable=True),
+    sa.Column('priority', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('assigned_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('verified_at', sa.DateTime(), nullable=True),
+    sa.Column('assigned_operator', sa.String(), nullable=True),
+    sa.Column('verified_by', sa.String(), nullable=True),
+    sa.Column('lifecycle_events', sa.JSON(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_rework_jobs_id'), 'rework_jobs', ['id'], unique=False)
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('username', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_table('analytics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('event_type', sa.String(), nullable=True),
+    sa.Column('event_action', sa.String(), nullable=True),
+    sa.Column('event_data', sa.JSON(), nullable=True),
+    sa.Column('session_id', sa.String(), nullable=True),
+    sa.Column('ip_address', sa.String(), nullable=True),
+    sa.Column('user_agent', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('duration_ms', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_analytics_event_type'), 'analytics', ['event_type'], unique=False)
+    op.create_index(op.f('ix_analytics_id'), 'analytics', ['id'], unique=False)
+    op.create_index(op.f('ix_analytics_session_id'), 'analytics', ['session_id'], unique=False)
+    op.create_table('designs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('category', sa.String(), nullable=True),
+    sa.Column('style_preset', sa.String(), nullable=True),
+    sa.Column('prompt', sa.Text(), nullable=True),
+    sa.Column('realism_mode', sa.String(), nullable=True),
+    sa.Column('generated_images', sa.JSON(), nullable=True),
+    sa.Column('seed_id', sa.String(), nullable=True),
+    sa.Column('model_version', sa.String(), nullable=True),
+    sa.Column('generation_id', sa.String(), nullable=True),
+    sa.Column('dominant_materials', sa.JSON(), nullable=True),
+    sa.Column('dominant_colors', sa.JSON(), nullable=True),
+    sa.Column('confidence_score', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('is_favorite', sa.Boolean(), nullable=True),
+    sa.Column('is_idea', sa.Boolean(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_designs_category'), 'designs', ['category'], unique=False)
+    op.create_index(op.f('ix_designs_generation_id'), 'designs', ['generation_id'], unique=True)
+    op.create_index(op.f('ix_designs_id'), 'designs', ['id'], unique=False)
+    op.create_index(op.f('ix_designs_style_preset'), 'designs', ['style_preset'], unique=False)
+    op.create_table('qc_inspections',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('item_image_url', sa.String(), nullable=True),
+    sa.Column('item_thumbnail_url', sa.String(), nullable=True),
+    sa.Column('item_reference', sa.String(), nullable=True),
+    sa.Column('detections', sa.JSON(), nullable=True),
+    sa.Column('detection_mode', sa.String(), nullable=True),
+    sa.Column('model_version', sa.String(), nullable=True),
+    sa.Column('operator_decision', sa.String(), nullable=True),
+    sa.Column('operator_notes', sa.Text(), nullable=True),
+    sa.Column('is_false_positive', sa.Boolean(), nullable=True),
+    sa.Column('rework_job_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('inspected_at', sa.DateTime(), nullable=True),
+    sa.Column('confidence_threshold', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['rework_job_id'], ['rework_jobs.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_qc_inspections_id'), 'qc_inspections', ['id'], unique=False)
+    op.create_table('tryons',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('design_id', sa.Integer(), nullable=True),
+    sa.Column('hand_photo_url', sa.String(), nullable=True),
+    sa.Column('overlay_image_url', sa.String(), nullable=True),
+    sa.Column('overlay_transform', sa.JSON(), nullable=True),
+    sa.Column('finger_type', sa.String(), nullable=True),
+    sa.Column('anchor_points', sa.JSON(), nullable=True),
+    sa.Column('snapshot_url', sa.String(), nullable=True),
+    sa.Column('snapshot_filename', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('is_approved', sa.Boolean(), nullable=True),
+    sa.Column('sent_for_approval', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['design_id'], ['designs.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tryons_id'), 'tryons', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_tryons_id'), table_name='tryons')
+    op.drop_table('tryons')
+    op.drop_index(op.f('ix_qc_inspections_id'), table_name='qc_inspections')
+    op.drop_table('qc_inspections')
+    op.drop_index(op.f('ix_designs_style_preset'), table_name='designs')
+    op.drop_index(op.f('ix_designs_id'), table_name='designs')
+    op.drop_index(op.f('ix_designs_generation_id'), table_name='designs')
+    op.drop_index(op.f('ix_designs_category'), table_name='designs')
+    op.drop_table('designs')
+    op.drop_index(op.f('ix_analytics_session_id'), table_name='analytics')
+    op.drop_index(op.f('ix_analytics_id'), table_name='analytics')
+    op.drop_index(op.f('ix_analytics_event_type'), table_name='analytics')
+    op.drop_table('analytics')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_rework_jobs_id'), table_name='rework_jobs')
+    op.drop_table('rework_jobs')
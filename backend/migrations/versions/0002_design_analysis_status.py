@@ -0,0 +1,29 @@
+"""Track deferred design analysis (designs.analysis_status)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('designs', sa.Column('analysis_status', sa.String(), nullable=True))
+    # Existing designs were analysed inline
+    op.execute("UPDATE designs SET analysis_status = 'completed'")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('designs') as batch_op:
+        batch_op.drop_column('analysis_status')
@@ -0,0 +1,44 @@
+"""Pre-generated template gallery previews (template_previews)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'template_previews',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('template_key', sa.String(), nullable=True),
+        sa.Column('category', sa.String(), nullable=True),
+        sa.Column('style_preset', sa.String(), nullable=True),
+        sa.Column('prompt', sa.Text(), nullable=True),
+        sa.Column('image_s3_key', sa.String(), nullable=True),
+        sa.Column('model_version', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_template_previews_id', 'template_previews', ['id'])
+    op.create_index('ix_template_previews_template_key', 'template_previews', ['template_key'], unique=True)
+    op.create_index('ix_template_previews_category', 'template_previews', ['category'])
+    op.create_index('ix_template_previews_style_preset', 'template_previews', ['style_preset'])
+
+
+def downgrade() -> None:
+    op.drop_table('template_previews')
@@ -0,0 +1,48 @@
+"""Background 3D generation jobs (model_3d_jobs)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 09:15:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'model_3d_jobs',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=True),
+        sa.Column('input_path', sa.String(), nullable=True),
+        sa.Column('export_format', sa.String(), nullable=True),
+        sa.Column('remove_background', sa.Boolean(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('stage', sa.String(), nullable=True),
+        sa.Column('progress', sa.Integer(), nullable=True),
+        sa.Column('tripo_task_id', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_model_3d_jobs_id', 'model_3d_jobs', ['id'])
+    op.create_index('ix_model_3d_jobs_user_id', 'model_3d_jobs', ['user_id'])
+    op.create_index('ix_model_3d_jobs_status', 'model_3d_jobs', ['status'])
+
+
+def downgrade() -> None:
+    op.drop_table('model_3d_jobs')
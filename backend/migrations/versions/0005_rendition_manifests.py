@@ -0,0 +1,30 @@
+"""WebP/AVIF rendition manifests (designs.renditions, tryons.snapshot_renditions)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 09:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('designs', sa.Column('renditions', sa.JSON(), nullable=True))
+    op.add_column('tryons', sa.Column('snapshot_renditions', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('tryons') as batch_op:
+        batch_op.drop_column('snapshot_renditions')
+    with op.batch_alter_table('designs') as batch_op:
+        batch_op.drop_column('renditions')
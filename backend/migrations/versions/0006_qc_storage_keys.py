@@ -0,0 +1,30 @@
+"""Storage keys for QC uploads (qc_inspections.item_image_key, item_thumbnail_key)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 09:25:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing data: URLs are moved out by python -m backend.utils.migrate_qc_images
+    op.add_column('qc_inspections', sa.Column('item_image_key', sa.String(), nullable=True))
+    op.add_column('qc_inspections', sa.Column('item_thumbnail_key', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('qc_inspections') as batch_op:
+        batch_op.drop_column('item_thumbnail_key')
+        batch_op.drop_column('item_image_key')
@@ -1,10 +1,11 @@
 """
 Database models and setup for JewelTech
 """
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, JSON, ForeignKey
+from sqlalchemy import create_engine, inspect, Column, Integer, String, Float, DateTime, Text, Boolean, JSON, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
+from pathlib import Path
 from backend.app.config import settings
 
 # Create database engine
@@ -19,6 +20,9 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base class for models
 Base = declarative_base()
 
+# Alembic revision matching the schema of databases created before migrations were introduced
+BASELINE_REVISION = "0001"
+
 
 def get_db():
     """Dependency for getting database session"""
@@ -59,6 +63,7 @@ class Design(Base):
 
     # Generation details
     generated_images = Column(JSON)  # List of image URLs
+    renditions = Column(JSON)  # Rendition manifest per generated image (None for older designs)
     seed_id = Column(String)
     model_version = Column(String)
     generation_id = Column(String, unique=True, index=True)
@@ -67,6 +72,7 @@ class Design(Base):
     dominant_materials = Column(JSON)  # ["gold", "diamond"]
     dominant_colors = Column(JSON)  # ["gold", "white"]
     confidence_score = Column(Float)
+    analysis_status = Column(String, default="completed")  # pending, completed, failed
 
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -103,6 +109,7 @@ class TryOn(Base):
     # Snapshot
     snapshot_url = Column(String)
     snapshot_filename = Column(String)
+    snapshot_renditions = Column(JSON)  # Rendition manifest of the snapshot
 
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -122,13 +129,15 @@ class QCInspection(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
 
     # Inspected item
-    item_image_url = Column(String)
-    item_thumbnail_url = Column(String)
+    item_image_url = Column(String)  # Legacy: data URL stored before uploads moved to storage
+    item_thumbnail_url = Column(String)  # Legacy, as item_image_url
+    item_image_key = Column(String)  # Storage key of the inspected file (image, CAD or PDF)
+    item_thumbnail_key = Column(String)  # Storage key of the PNG thumbnail (images only)
     item_reference = Column(String)  # Design ID, Order ID, etc.
 
     # Detection results
     detections = Column(JSON)  # [{x, y, w, h, label, confidence, severity}]
-    detection_mode = Column(String)  # simulated or ml
+    detection_mode = Column(String)  # simulated, classical or ml
     model_version = Column(String)
 
     # Operator decision
@@ -161,7 +170,7 @@ class ReworkJob(Base):
     defect_description = Column(Text)
 
     # Evidence
-    evidence_images = Column(JSON)  # List of image URLs
+    evidence_images = Column(JSON)  # List of storage keys (or image URLs from older jobs)
 
     # Assignment
     assigned_to_station = Column(String)
@@ -185,6 +194,59 @@ class ReworkJob(Base):
     inspection = relationship("QCInspection", back_populates="rework_job")
 
 
+class TemplatePreview(Base):
+    """Pre-generated preview image for a template prompt"""
+    __tablename__ = "template_previews"
+
+    id = Column(Integer, primary_key=True, index=True)
+    template_key = Column(String, unique=True, index=True)  # Hash of category + style + prompt + image model
+
+    # Template
+    category = Column(String, index=True)
+    style_preset = Column(String, index=True)
+    prompt = Column(Text)
+
+    # Rendered preview
+    image_s3_key = Column(String)
+    model_version = Column(String)
+    status = Column(String, default="pending")  # pending, ready, failed
+    error = Column(Text)
+
+    # Metadata
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Model3DJob(Base):
+    """Background 3D model generation job"""
+    __tablename__ = "model_3d_jobs"
+
+    id = Column(String, primary_key=True, index=True)  # Also used as the generation ID
+    user_id = Column(String, index=True)  # MongoDB user ID
+
+    # Input
+    input_path = Column(String)  # Local storage path of the submitted image
+    export_format = Column(String, default="glb")
+    remove_background = Column(Boolean, default=True)
+
+    # Progress
+    status = Column(String, default="queued", index=True)  # queued, running, succeeded, failed
+    stage = Column(String, default="queued")  # queued, uploading, creating_task, generating, downloading, storing, completed
+    progress = Column(Integer, default=0)  # 0-100
+    tripo_task_id = Column(String)  # Stored as soon as the Tripo task exists so it can be resumed
+    attempts = Column(Integer, default=0)
+
+    # Outcome
+    result = Column(JSON)
+    error = Column(Text)
+
+    # Timing
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+
+
 class Analytics(Base):
     """Analytics and logging model"""
     __tablename__ = "analytics"
@@ -207,10 +269,35 @@ class Analytics(Base):
     duration_ms = Column(Integer)  # Event duration if applicable
 
 
-# Create all tables
-def init_db():
-    """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+def _alembic_config(connection):
+    """Alembic config for backend/migrations, running on the given connection"""
+    from alembic.config import Config
+
+    config = Config(str(Path(__file__).resolve().parent.parent / "alembic.ini"))
+    config.attributes["connection"] = connection
+    return config
+
+
+# Create or migrate tables
+def init_db(bind=None):
+    """
+    Initialize database tables by applying pending Alembic migrations (backend/migrations)
+
+    Databases created before migrations existed are first stamped with the
+    baseline revision, so only the later revisions run on them.
+
+    Args:
+        bind: Engine to initialize (defaults to the app engine)
+    """
+    from alembic import command
+
+    bind = bind or engine
+    with bind.begin() as connection:
+        config = _alembic_config(connection)
+        tables = inspect(connection).get_table_names()
+        if tables and "alembic_version" not in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
 
 
 if __name__ == "__main__":
@@ -191,6 +191,83 @@ class TrialUsageModel:
         usage_record["_id"] = str(result.inserted_id)
         return usage_record
 
+    @staticmethod
+    def record_usage_bulk(user_id: str, feature: str, count: int) -> int:
+        """Record several uses of a feature at once (one insert and one counter update)"""
+        if count <= 0:
+            return 0
+
+        db = get_mongodb()
+        timestamp = datetime.utcnow()
+
+        db.trial_usage.insert_many([
+            {"user_id": user_id, "feature": feature, "timestamp": timestamp}
+            for _ in range(count)
+        ])
+
+        from bson import ObjectId
+        db.users.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$inc": {f"trial_limits.{feature}.used": count}}
+        )
+
+        return count
+
+    @staticmethod
+    def reserve_usage(user_id: str, feature: str, count: int = 1) -> Dict[str, Any]:
+        """
+        Atomically claim uses of a feature before the work runs
+
+        The counter is only incremented if the user still has `count` trials left,
+        so concurrent requests can't overspend the same remaining budget.
+
+        Returns:
+            Trial status (as check_trial_limit) with "allowed" telling whether the uses were reserved
+        """
+        trial_status = TrialUsageModel.check_trial_limit(user_id, feature)
+        if not trial_status["allowed"]:
+            return trial_status
+
+        db = get_mongodb()
+        from bson import ObjectId
+        query = {"_id": ObjectId(user_id)}
+        if not trial_status.get("unlimited"):
+            query["$expr"] = {"$lte": [
+                {"$add": [{"$ifNull": [f"$trial_limits.{feature}.used", 0]}, count]},
+                {"$ifNull": [f"$trial_limits.{feature}.limit", 3]}
+            ]}
+
+        result = db.users.update_one(query, {"$inc": {f"trial_limits.{feature}.used": count}})
+        if result.modified_count == 0:
+            return {**TrialUsageModel.check_trial_limit(user_id, feature), "allowed": False}
+
+        timestamp = datetime.utcnow()
+        db.trial_usage.insert_many([
+            {"user_id": user_id, "feature": feature, "timestamp": timestamp}
+            for _ in range(count)
+        ])
+        return {**trial_status, "allowed": True, "reserved": count}
+
+    @staticmethod
+    def refund_usage(user_id: str, feature: str, count: int = 1) -> int:
+        """Give back uses reserved with reserve_usage when the work didn't happen"""
+        if count <= 0:
+            return 0
+
+        db = get_mongodb()
+        from bson import ObjectId
+        db.users.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$inc": {f"trial_limits.{feature}.used": -count}}
+        )
+        for _ in range(count):
+            db.trial_usage.find_one_and_delete(
+                {"user_id": user_id, "feature": feature},
+                sort=[("timestamp", DESCENDING)]
+            )
+
+        return count
+
     @staticmethod
     def get_user_usage(user_id: str, feature: Optional[str] = None) -> list:
         """Get usage history for a user"""
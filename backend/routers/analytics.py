@@ -8,6 +8,7 @@ from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from backend.models.database import get_db, Analytics, Design, TryOn, QCInspection
+from backend.services.rendition_service import rendition_service
 from datetime import datetime, timedelta
 import logging
 
@@ -159,7 +160,10 @@ async def get_dashboard_stats(
                     "id": d.id,
                     "category": d.category,
                     "style_preset": d.style_preset,
-                    "thumbnail": d.generated_images[0] if d.generated_images else None,
+                    "thumbnail": rendition_service.url(
+                        d.renditions[0] if d.renditions else None,
+                        fallback=d.generated_images[0] if d.generated_images else None
+                    ),
                     "created_at": d.created_at.isoformat()
                 }
                 for d in recent_designs
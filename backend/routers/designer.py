@@ -2,17 +2,27 @@
 AI Jewellery Designer Router
 Endpoints for text-to-image jewellery generation and 3D model generation
 """
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
-from backend.models.database import get_db, Design, User
+from backend.models.database import get_db, Design, User, SessionLocal
 from backend.models.mongodb import TrialUsageModel
 from backend.services.ai_designer_service import ai_designer_service
 from backend.services.s3_service import s3_service
 from backend.services.model_3d_service import model_3d_service
-from backend.utils.auth import get_current_user, get_current_verified_user
+from backend.services.model_3d_job_service import model_3d_job_service
+from backend.services.mesh_analysis_service import mesh_analysis_service
+from backend.services.http_client_service import http_client_service
+from backend.services.template_gallery_service import template_gallery_service
+from backend.services.rendition_service import rendition_service
+from backend.utils.auth import get_current_user, get_current_verified_user, get_admin_user
+from backend.utils.events import event_broker, format_sse
+from backend.app.config import settings
 from PIL import Image
+from datetime import datetime
+import asyncio
 import io
 import logging
 
@@ -29,6 +39,8 @@ class GenerateDesignRequest(BaseModel):
     style_preset: str = Field(..., description="Style: bridal, minimalist, traditional, antique, heavy-stone")
     realism_mode: str = Field(default="realistic", description="Realism: realistic, photoreal, cad, sketch")
     num_images: int = Field(default=4, ge=1, le=4, description="Number of images to generate")
+    defer_analysis: bool = Field(default=False, description="Return images immediately and run design analysis in the background")
+    use_cache: bool = Field(default=True, description="Reuse a cached generation for an identical prompt (when the design cache is enabled)")
     user_id: Optional[int] = Field(default=1, description="User ID")
 
 
@@ -37,6 +49,8 @@ class ImageData(BaseModel):
     url: str
     revised_prompt: Optional[str] = None
     seed: str
+    timings: Optional[Dict[str, float]] = None
+    renditions: Optional[Dict[str, Any]] = None  # WebP/AVIF variants, each with a url
 
 
 class GenerateDesignResponse(BaseModel):
@@ -49,9 +63,12 @@ class GenerateDesignResponse(BaseModel):
     style_preset: str
     realism_mode: str
     images: List[ImageData]
+    failed_images: int = 0
     materials: List[str]
     colors: List[str]
-    confidence: float
+    confidence: Optional[float] = None
+    analysis_status: str = "completed"
+    cached: bool = False
     created_at: str
 
 
@@ -59,6 +76,7 @@ class TemplatePromptsRequest(BaseModel):
     """Request for template prompts"""
     category: str
     style_preset: str
+    include_previews: bool = False  # Include pre-generated preview image URLs
 
 
 class SaveIdeaRequest(BaseModel):
@@ -67,9 +85,97 @@ class SaveIdeaRequest(BaseModel):
     is_favorite: Optional[bool] = False
 
 
+def _analysis_payload(design: Design) -> Dict[str, Any]:
+    """Build the analysis fields of a design for the analysis endpoints"""
+    return {
+        "design_id": design.id,
+        "analysis_status": design.analysis_status or "completed",
+        "materials": design.dominant_materials or [],
+        "colors": design.dominant_colors or [],
+        "confidence": design.confidence_score
+    }
+
+
+def _mark_analysis_failed(design_id: int):
+    """Settle a deferred analysis that could not be stored so readers stop waiting on it (fresh transaction)"""
+    db = SessionLocal()
+    try:
+        db.query(Design).filter(Design.id == design_id).update({"analysis_status": "failed"})
+        db.commit()
+    except Exception as e:
+        logger.error(f"Could not mark analysis of design {design_id} as failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+async def _complete_design_analysis(design_id: int, image_url: str, enhanced_prompt: str, cache_key: Optional[str] = None):
+    """
+    Background follow-up for deferred analysis: run Claude, patch the Design row
+    and notify SSE subscribers
+    """
+    analysis = await ai_designer_service.analyze_design_with_claude(image_url, enhanced_prompt)
+    await ai_designer_service.update_cached_analysis(cache_key, analysis)
+
+    db = SessionLocal()
+    try:
+        design = db.query(Design).filter(Design.id == design_id).first()
+        if not design:
+            logger.warning(f"Design {design_id} deleted before analysis completed")
+            payload = {"design_id": design_id, "analysis_status": "deleted"}
+        else:
+            design.dominant_materials = analysis.get("materials", [])
+            design.dominant_colors = analysis.get("colors", [])
+            design.confidence_score = analysis.get("confidence", 0.5)
+            design.analysis_status = "completed"
+            db.commit()
+
+            payload = _analysis_payload(design)
+            logger.info(f"Deferred analysis stored for design {design_id}")
+    except Exception as e:
+        logger.error(f"Error storing deferred analysis for design {design_id}: {e}")
+        db.rollback()
+        _mark_analysis_failed(design_id)
+        payload = {"design_id": design_id, "analysis_status": "failed", "error": str(e)}
+    finally:
+        db.close()
+
+    event_broker.publish(f"design-analysis:{design_id}", {**payload, "final": True})
+
+
+async def _store_design_renditions(design_id: int, images: List[Dict[str, Any]], cache_key: Optional[str] = None):
+    """
+    Background follow-up: encode the gallery renditions of a new design and store
+    their manifests on the Design row (and in its design cache entry, so cache hits reuse them)
+    """
+    renditions = await ai_designer_service.create_renditions(images)
+    if not any(renditions):
+        return
+    await ai_designer_service.update_cached_renditions(cache_key, renditions)
+
+    def store():
+        db = SessionLocal()
+        try:
+            design = db.query(Design).filter(Design.id == design_id).first()
+            if not design:
+                logger.warning(f"Design {design_id} deleted before renditions completed")
+                return
+            design.renditions = renditions
+            db.commit()
+            logger.info(f"Renditions stored for design {design_id}")
+        except Exception as e:
+            logger.error(f"Error storing renditions for design {design_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    await asyncio.to_thread(store)
+
+
 @router.post("/generate", response_model=GenerateDesignResponse)
 async def generate_design(
     request: GenerateDesignRequest,
+    background_tasks: BackgroundTasks,
     current_user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -84,6 +190,10 @@ async def generate_design(
     5. Saves to database
     6. Records trial usage
     7. Returns results with URLs
+
+    With defer_analysis=true, step 4 runs in the background after the response is sent;
+    poll /designs/{id}/analysis or stream /designs/{id}/analysis/stream for the result.
+    WebP/AVIF gallery renditions are always encoded in the background.
     """
     try:
         user_id = current_user["_id"]
@@ -108,7 +218,9 @@ async def generate_design(
             category=request.category,
             style_preset=request.style_preset,
             realism_mode=request.realism_mode,
-            num_images=request.num_images
+            num_images=request.num_images,
+            defer_analysis=request.defer_analysis,
+            use_cache=request.use_cache
         )
 
         # Record trial usage
@@ -126,12 +238,14 @@ async def generate_design(
             prompt=request.prompt,
             realism_mode=request.realism_mode,
             generated_images=[img["url"] for img in result["images"]],
+            renditions=[img.get("renditions") for img in result["images"]],
             seed_id=result["images"][0]["seed"] if result["images"] else "",
             model_version=result["model"],
             generation_id=result["generation_id"],
             dominant_materials=result["materials"],
             dominant_colors=result["colors"],
-            confidence_score=result["confidence"]
+            confidence_score=result["confidence"],
+            analysis_status=result["analysis_status"]
         )
 
         db.add(design)
@@ -140,6 +254,19 @@ async def generate_design(
 
         logger.info(f"Design saved: {design.id}")
 
+        if result["analysis_status"] == "pending":
+            background_tasks.add_task(
+                _complete_design_analysis,
+                design.id,
+                result["images"][0]["url"],
+                result["enhanced_prompt"],
+                result["cache_key"]
+            )
+
+        # Cache hits carry the manifests stored by an earlier follow-up; only missing ones are encoded
+        if settings.renditions_enabled and not all(img.get("renditions") for img in result["images"]):
+            background_tasks.add_task(_store_design_renditions, design.id, result["images"], result["cache_key"])
+
         return GenerateDesignResponse(
             generation_id=result["generation_id"],
             design_id=design.id,
@@ -148,10 +275,16 @@ async def generate_design(
             category=request.category,
             style_preset=request.style_preset,
             realism_mode=request.realism_mode,
-            images=[ImageData(**img) for img in result["images"]],
+            images=[
+                ImageData(**{**img, "renditions": rendition_service.with_urls(img.get("renditions"))})
+                for img in result["images"]
+            ],
+            failed_images=result.get("failed_images", 0),
             materials=result["materials"],
             colors=result["colors"],
             confidence=result["confidence"],
+            analysis_status=result["analysis_status"],
+            cached=result["cached"],
             created_at=result["created_at"]
         )
 
@@ -165,7 +298,8 @@ async def get_template_prompts(request: TemplatePromptsRequest):
     """
     Get template prompts for a category and style
 
-    Returns pre-defined example prompts that users can use
+    Returns pre-defined example prompts that users can use, optionally with
+    ready-made preview images from the template gallery warm-up job
     """
     try:
         templates = ai_designer_service.get_template_prompts(
@@ -173,17 +307,49 @@ async def get_template_prompts(request: TemplatePromptsRequest):
             request.style_preset
         )
 
-        return {
+        response = {
             "category": request.category,
             "style_preset": request.style_preset,
             "templates": templates
         }
 
+        if request.include_previews:
+            response["previews"] = await template_gallery_service.get_previews(
+                request.category,
+                request.style_preset,
+                templates
+            )
+
+        return response
+
     except Exception as e:
         logger.error(f"Error getting templates: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/templates/warmup")
+async def warm_template_gallery(admin_user: Dict[str, Any] = Depends(get_admin_user)):
+    """
+    Start (or resume) pre-generating template preview images (Admin only)
+
+    Templates that already have a preview are skipped.
+    """
+    started = template_gallery_service.start()
+    return {
+        "success": True,
+        "started": started,
+        "state": template_gallery_service.state
+    }
+
+
+@router.get("/templates/warmup")
+async def get_template_gallery_status(admin_user: Dict[str, Any] = Depends(get_admin_user)):
+    """
+    Get template preview warm-up progress (Admin only)
+    """
+    return template_gallery_service.state
+
+
 @router.post("/save-idea")
 async def save_as_idea(
     request: SaveIdeaRequest,
@@ -236,9 +402,11 @@ async def get_design(design_id: int, db: Session = Depends(get_db)):
             "prompt": design.prompt,
             "realism_mode": design.realism_mode,
             "images": design.generated_images,
+            "renditions": [rendition_service.with_urls(manifest) for manifest in design.renditions or []],
             "materials": design.dominant_materials,
             "colors": design.dominant_colors,
             "confidence": design.confidence_score,
+            "analysis_status": design.analysis_status or "completed",
             "is_favorite": design.is_favorite,
             "is_idea": design.is_idea,
             "created_at": design.created_at.isoformat()
@@ -251,6 +419,59 @@ async def get_design(design_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/designs/{design_id}/analysis")
+async def get_design_analysis(design_id: int, db: Session = Depends(get_db)):
+    """
+    Get the design analysis (materials, colors, confidence) and its status
+    """
+    try:
+        design = db.query(Design).filter(Design.id == design_id).first()
+
+        if not design:
+            raise HTTPException(status_code=404, detail="Design not found")
+
+        return _analysis_payload(design)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting design analysis: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/designs/{design_id}/analysis/stream")
+async def stream_design_analysis(design_id: int, db: Session = Depends(get_db)):
+    """
+    Stream the design analysis as Server-Sent Events
+
+    Emits a single "analysis" event once the analysis is available
+    (immediately if it already is), then closes the stream.
+    """
+    design = db.query(Design).filter(Design.id == design_id).first()
+
+    if not design:
+        raise HTTPException(status_code=404, detail="Design not found")
+
+    payload = _analysis_payload(design)
+
+    async def event_stream():
+        if payload["analysis_status"] != "pending":
+            yield format_sse(payload, event="analysis")
+            return
+
+        async for event in event_broker.subscribe(
+            f"design-analysis:{design_id}",
+            timeout=settings.sse_timeout_seconds
+        ):
+            yield format_sse(event, event="analysis")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/designs")
 async def list_designs(
     user_id: int = 1,
@@ -259,10 +480,16 @@ async def list_designs(
     is_idea: Optional[bool] = None,
     limit: int = 20,
     offset: int = 0,
+    image_width: Optional[int] = None,
+    image_format: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     List designs with filters
+
+    thumbnail is the smallest stored rendition covering image_width pixels
+    (default RENDITION_LIST_WIDTH) in image_format (webp or avif, default
+    webp); designs created before renditions fall back to the original image.
     """
     try:
         query = db.query(Design).filter(Design.user_id == user_id)
@@ -288,7 +515,13 @@ async def list_designs(
                     "category": d.category,
                     "style_preset": d.style_preset,
                     "prompt": d.prompt,
-                    "thumbnail": d.generated_images[0] if d.generated_images else None,
+                    "thumbnail": rendition_service.url(
+                        d.renditions[0] if d.renditions else None,
+                        image_width,
+                        image_format,
+                        fallback=d.generated_images[0] if d.generated_images else None
+                    ),
+                    "image_url": d.generated_images[0] if d.generated_images else None,
                     "is_favorite": d.is_favorite,
                     "is_idea": d.is_idea,
                     "created_at": d.created_at.isoformat()
@@ -328,6 +561,55 @@ async def delete_design(design_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _load_3d_source_image(
+    file: Optional[UploadFile],
+    image_url: Optional[str],
+    export_format: str
+) -> tuple:
+    """
+    Validate 3D generation inputs and load the source image
+
+    Returns:
+        Tuple of (image bytes, content type)
+    """
+    # Validate that at least one input method is provided
+    if not file and not image_url:
+        raise HTTPException(
+            status_code=400,
+            detail="Either 'file' or 'image_url' must be provided"
+        )
+
+    # Validate export format
+    supported_formats = model_3d_service.get_supported_formats()
+    if export_format not in supported_formats:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format: {export_format}. Supported: {', '.join(supported_formats)}"
+        )
+
+    # Load image from file or URL
+    if file:
+        # Validate file type
+        if not file.content_type or not file.content_type.startswith('image/'):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type: {file.content_type}. Must be an image."
+            )
+        logger.info(f"Generating 3D model from uploaded file: {file.filename}, format: {export_format}")
+        return await file.read(), file.content_type
+
+    # Fetch image from URL (now S3 URLs which are publicly accessible)
+    logger.info(f"Generating 3D model from URL: {image_url}, format: {export_format}")
+    client = http_client_service.get_client("default")
+    response = await client.get(image_url, timeout=30.0, follow_redirects=True)
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to fetch image from URL: HTTP {response.status_code}"
+        )
+    return response.content, response.headers.get("content-type", "image/png").split(";")[0]
+
+
 @router.post("/generate-3d")
 async def generate_3d_model(
     file: Optional[UploadFile] = File(default=None, description="2D image file (JPEG, PNG)"),
@@ -374,45 +656,8 @@ async def generate_3d_model(
 
         logger.info(f"Generating 3D model for user {current_user['username']}")
 
-        # Validate that at least one input method is provided
-        if not file and not image_url:
-            raise HTTPException(
-                status_code=400,
-                detail="Either 'file' or 'image_url' must be provided"
-            )
-
-        # Validate export format
-        supported_formats = model_3d_service.get_supported_formats()
-        if export_format not in supported_formats:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported format: {export_format}. Supported: {', '.join(supported_formats)}"
-            )
-
-        # Load image from file or URL
-        if file:
-            # Validate file type
-            if not file.content_type or not file.content_type.startswith('image/'):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid file type: {file.content_type}. Must be an image."
-                )
-            logger.info(f"Generating 3D model from uploaded file: {file.filename}, format: {export_format}")
-            contents = await file.read()
-            image = Image.open(io.BytesIO(contents))
-        else:
-            # Fetch image from URL (now S3 URLs which are publicly accessible)
-            logger.info(f"Generating 3D model from URL: {image_url}, format: {export_format}")
-            import httpx
-
-            async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-                response = await client.get(image_url)
-                if response.status_code != 200:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Failed to fetch image from URL: HTTP {response.status_code}"
-                    )
-                image = Image.open(io.BytesIO(response.content))
+        contents, _ = await _load_3d_source_image(file, image_url, export_format)
+        image = Image.open(io.BytesIO(contents))
 
         # Generate 3D model
         result = await model_3d_service.generate_3d_model(
@@ -437,6 +682,7 @@ async def generate_3d_model(
             "generation_id": result["generation_id"],
             "model_url": result["model_url"],
             "thumbnail_url": result["thumbnail_url"],
+            "thumbnail_renditions": rendition_service.with_urls(result.get("thumbnail_renditions")),
             "format": result["format"],
             "mime_type": result["mime_type"],
             "file_size": result["file_size"],
@@ -455,6 +701,128 @@ async def generate_3d_model(
         )
 
 
+@router.post("/3d-jobs", status_code=202)
+async def submit_3d_job(
+    file: Optional[UploadFile] = File(default=None, description="2D image file (JPEG, PNG)"),
+    image_url: Optional[str] = Form(default=None, description="URL of image to convert to 3D"),
+    remove_background: bool = Form(default=True, description="Remove background before processing"),
+    export_format: str = Form(default="glb", description="Export format: glb, obj, ply, stl"),
+    current_user: Dict[str, Any] = Depends(get_current_verified_user)
+):
+    """
+    Queue a 3D model generation job (Requires authentication)
+
+    Returns immediately with a job ID. Poll GET /3d-jobs/{job_id} or subscribe
+    to GET /3d-jobs/{job_id}/events for stage progress. A trial is reserved
+    when the job is queued and refunded if the job fails.
+
+    Returns:
+        Job state with status "queued"
+    """
+    try:
+        user_id = current_user["_id"]
+
+        # Reserve a trial up front so queued jobs can't exceed the limit
+        trial_status = TrialUsageModel.reserve_usage(user_id, "3d_generation")
+        if not trial_status["allowed"]:
+            raise HTTPException(
+                status_code=402,
+                detail={
+                    "error": "trial_limit_reached",
+                    "message": f"You've used all {trial_status['limit']} trials for 3D Generation. Join our waitlist for unlimited access!",
+                    "trial_status": trial_status
+                }
+            )
+
+        try:
+            contents, content_type = await _load_3d_source_image(file, image_url, export_format)
+
+            job = await model_3d_job_service.submit(
+                user_id=str(user_id),
+                image_bytes=contents,
+                content_type=content_type,
+                export_format=export_format,
+                remove_background=remove_background
+            )
+        except Exception:
+            TrialUsageModel.refund_usage(user_id, "3d_generation")
+            raise
+
+        return {
+            "success": True,
+            **job,
+            "status_url": f"/api/designer/3d-jobs/{job['job_id']}",
+            "events_url": f"/api/designer/3d-jobs/{job['job_id']}/events"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queuing 3D job: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to queue 3D generation: {str(e)}"
+        )
+
+
+async def _get_user_3d_job(job_id: str, current_user: Dict[str, Any]) -> Dict:
+    """Load a 3D job, hiding other users' jobs"""
+    job = await model_3d_job_service.get_job(job_id)
+    if not job or job["user_id"] != str(current_user["_id"]):
+        raise HTTPException(status_code=404, detail="3D job not found")
+    return job
+
+
+@router.get("/3d-jobs/{job_id}")
+async def get_3d_job(
+    job_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Get the status of a 3D generation job
+
+    Returns:
+        Job state (status, stage, progress, and result or error when finished)
+    """
+    return await _get_user_3d_job(job_id, current_user)
+
+
+@router.get("/3d-jobs/{job_id}/events")
+async def stream_3d_job(
+    job_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Stream 3D job progress as Server-Sent Events
+
+    Emits the current state, then a "progress" event on every later stage
+    change, and closes after the job succeeds or fails.
+    """
+    job = await _get_user_3d_job(job_id, current_user)
+
+    async def event_stream():
+        yield format_sse(job, event="progress")
+        if job["status"] not in ("queued", "running"):
+            return
+
+        # Replay only covers what happened between the snapshot and subscribing:
+        # older events would send the progress bar backwards
+        snapshot_at = datetime.fromisoformat(job["updated_at"])
+        async for event in event_broker.subscribe(
+            model_3d_job_service.channel(job_id),
+            timeout=settings.sse_timeout_seconds
+        ):
+            if not event.get("final") and datetime.fromisoformat(event["updated_at"]) <= snapshot_at:
+                continue
+            yield format_sse(event, event="progress")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/3d-formats")
 async def get_supported_3d_formats():
     """
@@ -466,6 +834,8 @@ async def get_supported_3d_formats():
     return {
         "formats": model_3d_service.get_supported_formats(),
         "recommended": "glb",
+        # Formats with real mesh statistics (vertices, faces, bounding box, area, volume, watertight)
+        "analyzed_formats": list(mesh_analysis_service.SUPPORTED_FORMATS),
         "descriptions": {
             "glb": "GL Transmission Format Binary - Best for web viewing",
             "obj": "Wavefront OBJ - Widely compatible, good for editing",
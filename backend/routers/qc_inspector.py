@@ -3,23 +3,145 @@ QC Inspector Router
 Endpoints for quality control inspection
 """
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, defer
 from backend.models.database import get_db, QCInspection, ReworkJob
 from backend.models.mongodb import TrialUsageModel
-from backend.services.qc_inspector_service import qc_inspector_service
+from backend.services.qc_inspector_service import qc_inspector_service, THUMBNAIL_FOLDER
+from backend.services.qc_pool_service import QCPoolBusyError
+from backend.services.image_executor_service import image_executor_service, ImageExecutorBusyError
 from backend.services.s3_service import s3_service
+from backend.services.storage_service import get_storage_service
 from backend.utils.auth import get_current_user
+from backend.app.config import settings
 from PIL import Image
+import asyncio
 import io
+import json
 import logging
+import mimetypes
+import time
+import zipfile
+import zlib
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'webp', 'gif']
+
+# Same limit as single inspections, per file and per zip entry
+MAX_FILE_SIZE = 50 * 1024 * 1024
+
+# Times a batch item waits out a saturated QC pool / image executor before failing
+BATCH_BUSY_RETRIES = 3
+
+
+def _make_thumbnail(contents: bytes) -> bytes:
+    """Render a 300x300 PNG thumbnail (CPU-bound: run on the image executor)"""
+    image = Image.open(io.BytesIO(contents))
+    image.thumbnail((300, 300), Image.Resampling.LANCZOS)
+    thumb_buffer = io.BytesIO()
+    image.save(thumb_buffer, format='PNG')
+    return thumb_buffer.getvalue()
+
+
+async def _store_upload(
+    contents: bytes,
+    content_type: Optional[str],
+    filename: Optional[str],
+    is_image: bool
+) -> Tuple[str, Optional[str]]:
+    """
+    Store an inspected file and, for images, its PNG thumbnail
+
+    Rows keep only the storage keys; URLs are resolved when inspections are read.
+
+    Args:
+        contents: Uploaded file
+        content_type: Upload's MIME type
+        filename: Upload's filename (for the stored file's extension)
+        is_image: Whether to render a thumbnail
+
+    Returns:
+        Tuple of (file key, thumbnail key or None for CAD/PDF files)
+    """
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else None
+    if not is_image:
+        return await asyncio.to_thread(qc_inspector_service.store_file, contents, content_type, extension), None
+
+    # Thumbnail first: a saturated image executor fails the request before anything is stored
+    thumbnail = None
+    try:
+        thumbnail = await image_executor_service.run(_make_thumbnail, contents)
+    except ImageExecutorBusyError:
+        raise
+    except Exception as e:
+        logger.warning(f"Failed to create thumbnail: {e}")
+
+    uploads = [asyncio.to_thread(qc_inspector_service.store_file, contents, content_type, extension)]
+    if thumbnail is not None:
+        uploads.append(asyncio.to_thread(qc_inspector_service.store_file, thumbnail, "image/png", "png", THUMBNAIL_FOLDER))
+    keys = await asyncio.gather(*uploads)
+    # Without a thumbnail, lists fall back to the image itself
+    return keys[0], keys[-1]
+
+
+def _delete_stored(keys) -> None:
+    """Best-effort removal of stored files whose inspection was not saved"""
+    storage = get_storage_service()
+    for key in set(filter(None, keys)):
+        storage.delete_image(key)
+
+
+async def _inspect_and_store(
+    contents: bytes,
+    file_type: str,
+    has_cad_file: bool,
+    force_simulated: bool,
+    content_type: Optional[str],
+    filename: Optional[str]
+) -> Tuple[Dict[str, Any], str, Optional[str]]:
+    """
+    Inspect a file while it is being stored; stored files are deleted again if the inspection fails
+
+    Returns:
+        Tuple of (inspection result, file key, thumbnail key)
+    """
+    store = asyncio.create_task(_store_upload(contents, content_type, filename, file_type == 'image'))
+    try:
+        result = await qc_inspector_service.inspect_file(
+            contents,
+            file_type=file_type,
+            has_cad_file=has_cad_file,
+            force_simulated=force_simulated
+        )
+    except asyncio.CancelledError:
+        store.cancel()
+        raise
+    except Exception:
+        stored = (await asyncio.gather(store, return_exceptions=True))[0]
+        if isinstance(stored, tuple):
+            await asyncio.to_thread(_delete_stored, stored)
+        raise
+
+    image_key, thumbnail_key = await store
+    return result, image_key, thumbnail_key
+
+
+def _busy_error(e: Exception) -> HTTPException:
+    """429 response telling the client to back off (QC pool or image executor saturated)"""
+    retry_after = getattr(e, "retry_after", settings.image_executor_retry_after_seconds)
+    return HTTPException(
+        status_code=429,
+        detail=str(e),
+        headers={"Retry-After": str(retry_after)}
+    )
+
 
 # Request/Response models
 class InspectionRequest(BaseModel):
@@ -92,7 +214,7 @@ async def inspect_item(
         logger.info(f"File read successfully - Size: {len(contents)} bytes")
 
         # Validate size (check with maximum size first)
-        max_size = 50 * 1024 * 1024  # 50MB max for all files
+        max_size = MAX_FILE_SIZE  # 50MB max for all files
         if len(contents) > max_size:
             raise HTTPException(status_code=400, detail=f"File too large (max 50MB)")
 
@@ -104,7 +226,7 @@ async def inspect_item(
 
         # Accepted file types
         cad_extensions = ['stl', 'step', 'stp', 'obj', 'iges', 'igs']
-        image_extensions = ['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'webp', 'gif']
+        image_extensions = IMAGE_EXTENSIONS
         pdf_extensions = ['pdf']
 
         is_cad = file_extension in cad_extensions
@@ -134,51 +256,19 @@ async def inspect_item(
                 logger.error(f"Image validation failed: {str(e)}")
                 raise HTTPException(status_code=400, detail=f"Invalid image file: {str(e)}")
 
-        # Convert to base64 data URL for immediate display (no S3 upload needed for preview)
-        import base64
-
-        if is_image:
-            # For images, create base64 data URL
-            base64_data = base64.b64encode(contents).decode('utf-8')
-            url = f"data:{file.content_type};base64,{base64_data}"
-
-            # Create thumbnail
-            try:
-                # Re-open image from contents (don't reuse test_image after verify())
-                image = Image.open(io.BytesIO(contents))
-                image.thumbnail((300, 300), Image.Resampling.LANCZOS)
-                thumb_buffer = io.BytesIO()
-                image.save(thumb_buffer, format='PNG')
-                thumb_buffer.seek(0)
-                thumb_base64 = base64.b64encode(thumb_buffer.getvalue()).decode('utf-8')
-                thumbnail_url = f"data:image/png;base64,{thumb_base64}"
-            except Exception as e:
-                logger.warning(f"Failed to create thumbnail: {e}")
-                thumbnail_url = url
-        else:
-            # For CAD/PDF files, still need a placeholder or we could upload to S3 if needed
-            # For now, just use a data URL
-            base64_data = base64.b64encode(contents).decode('utf-8')
-            content_type = file.content_type or 'application/octet-stream'
-            url = f"data:{content_type};base64,{base64_data}"
-            thumbnail_url = None
-
         # Determine file type for inspection
         file_type = 'cad' if is_cad else 'pdf' if is_pdf else 'image'
 
-        # Perform inspection
-        inspection_result = await qc_inspector_service.inspect_file(
-            contents,
-            file_type=file_type,
-            has_cad_file=has_cad_file,
-            force_simulated=force_simulated
+        # Perform inspection while the file and thumbnail go to storage
+        inspection_result, image_key, thumbnail_key = await _inspect_and_store(
+            contents, file_type, has_cad_file, force_simulated, file.content_type, file.filename
         )
 
         # Save to database
         inspection = QCInspection(
             user_id=user_id,
-            item_image_url=url,
-            item_thumbnail_url=thumbnail_url,
+            item_image_key=image_key,
+            item_thumbnail_key=thumbnail_key,
             item_reference=item_reference,
             detections=inspection_result["defects"],
             detection_mode=inspection_result["detection_mode"],
@@ -202,8 +292,8 @@ async def inspect_item(
             "recommendation": inspection_result["recommendation"],
             "defects": inspection_result["defects"],
             "defect_count": inspection_result["defect_count"],
-            "image_url": url,
-            "thumbnail_url": thumbnail_url,
+            "image_url": qc_inspector_service.file_url(image_key),
+            "thumbnail_url": qc_inspector_service.file_url(thumbnail_key),
             "detection_mode": inspection_result["detection_mode"],
             "file_type": inspection_result["file_type"],
             "has_cad_file": has_cad_file,
@@ -217,11 +307,270 @@ async def inspect_item(
 
     except HTTPException:
         raise
+    except (QCPoolBusyError, ImageExecutorBusyError) as e:
+        raise _busy_error(e)
     except Exception as e:
         logger.error(f"Error during inspection: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _read_zip(data: bytes, max_items: int, max_total_size: int) -> List[Tuple[str, bytes]]:
+    """
+    Extract the image entries of a zip archive (CPU-bound: run in a thread)
+
+    Directories, macOS metadata and hidden files are skipped.
+
+    Raises:
+        ValueError: If the archive is invalid or corrupt, has too many images,
+            an oversized entry or more than max_total_size bytes in total
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid zip file: {e}")
+
+    entries = []
+    total_size = 0
+    with archive:
+        for info in archive.infolist():
+            name = info.filename.rsplit('/', 1)[-1]
+            if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                continue
+            if len(entries) >= max_items:
+                raise ValueError(f"A batch can hold at most {max_items} items")
+            # Checked before decompressing so a zip bomb can't exhaust memory
+            # (reads stop at the declared size, so these limits hold even if a header lies)
+            if info.file_size > MAX_FILE_SIZE:
+                raise ValueError(f"{info.filename} is too large (max 50MB)")
+            total_size += info.file_size
+            if total_size > max_total_size:
+                raise ValueError(f"Zip contents are too large (max {max_total_size // (1024 * 1024)}MB uncompressed)")
+            try:
+                entries.append((info.filename, archive.read(info)))
+            except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+                raise ValueError(f"Corrupt zip entry {info.filename}: {e}")
+    return entries
+
+
+async def _inspect_batch_item(
+    index: int,
+    source: str,
+    contents: bytes,
+    has_cad_file: bool,
+    force_simulated: bool
+) -> Dict[str, Any]:
+    """
+    Inspect one batch item: analysis (QC pool) runs while the file and thumbnail are stored
+
+    Returns:
+        Dict with index, source and either result/image_key/thumbnail_key or error
+    """
+    extension = source.rsplit('.', 1)[-1].lower() if '.' in source else ''
+    if extension not in IMAGE_EXTENSIONS:
+        return {"index": index, "source": source, "error": "Unsupported file type (batches accept images)"}
+    if len(contents) > MAX_FILE_SIZE:
+        return {"index": index, "source": source, "error": "File too large (max 50MB)"}
+
+    content_type = mimetypes.guess_type(source)[0] or f"image/{extension}"
+    for attempt in range(BATCH_BUSY_RETRIES + 1):
+        try:
+            result, image_key, thumbnail_key = await _inspect_and_store(
+                contents, 'image', has_cad_file, force_simulated, content_type, source
+            )
+            return {"index": index, "source": source, "result": result, "image_key": image_key, "thumbnail_key": thumbnail_key}
+        except (QCPoolBusyError, ImageExecutorBusyError) as e:
+            if attempt == BATCH_BUSY_RETRIES:
+                return {"index": index, "source": source, "error": str(e)}
+            await asyncio.sleep(getattr(e, "retry_after", settings.image_executor_retry_after_seconds))
+        except ValueError as e:
+            return {"index": index, "source": source, "error": str(e)}
+        except Exception as e:
+            logger.error(f"Error inspecting batch item {source}: {e}")
+            return {"index": index, "source": source, "error": str(e)}
+
+
+@router.post("/inspect-batch")
+async def inspect_batch(
+    files: List[UploadFile] = File(None, description="Images of the pieces on the tray"),
+    archive: Optional[UploadFile] = File(None, description="Zip archive of images (instead of or in addition to files)"),
+    item_reference: Optional[str] = Form(None, description="Tray/lot reference, prefixed to each item's filename"),
+    has_cad_file: bool = Form(True),
+    force_simulated: bool = Form(False),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Inspect a tray of pieces in one request (Requires authentication)
+
+    Items are analyzed in parallel and streamed back as NDJSON lines in
+    completion order:
+
+    - {"type": "batch", "total"}
+    - {"type": "item", "index", "source", "success", "status", "defects", ...} per item
+    - {"type": "summary", "succeeded", "failed", "inspection_ids", "elapsed_seconds"}
+
+    Inspections are saved with one bulk insert once every item has finished,
+    so inspection IDs arrive in the summary (keyed by item index). Trials for
+    the tray are reserved up front; items beyond the remaining trials are
+    reported as failed, and trials of items that fail or aren't saved are
+    refunded. If the client disconnects before the summary, nothing is saved
+    or charged (files already stored for finished items are not removed).
+    """
+    try:
+        user_id = current_user["_id"]
+        files = files or []
+        max_items = settings.qc_batch_max_items
+
+        items = []
+        for upload in files:
+            items.append((upload.filename or f"item_{len(items)}", await upload.read()))
+        if archive is not None:
+            try:
+                items.extend(await asyncio.to_thread(
+                    _read_zip, await archive.read(), max_items, settings.qc_batch_max_archive_mb * 1024 * 1024
+                ))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        if not items:
+            raise HTTPException(status_code=400, detail="Provide files and/or a zip archive")
+        if len(items) > max_items:
+            raise HTTPException(status_code=400, detail=f"A batch can hold at most {max_items} items")
+
+        # Reserve trials for the whole tray at once, so concurrent trays can't
+        # spend the same remaining budget; with too few left, take what remains
+        trial_status = TrialUsageModel.reserve_usage(user_id, "qc_inspector", len(items))
+        while not trial_status["allowed"] and trial_status.get("remaining", 0) > 0:
+            trial_status = TrialUsageModel.reserve_usage(
+                user_id, "qc_inspector", min(len(items), trial_status["remaining"])
+            )
+        if not trial_status["allowed"]:
+            raise HTTPException(
+                status_code=402,
+                detail={
+                    "error": "trial_limit_reached",
+                    "message": f"You've used all {trial_status['limit']} trials for QC Inspector. Join our waitlist for unlimited access!",
+                    "trial_status": trial_status
+                }
+            )
+        budget = trial_status["reserved"]
+
+        logger.info(f"QC batch for user {current_user['username']}: {len(items)} items, {budget} within trial budget")
+
+        async def ndjson_stream():
+            start = time.perf_counter()
+            # Reserved trials to give back unless their inspections are saved
+            unused = budget
+            try:
+                yield json.dumps({"type": "batch", "total": len(items)}) + "\n"
+
+                semaphore = asyncio.Semaphore(max(1, settings.qc_batch_concurrency))
+
+                async def run(index: int, source: str, contents: bytes) -> Dict[str, Any]:
+                    async with semaphore:
+                        return await _inspect_batch_item(index, source, contents, has_cad_file, force_simulated)
+
+                tasks = [asyncio.create_task(run(index, source, contents)) for index, (source, contents) in enumerate(items[:budget])]
+                completed = []
+                try:
+                    for index, (source, _) in enumerate(items[budget:], start=budget):
+                        completed.append({"index": index, "source": source, "error": "trial_limit_reached"})
+                        yield json.dumps({"type": "item", "index": index, "source": source, "success": False, "error": "trial_limit_reached"}) + "\n"
+
+                    for next_done in asyncio.as_completed(tasks):
+                        item = await next_done
+                        completed.append(item)
+                        if "error" in item:
+                            line = {"type": "item", "index": item["index"], "source": item["source"], "success": False, "error": item["error"]}
+                        else:
+                            result = item["result"]
+                            line = {
+                                "type": "item",
+                                "index": item["index"],
+                                "source": item["source"],
+                                "success": True,
+                                **{key: result[key] for key in (
+                                    "status", "recommendation", "defects", "defect_count", "detection_mode",
+                                    "image_analysis", "requires_reshoot", "lighting_warning"
+                                )}
+                            }
+                        yield json.dumps(line) + "\n"
+                finally:
+                    for task in tasks:
+                        task.cancel()
+
+                # One bulk insert and one commit for the whole tray
+                succeeded = sorted((item for item in completed if "error" not in item), key=lambda item: item["index"])
+                inspected_at = datetime.utcnow()
+                rows = [
+                    {
+                        "user_id": user_id,
+                        "item_image_key": item["image_key"],
+                        "item_thumbnail_key": item["thumbnail_key"],
+                        "item_reference": f"{item_reference}/{item['source']}" if item_reference else item["source"],
+                        "detections": item["result"]["defects"],
+                        "detection_mode": item["result"]["detection_mode"],
+                        "model_version": "v1.0",
+                        "confidence_threshold": item["result"]["confidence_threshold"],
+                        "inspected_at": inspected_at
+                    }
+                    for item in succeeded
+                ]
+                def save() -> List[int]:
+                    ids = []
+                    if rows:
+                        # IDs come back in row order (on SQLite, SQLAlchemy inserts row by row to keep it)
+                        ids = db.scalars(insert(QCInspection).returning(QCInspection.id, sort_by_parameter_order=True), rows).all()
+                    db.commit()
+                    return ids
+
+                try:
+                    ids = await asyncio.to_thread(save)
+                    inspection_ids = {item["index"]: inspection_id for item, inspection_id in zip(succeeded, ids)}
+                except Exception as e:
+                    await asyncio.to_thread(db.rollback)
+                    logger.error(f"Error saving QC batch: {e}")
+                    await asyncio.to_thread(
+                        _delete_stored,
+                        [key for item in succeeded for key in (item["image_key"], item["thumbnail_key"])]
+                    )
+                    yield json.dumps({"type": "summary", "success": False, "error": f"Could not save inspections: {e}"}) + "\n"
+                    return
+
+                # Saved inspections keep their trials; the rest are given back
+                unused = budget - len(rows)
+
+                logger.info(f"QC batch saved {len(rows)}/{len(items)} inspections in {time.perf_counter() - start:.1f}s")
+                yield json.dumps({
+                    "type": "summary",
+                    "success": True,
+                    "total": len(items),
+                    "succeeded": len(rows),
+                    "failed": len(items) - len(rows),
+                    "inspection_ids": inspection_ids,
+                    "elapsed_seconds": round(time.perf_counter() - start, 2)
+                }) + "\n"
+            finally:
+                if unused:
+                    # Called directly so the refund also runs when a disconnect cancels the stream
+                    try:
+                        TrialUsageModel.refund_usage(user_id, "qc_inspector", unused)
+                    except Exception as e:
+                        logger.error(f"Error refunding QC trials for user {user_id}: {e}")
+
+        return StreamingResponse(
+            ndjson_stream(),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error starting QC batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/triage")
 async def triage_inspection(
     request: TriageRequest,
@@ -267,7 +616,7 @@ async def triage_inspection(
                     key=lambda x: {"low": 1, "medium": 2, "high": 3}.get(x, 0)
                 ),
                 defect_description=request.operator_notes,
-                evidence_images=[inspection.item_image_url],
+                evidence_images=[inspection.item_image_key or inspection.item_image_url],
                 assigned_to_station=rework_job["assigned_station"],
                 priority=rework_job["priority"],
                 status="pending",
@@ -336,7 +685,7 @@ async def create_rework_job(
                 key=lambda x: {"low": 1, "medium": 2, "high": 3}.get(x, 0)
             ),
             defect_description=request.operator_notes,
-            evidence_images=[inspection.item_image_url],
+            evidence_images=[inspection.item_image_key or inspection.item_image_url],
             assigned_to_station=request.assigned_station,
             priority=request.priority,
             status="pending",
@@ -446,8 +795,8 @@ async def get_inspection(inspection_id: int, db: Session = Depends(get_db)):
         return {
             "id": inspection.id,
             "item_reference": inspection.item_reference,
-            "image_url": inspection.item_image_url,
-            "thumbnail_url": inspection.item_thumbnail_url,
+            "image_url": qc_inspector_service.file_url(inspection.item_image_key or inspection.item_image_url),
+            "thumbnail_url": qc_inspector_service.file_url(inspection.item_thumbnail_key or inspection.item_thumbnail_url),
             "defects": inspection.detections,
             "defect_count": len(inspection.detections) if inspection.detections else 0,
             "detection_mode": inspection.detection_mode,
@@ -485,7 +834,8 @@ async def list_inspections(
             query = query.filter(QCInspection.operator_decision == decision)
 
         total = query.count()
-        inspections = query.order_by(
+        # Rows not yet migrated may hold the whole upload as a data URL: don't load it for lists
+        inspections = query.options(defer(QCInspection.item_image_url)).order_by(
             QCInspection.created_at.desc()
         ).offset(offset).limit(limit).all()
 
@@ -497,7 +847,7 @@ async def list_inspections(
                 {
                     "id": i.id,
                     "item_reference": i.item_reference,
-                    "thumbnail_url": i.item_thumbnail_url,
+                    "thumbnail_url": qc_inspector_service.file_url(i.item_thumbnail_key or i.item_thumbnail_url),
                     "defect_count": len(i.detections) if i.detections else 0,
                     "operator_decision": i.operator_decision,
                     "rework_job_id": i.rework_job_id,
@@ -528,7 +878,7 @@ async def get_rework_job(rework_job_id: int, db: Session = Depends(get_db)):
             "defect_type": rework.defect_type,
             "defect_severity": rework.defect_severity,
             "defect_description": rework.defect_description,
-            "evidence_images": rework.evidence_images,
+            "evidence_images": [qc_inspector_service.file_url(image) for image in rework.evidence_images or []],
             "assigned_to_station": rework.assigned_to_station,
             "assigned_operator": rework.assigned_operator,
             "priority": rework.priority,
@@ -3,24 +3,39 @@ Virtual Try-On Router
 Endpoints for virtual try-on functionality with AI-powered Veo 2 integration
 """
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from sqlalchemy.orm import Session
 from backend.models.database import get_db, TryOn, Design
 from backend.models.mongodb import TrialUsageModel
+from backend.services.image_executor_service import image_executor_service, ImageExecutorBusyError
 from backend.services.s3_service import s3_service
-from backend.services.virtual_tryon_service import virtual_tryon_service
+from backend.services.storage_service import get_storage_service
+from backend.services.admission_service import AdmissionRejectedError
+from backend.services.compositing_service import compositing_service
+from backend.services.rendition_service import rendition_service
+from backend.services.tryon_batch_service import tryon_batch_service, BatchItem
+from backend.services.tryon_progress_service import tryon_progress_service, RequestIdInUseError
+from backend.services.virtual_tryon_service import virtual_tryon_service, tryon_admission
 from backend.utils.auth import get_current_user
+from backend.utils.events import event_broker, format_sse
 from PIL import Image, ImageDraw
+import asyncio
 import io
 import logging
 import json
+import re
+import uuid
 import base64
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Client-chosen try-on request IDs (e.g. a UUID)
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
 
 # Request/Response models
 class TransformData(BaseModel):
@@ -33,6 +48,16 @@ class TransformData(BaseModel):
     hue: float = 0.0
 
 
+class PreviewTransformData(BaseModel):
+    """Overlay transform for local previews (omitted fields use defaults / anchor points)"""
+    x: Optional[float] = None
+    y: Optional[float] = None
+    scale: Optional[float] = Field(default=None, gt=0)
+    rotation: Optional[float] = None
+    opacity: Optional[float] = Field(default=None, ge=0, le=1)
+    hue: Optional[float] = None
+
+
 class AnchorPoints(BaseModel):
     """Finger anchor points"""
     knuckle: Optional[Dict[str, float]] = None
@@ -56,6 +81,72 @@ class SaveSnapshotRequest(BaseModel):
     snapshot_data: str  # Base64 encoded image
 
 
+def _busy_error(e: Exception) -> HTTPException:
+    """429 response telling the client to back off (image pool saturated or try-on queue full)"""
+    retry_after = getattr(e, "retry_after", settings.image_executor_retry_after_seconds)
+    return HTTPException(
+        status_code=429,
+        detail=str(e),
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+def _render_hand_photo(
+    contents: bytes,
+    max_dimension: int = 2048,
+    thumbnail_size: Optional[Tuple[int, int]] = (300, 300)
+) -> Tuple[bytes, Tuple[int, int], Optional[bytes], Image.Image]:
+    """
+    Decode a hand photo once and render the stored JPEG and PNG thumbnail (runs on the image executor)
+
+    Args:
+        contents: Uploaded image bytes
+        max_dimension: Longest side of the stored photo
+        thumbnail_size: Bounding box of the thumbnail (None = no thumbnail)
+
+    Returns:
+        Tuple of (jpeg_bytes, (width, height), thumbnail_png_bytes or None, downscaled image)
+
+    Raises:
+        ValueError: If the bytes are not a valid image
+    """
+    try:
+        image = Image.open(io.BytesIO(contents))
+        scale = min(1.0, max_dimension / max(image.size))
+        target = tuple(max(1, int(dim * scale)) for dim in image.size)
+        # JPEGs much larger than the target decode straight at a reduced scale
+        image.draft(None, target)
+        image.load()
+    except Exception:
+        raise ValueError("Invalid image file")
+
+    # Resize if too large
+    if image.size != target:
+        image = image.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    # The thumbnail comes from the same decoded (already downscaled) pixels
+    thumbnail_bytes = None
+    if thumbnail_size:
+        ratio = min(1.0, thumbnail_size[0] / image.width, thumbnail_size[1] / image.height)
+        thumbnail = image
+        if ratio < 1.0:
+            thumbnail = image.resize(
+                (max(1, round(image.width * ratio)), max(1, round(image.height * ratio))),
+                Image.Resampling.LANCZOS,
+                reducing_gap=2.0
+            )
+        thumbnail_buffer = io.BytesIO()
+        thumbnail.save(thumbnail_buffer, format="PNG")
+        thumbnail_bytes = thumbnail_buffer.getvalue()
+
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+    return buffer.getvalue(), image.size, thumbnail_bytes, image
+
+
 @router.post("/upload-hand-photo")
 async def upload_hand_photo(
     file: UploadFile = File(...),
@@ -63,7 +154,9 @@ async def upload_hand_photo(
     """
     Upload hand photo for try-on
 
-    Accepts image upload and stores in S3
+    Accepts image upload and stores in S3. With renditions enabled the
+    thumbnail is the smallest WebP rendition covering 300px (all variants are
+    listed under renditions); otherwise a 300px PNG thumbnail is stored.
     """
     try:
         # Validate file type
@@ -78,36 +171,30 @@ async def upload_hand_photo(
         if len(contents) > max_size:
             raise HTTPException(status_code=400, detail="File too large (max 10MB)")
 
-        # Validate it's a valid image
+        # Decode once, render the photo (max 2048px) and thumbnail on the shared image pool
+        use_renditions = settings.renditions_enabled
         try:
-            image = Image.open(io.BytesIO(contents))
-            image.verify()
-        except Exception:
-            raise HTTPException(status_code=400, detail="Invalid image file")
-
-        # Re-open for processing
-        image = Image.open(io.BytesIO(contents))
-
-        # Resize if too large (max 2048px)
-        max_dimension = 2048
-        if max(image.size) > max_dimension:
-            ratio = max_dimension / max(image.size)
-            new_size = tuple(int(dim * ratio) for dim in image.size)
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
-
-        # Upload to S3
-        url, key = s3_service.upload_from_pil(
-            image,
-            folder="tryon/hand-photos",
-            format="JPEG"
-        )
-
-        # Create thumbnail
-        thumbnail_url, thumb_key = s3_service.create_thumbnail(
-            contents,
-            max_size=(300, 300),
-            folder="tryon/thumbnails"
-        )
+            photo_bytes, (width, height), thumbnail_bytes, image = await image_executor_service.run(
+                _render_hand_photo, contents, 2048, None if use_renditions else (300, 300)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Upload the photo and its thumbnail/renditions concurrently, all to the configured backend
+        storage = get_storage_service()
+        photo_upload = asyncio.to_thread(storage.upload_image, photo_bytes, "tryon/hand-photos", None, "image/jpeg")
+        renditions = None
+        if use_renditions:
+            (url, key), renditions = await asyncio.gather(
+                photo_upload,
+                rendition_service.create(image, "tryon/hand-photos", f"hand_{uuid.uuid4().hex[:12]}")
+            )
+            thumbnail_url = rendition_service.url(renditions, 300, fallback=url)
+        else:
+            (url, key), (thumbnail_url, thumb_key) = await asyncio.gather(
+                photo_upload,
+                asyncio.to_thread(storage.upload_image, thumbnail_bytes, "tryon/thumbnails", None, "image/png")
+            )
 
         logger.info(f"Uploaded hand photo: {url}")
 
@@ -116,14 +203,17 @@ async def upload_hand_photo(
             "url": url,
             "key": key,
             "thumbnail_url": thumbnail_url,
+            "renditions": rendition_service.with_urls(renditions),
             "dimensions": {
-                "width": image.width,
-                "height": image.height
+                "width": width,
+                "height": height
             }
         }
 
     except HTTPException:
         raise
+    except ImageExecutorBusyError as e:
+        raise _busy_error(e)
     except Exception as e:
         logger.error(f"Error uploading hand photo: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -198,6 +288,9 @@ async def save_snapshot(
 
         tryon.snapshot_url = url
         tryon.snapshot_filename = key.split('/')[-1]
+        tryon.snapshot_renditions = await rendition_service.create(
+            contents, "tryon/snapshots", tryon.snapshot_filename.rsplit(".", 1)[0]
+        )
 
         db.commit()
         db.close()
@@ -207,6 +300,7 @@ async def save_snapshot(
         return {
             "success": True,
             "snapshot_url": url,
+            "renditions": rendition_service.with_urls(tryon.snapshot_renditions),
             "message": "Snapshot saved successfully"
         }
 
@@ -286,6 +380,7 @@ async def view_tryon(tryon_id: int, db: Session = Depends(get_db)):
             "hand_photo_url": tryon.hand_photo_url,
             "overlay_image_url": tryon.overlay_image_url,
             "snapshot_url": tryon.snapshot_url,
+            "snapshot_renditions": rendition_service.with_urls(tryon.snapshot_renditions),
             "transform": tryon.overlay_transform,
             "finger_type": tryon.finger_type,
             "design": design_info,
@@ -306,10 +401,16 @@ async def list_tryons(
     design_id: Optional[int] = None,
     limit: int = 20,
     offset: int = 0,
+    image_width: Optional[int] = None,
+    image_format: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     List try-on sessions
+
+    thumbnail is the smallest snapshot rendition covering image_width pixels
+    (default RENDITION_LIST_WIDTH) in image_format (webp or avif), or the
+    snapshot itself for try-ons saved before renditions.
     """
     try:
         query = db.query(TryOn).filter(TryOn.user_id == user_id)
@@ -329,6 +430,7 @@ async def list_tryons(
                     "id": t.id,
                     "design_id": t.design_id,
                     "snapshot_url": t.snapshot_url,
+                    "thumbnail": rendition_service.url(t.snapshot_renditions, image_width, image_format, fallback=t.snapshot_url),
                     "finger_type": t.finger_type,
                     "is_approved": t.is_approved,
                     "sent_for_approval": t.sent_for_approval,
@@ -399,6 +501,8 @@ async def generate_ai_tryon(
     use_examples: bool = Form(True),
     auto_detect: bool = Form(True, description="Automatically detect body part and placement"),
     design_id: Optional[int] = Form(None),
+    force_regenerate: bool = Form(False, description="Ignore a cached result for the same photos and jewelry"),
+    request_id: Optional[str] = Form(None, description="Client-chosen ID to follow at GET /progress/{request_id}"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
@@ -417,10 +521,24 @@ async def generate_ai_tryon(
     4. Uses Gemini Imagen 3 (Banana) for intelligent analysis and image generation
     5. Optionally uses example pairs for few-shot learning
     6. Generates photorealistic try-on images with AI compositing
-    7. Records trial usage
+    7. Records trial usage (not for results served from the try-on cache)
+
+    Repeat requests with the same photos, jewelry type and description reuse the
+    stored result unless force_regenerate is set.
+
+    Pass a request_id and open GET /progress/{request_id} to receive stage
+    events while the try-on runs; the response includes per-stage timings_ms.
 
     Upload example pairs to backend/assets/tryon_examples/ for better results!
     """
+    if request_id is not None and not REQUEST_ID_PATTERN.match(request_id):
+        raise HTTPException(status_code=400, detail="request_id must be 8-64 letters, digits, '-' or '_'")
+
+    try:
+        progress = tryon_progress_service.track(request_id, current_user["_id"])
+    except RequestIdInUseError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
     try:
         user_id = current_user["_id"]
 
@@ -446,22 +564,21 @@ async def generate_ai_tryon(
         body_contents = await body_photo.read()
         jewelry_contents = await jewelry_photo.read()
 
+        # Prepare inline parts: acceptable JPEG/PNG uploads pass through untouched,
+        # anything else gets a single bounded downscale (off the event loop)
+        progress.stage("preparing")
         try:
-            body_image = Image.open(io.BytesIO(body_contents)).convert("RGB")
-            jewelry_image = Image.open(io.BytesIO(jewelry_contents)).convert("RGBA")
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid image file: {e}")
-
-        # Resize if too large (for API limits)
-        max_size = 2048
-        for img_name, img in [("body", body_image), ("jewelry", jewelry_image)]:
-            if max(img.size) > max_size:
-                ratio = max_size / max(img.size)
-                new_size = tuple(int(dim * ratio) for dim in img.size)
-                if img_name == "body":
-                    body_image = img.resize(new_size, Image.Resampling.LANCZOS)
-                else:
-                    jewelry_image = img.resize(new_size, Image.Resampling.LANCZOS)
+            body_image, jewelry_image = await asyncio.gather(
+                image_executor_service.run(virtual_tryon_service.prepare_inline_image, body_contents),
+                image_executor_service.run(virtual_tryon_service.prepare_inline_image, jewelry_contents, True)
+            )
+            cache_key = None
+            if settings.tryon_cache_enabled:
+                cache_key = await virtual_tryon_service.tryon_cache_key(
+                    user_id, body_contents, jewelry_contents, jewelry_type, jewelry_description
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         if auto_detect:
             logger.info(f"Generating AI try-on for {jewelry_type} with AUTO-DETECTION")
@@ -476,13 +593,20 @@ async def generate_ai_tryon(
             jewelry_description=jewelry_description,
             target_area=target_area,
             use_examples=use_examples,
-            auto_detect=auto_detect
+            auto_detect=auto_detect,
+            cache_key=cache_key,
+            force_regenerate=force_regenerate,
+            user_id=user_id,
+            progress=progress
         )
 
-        logger.info(f"AI try-on generated successfully")
+        if result["cached"]:
+            logger.info("AI try-on served from cache")
+        else:
+            logger.info("AI try-on generated successfully")
 
-        # Record trial usage
-        TrialUsageModel.record_usage(user_id, "virtual_tryon")
+            # Record trial usage
+            TrialUsageModel.record_usage(user_id, "virtual_tryon")
 
         # Build response
         response = {
@@ -491,13 +615,20 @@ async def generate_ai_tryon(
             "design_id": design_id,
             "auto_detection_used": auto_detect and target_area is None
         }
+        progress.complete(result_url=result["result_url"], cached=result["cached"])
+        response.update(request_id=progress.request_id, timings_ms=progress.timings_ms)
 
         return response
 
-    except HTTPException:
+    except HTTPException as e:
+        progress.fail(e.detail)
         raise
+    except (ImageExecutorBusyError, AdmissionRejectedError) as e:
+        progress.fail(str(e))
+        raise _busy_error(e)
     except Exception as e:
         logger.error(f"Error generating AI try-on: {e}")
+        progress.fail(str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -514,21 +645,40 @@ async def composite_tryon(
     jewelry_description: str = Form("", description="Description of jewelry"),
     save_to_db: bool = Form(False),
     user_id: int = Form(1),
-    design_id: Optional[int] = Form(None)
+    design_id: Optional[int] = Form(None),
+    mode: str = Form("generative", description="generative (Gemini final render) or preview (local compositing)"),
+    transform: Optional[str] = Form(None, description="Preview: JSON overlay transform {x, y, scale, rotation, opacity, hue}"),
+    anchor_points: Optional[str] = Form(None, description="Preview: JSON finger anchors {knuckle: {x, y}, base: {x, y}}")
 ):
     """
-    Generate AI-powered virtual try-on composite image using Gemini 2.5
+    Generate a virtual try-on composite image
 
     Works with any body part photo (hand, neck, full body, ear, etc.)
-    Uses Gemini AI to create a photorealistic composite image
+    - mode=generative: Gemini AI creates a photorealistic composite (final render)
+    - mode=preview: the jewelry PNG is placed locally using the overlay transform
+      (same semantics as the try-on canvas); returns in milliseconds as a data URL
     """
     try:
+        if mode not in ("generative", "preview"):
+            raise HTTPException(status_code=400, detail="mode must be 'generative' or 'preview'")
+
         # Read images
         body_contents = await body_photo.read()
         jewelry_contents = await jewelry_photo.read()
 
-        body_image = Image.open(io.BytesIO(body_contents)).convert("RGB")
-        jewelry_image = Image.open(io.BytesIO(jewelry_contents)).convert("RGBA")
+        if mode == "preview":
+            return await _composite_preview(
+                body_contents, jewelry_contents, transform, anchor_points,
+                jewelry_type, save_to_db, user_id, design_id
+            )
+
+        try:
+            body_image, jewelry_image = await asyncio.gather(
+                image_executor_service.run(virtual_tryon_service.prepare_inline_image, body_contents),
+                image_executor_service.run(virtual_tryon_service.prepare_inline_image, jewelry_contents, True)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         logger.info("Generating AI-powered virtual try-on...")
 
@@ -537,7 +687,8 @@ async def composite_tryon(
             person_image=body_image,
             jewelry_image=jewelry_image,
             jewelry_type=jewelry_type,
-            jewelry_description=jewelry_description
+            jewelry_description=jewelry_description,
+            user_id=str(user_id)
         )
 
         logger.info(f"AI try-on generated successfully")
@@ -547,7 +698,8 @@ async def composite_tryon(
             "result_url": result["result_url"],
             "s3_url": result.get("s3_url"),
             "model_used": result["model_used"],
-            "generation_method": result["generation_method"]
+            "generation_method": result["generation_method"],
+            "queue": result.get("queue")
         }
 
         # Save to database if requested
@@ -577,11 +729,274 @@ async def composite_tryon(
 
     except HTTPException:
         raise
+    except (ImageExecutorBusyError, AdmissionRejectedError) as e:
+        raise _busy_error(e)
     except Exception as e:
         logger.error(f"Error compositing try-on: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _composite_preview(
+    body_contents: bytes,
+    jewelry_contents: bytes,
+    transform_json: Optional[str],
+    anchor_points_json: Optional[str],
+    jewelry_type: str,
+    save_to_db: bool,
+    user_id: int,
+    design_id: Optional[int]
+) -> Dict:
+    """Local compositing path of /composite-tryon (no external API calls)"""
+    try:
+        transform = PreviewTransformData(**json.loads(transform_json)) if transform_json else PreviewTransformData()
+        anchors = AnchorPoints(**json.loads(anchor_points_json)) if anchor_points_json else None
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid transform or anchor_points: {e}")
+
+    try:
+        preview = await image_executor_service.run(
+            compositing_service.composite,
+            body_contents,
+            jewelry_contents,
+            transform.model_dump(exclude_none=True),
+            anchors.model_dump(exclude_none=True) if anchors else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    response_data = {
+        "success": True,
+        "mode": "preview",
+        "result_url": f"data:{preview['mime_type']};base64,{base64.b64encode(preview['data']).decode()}",
+        "s3_url": None,
+        "model_used": None,
+        "generation_method": "local_composite",
+        "image_size": preview["image_size"],
+        "transform": preview["transform"],
+        "timings_ms": preview["timings_ms"]
+    }
+
+    if save_to_db:
+        url, key = await asyncio.to_thread(
+            s3_service.upload_image, preview["data"], "tryon/previews", None, preview["mime_type"]
+        )
+        renditions = await rendition_service.create(preview["data"], "tryon/previews", key.split("/")[-1].rsplit(".", 1)[0])
+        response_data["s3_url"] = url
+
+        tryon_id = await asyncio.to_thread(
+            _save_preview_tryon,
+            user_id=user_id,
+            design_id=design_id,
+            hand_photo_url=url,
+            overlay_image_url=url,
+            overlay_transform=preview["transform"],
+            finger_type=jewelry_type,
+            anchor_points=anchors.model_dump() if anchors else None,
+            snapshot_url=url,
+            snapshot_renditions=renditions
+        )
+        response_data["tryon_id"] = tryon_id
+        logger.info(f"Saved preview try-on to database: {tryon_id}")
+
+    return response_data
+
+
+def _save_preview_tryon(**fields) -> int:
+    """Insert a preview try-on row (blocking: run off the event loop)"""
+    from backend.models.database import SessionLocal
+    db = SessionLocal()
+    try:
+        tryon = TryOn(**fields)
+        db.add(tryon)
+        db.commit()
+        db.refresh(tryon)
+        return tryon.id
+    finally:
+        db.close()
+
+
+@router.get("/queue-status")
+async def get_queue_status(current_user: Dict[str, Any] = Depends(get_current_user)):
+    """
+    Gemini try-on queue status (Requires authentication)
+
+    Poll while a try-on request is waiting to see its queue position and ETA
+    """
+    return {
+        "success": True,
+        **tryon_admission.queue_status(current_user["_id"])
+    }
+
+
+def _parse_design_ids(design_ids: Optional[str]) -> List[int]:
+    """Parse design IDs given as a JSON list or comma-separated string"""
+    if not design_ids or not design_ids.strip():
+        return []
+    try:
+        value = json.loads(design_ids) if design_ids.strip().startswith("[") else design_ids.split(",")
+        return [int(str(item).strip()) for item in value if str(item).strip()]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="design_ids must be a JSON list or comma-separated list of integers")
+
+
+@router.post("/batch")
+async def batch_tryon(
+    body_photo: UploadFile = File(..., description="Photo of body part, shared by every item"),
+    jewelry_photos: List[UploadFile] = File(None, description="Jewelry images to try on"),
+    design_ids: Optional[str] = Form(None, description="Saved design IDs (JSON list or comma-separated)"),
+    jewelry_type: Optional[str] = Form(None, description="Type for uploaded photos (designs default to their category)"),
+    jewelry_description: Optional[str] = Form(None),
+    force_regenerate: bool = Form(False, description="Ignore cached results"),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Render one body photo with many jewelry pieces (Requires authentication)
+
+    The body photo is prepared and hashed once; items render concurrently
+    (within the per-user try-on limit) and are streamed back as NDJSON lines
+    in completion order:
+
+    - {"type": "batch", "job_id", "total"}
+    - {"type": "item", "index", "source", "success", "result_url", "cached", ...} per item
+    - {"type": "summary", "succeeded", "failed", "cached", "elapsed_seconds"}
+
+    The job keeps running if the client disconnects; fetch its results from
+    GET /batch/{job_id}. Each generated item uses one trial; cached items are free.
+    """
+    try:
+        user_id = current_user["_id"]
+        jewelry_photos = jewelry_photos or []
+        ids = _parse_design_ids(design_ids)
+
+        total = len(jewelry_photos) + len(ids)
+        if total == 0:
+            raise HTTPException(status_code=400, detail="Provide jewelry_photos and/or design_ids")
+        if total > settings.tryon_batch_max_items:
+            raise HTTPException(status_code=400, detail=f"A batch can hold at most {settings.tryon_batch_max_items} items")
+        if jewelry_photos and not jewelry_type:
+            raise HTTPException(status_code=400, detail="jewelry_type is required for uploaded jewelry photos")
+
+        for file in [body_photo, *jewelry_photos]:
+            if not file.content_type or not file.content_type.startswith("image/"):
+                raise HTTPException(status_code=400, detail=f"{file.filename} must be an image")
+
+        # Resolve designs up front so a bad ID fails the request instead of an item
+        designs = {}
+        if ids:
+            designs = {d.id: d for d in db.query(Design).filter(Design.id.in_(ids)).all()}
+            missing = [design_id for design_id in ids if design_id not in designs or not designs[design_id].generated_images]
+            if missing:
+                raise HTTPException(status_code=400, detail=f"Designs not found or without images: {missing}")
+
+        trial_status = TrialUsageModel.check_trial_limit(user_id, "virtual_tryon")
+        if not trial_status["allowed"]:
+            raise HTTPException(
+                status_code=402,
+                detail={
+                    "error": "trial_limit_reached",
+                    "message": f"You've used all {trial_status['limit']} trials for Virtual Try-On. Join our waitlist for unlimited access!",
+                    "trial_status": trial_status
+                }
+            )
+
+        items = []
+        for photo in jewelry_photos:
+            items.append(BatchItem(
+                index=len(items),
+                source=photo.filename or f"jewelry_{len(items)}",
+                jewelry_type=jewelry_type,
+                jewelry_description=jewelry_description,
+                data=await photo.read()
+            ))
+        for design_id in ids:
+            design = designs[design_id]
+            items.append(BatchItem(
+                index=len(items),
+                source=f"design:{design_id}",
+                jewelry_type=(design.category or jewelry_type or "jewelry").lower(),
+                jewelry_description=jewelry_description or design.prompt,
+                image_url=design.generated_images[0],
+                image_key=s3_service.key_from_url(design.generated_images[0]),
+                design_id=design_id
+            ))
+
+        try:
+            job = await tryon_batch_service.start(
+                user_id=user_id,
+                body_data=await body_photo.read(),
+                items=items,
+                force_regenerate=force_regenerate
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        logger.info(f"Started try-on batch {job.id} for user {current_user['username']}: {total} items")
+
+        async def ndjson_stream():
+            async for event in tryon_batch_service.events(job):
+                yield json.dumps(event) + "\n"
+
+        return StreamingResponse(
+            ndjson_stream(),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Batch-Job-Id": job.id}
+        )
+
+    except HTTPException:
+        raise
+    except ImageExecutorBusyError as e:
+        raise _busy_error(e)
+    except Exception as e:
+        logger.error(f"Error starting try-on batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/batch/{job_id}")
+async def get_batch_tryon(job_id: str, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """
+    Get a batch try-on job's progress and results (Requires authentication)
+
+    Jobs are kept in memory for the most recent TRYON_BATCH_RETAINED_JOBS batches
+    """
+    job = tryon_batch_service.get_job(job_id)
+    if not job or str(job.user_id) != str(current_user["_id"]):
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    return {"success": True, **job.to_dict()}
+
+
+@router.get("/progress/{request_id}")
+async def stream_tryon_progress(request_id: str, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """
+    Stream a try-on's progress as Server-Sent Events (Requires authentication)
+
+    Open before or while POSTing generate-ai-tryon with the same request_id
+    (a fresh one per try-on: reused IDs are rejected with 409).
+    Emits a "progress" event per stage (preparing, cache_lookup,
+    queued, sending, receiving, storing, retrying) with the elapsed time and
+    completed stage durations, then a final "completed" or "failed" event.
+    """
+    user_id = str(current_user["_id"])
+    owner = tryon_progress_service.owner(request_id)
+    if owner is not None and owner != user_id:
+        raise HTTPException(status_code=404, detail="Try-on request not found")
+
+    async def event_stream():
+        # The channel is per user: another user's request with the same ID never shows up here
+        async for event in event_broker.subscribe(
+            tryon_progress_service.channel(user_id, request_id),
+            timeout=settings.sse_timeout_seconds
+        ):
+            yield format_sse(event, event="progress")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/examples/status")
 async def get_examples_status():
     """
@@ -0,0 +1,227 @@
+"""
+Admission Control Service
+Bounded concurrency with a fair FIFO queue and per-user caps for rate-limited provider calls
+"""
+import asyncio
+import itertools
+import logging
+import math
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Weight of the latest call when updating the average service time used for ETAs
+EMA_ALPHA = 0.2
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request can't be queued (queue full or per-user cap reached)"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """One admitted or waiting request"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, user_id: Optional[str], position: int, eta_seconds: float):
+        self.id = next(self._ids)
+        self.user_id = user_id
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.position_on_arrival = position
+        self.eta_on_arrival = eta_seconds
+        self.future: Optional[asyncio.Future] = None
+
+    @property
+    def waited_seconds(self) -> float:
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return round(end - self.enqueued_at, 3)
+
+    def to_dict(self) -> Dict:
+        return {
+            "position_on_arrival": self.position_on_arrival,
+            "eta_seconds_on_arrival": round(self.eta_on_arrival, 1),
+            "waited_seconds": self.waited_seconds
+        }
+
+
+class AdmissionController:
+    """
+    Caps in-flight calls to a provider and queues the rest in arrival order
+
+    Requests beyond max_in_flight wait in a FIFO queue; a user may hold at most
+    max_per_user queued + running requests, and the queue holds at most
+    max_queue entries. Rejections raise AdmissionRejectedError with a
+    Retry-After hint derived from the current ETA.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_in_flight: int,
+        max_queue: int,
+        max_per_user: int,
+        expected_seconds: float
+    ):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.avg_seconds = expected_seconds
+        self._queue: Deque[AdmissionTicket] = deque()
+        self._in_flight = 0
+        self._per_user: Dict[str, int] = defaultdict(int)
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "cancelled": 0, "peak_queue": 0}
+
+    def eta_seconds(self, position: int) -> float:
+        """
+        Estimated wait before a queued request starts
+
+        Args:
+            position: 1-based queue position (0 = starts immediately)
+
+        Returns:
+            Seconds, from the average service time and number of slots
+        """
+        if position <= 0:
+            return 0.0
+        return math.ceil(position / max(1, self.max_in_flight)) * self.avg_seconds
+
+    def _reject(self, message: str):
+        self.stats["rejected"] += 1
+        retry_after = max(1, math.ceil(self.eta_seconds(len(self._queue) + 1)))
+        raise AdmissionRejectedError(message, retry_after)
+
+    def _grant(self, ticket: AdmissionTicket):
+        self._in_flight += 1
+        ticket.started_at = time.monotonic()
+        self.stats["admitted"] += 1
+
+    def _dispatch(self):
+        """Hand free slots to the head of the queue"""
+        while self._queue and self._in_flight < self.max_in_flight:
+            ticket = self._queue.popleft()
+            self._grant(ticket)
+            ticket.future.set_result(None)
+
+    def _release(self, ticket: AdmissionTicket):
+        self._in_flight -= 1
+        self._per_user[ticket.user_id] -= 1
+        if self._per_user[ticket.user_id] <= 0:
+            del self._per_user[ticket.user_id]
+        self._dispatch()
+
+    async def acquire(self, user_id: Optional[str]) -> AdmissionTicket:
+        """
+        Wait for a slot
+
+        Args:
+            user_id: Caller identity for the per-user cap (None = not capped)
+
+        Returns:
+            Ticket to pass to release()
+
+        Raises:
+            AdmissionRejectedError: If the user already has max_per_user requests or the queue is full
+        """
+        user_id = str(user_id) if user_id is not None else None
+        if user_id is not None and self._per_user[user_id] >= self.max_per_user:
+            self._reject(f"You already have {self._per_user[user_id]} try-ons in progress, please wait for them to finish")
+
+        if not self._queue and self._in_flight < self.max_in_flight:
+            ticket = AdmissionTicket(user_id, 0, 0.0)
+            self._per_user[user_id] += 1
+            self._grant(ticket)
+            return ticket
+
+        if len(self._queue) >= self.max_queue:
+            self._reject("Try-on queue is full, please retry shortly")
+
+        position = len(self._queue) + 1
+        ticket = AdmissionTicket(user_id, position, self.eta_seconds(position))
+        ticket.future = asyncio.get_running_loop().create_future()
+        self._queue.append(ticket)
+        self._per_user[user_id] += 1
+        self.stats["queued"] += 1
+        self.stats["peak_queue"] = max(self.stats["peak_queue"], len(self._queue))
+        logger.info(f"{self.name}: queued request for user {user_id} at position {position} (ETA {ticket.eta_on_arrival:.0f}s)")
+
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            if ticket.future.done() and not ticket.future.cancelled():
+                # Slot was granted just before the cancellation landed
+                self._release(ticket)
+            else:
+                self._queue.remove(ticket)
+                self._per_user[user_id] -= 1
+                if self._per_user[user_id] <= 0:
+                    del self._per_user[user_id]
+            raise
+        return ticket
+
+    def release(self, ticket: AdmissionTicket):
+        """Free a slot and record how long the call took"""
+        duration = time.monotonic() - ticket.started_at
+        self.avg_seconds = (1 - EMA_ALPHA) * self.avg_seconds + EMA_ALPHA * duration
+        self._release(ticket)
+
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[str]) -> AsyncIterator[AdmissionTicket]:
+        """Hold a slot for the duration of the block"""
+        ticket = await self.acquire(user_id)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def queue_status(self, user_id: Optional[str] = None) -> Dict:
+        """
+        Current queue state, with the caller's waiting requests if user_id is given
+
+        Args:
+            user_id: Optional caller identity
+
+        Returns:
+            Dict with in_flight, queued, avg_seconds and the user's positions/ETAs
+        """
+        status = {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": len(self._queue),
+            "avg_seconds": round(self.avg_seconds, 1),
+            "eta_seconds_for_new_request": round(
+                self.eta_seconds(len(self._queue) + 1 if self._in_flight >= self.max_in_flight else 0), 1
+            )
+        }
+        if user_id is not None:
+            waiting: List[Dict] = [
+                {"position": index + 1, "eta_seconds": round(self.eta_seconds(index + 1), 1), "waited_seconds": ticket.waited_seconds}
+                for index, ticket in enumerate(self._queue)
+                if ticket.user_id == str(user_id)
+            ]
+            status["your_requests"] = {
+                "waiting": waiting,
+                "total": self._per_user.get(str(user_id), 0)
+            }
+        return status
+
+    def get_metrics(self) -> Dict:
+        """Get admission counters"""
+        return {
+            **self.stats,
+            "in_flight": self._in_flight,
+            "queued": len(self._queue),
+            "avg_seconds": round(self.avg_seconds, 2),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "max_per_user": self.max_per_user
+        }
@@ -2,25 +2,36 @@
 AI Jewellery Designer Service
 Handles text-to-image generation for jewellery designs using various AI models
 """
-from openai import OpenAI
-from anthropic import Anthropic
+from openai import AsyncOpenAI
+from anthropic import AsyncAnthropic
 import google.generativeai as genai
 from backend.app.config import settings
 from backend.services.s3_service import s3_service
+from backend.services.cache_service import ResultCache
+from backend.services.rendition_service import rendition_service
 from typing import List, Dict, Optional
 import logging
 import uuid
 from datetime import datetime
 import json
 import base64
+import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
-# Initialize AI clients
-openai_client = OpenAI(api_key=settings.openai_api_key)
-anthropic_client = Anthropic(api_key=settings.anthropic_api_key)
+# Initialize AI clients (async SDK clients so provider calls never block the event loop)
+openai_client = AsyncOpenAI(api_key=settings.openai_api_key)
+anthropic_client = AsyncAnthropic(api_key=settings.anthropic_api_key)
 genai.configure(api_key=settings.gemini_api_key)
 
+# Opt-in cache of generated designs keyed on the enhanced prompt + model parameters
+design_cache = ResultCache(
+    "designs",
+    max_entries=settings.design_cache_max_entries,
+    use_redis=settings.cache_use_redis
+)
+
 
 class AIDesignerService:
     """Service for generating jewellery designs using AI"""
@@ -63,9 +74,46 @@ class AIDesignerService:
         "sketch": "Hand-drawn jewelry sketch, pencil drawing, designer sketch style, artistic rendering"
     }
 
+    # Curated template prompts per category and style (pre-rendered by the template gallery)
+    TEMPLATE_PROMPTS = {
+        "ring": {
+            "bridal": [
+                "solitaire engagement ring with round brilliant diamond, thin pavé band, 18k white gold",
+                "halo engagement ring with cushion cut center diamond, rose gold band with micro pavé",
+                "three-stone engagement ring with emerald cut center, platinum setting"
+            ],
+            "minimalist": [
+                "simple solitaire ring with round diamond, thin polished band, 14k yellow gold",
+                "bezel set diamond ring, sleek modern design, brushed finish",
+                "thin band with single floating diamond, minimal setting"
+            ],
+            "traditional": [
+                "ornate gold ring with filigree work, ruby center stone, intricate band details",
+                "heritage design ring with granulation, multiple small diamonds, 22k gold",
+                "traditional Indian ring with temple motifs, emerald center, detailed engraving"
+            ]
+        },
+        "necklace": {
+            "bridal": [
+                "diamond pendant necklace with teardrop design, delicate chain, white gold",
+                "solitaire diamond pendant, classic round cut, simple chain, platinum",
+                "halo pendant necklace with pear-shaped diamond, micro pavé halo"
+            ],
+            "minimalist": [
+                "simple gold chain with small diamond pendant, delicate and modern",
+                "single pearl pendant on thin gold chain, minimalist design",
+                "small geometric pendant, clean lines, brushed metal finish"
+            ]
+        }
+    }
+
     def __init__(self):
         self.default_model = settings.default_image_model
 
+        # Per-provider concurrency limits
+        self.openai_semaphore = asyncio.Semaphore(settings.openai_max_concurrency)
+        self.anthropic_semaphore = asyncio.Semaphore(settings.anthropic_max_concurrency)
+
     def enhance_prompt(
         self,
         base_prompt: str,
@@ -104,6 +152,70 @@ class AIDesignerService:
         logger.info(f"Enhanced prompt: {enhanced}")
         return enhanced
 
+    async def _generate_single_image(
+        self,
+        prompt: str,
+        size: str,
+        quality: str
+    ) -> Dict:
+        """
+        Generate one DALL-E image, decode it and upload it to S3
+
+        Args:
+            prompt: Enhanced prompt
+            size: Image size
+            quality: Image quality
+
+        Returns:
+            Image data with S3 URL and per-stage timings
+        """
+        start = time.perf_counter()
+
+        # Request base64 encoded image instead of URL
+        async with self.openai_semaphore:
+            response = await openai_client.images.generate(
+                model=self.default_model,
+                prompt=prompt,
+                size=size,
+                quality=quality if self.default_model == "dall-e-3" else "standard",
+                n=1,
+                response_format="b64_json"  # Request base64 format
+            )
+        generated_at = time.perf_counter()
+
+        image = response.data[0]
+
+        # Decode base64 image
+        image_data = base64.b64decode(image.b64_json)
+
+        # Save to S3 (gallery renditions are built afterwards by create_renditions)
+        seed = f"dalle_{uuid.uuid4().hex[:8]}"
+        filename = f"design_{seed}.png"
+        s3_url, s3_key = await asyncio.to_thread(
+            s3_service.upload_image,
+            image_data=image_data,
+            folder="designs",
+            filename=filename,
+            content_type="image/png"
+        )
+        uploaded_at = time.perf_counter()
+
+        logger.info(f"Saved image to S3: {s3_url}")
+
+        return {
+            "url": s3_url,  # Use S3 URL
+            "s3_key": s3_key,
+            "renditions": None,
+            "revised_prompt": getattr(image, 'revised_prompt', prompt),
+            "model": self.default_model,
+            "seed": seed,
+            "timings": {
+                "generate_ms": round((generated_at - start) * 1000, 1),
+                "upload_ms": round((uploaded_at - generated_at) * 1000, 1),
+                "total_ms": round((uploaded_at - start) * 1000, 1)
+            }
+        }
+
     async def generate_with_dalle(
         self,
         prompt: str,
@@ -112,7 +224,10 @@ class AIDesignerService:
         quality: str = "hd"
     ) -> List[Dict]:
         """
-        Generate images using DALL-E and save to local storage
+        Generate images using DALL-E concurrently and save them to S3
+
+        Partial failures are tolerated: the images that succeeded are returned,
+        and an error is only raised when every generation failed.
 
         Args:
             prompt: Enhanced prompt
@@ -121,49 +236,32 @@ class AIDesignerService:
             quality: Image quality
 
         Returns:
-            List of generated image data with local storage URLs
+            List of generated image data with S3 URLs and per-image timings
         """
         try:
             # DALL-E 3 only supports 1 image per request
             if self.default_model == "dall-e-3":
                 num_images = min(num_images, 1)
 
-            results = []
-
-            for i in range(num_images):
-                # Request base64 encoded image instead of URL
-                response = openai_client.images.generate(
-                    model=self.default_model,
-                    prompt=prompt,
-                    size=size,
-                    quality=quality if self.default_model == "dall-e-3" else "standard",
-                    n=1,
-                    response_format="b64_json"  # Request base64 format
-                )
+            # Fan out the generations, capped at design_generation_concurrency
+            fan_out = asyncio.Semaphore(max(1, settings.design_generation_concurrency))
 
-                for image in response.data:
-                    # Decode base64 image
-                    image_data = base64.b64decode(image.b64_json)
-
-                    # Save to S3
-                    seed = f"dalle_{uuid.uuid4().hex[:8]}"
-                    filename = f"design_{seed}.png"
-                    s3_url, s3_key = s3_service.upload_image(
-                        image_data=image_data,
-                        folder="designs",
-                        filename=filename,
-                        content_type="image/png"
-                    )
-
-                    logger.info(f"Saved image to S3: {s3_url}")
-
-                    results.append({
-                        "url": s3_url,  # Use S3 URL
-                        "s3_key": s3_key,
-                        "revised_prompt": getattr(image, 'revised_prompt', prompt),
-                        "model": self.default_model,
-                        "seed": seed
-                    })
+            async def generate_bounded() -> Dict:
+                async with fan_out:
+                    return await self._generate_single_image(prompt, size, quality)
+
+            outcomes = await asyncio.gather(
+                *(generate_bounded() for _ in range(num_images)),
+                return_exceptions=True
+            )
+
+            results = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+            failures = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+
+            if failures:
+                logger.warning(f"{len(failures)}/{num_images} DALL-E generations failed: {failures[0]}")
+                if not results:
+                    raise failures[0]
 
             logger.info(f"Generated {len(results)} images with DALL-E and saved to S3")
             return results
@@ -189,38 +287,39 @@ class AIDesignerService:
         """
         try:
             # Use Claude's vision capabilities to analyze the image
-            message = anthropic_client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1024,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "url",
-                                    "url": image_url
+            async with self.anthropic_semaphore:
+                message = await anthropic_client.messages.create(
+                    model="claude-3-5-sonnet-20241022",
+                    max_tokens=1024,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "image",
+                                    "source": {
+                                        "type": "url",
+                                        "url": image_url
+                                    }
+                                },
+                                {
+                                    "type": "text",
+                                    "text": f"""Analyze this jewelry design and extract the following information in JSON format:
+                                    {{
+                                      "materials": ["list of materials detected, e.g., gold, diamond, platinum"],
+                                      "colors": ["dominant colors"],
+                                      "style_attributes": ["style characteristics"],
+                                      "stone_count": "estimated number of stones",
+                                      "confidence": 0.0-1.0
+                                    }}
+
+                                    Original prompt: {prompt}
+                                    """
                                 }
-                            },
-                            {
-                                "type": "text",
-                                "text": f"""Analyze this jewelry design and extract the following information in JSON format:
-                                {{
-                                  "materials": ["list of materials detected, e.g., gold, diamond, platinum"],
-                                  "colors": ["dominant colors"],
-                                  "style_attributes": ["style characteristics"],
-                                  "stone_count": "estimated number of stones",
-                                  "confidence": 0.0-1.0
-                                }}
-
-                                Original prompt: {prompt}
-                                """
-                            }
-                        ]
-                    }
-                ]
-            )
+                            ]
+                        }
+                    ]
+                )
 
             # Parse response
             response_text = message.content[0].text
@@ -263,7 +362,9 @@ class AIDesignerService:
         category: str,
         style_preset: str,
         realism_mode: str = "realistic",
-        num_images: int = 4
+        num_images: int = 4,
+        defer_analysis: bool = False,
+        use_cache: bool = True
     ) -> Dict:
         """
         Main method to generate jewellery design
@@ -274,6 +375,8 @@ class AIDesignerService:
             style_preset: Style preset
             realism_mode: Realism mode
             num_images: Number of images to generate
+            defer_analysis: Skip the Claude analysis so the caller can run it in the background
+            use_cache: Reuse a cached generation for an identical prompt (if design_cache_enabled)
 
         Returns:
             Complete generation result with images and metadata
@@ -284,22 +387,43 @@ class AIDesignerService:
                 prompt, category, style_preset, realism_mode
             )
 
-            # Generate images
-            images = await self.generate_with_dalle(
-                enhanced_prompt,
-                num_images=min(num_images, settings.max_images_per_generation),
-                size=settings.image_size,
-                quality=settings.image_quality
-            )
+            requested_images = min(num_images, settings.max_images_per_generation)
+            if self.default_model == "dall-e-3":
+                requested_images = 1  # DALL-E 3 only supports 1 image per request
+
+            # Look up an identical earlier generation
+            cache_key = None
+            cached = None
+            if use_cache and settings.design_cache_enabled:
+                cache_key = self.design_cache_key(enhanced_prompt, requested_images)
+                cached = await design_cache.get(cache_key)
+
+            if cached:
+                logger.info(f"Design cache hit: {cache_key[:12]}")
+                images = self._images_from_cache(cached)
+                analysis = cached.get("analysis") or {}
+            else:
+                # Generate images
+                images = await self.generate_with_dalle(
+                    enhanced_prompt,
+                    num_images=requested_images,
+                    size=settings.image_size,
+                    quality=settings.image_quality
+                )
+                analysis = {}
 
-            # Analyze first image with Claude
-            if images:
+            # Analyze first image with Claude (unless cached or the caller runs it as a follow-up)
+            analysis_status = "completed"
+            if images and not analysis and defer_analysis:
+                analysis_status = "pending"
+            elif images and not analysis:
                 analysis = await self.analyze_design_with_claude(
                     images[0]["url"],
                     enhanced_prompt
                 )
-            else:
-                analysis = {}
+
+            if cache_key and not cached and images:
+                await self.cache_generation(cache_key, images, analysis)
 
             # Create generation result
             generation_id = f"gen_{uuid.uuid4().hex}"
@@ -312,10 +436,14 @@ class AIDesignerService:
                 "style_preset": style_preset,
                 "realism_mode": realism_mode,
                 "images": images,
+                "failed_images": max(0, requested_images - len(images)),
                 "analysis": analysis,
+                "analysis_status": analysis_status,
+                "cached": bool(cached),
+                "cache_key": cache_key,
                 "materials": analysis.get("materials", []),
                 "colors": analysis.get("colors", []),
-                "confidence": analysis.get("confidence", 0.5),
+                "confidence": analysis.get("confidence", 0.5) if analysis_status == "completed" else None,
                 "model": self.default_model,
                 "created_at": datetime.utcnow().isoformat()
             }
@@ -327,6 +455,91 @@ class AIDesignerService:
             logger.error(f"Error generating design: {e}")
             raise
 
+    def _images_from_cache(self, cached: Dict) -> List[Dict]:
+        """Rebuild image entries from a cache hit with fresh presigned URLs"""
+        images = []
+        for img in cached.get("images", []):
+            url = s3_service.generate_presigned_url(img["s3_key"], expiration=86400)
+            if not url:
+                url = f"https://s3.{settings.aws_region}.amazonaws.com/{s3_service.bucket}/{img['s3_key']}"
+            images.append({**img, "url": url, "timings": None})
+        return images
+
+    def design_cache_key(self, enhanced_prompt: str, num_images: int) -> str:
+        """Cache key for a generation: normalized enhanced prompt plus model parameters"""
+        return design_cache.make_key(
+            enhanced_prompt, self.default_model, settings.image_size, settings.image_quality, num_images
+        )
+
+    async def cache_generation(self, cache_key: str, images: List[Dict], analysis: Dict):
+        """Store generated images (by S3 key, with any rendition manifests) and their analysis in the design cache"""
+        await design_cache.set(cache_key, {
+            "images": [
+                {**{key: img[key] for key in ("s3_key", "revised_prompt", "model", "seed")},
+                 "renditions": img.get("renditions")}
+                for img in images
+            ],
+            "analysis": analysis
+        })
+
+    async def create_renditions(self, images: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Build WebP/AVIF renditions of generated images, reading the originals back from S3
+
+        Runs as a follow-up once the design has been returned so encoding never adds
+        to generation latency.
+
+        Args:
+            images: Image entries from generate_design (with s3_key and seed); entries
+                that already have renditions (cache hits) are kept as they are
+
+        Returns:
+            One rendition manifest per image (None where it failed)
+        """
+        async def render(img: Dict) -> Optional[Dict]:
+            if img.get("renditions"):
+                return img["renditions"]
+            try:
+                image_data = await asyncio.to_thread(s3_service.download_image, img["s3_key"])
+            except Exception as e:
+                logger.warning(f"Could not read {img['s3_key']} for renditions: {e}")
+                return None
+            return await rendition_service.create(image_data, "designs", f"design_{img['seed']}")
+
+        return list(await asyncio.gather(*(render(img) for img in images)))
+
+    async def update_cached_renditions(self, cache_key: Optional[str], renditions: List[Optional[Dict]]):
+        """
+        Attach rendition manifests (from create_renditions) to a cached generation
+
+        Args:
+            cache_key: Key returned in the generation result (None if caching was off)
+            renditions: One manifest per cached image
+        """
+        if not cache_key:
+            return
+        cached = await design_cache.get(cache_key, record_stats=False)
+        if cached and len(cached.get("images", [])) == len(renditions):
+            images = [
+                {**img, "renditions": manifest or img.get("renditions")}
+                for img, manifest in zip(cached["images"], renditions)
+            ]
+            await design_cache.set(cache_key, {**cached, "images": images})
+
+    async def update_cached_analysis(self, cache_key: Optional[str], analysis: Dict):
+        """
+        Attach a (deferred) analysis to a cached generation
+
+        Args:
+            cache_key: Key returned in the generation result (None if caching was off)
+            analysis: Analysis result from Claude
+        """
+        if not cache_key:
+            return
+        cached = await design_cache.get(cache_key, record_stats=False)
+        if cached and not cached.get("analysis"):
+            await design_cache.set(cache_key, {**cached, "analysis": analysis})
+
     def get_template_prompts(self, category: str, style_preset: str) -> List[str]:
         """
         Get template prompts for a category and style
@@ -338,39 +551,7 @@ class AIDesignerService:
         Returns:
             List of template prompts
         """
-        templates = {
-            "ring": {
-                "bridal": [
-                    "solitaire engagement ring with round brilliant diamond, thin pavé band, 18k white gold",
-                    "halo engagement ring with cushion cut center diamond, rose gold band with micro pavé",
-                    "three-stone engagement ring with emerald cut center, platinum setting"
-                ],
-                "minimalist": [
-                    "simple solitaire ring with round diamond, thin polished band, 14k yellow gold",
-                    "bezel set diamond ring, sleek modern design, brushed finish",
-                    "thin band with single floating diamond, minimal setting"
-                ],
-                "traditional": [
-                    "ornate gold ring with filigree work, ruby center stone, intricate band details",
-                    "heritage design ring with granulation, multiple small diamonds, 22k gold",
-                    "traditional Indian ring with temple motifs, emerald center, detailed engraving"
-                ]
-            },
-            "necklace": {
-                "bridal": [
-                    "diamond pendant necklace with teardrop design, delicate chain, white gold",
-                    "solitaire diamond pendant, classic round cut, simple chain, platinum",
-                    "halo pendant necklace with pear-shaped diamond, micro pavé halo"
-                ],
-                "minimalist": [
-                    "simple gold chain with small diamond pendant, delicate and modern",
-                    "single pearl pendant on thin gold chain, minimalist design",
-                    "small geometric pendant, clean lines, brushed metal finish"
-                ]
-            }
-        }
-
-        return templates.get(category, {}).get(style_preset, [
+        return self.TEMPLATE_PROMPTS.get(category, {}).get(style_preset, [
             f"Beautiful {style_preset} style {category}",
             f"Elegant {category} with modern design",
             f"Classic {style_preset} {category} with fine details"
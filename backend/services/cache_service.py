@@ -0,0 +1,184 @@
+"""
+Result Cache Service
+Content-addressed two-tier cache (in-process LRU/TTL backed by Redis) for expensive AI generations
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from backend.app.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
+
+# Seconds to wait before retrying Redis after a connection failure
+REDIS_RETRY_SECONDS = 60
+
+_redis_client = None
+_redis_down_until = 0.0
+
+
+def _get_redis():
+    """Get the shared Redis client, or None if Redis is unavailable"""
+    global _redis_client
+    if not REDIS_AVAILABLE or not settings.redis_url or time.time() < _redis_down_until:
+        return None
+    if _redis_client is None:
+        _redis_client = aioredis.from_url(settings.redis_url, socket_connect_timeout=1, socket_timeout=1)
+    return _redis_client
+
+
+def _mark_redis_down(error: Exception):
+    """Back off from Redis after a failure and fall back to the in-process tier"""
+    global _redis_down_until
+    _redis_down_until = time.time() + REDIS_RETRY_SECONDS
+    logger.warning(f"Redis cache unavailable, using in-process cache only for {REDIS_RETRY_SECONDS}s: {error}")
+
+
+class TTLCache:
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ResultCache:
+    """Namespaced two-tier cache with hit/miss counters"""
+
+    def __init__(self, namespace: str, max_entries: int = 256, ttl_seconds: Optional[int] = None, use_redis: bool = True):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds or settings.cache_ttl_seconds
+        self.use_redis = use_redis
+        self.local = TTLCache(max_entries, self.ttl_seconds)
+        self.stats = {"hits": 0, "local_hits": 0, "redis_hits": 0, "misses": 0, "sets": 0}
+        _registry[namespace] = self
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """
+        Build a content-addressed key from request parameters
+
+        Args:
+            parts: Values identifying the result (strings are whitespace/case normalised)
+
+        Returns:
+            SHA-256 hex digest
+        """
+        normalized = [" ".join(p.lower().split()) if isinstance(p, str) else p for p in parts]
+        return hashlib.sha256(json.dumps(normalized, default=str).encode("utf-8")).hexdigest()
+
+    def _redis_key(self, key: str) -> str:
+        return f"jeweltech:{self.namespace}:{key}"
+
+    async def get(self, key: str, record_stats: bool = True) -> Optional[Dict]:
+        """
+        Look up a cached result (in-process first, then Redis)
+
+        Args:
+            key: Cache key from make_key()
+            record_stats: Count this lookup towards hit/miss metrics
+
+        Returns:
+            Cached value or None
+        """
+        stats = self.stats if record_stats else dict.fromkeys(self.stats, 0)
+
+        value = self.local.get(key)
+        if value is not None:
+            stats["hits"] += 1
+            stats["local_hits"] += 1
+            return value
+
+        client = _get_redis() if self.use_redis else None
+        if client is not None:
+            try:
+                raw = await client.get(self._redis_key(key))
+                if raw is not None:
+                    value = json.loads(raw)
+                    self.local.set(key, value)
+                    stats["hits"] += 1
+                    stats["redis_hits"] += 1
+                    return value
+            except Exception as e:
+                _mark_redis_down(e)
+
+        stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Dict):
+        """Store a JSON-serialisable result in both tiers"""
+        self.local.set(key, value)
+        self.stats["sets"] += 1
+
+        client = _get_redis() if self.use_redis else None
+        if client is not None:
+            try:
+                await client.set(self._redis_key(key), json.dumps(value, default=str), ex=self.ttl_seconds)
+            except Exception as e:
+                _mark_redis_down(e)
+
+    async def delete(self, key: str):
+        """Remove a result from both tiers"""
+        self.local.delete(key)
+        client = _get_redis() if self.use_redis else None
+        if client is not None:
+            try:
+                await client.delete(self._redis_key(key))
+            except Exception as e:
+                _mark_redis_down(e)
+
+    def get_stats(self) -> Dict:
+        """Get hit-rate metrics for this cache"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "entries": len(self.local),
+            "evictions": self.local.evictions,
+            "redis": self.use_redis and _get_redis() is not None
+        }
+
+
+_registry: Dict[str, ResultCache] = {}
+
+
+def get_cache_metrics() -> Dict:
+    """Get metrics for every registered cache"""
+    return {namespace: cache.get_stats() for namespace, cache in _registry.items()}
@@ -0,0 +1,209 @@
+"""
+Compositing Service
+Local try-on previews: places a jewelry PNG on a body photo using the overlay transform
+"""
+import io
+import logging
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from backend.app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRANSFORM = {"scale": 1.0, "rotation": 0.0, "opacity": 1.0, "hue": 0.0}
+
+# EXIF Orientation
+ORIENTATION_TAG = 0x0112
+
+
+def hue_rotation_matrix(degrees: float) -> np.ndarray:
+    """
+    Luminance-preserving RGB hue rotation (same matrix as the CSS hue-rotate() filter)
+
+    Args:
+        degrees: Hue angle
+
+    Returns:
+        3x3 matrix applied to RGB column vectors
+    """
+    a = math.cos(math.radians(degrees))
+    b = math.sin(math.radians(degrees))
+    return np.array([
+        [0.213 + 0.787 * a - 0.213 * b, 0.715 - 0.715 * a - 0.715 * b, 0.072 - 0.072 * a + 0.928 * b],
+        [0.213 - 0.213 * a + 0.143 * b, 0.715 + 0.285 * a + 0.140 * b, 0.072 - 0.072 * a - 0.283 * b],
+        [0.213 - 0.213 * a - 0.787 * b, 0.715 - 0.715 * a + 0.715 * b, 0.072 + 0.928 * a + 0.072 * b]
+    ], dtype=np.float32)
+
+
+class CompositingService:
+    """
+    Server-side version of the try-on canvas
+
+    Follows the frontend's canvas semantics: the overlay's centre is placed at
+    (x, y) in body-photo pixels, rotated clockwise by `rotation` degrees, scaled
+    by `scale` and drawn with `opacity`; `hue` rotates the overlay's colours.
+    """
+
+    @staticmethod
+    def resolve_transform(
+        transform: Optional[Dict],
+        anchor_points: Optional[Dict],
+        body_size: Tuple[int, int]
+    ) -> Dict:
+        """
+        Fill in a transform from defaults and finger anchor points
+
+        Without an explicit x/y the overlay is centred between the knuckle and
+        base anchors (rotated to follow the finger), or on the photo centre.
+
+        Args:
+            transform: Overlay transform (any of x, y, scale, rotation, opacity, hue)
+            anchor_points: Optional {"knuckle": {x, y}, "base": {x, y}}
+            body_size: Body photo (width, height)
+
+        Returns:
+            Complete transform dict
+        """
+        resolved = {**DEFAULT_TRANSFORM, "x": body_size[0] / 2, "y": body_size[1] / 2}
+        anchors = anchor_points or {}
+        knuckle, base = anchors.get("knuckle"), anchors.get("base")
+        placed = transform and transform.get("x") is not None and transform.get("y") is not None
+
+        if not placed and knuckle and base:
+            dx, dy = base["x"] - knuckle["x"], base["y"] - knuckle["y"]
+            resolved["x"] = (knuckle["x"] + base["x"]) / 2
+            resolved["y"] = (knuckle["y"] + base["y"]) / 2
+            # Align the overlay's vertical axis with the finger
+            resolved["rotation"] = math.degrees(math.atan2(-dx, dy))
+
+        resolved.update({key: value for key, value in (transform or {}).items() if value is not None})
+        return resolved
+
+    def composite(
+        self,
+        body_data: bytes,
+        jewelry_data: bytes,
+        transform: Optional[Dict] = None,
+        anchor_points: Optional[Dict] = None,
+        max_dimension: Optional[int] = None,
+        quality: Optional[int] = None
+    ) -> Dict:
+        """
+        Composite the jewelry onto the body photo (CPU-bound: run on the image executor)
+
+        Args:
+            body_data: Body photo bytes
+            jewelry_data: Jewelry image bytes (PNG with transparency)
+            transform: Overlay transform in original body-photo pixels
+            anchor_points: Optional finger anchors, used when the transform has no x/y
+            max_dimension: Longest output side (defaults to TRYON_PREVIEW_MAX_DIMENSION)
+            quality: JPEG quality (defaults to TRYON_PREVIEW_JPEG_QUALITY)
+
+        Returns:
+            Dict with JPEG data, mime_type, image_size, the applied transform and timings_ms
+
+        Raises:
+            ValueError: If either image can't be decoded
+        """
+        import cv2
+
+        max_dimension = max_dimension or settings.tryon_preview_max_dimension
+        quality = quality or settings.tryon_preview_jpeg_quality
+        timings = {}
+        start = time.perf_counter()
+
+        try:
+            body = Image.open(io.BytesIO(body_data))
+            # Transform coordinates refer to the photo as the browser shows it (EXIF orientation applied)
+            raw_size = body.size
+            rotated = body.getexif().get(ORIENTATION_TAG) in (5, 6, 7, 8)
+            original_size = raw_size[::-1] if rotated else raw_size
+
+            # Work at preview resolution; JPEGs decode straight at a reduced scale
+            factor = min(1.0, max_dimension / max(original_size))
+            if factor < 1.0:
+                body.draft("RGB", (math.ceil(raw_size[0] * factor), math.ceil(raw_size[1] * factor)))
+            body = ImageOps.exif_transpose(body).convert("RGB")
+            target = (max(1, round(original_size[0] * factor)), max(1, round(original_size[1] * factor)))
+            if body.size != target:
+                body = body.resize(target, Image.Resampling.BILINEAR)
+
+            jewelry = Image.open(io.BytesIO(jewelry_data)).convert("RGBA")
+        except Exception as e:
+            raise ValueError(f"Invalid image file: {e}")
+
+        canvas = np.array(body)
+        resolved = self.resolve_transform(transform, anchor_points, original_size)
+        x, y = resolved["x"] * factor, resolved["y"] * factor
+        scale = resolved["scale"] * factor
+        opacity = min(max(resolved["opacity"], 0.0), 1.0)
+
+        # Shrink the overlay to its on-canvas size before going to float32
+        # (premultiplied resample, so transparent pixels don't bleed into the edges)
+        source_w, source_h = jewelry.size
+        if scale < 1.0:
+            on_canvas = (max(1, round(source_w * scale)), max(1, round(source_h * scale)))
+            jewelry = jewelry.convert("RGBa").resize(on_canvas, Image.Resampling.BOX).convert("RGBA")
+        scale_x, scale_y = scale * source_w / jewelry.width, scale * source_h / jewelry.height
+        overlay = np.asarray(jewelry, dtype=np.float32)
+        timings["decode_ms"] = (time.perf_counter() - start) * 1000
+
+        step = time.perf_counter()
+        rgb, alpha = overlay[..., :3], overlay[..., 3:] / 255.0
+        if resolved["hue"]:
+            rgb = np.clip(rgb @ hue_rotation_matrix(resolved["hue"]).T, 0, 255)
+        # Premultiply so bilinear sampling doesn't pull dark fringes in from transparent pixels
+        premultiplied = np.concatenate([rgb * alpha, alpha], axis=2)
+
+        # Overlay centre -> (x, y), canvas-style clockwise rotation, uniform scale
+        theta = math.radians(resolved["rotation"])
+        cos_t, sin_t = math.cos(theta), math.sin(theta)
+        half_w, half_h = overlay.shape[1] / 2, overlay.shape[0] / 2
+        matrix = np.array([
+            [cos_t * scale_x, -sin_t * scale_y, x - cos_t * scale_x * half_w + sin_t * scale_y * half_h],
+            [sin_t * scale_x, cos_t * scale_y, y - sin_t * scale_x * half_w - cos_t * scale_y * half_h]
+        ], dtype=np.float64)
+
+        # Only warp/blend the region the overlay covers
+        corners = np.array([[0, 0, 1], [overlay.shape[1], 0, 1], [0, overlay.shape[0], 1], [overlay.shape[1], overlay.shape[0], 1]])
+        projected = corners @ matrix.T
+        x0 = max(0, int(math.floor(projected[:, 0].min())))
+        y0 = max(0, int(math.floor(projected[:, 1].min())))
+        x1 = min(canvas.shape[1], int(math.ceil(projected[:, 0].max())))
+        y1 = min(canvas.shape[0], int(math.ceil(projected[:, 1].max())))
+
+        if x1 > x0 and y1 > y0 and opacity > 0:
+            matrix[:, 2] -= (x0, y0)
+            warped = cv2.warpAffine(
+                premultiplied, matrix, (x1 - x0, y1 - y0),
+                flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=0
+            )
+            coverage = warped[..., 3:] * opacity
+            region = canvas[y0:y1, x0:x1].astype(np.float32)
+            blended = warped[..., :3] * opacity + region * (1.0 - coverage)
+            canvas[y0:y1, x0:x1] = np.clip(blended + 0.5, 0, 255).astype(np.uint8)
+        timings["composite_ms"] = (time.perf_counter() - step) * 1000
+
+        step = time.perf_counter()
+        buffer = io.BytesIO()
+        Image.fromarray(canvas).save(buffer, format="JPEG", quality=quality)
+        timings["encode_ms"] = (time.perf_counter() - step) * 1000
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+
+        return {
+            "data": buffer.getvalue(),
+            "mime_type": "image/jpeg",
+            "image_size": (canvas.shape[1], canvas.shape[0]),
+            "scale_factor": factor,
+            "transform": resolved,
+            "timings_ms": {name: round(value, 1) for name, value in timings.items()}
+        }
+
+
+# Global service instance
+compositing_service = CompositingService()
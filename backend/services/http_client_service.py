@@ -0,0 +1,183 @@
+"""
+Shared HTTP Client Service
+App-lifetime registry of pooled httpx.AsyncClient instances for outbound provider calls
+"""
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+from backend.app.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 - only needed to enable HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _MeteredTransport(httpx.AsyncBaseTransport):
+    """Transport wrapper that records request counts, latency and new connections for a pool"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, stats: Dict):
+        self.inner = inner
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self.stats
+        caller_trace = request.extensions.get("trace")
+
+        async def trace(event: str, info: Dict):
+            # httpcore's public trace extension: fires once per TCP connection opened
+            if event == "connection.connect_tcp.complete":
+                stats["connections_opened_total"] += 1
+            if caller_trace is not None:
+                await caller_trace(event, info)
+
+        request.extensions["trace"] = trace
+        stats["requests_total"] += 1
+        stats["requests_in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["requests_in_flight"])
+        start = time.perf_counter()
+        try:
+            response = await self.inner.handle_async_request(request)
+            if response.status_code >= 500:
+                stats["errors_total"] += 1
+            return response
+        except Exception:
+            stats["errors_total"] += 1
+            raise
+        finally:
+            stats["requests_in_flight"] -= 1
+            stats["completed_total"] += 1
+            stats["total_latency_ms"] += (time.perf_counter() - start) * 1000
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class HTTPClientService:
+    """Registry of long-lived, connection-pooled async HTTP clients (one pool per provider)"""
+
+    # Known provider pools; anything else (S3 presigned URLs, arbitrary image URLs) uses "default"
+    PROVIDERS = ("gemini", "tripo", "default")
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, httpx.AsyncBaseTransport] = {}
+        self._stats: Dict[str, Dict] = {}
+
+    def _build_client(self, name: str) -> httpx.AsyncClient:
+        """Create a pooled client with pool-wide connection limits and keep-alive tuning"""
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections_per_pool,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds
+        )
+        timeout = httpx.Timeout(settings.http_default_timeout_seconds, connect=settings.http_connect_timeout_seconds)
+        use_http2 = settings.http_enable_http2 and HTTP2_AVAILABLE
+
+        inner = self._transports.get(name) or httpx.AsyncHTTPTransport(limits=limits, http2=use_http2)
+        stats = self._stats.setdefault(name, {
+            "requests_total": 0,
+            "requests_in_flight": 0,
+            "peak_in_flight": 0,
+            "completed_total": 0,
+            "errors_total": 0,
+            "connections_opened_total": 0,
+            "total_latency_ms": 0.0
+        })
+
+        client = httpx.AsyncClient(
+            timeout=timeout,
+            transport=_MeteredTransport(inner, stats)
+        )
+        logger.info(
+            f"HTTP client pool '{name}' created "
+            f"(max_connections={limits.max_connections}, keepalive={limits.max_keepalive_connections}, http2={use_http2})"
+        )
+        return client
+
+    def get_client(self, name: str = "default") -> httpx.AsyncClient:
+        """
+        Get the shared client for a provider, creating it lazily if startup() wasn't called
+
+        Args:
+            name: Provider pool name (gemini, tripo, default)
+
+        Returns:
+            Pooled httpx.AsyncClient
+        """
+        if name not in self.PROVIDERS:
+            name = "default"
+
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._build_client(name)
+            self._clients[name] = client
+        return client
+
+    async def set_transport(self, name: str, transport: Optional[httpx.AsyncBaseTransport]):
+        """
+        Override the transport for a provider pool (e.g. an ASGI stand-in for tests)
+
+        Args:
+            name: Provider pool name
+            transport: httpx transport, or None to restore the network transport
+        """
+        if transport is None:
+            self._transports.pop(name, None)
+        else:
+            self._transports[name] = transport
+
+        # Drop the existing client so the next get_client() picks up the new transport
+        existing = self._clients.pop(name, None)
+        if existing is not None and not existing.is_closed:
+            await existing.aclose()
+
+    async def startup(self):
+        """Create all provider pools up front (called from app startup)"""
+        for name in self.PROVIDERS:
+            self.get_client(name)
+        logger.info(f"HTTP client pools ready: {list(self._clients.keys())} (HTTP/2 available: {HTTP2_AVAILABLE})")
+
+    async def shutdown(self):
+        """Close all pools and release their connections (called from app shutdown)"""
+        for name, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing HTTP client pool '{name}': {e}")
+        self._clients.clear()
+        logger.info("HTTP client pools closed")
+
+    def get_metrics(self) -> Dict:
+        """
+        Get pool utilisation metrics per provider
+
+        Returns:
+            Dict of provider name -> metrics
+        """
+        metrics = {}
+        for name, stats in self._stats.items():
+            client = self._clients.get(name)
+            active = client is not None and not client.is_closed
+            completed = stats["completed_total"]
+            metrics[name] = {
+                **stats,
+                "total_latency_ms": round(stats["total_latency_ms"], 2),
+                "avg_latency_ms": round(stats["total_latency_ms"] / completed, 2) if completed else 0.0,
+                # Share of requests that reused a pooled connection
+                "connection_reuse": round(1 - stats["connections_opened_total"] / stats["requests_total"], 3)
+                if stats["requests_total"] else 0.0,
+                "max_connections": settings.http_max_connections_per_pool,
+                "utilisation": round(stats["requests_in_flight"] / settings.http_max_connections_per_pool, 3),
+                "active": active
+            }
+        return metrics
+
+
+# Global HTTP client service instance
+http_client_service = HTTPClientService()
@@ -0,0 +1,103 @@
+"""
+Image Executor Service
+Shared, bounded worker pool for CPU-bound PIL work (decode, resize, encode)
+"""
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from backend.app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ImageExecutorBusyError(Exception):
+    """Raised when the image executor already has its maximum number of pending jobs"""
+
+
+class ImageExecutorService:
+    """
+    Runs image processing off the event loop with backpressure
+
+    Uses threads: Pillow releases the GIL while decoding, resampling and
+    encoding, and images don't need to be pickled to a worker process.
+    At most IMAGE_EXECUTOR_MAX_PENDING jobs may be running or queued; beyond
+    that run() fails fast with ImageExecutorBusyError (mapped to HTTP 429).
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self.stats = {"completed": 0, "errors": 0, "rejected": 0, "peak_pending": 0, "total_ms": 0.0}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.image_executor_workers),
+                thread_name_prefix="image-worker"
+            )
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking image function on the shared pool
+
+        Args:
+            fn: Function to run
+            args, kwargs: Arguments for fn
+
+        Returns:
+            fn's return value
+
+        Raises:
+            ImageExecutorBusyError: If the pool is saturated
+        """
+        if self._pending >= settings.image_executor_max_pending:
+            self.stats["rejected"] += 1
+            raise ImageExecutorBusyError(
+                f"Image processing is at capacity ({self._pending} jobs pending), please retry shortly"
+            )
+
+        self._pending += 1
+        self.stats["peak_pending"] = max(self.stats["peak_pending"], self._pending)
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self._pending -= 1
+
+        # Only successful jobs count as completed (and towards avg_ms)
+        self.stats["completed"] += 1
+        self.stats["total_ms"] += (time.perf_counter() - start) * 1000
+        return result
+
+    def shutdown(self):
+        """Stop the worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_metrics(self) -> Dict:
+        """Get pool utilisation metrics"""
+        completed = self.stats["completed"]
+        return {
+            "workers": settings.image_executor_workers,
+            "max_pending": settings.image_executor_max_pending,
+            "pending": self._pending,
+            "peak_pending": self.stats["peak_pending"],
+            "completed": completed,
+            "errors": self.stats["errors"],
+            "rejected": self.stats["rejected"],
+            "avg_ms": round(self.stats["total_ms"] / completed, 1) if completed else 0.0
+        }
+
+
+# Global service instance
+image_executor_service = ImageExecutorService()
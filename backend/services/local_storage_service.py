@@ -2,12 +2,13 @@
 Local File Storage Service for image storage and retrieval
 Alternative to S3 for development/local environments
 """
+import asyncio
 import os
 import io
 from PIL import Image
 import uuid
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import AsyncIterator, Optional, Tuple
 import logging
 from pathlib import Path
 
@@ -85,6 +86,54 @@ class LocalStorageService:
             logger.error(f"Error saving to local storage: {e}")
             raise
 
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        folder: str,
+        filename: str,
+        content_type: str = "application/octet-stream",
+        cache_control: str = "",
+        expiration: int = 0
+    ) -> Tuple[str, str, int]:
+        """
+        Stream data to a file without buffering it in memory
+
+        Chunks are written to a temporary ".part" file that is renamed into place
+        once complete, so readers never see a partial file.
+
+        Args:
+            chunks: Async iterator of data chunks (e.g. an httpx response body)
+            folder: Subfolder/prefix
+            filename: Filename
+            content_type: MIME type (unused, kept for parity with S3)
+            cache_control: Unused, kept for parity with S3
+            expiration: Unused, kept for parity with S3
+
+        Returns:
+            Tuple of (url, relative_path, size in bytes)
+        """
+        folder_path = self.base_path / folder
+        folder_path.mkdir(parents=True, exist_ok=True)
+        file_path = folder_path / filename
+        temp_path = folder_path / f"{filename}.part"
+        relative_path = f"{folder}/{filename}"
+
+        size = 0
+        handle = await asyncio.to_thread(open, temp_path, 'wb')
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(handle.write, chunk)
+                size += len(chunk)
+        except BaseException:
+            handle.close()
+            temp_path.unlink(missing_ok=True)
+            raise
+        handle.close()
+        os.replace(temp_path, file_path)
+
+        logger.info(f"Streamed {size} bytes to local storage: {file_path}")
+        return f"{self.base_url}/{relative_path}", relative_path, size
+
     def upload_from_pil(
         self,
         image: Image.Image,
@@ -181,6 +230,18 @@ class LocalStorageService:
             logger.error(f"Error creating thumbnail: {e}")
             raise
 
+    def download_image(self, relative_path: str) -> bytes:
+        """
+        Read an image back from local storage
+
+        Args:
+            relative_path: Relative path of the image
+
+        Returns:
+            File bytes
+        """
+        return (self.base_path / relative_path).read_bytes()
+
     def delete_image(self, relative_path: str) -> bool:
         """
         Delete image from local filesystem
@@ -205,6 +266,19 @@ class LocalStorageService:
             logger.error(f"Error deleting from local storage: {e}")
             return False
 
+    def get_url(self, relative_path: str, expiration: int = 3600) -> str:
+        """
+        Get the URL a stored file is served at
+
+        Args:
+            relative_path: Relative path of the file
+            expiration: Ignored (local URLs don't expire)
+
+        Returns:
+            URL under base_url
+        """
+        return f"{self.base_url}/{relative_path}"
+
     def get_full_path(self, relative_path: str) -> Path:
         """
         Get full filesystem path from relative path
@@ -0,0 +1,105 @@
+"""
+Mesh Analysis Service
+Computes real statistics for generated 3D models in a process pool, cached by content hash
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from backend.app.config import settings
+from backend.services.cache_service import ResultCache
+from backend.utils.mesh_stats import analyze_mesh_file
+
+logger = logging.getLogger(__name__)
+
+# Mesh stats depend only on file content, so entries can live for a long time
+mesh_stats_cache = ResultCache("mesh_stats", max_entries=1024, ttl_seconds=30 * 86400, use_redis=settings.cache_use_redis)
+
+
+class MeshAnalysisService:
+    """Parses GLB/OBJ/STL files off the event loop and reports geometry stats"""
+
+    SUPPORTED_FORMATS = ("glb", "obj", "stl")
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = {"analyzed": 0, "failed": 0, "restarts": 0, "total_ms": 0.0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: workers only import NumPy + the parser, not the app (and never fork the event loop)
+            self._executor = ProcessPoolExecutor(
+                max_workers=max(1, settings.mesh_analysis_workers),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def analyze(self, path: str, content_hash: str) -> Dict:
+        """
+        Get statistics for a mesh file
+
+        Args:
+            path: Path to the downloaded GLB, OBJ or STL file
+            content_hash: SHA-256 of the file content (cache key)
+
+        Returns:
+            Stats dict (vertices, faces, bounding_box, surface_area, volume, is_watertight)
+        """
+        cached = await mesh_stats_cache.get(content_hash)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            stats = await loop.run_in_executor(executor, analyze_mesh_file, str(path))
+        except BrokenProcessPool:
+            # A worker died (OOM kill, segfault): the executor is unusable, start a fresh one
+            self.stats["failed"] += 1
+            self.stats["restarts"] += 1
+            self._reset_executor(executor)
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats["analyzed"] += 1
+        self.stats["total_ms"] += elapsed_ms
+        logger.info(f"Mesh analysed in {elapsed_ms:.0f}ms: {stats['vertices']} vertices, {stats['faces']} faces")
+
+        await mesh_stats_cache.set(content_hash, stats)
+        return {**stats, "cached": False}
+
+    def _reset_executor(self, executor: ProcessPoolExecutor):
+        """Drop a broken executor so the next analysis spawns new workers"""
+        if self._executor is executor:
+            logger.warning("Mesh analysis pool is broken (a worker exited unexpectedly), recreating it")
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_metrics(self) -> Dict:
+        """Get analysis counters"""
+        analyzed = self.stats["analyzed"]
+        return {
+            "analyzed": analyzed,
+            "failed": self.stats["failed"],
+            "restarts": self.stats["restarts"],
+            "avg_ms": round(self.stats["total_ms"] / analyzed, 1) if analyzed else 0.0,
+            "workers": settings.mesh_analysis_workers
+        }
+
+
+# Global service instance
+mesh_analysis_service = MeshAnalysisService()
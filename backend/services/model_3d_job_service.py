@@ -0,0 +1,365 @@
+"""
+3D Generation Job Service
+Runs long 3D model generations on a background worker pool with persisted, resumable job state
+"""
+import asyncio
+import io
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from PIL import Image
+from sqlalchemy import and_, func, or_
+
+from backend.app.config import settings
+from backend.models.database import SessionLocal, Model3DJob
+from backend.models.mongodb import TrialUsageModel
+from backend.services.model_3d_service import model_3d_service
+from backend.services.storage_service import get_storage_service
+from backend.utils.events import event_broker
+
+logger = logging.getLogger(__name__)
+
+TRIAL_FEATURE = "3d_generation"
+
+
+class Model3DJobService:
+    """
+    Queue and worker pool for 3D generation jobs
+
+    Job state lives in the database and input images in the configured storage
+    backend, so any API process (on any host sharing both) can take over a job.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+        self._pending: set = set()
+        self._active: set = set()
+        self.stats = {"submitted": 0, "succeeded": 0, "failed": 0, "resumed": 0}
+
+    @staticmethod
+    def channel(job_id: str) -> str:
+        """Event broker channel for a job's progress events"""
+        return f"model-3d-job:{job_id}"
+
+    @staticmethod
+    def to_dict(job: Model3DJob) -> Dict:
+        """Serialise a job row for API responses and events"""
+        return {
+            "job_id": job.id,
+            "user_id": job.user_id,
+            "status": job.status,
+            "stage": job.stage,
+            "progress": job.progress or 0,
+            "export_format": job.export_format,
+            "tripo_task_id": job.tripo_task_id,
+            "attempts": job.attempts or 0,
+            "result": job.result,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+            "completed_at": job.completed_at.isoformat() if job.completed_at else None
+        }
+
+    def _create_job(self, **fields) -> Dict:
+        db = SessionLocal()
+        try:
+            job = Model3DJob(**fields)
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            return self.to_dict(job)
+        finally:
+            db.close()
+
+    def _update_job(self, job_id: str, **fields) -> Optional[Dict]:
+        db = SessionLocal()
+        try:
+            job = db.query(Model3DJob).filter(Model3DJob.id == job_id).first()
+            if not job:
+                return None
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = datetime.utcnow()
+            db.commit()
+            return self.to_dict(job)
+        finally:
+            db.close()
+
+    def _load_job(self, job_id: str) -> Optional[Model3DJob]:
+        db = SessionLocal()
+        try:
+            return db.query(Model3DJob).filter(Model3DJob.id == job_id).first()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _claimable():
+        """Queued jobs, and running jobs whose worker stopped updating them (its process died)"""
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.generation_3d_stale_seconds)
+        return or_(
+            Model3DJob.status == "queued",
+            and_(Model3DJob.status == "running", Model3DJob.updated_at < stale_before)
+        )
+
+    def _claim_job(self, job_id: str) -> Optional[Model3DJob]:
+        """
+        Atomically move a job to "running" for this worker
+
+        Every API process sees the same unfinished jobs, so the status change is a
+        conditional UPDATE: only the process whose update matched the row runs the job.
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            claimed = (
+                db.query(Model3DJob)
+                .filter(Model3DJob.id == job_id, self._claimable())
+                .update({
+                    Model3DJob.status: "running",
+                    Model3DJob.attempts: func.coalesce(Model3DJob.attempts, 0) + 1,
+                    Model3DJob.started_at: func.coalesce(Model3DJob.started_at, now),
+                    Model3DJob.updated_at: now
+                }, synchronize_session=False)
+            )
+            db.commit()
+            if not claimed:
+                return None
+            return db.query(Model3DJob).filter(Model3DJob.id == job_id).first()
+        finally:
+            db.close()
+
+    def _unfinished_job_ids(self) -> List[str]:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Model3DJob.id)
+                .filter(self._claimable())
+                .order_by(Model3DJob.created_at)
+                .all()
+            )
+            return [row[0] for row in rows]
+        finally:
+            db.close()
+
+    async def _publish(self, job_id: str, final: bool = False, **fields) -> Optional[Dict]:
+        """Persist job fields and notify SSE subscribers"""
+        job = await asyncio.to_thread(self._update_job, job_id, **fields)
+        if job is not None:
+            event_broker.publish(self.channel(job_id), {**job, "final": final})
+        return job
+
+    async def submit(
+        self,
+        user_id: str,
+        image_bytes: bytes,
+        content_type: str = "image/png",
+        export_format: str = "glb",
+        remove_background: bool = True
+    ) -> Dict:
+        """
+        Persist a new job and queue it for the worker pool
+
+        Args:
+            user_id: MongoDB user ID (the caller reserves trial usage; it is refunded if the job fails)
+            image_bytes: Source image bytes
+            content_type: Source image MIME type
+            export_format: Export format (glb, obj, fbx, usdz, stl)
+            remove_background: Whether to remove background
+
+        Returns:
+            Job state
+        """
+        await self.start()
+
+        job_id = f"3d_{uuid.uuid4().hex}"
+        extension = content_type.split("/")[-1] if content_type.startswith("image/") else "png"
+        _, input_path = await asyncio.to_thread(
+            get_storage_service().upload_image,
+            image_bytes,
+            "3d-job-inputs",
+            f"{job_id}.{extension}",
+            content_type
+        )
+
+        job = await asyncio.to_thread(
+            self._create_job,
+            id=job_id,
+            user_id=user_id,
+            input_path=input_path,
+            export_format=export_format,
+            remove_background=remove_background,
+            status="queued",
+            stage="queued",
+            progress=0
+        )
+        self.stats["submitted"] += 1
+        event_broker.publish(self.channel(job_id), {**job, "final": False})
+
+        self._enqueue(job_id)
+        logger.info(f"3D job {job_id} queued for user {user_id} (queue depth {self._queue.qsize()})")
+        return job
+
+    async def _run_job(self, job_id: str):
+        """Run the 3D pipeline for one job, resuming its Tripo task if it already has one"""
+        job = await asyncio.to_thread(self._claim_job, job_id)
+        if job is None:
+            # Finished, or another process got to it first
+            return
+
+        if job.attempts > settings.generation_3d_max_attempts:
+            # Every earlier claim ended with its process dying (OOM, segfault): don't take down another
+            await self._fail_job(job, f"3D generation gave up after {job.attempts - 1} interrupted attempts")
+            return
+
+        if job.tripo_task_id:
+            self.stats["resumed"] += 1
+
+        await self._publish(job_id, status="running")
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+
+        try:
+            image_bytes = await asyncio.to_thread(get_storage_service().download_image, job.input_path)
+            image = Image.open(io.BytesIO(image_bytes))
+
+            async def on_progress(stage: str, progress: int, **details):
+                await self._publish(job_id, stage=stage, progress=progress, **details)
+
+            result = await model_3d_service.generate_3d_model(
+                image=image,
+                remove_background=job.remove_background,
+                export_format=job.export_format,
+                progress_callback=on_progress,
+                tripo_task_id=job.tripo_task_id,
+                generation_id=job_id
+            )
+        except asyncio.CancelledError:
+            # Shutting down: leave the job "running" so it is resumed once it goes stale
+            raise
+        except Exception as e:
+            logger.error(f"3D job {job_id} crashed: {e}", exc_info=True)
+            result = {"success": False, "error": str(e)}
+        finally:
+            heartbeat.cancel()
+
+        if result.get("success"):
+            self.stats["succeeded"] += 1
+            await self._publish(
+                job_id,
+                final=True,
+                status="succeeded",
+                stage="completed",
+                progress=100,
+                result=result,
+                completed_at=datetime.utcnow()
+            )
+            logger.info(f"3D job {job_id} succeeded")
+            await self._remove_input(job)
+        else:
+            await self._fail_job(job, result.get("error", "3D generation failed"))
+
+    async def _fail_job(self, job: Model3DJob, error: str):
+        """Mark a job failed, refund its trial and remove its input image"""
+        try:
+            await asyncio.to_thread(TrialUsageModel.refund_usage, job.user_id, TRIAL_FEATURE)
+        except Exception as e:
+            logger.error(f"Error refunding 3D trial usage for job {job.id}: {e}")
+
+        self.stats["failed"] += 1
+        await self._publish(
+            job.id,
+            final=True,
+            status="failed",
+            error=error,
+            completed_at=datetime.utcnow()
+        )
+        logger.warning(f"3D job {job.id} failed: {error}")
+        await self._remove_input(job)
+
+    async def _remove_input(self, job: Model3DJob):
+        try:
+            await asyncio.to_thread(get_storage_service().delete_image, job.input_path)
+        except Exception as e:
+            logger.warning(f"Could not remove input image for 3D job {job.id}: {e}")
+
+    async def _heartbeat(self, job_id: str):
+        """Keep a running job's updated_at fresh so other processes don't take it over"""
+        interval = max(1.0, settings.generation_3d_stale_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self._update_job, job_id)
+
+    def _enqueue(self, job_id: str):
+        if job_id not in self._pending and job_id not in self._active:
+            self._pending.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def _requeue_unfinished(self):
+        """Queue unfinished jobs now, then keep picking up jobs abandoned by dead processes"""
+        while True:
+            try:
+                pending = await asyncio.to_thread(self._unfinished_job_ids)
+                for job_id in pending:
+                    self._enqueue(job_id)
+                if pending:
+                    logger.info(f"Queued {len(pending)} unfinished 3D jobs")
+            except Exception as e:
+                logger.error(f"Error scanning for unfinished 3D jobs: {e}")
+            await asyncio.sleep(settings.generation_3d_stale_seconds)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id = await self._queue.get()
+            self._pending.discard(job_id)
+            self._active.add(job_id)
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                logger.error(f"3D worker {worker_id} error on job {job_id}: {e}", exc_info=True)
+            finally:
+                self._active.discard(job_id)
+                self._queue.task_done()
+
+    async def start(self):
+        """Start the worker pool and requeue jobs left unfinished by a previous run"""
+        if self._workers:
+            return
+
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(i))
+            for i in range(max(1, settings.generation_3d_workers))
+        ]
+        self._reaper = asyncio.create_task(self._requeue_unfinished())
+
+    async def stop(self):
+        """Cancel the worker pool (running jobs are resumed once they go stale)"""
+        tasks = self._workers + ([self._reaper] if self._reaper else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._reaper = None
+        self._pending.clear()
+        self._active.clear()
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get the current state of a job"""
+        job = await asyncio.to_thread(self._load_job, job_id)
+        return self.to_dict(job) if job else None
+
+    def get_metrics(self) -> Dict:
+        """Get worker pool metrics"""
+        return {
+            **self.stats,
+            "workers": len(self._workers),
+            "active": len(self._active),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0
+        }
+
+
+# Global service instance
+model_3d_job_service = Model3DJobService()
@@ -2,30 +2,43 @@
 3D Model Generation Service
 Converts 2D jewellery images to 3D models using Tripo3D API
 """
+import hashlib
 import logging
+import os
+import tempfile
 import uuid
-import time
 import asyncio
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Awaitable, Callable, Dict, Optional, Tuple
 import io
 import base64
 
 from PIL import Image
 import httpx
 from backend.app.config import settings
-from backend.services.s3_service import s3_service
+from backend.services.mesh_analysis_service import mesh_analysis_service
+from backend.services.storage_service import get_storage_service
+from backend.services.rendition_service import rendition_service
+from backend.services.http_client_service import http_client_service
+from backend.services.tripo_poller_service import TripoTaskPoller
 
 logger = logging.getLogger(__name__)
 
+# Progress hook: await progress_callback(stage, progress_percent, **details)
+ProgressCallback = Callable[..., Awaitable[None]]
+
 
 class Model3DService:
     """Service for generating 3D models from 2D images using Tripo3D API"""
 
+    # Bytes read from the model download per chunk
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
     def __init__(self):
         """Initialize the 3D model generation service"""
-        self.api_base_url = "https://api.tripo3d.ai/v2/openapi"
+        self.api_base_url = settings.tripo_api_base_url.rstrip("/")
         self.api_key = settings.tripo_api_key
+        self.poller = TripoTaskPoller(self._fetch_task_status)
 
         logger.info("3D Model Service initialized (Tripo3D API)")
 
@@ -62,24 +75,25 @@ class Model3DService:
 
                 # Upload to Tripo API with extended timeout and retry
                 timeout = httpx.Timeout(180.0, connect=30.0)  # 180s total, 30s connect
-                async with httpx.AsyncClient(timeout=timeout) as client:
-                    response = await client.post(
-                        f"{self.api_base_url}/upload",
-                        headers={
-                            "Authorization": f"Bearer {self.api_key}"
-                        },
-                        files={
-                            "file": ("image.jpg", img_byte_arr, "image/jpeg")
-                        }
-                    )
-
-                    if response.status_code != 200:
-                        raise Exception(f"Failed to upload image: HTTP {response.status_code} - {response.text}")
-
-                    result = response.json()
-                    image_token = result["data"]["image_token"]
-                    logger.info(f"Image uploaded successfully: {image_token}")
-                    return image_token
+                client = http_client_service.get_client("tripo")
+                response = await client.post(
+                    f"{self.api_base_url}/upload",
+                    headers={
+                        "Authorization": f"Bearer {self.api_key}"
+                    },
+                    files={
+                        "file": ("image.jpg", img_byte_arr, "image/jpeg")
+                    },
+                    timeout=timeout
+                )
+
+                if response.status_code != 200:
+                    raise Exception(f"Failed to upload image: HTTP {response.status_code} - {response.text}")
+
+                result = response.json()
+                image_token = result["data"]["image_token"]
+                logger.info(f"Image uploaded successfully: {image_token}")
+                return image_token
 
             except (httpx.ReadTimeout, httpx.ConnectTimeout) as e:
                 logger.warning(f"Timeout on attempt {attempt + 1}/{max_retries}: {e}")
@@ -111,106 +125,167 @@ class Model3DService:
             Task ID
         """
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(
-                    f"{self.api_base_url}/task",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "type": mode,
-                        "file": {
-                            "type": "image_token",
-                            "file_token": image_token
-                        }
+            client = http_client_service.get_client("tripo")
+            response = await client.post(
+                f"{self.api_base_url}/task",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "type": mode,
+                    "file": {
+                        "type": "image_token",
+                        "file_token": image_token
                     }
-                )
+                },
+                timeout=120.0
+            )
 
-                if response.status_code != 200:
-                    raise Exception(f"Failed to create task: HTTP {response.status_code} - {response.text}")
+            if response.status_code != 200:
+                raise Exception(f"Failed to create task: HTTP {response.status_code} - {response.text}")
 
-                result = response.json()
-                task_id = result["data"]["task_id"]
-                logger.info(f"Task created: {task_id}")
-                return task_id
+            result = response.json()
+            task_id = result["data"]["task_id"]
+            logger.info(f"Task created: {task_id}")
+            return task_id
 
         except Exception as e:
             logger.error(f"Error creating Tripo task: {e}")
             raise
 
-    async def _poll_task(self, task_id: str, max_wait: int = 300) -> Dict:
+    async def _fetch_task_status(self, task_id: str) -> Dict:
+        """
+        Fetch the current status of a task (one request, used by the shared poller)
+
+        Args:
+            task_id: Task ID to check
+
+        Returns:
+            Task data (status, progress, output)
+        """
+        client = http_client_service.get_client("tripo")
+        response = await client.get(
+            f"{self.api_base_url}/task/{task_id}",
+            headers={
+                "Authorization": f"Bearer {self.api_key}"
+            },
+            timeout=120.0
+        )
+
+        if response.status_code != 200:
+            raise Exception(f"Failed to poll task: HTTP {response.status_code}")
+
+        data = response.json()["data"]
+        logger.debug(f"Task {task_id} status: {data.get('status')} ({data.get('progress')}%)")
+        return data
+
+    async def _poll_task(
+        self,
+        task_id: str,
+        max_wait: int = 300,
+        on_progress: Optional[Callable[[int], Awaitable[None]]] = None
+    ) -> Dict:
         """
-        Poll task until completion
+        Wait for a task to complete via the shared poller
 
         Args:
             task_id: Task ID to poll
             max_wait: Maximum wait time in seconds
+            on_progress: Optional hook called with Tripo's progress percentage
 
         Returns:
             Task result data
         """
         try:
-            start_time = time.time()
-
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                while time.time() - start_time < max_wait:
-                    response = await client.get(
-                        f"{self.api_base_url}/task/{task_id}",
-                        headers={
-                            "Authorization": f"Bearer {self.api_key}"
-                        }
-                    )
-
-                    if response.status_code != 200:
-                        raise Exception(f"Failed to poll task: HTTP {response.status_code}")
-
-                    result = response.json()
-                    status = result["data"]["status"]
-
-                    logger.info(f"Task {task_id} status: {status}")
-
-                    if status == "success":
-                        return result["data"]
-                    elif status == "failed":
-                        error = result["data"].get("error", "Unknown error")
-                        raise Exception(f"Task failed: {error}")
-                    elif status in ["running", "queued"]:
-                        # Wait before polling again
-                        await asyncio.sleep(3)
-                    else:
-                        raise Exception(f"Unknown status: {status}")
-
-                raise Exception("Task timeout: exceeded maximum wait time")
-
+            return await self.poller.wait_for(task_id, max_wait=max_wait, on_progress=on_progress)
         except Exception as e:
             logger.error(f"Error polling task: {e}")
             raise
 
-    async def _download_model(self, model_url: str) -> bytes:
+    async def _stream_model_to_storage(
+        self,
+        model_url: str,
+        filename: str,
+        mime_type: str,
+        copy_to: Optional[str] = None
+    ) -> Tuple[str, str, int, str]:
         """
-        Download the generated 3D model
+        Stream the generated 3D model from Tripo straight into storage
+
+        The response body is piped chunk by chunk into the storage backend
+        (S3 multipart upload or a local file), so memory stays bounded
+        regardless of model size.
 
         Args:
             model_url: URL to download model from
+            filename: Destination filename in the 3d-models folder
+            mime_type: Model MIME type
+            copy_to: Optional local path to also write the model to (for mesh analysis)
 
         Returns:
-            Model file bytes
+            Tuple of (url, key, size in bytes, SHA-256 of the content)
         """
-        try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.get(model_url)
+        hasher = hashlib.sha256()
+        copy = open(copy_to, 'wb') if copy_to else None
+
+        async def tee(chunks):
+            async for chunk in chunks:
+                hasher.update(chunk)
+                if copy is not None:
+                    await asyncio.to_thread(copy.write, chunk)
+                yield chunk
 
+        try:
+            storage = get_storage_service()
+            client = http_client_service.get_client("default")
+            async with client.stream("GET", model_url, timeout=120.0) as response:
                 if response.status_code != 200:
                     raise Exception(f"Failed to download model: HTTP {response.status_code}")
 
-                model_bytes = response.content
-                logger.info(f"Model downloaded: {len(model_bytes)} bytes")
-                return model_bytes
+                url, key, size = await storage.upload_stream(
+                    tee(response.aiter_bytes(self.DOWNLOAD_CHUNK_SIZE)),
+                    folder="3d-models",
+                    filename=filename,
+                    content_type=mime_type,
+                    cache_control='public, max-age=604800',  # Cache for 7 days
+                    expiration=604800  # 7 days
+                )
+
+            logger.info(f"Model streamed to storage: {key} ({size} bytes)")
+            return url, key, size, hasher.hexdigest()
 
         except Exception as e:
             logger.error(f"Error downloading model: {e}")
             raise
+        finally:
+            if copy is not None:
+                copy.close()
+
+    async def _analyze_mesh(self, path: str, content_hash: str) -> Dict:
+        """
+        Compute real mesh statistics, falling back to empty stats if the file can't be parsed
+
+        Args:
+            path: Local copy of the downloaded model
+            content_hash: SHA-256 of the model content
+
+        Returns:
+            Stats dict
+        """
+        try:
+            return await mesh_analysis_service.analyze(path, content_hash)
+        except Exception as e:
+            logger.warning(f"Mesh analysis failed: {e}")
+            return {
+                "vertices": None,
+                "faces": None,
+                "is_watertight": None,
+                "volume": None,
+                "surface_area": None,
+                "bounding_box": None,
+                "error": str(e)
+            }
 
     def _preprocess_image(self, image: Image.Image) -> Image.Image:
         """
@@ -250,7 +325,10 @@ class Model3DService:
         self,
         image: Image.Image,
         remove_background: bool = True,
-        export_format: str = "glb"
+        export_format: str = "glb",
+        progress_callback: Optional[ProgressCallback] = None,
+        tripo_task_id: Optional[str] = None,
+        generation_id: Optional[str] = None
     ) -> Dict:
         """
         Main method to generate 3D model from 2D image using Tripo API
@@ -259,31 +337,50 @@ class Model3DService:
             image: Input PIL image
             remove_background: Whether to remove background (handled by Tripo API)
             export_format: Export format (glb, obj, fbx, usdz, stl)
+            progress_callback: Optional async hook called as (stage, progress, **details)
+                when the pipeline moves on; the "generating" stage passes tripo_task_id
+            tripo_task_id: Resume an existing Tripo task instead of uploading again
+            generation_id: Reuse a generation ID (e.g. when resuming a job)
 
         Returns:
             Dictionary with model data and metadata
         """
+        async def report(stage: str, progress: int, **details):
+            if progress_callback is not None:
+                await progress_callback(stage, progress, **details)
+
         try:
             if not self.api_key:
                 raise Exception("Tripo API key not configured. Please add TRIPO_API_KEY to your .env file")
 
-            generation_id = f"3d_{uuid.uuid4().hex}"
+            generation_id = generation_id or f"3d_{uuid.uuid4().hex}"
             logger.info(f"Starting 3D generation {generation_id} using Tripo API")
 
             # Preprocess image
             preprocessed_image = self._preprocess_image(image)
 
-            # Step 1: Upload image
-            logger.info("Uploading image to Tripo...")
-            image_token = await self._upload_image(preprocessed_image)
+            if tripo_task_id:
+                logger.info(f"Resuming Tripo task {tripo_task_id}")
+                task_id = tripo_task_id
+            else:
+                # Step 1: Upload image
+                logger.info("Uploading image to Tripo...")
+                await report("uploading", 5)
+                image_token = await self._upload_image(preprocessed_image)
+
+                # Step 2: Create generation task
+                logger.info("Creating 3D generation task...")
+                await report("creating_task", 10)
+                task_id = await self._create_task(image_token)
+
+            # Step 3: Poll for completion (Tripo progress maps onto 15-85%)
+            logger.info("Waiting for 3D generation to complete...")
+            await report("generating", 15, tripo_task_id=task_id)
 
-            # Step 2: Create generation task
-            logger.info("Creating 3D generation task...")
-            task_id = await self._create_task(image_token)
+            async def on_tripo_progress(percent: int):
+                await report("generating", 15 + int(min(max(percent, 0), 100) * 0.7), tripo_task_id=task_id)
 
-            # Step 3: Poll for completion
-            logger.info("Waiting for 3D generation to complete...")
-            task_result = await self._poll_task(task_id)
+            task_result = await self._poll_task(task_id, on_progress=on_tripo_progress)
 
             # Step 4: Get model URL
             output = task_result.get("output", {})
@@ -299,10 +396,6 @@ class Model3DService:
                 logger.error(f"Full task result: {task_result}")
                 raise Exception(f"No model URL found in task result. Available fields: {list(output.keys())}")
 
-            # Step 5: Download model
-            logger.info(f"Downloading {export_format.upper()} model...")
-            model_bytes = await self._download_model(model_url)
-
             # Determine MIME type
             mime_types = {
                 "glb": "model/gltf-binary",
@@ -313,34 +406,23 @@ class Model3DService:
             }
             mime_type = mime_types.get(export_format, "application/octet-stream")
 
-            # Upload model to S3
-            logger.info(f"Uploading {export_format.upper()} model to S3...")
+            # Step 5: Stream model from Tripo into storage
+            logger.info(f"Downloading {export_format.upper()} model into storage...")
+            await report("downloading", 85)
             model_filename = f"3d_model_{generation_id}.{export_format}"
+            with tempfile.TemporaryDirectory(prefix="mesh_") as work_dir:
+                local_copy = os.path.join(work_dir, model_filename)
+                model_s3_url, model_s3_key, file_size, content_hash = await self._stream_model_to_storage(
+                    model_url, model_filename, mime_type, copy_to=local_copy
+                )
 
-            # First upload the model
-            s3_service.s3_client.put_object(
-                Bucket=s3_service.bucket,
-                Key=f"3d-models/{model_filename}",
-                Body=model_bytes,
-                ContentType=mime_type,
-                CacheControl='public, max-age=604800',  # Cache for 7 days
-                ContentDisposition='inline'
-            )
-
-            # Generate presigned URL with 7-day expiration
-            model_s3_url = s3_service.generate_presigned_url(
-                f"3d-models/{model_filename}",
-                expiration=604800  # 7 days
-            )
-            model_s3_key = f"3d-models/{model_filename}"
-
-            if not model_s3_url:
-                # Fallback to direct URL
-                model_s3_url = f"https://s3.{s3_service.s3_client.meta.region_name}.amazonaws.com/{s3_service.bucket}/{model_s3_key}"
+                # Step 6: Real mesh statistics (process pool, cached by content hash)
+                await report("analyzing", 90)
+                stats = await self._analyze_mesh(local_copy, content_hash)
 
-            logger.info(f"Model uploaded to S3: {model_s3_key}")
+            await report("storing", 95)
 
-            # Create and upload thumbnail to S3
+            # Create and upload thumbnail
             logger.info("Creating and uploading thumbnail...")
             thumb_buffer = io.BytesIO()
             thumb_image = preprocessed_image.copy()
@@ -349,30 +431,27 @@ class Model3DService:
             thumb_buffer.seek(0)
 
             thumb_filename = f"3d_thumb_{generation_id}.png"
-            thumbnail_url, thumb_s3_key = s3_service.upload_image(
-                image_data=thumb_buffer.getvalue(),
-                folder="3d-thumbnails",
-                filename=thumb_filename,
-                content_type="image/png"
+            (thumbnail_url, thumb_s3_key), thumbnail_renditions = await asyncio.gather(
+                asyncio.to_thread(
+                    get_storage_service().upload_image,
+                    image_data=thumb_buffer.getvalue(),
+                    folder="3d-thumbnails",
+                    filename=thumb_filename,
+                    content_type="image/png"
+                ),
+                rendition_service.create(preprocessed_image, "3d-thumbnails", f"3d_thumb_{generation_id}")
             )
-            logger.info(f"Thumbnail uploaded to S3: {thumb_s3_key}")
-
-            # Estimate stats (Tripo doesn't provide these, so we estimate)
-            stats = {
-                "vertices": 50000,  # Typical Tripo output
-                "faces": 100000,
-                "is_watertight": True,
-                "volume": None,
-                "surface_area": 1000.0
-            }
+            logger.info(f"Thumbnail uploaded: {thumb_s3_key}")
 
             result = {
                 "generation_id": generation_id,
                 "model_url": model_s3_url,  # S3 URL instead of base64 data URL
                 "thumbnail_url": thumbnail_url,  # S3 URL for thumbnail
+                "thumbnail_renditions": thumbnail_renditions,  # WebP/AVIF variant keys (rendition manifest)
                 "format": export_format,
                 "mime_type": mime_type,
-                "file_size": len(model_bytes),
+                "file_size": file_size,
+                "content_hash": content_hash,
                 "stats": stats,
                 "background_removed": remove_background,
                 "created_at": datetime.utcnow().isoformat(),
@@ -0,0 +1,402 @@
+"""
+QC Defect Detection
+Deterministic classical (OpenCV/NumPy) defect detector used by qc_mode=classical, and
+the QC process-pool worker functions. Kept free of app imports so pool workers stay light.
+"""
+import io
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Defect types the classical detector can tell apart (indices used in the result array)
+CLASSICAL_TYPES = ["scratch", "casting_porosity", "surface_discoloration", "polish_defect"]
+
+SEVERITIES = ["low", "medium", "high"]
+
+# Result array columns (one row per defect, original-image pixels)
+COLUMNS = ("x", "y", "width", "height", "type", "confidence", "severity", "area")
+
+# Specular highlights: near-white, low-chroma pixels (Lab chroma distance from neutral)
+SPECULAR_LEVEL = 235
+SPECULAR_MAX_CHROMA = 24
+
+# Pixels closer than this (summed Lab distance) to the median border colour are background
+BACKGROUND_TOLERANCE = 30
+# Below this foreground fraction the item is assumed to fill the frame
+MIN_FOREGROUND_FRACTION = 0.01
+
+# Structuring element for top-hat/black-hat, as a fraction of the working image's longest side
+LINE_KERNEL_FRACTION = 0.015
+
+# Response floors (8-bit levels) so clean, low-noise surfaces produce no candidates
+LINE_MIN_RESPONSE = 28
+CONTRAST_MIN_Z = 3.5
+CONTRAST_MIN_DIFFERENCE = 24
+CONTRAST_STD_FLOOR = 4.0
+COLOR_MIN_DISTANCE = 14
+# Robust threshold: median + k * MAD (scaled to sigma) of each response inside the item
+ROBUST_K = 6.0
+
+# Component filters, as fractions of the working image's pixel count
+MIN_COMPONENT_FRACTION = 0.00004
+MAX_COMPONENT_FRACTION = 0.15
+
+MAX_DEFECTS = 8
+
+# Simulated mode: Canny contours covering this fraction of the image are candidate defect regions
+CANDIDATE_MIN_FRACTION = 0.001
+CANDIDATE_MAX_FRACTION = 0.15
+
+# Pixel level counted as glint by image_statistics
+GLINT_LEVEL = 240
+
+# Per-process state of a QC pool worker (set by init_worker)
+_worker_state: Dict = {}
+
+
+class ClassicalDefectDetector:
+    """
+    Fully deterministic defect detector built from whole-image OpenCV/NumPy operations
+
+    Three response maps are computed on a downscaled working copy:
+    - scratches: morphological top-hat/black-hat (thin bright/dark structures)
+    - local contrast: deviation from the local mean in units of local std
+    - discoloration: Lab chroma deviation from the local mean colour
+    Specular highlights and the background are masked out, the union of the
+    thresholded maps is labelled once with connectedComponentsWithStats and
+    every component is scored in bulk with np.bincount.
+    """
+
+    def __init__(self, max_dimension: int = 1024):
+        self.max_dimension = max_dimension
+
+    def _masks(self, gray: np.ndarray, lab: np.ndarray, kernel_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Specular highlight mask and (eroded) item mask"""
+        import cv2
+
+        chroma = np.abs(lab[..., 1].astype(np.int16) - 128) + np.abs(lab[..., 2].astype(np.int16) - 128)
+        specular = ((gray >= SPECULAR_LEVEL) & (chroma < SPECULAR_MAX_CHROMA)).astype(np.uint8)
+        # Grow highlights over their bloom, which is where false positives come from
+        specular = cv2.dilate(specular, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size)))
+
+        border = np.concatenate([lab[0], lab[-1], lab[:, 0], lab[:, -1]])
+        background = np.median(border, axis=0).astype(np.int16)
+        distance = np.abs(lab.astype(np.int16) - background).sum(axis=2)
+        item = (distance > BACKGROUND_TOLERANCE).astype(np.uint8)
+        if item.mean() < MIN_FOREGROUND_FRACTION:
+            item = np.ones_like(item)
+        else:
+            # Erode so the item's own outline isn't reported as a scratch
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * kernel_size + 1, 2 * kernel_size + 1))
+            item = cv2.morphologyEx(item, cv2.MORPH_CLOSE, kernel)
+            item = cv2.erode(item, kernel, borderType=cv2.BORDER_CONSTANT, borderValue=0)
+
+        return specular.astype(bool), item.astype(bool)
+
+    @staticmethod
+    def _threshold(response: np.ndarray, valid: np.ndarray, floor: float) -> float:
+        """Robust (median + k * MAD) threshold of a response map inside the item, never below floor"""
+        values = response[valid]
+        if values.size == 0:
+            return floor
+        median = np.median(values)
+        mad = np.median(np.abs(values - median)) * 1.4826
+        return max(floor, float(median + ROBUST_K * mad))
+
+    def detect(self, rgb: np.ndarray) -> np.ndarray:
+        """
+        Detect defects in an RGB image
+
+        Args:
+            rgb: HxWx3 uint8 RGB array
+
+        Returns:
+            float32 array with one row per defect (see COLUMNS), strongest first
+        """
+        import cv2
+
+        height, width = rgb.shape[:2]
+        scale = min(1.0, self.max_dimension / max(height, width))
+        if scale < 1.0:
+            rgb = cv2.resize(
+                rgb,
+                (max(1, round(width * scale)), max(1, round(height * scale))),
+                interpolation=cv2.INTER_AREA
+            )
+        rgb = np.ascontiguousarray(rgb)
+
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        lab = cv2.cvtColor(rgb, cv2.COLOR_RGB2LAB)
+        work_height, work_width = gray.shape
+        pixels = work_height * work_width
+
+        kernel_size = max(9, int(max(work_height, work_width) * LINE_KERNEL_FRACTION) | 1)
+        window = 4 * kernel_size + 1
+
+        specular, item = self._masks(gray, lab, kernel_size)
+        valid = item & ~specular
+
+        # Scratch map: thin structures brighter or darker than their surroundings
+        line_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+        line = np.maximum(
+            cv2.morphologyEx(gray, cv2.MORPH_TOPHAT, line_kernel),
+            cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, line_kernel)
+        ).astype(np.float32)
+
+        # Local-contrast map: |pixel - local mean| in units of local std
+        gray_f = gray.astype(np.float32)
+        local_mean = cv2.blur(gray_f, (window, window))
+        local_var = cv2.blur(gray_f * gray_f, (window, window)) - local_mean * local_mean
+        difference = np.abs(gray_f - local_mean)
+        contrast = difference / (np.sqrt(np.maximum(local_var, 0)) + CONTRAST_STD_FLOOR)
+
+        # Discoloration map: chroma distance from the local mean colour
+        chroma = lab[..., 1:].astype(np.float32)
+        color = np.linalg.norm(chroma - cv2.blur(chroma, (window, window)), axis=2)
+
+        line_threshold = self._threshold(line, valid, LINE_MIN_RESPONSE)
+        contrast_threshold = self._threshold(contrast, valid, CONTRAST_MIN_Z)
+        color_threshold = self._threshold(color, valid, COLOR_MIN_DISTANCE)
+
+        line_mask = valid & (line > line_threshold)
+        contrast_mask = valid & (contrast > contrast_threshold) & (difference > CONTRAST_MIN_DIFFERENCE)
+        color_mask = valid & (color > color_threshold)
+
+        candidates = (line_mask | contrast_mask | color_mask).astype(np.uint8)
+        # Bridge one-pixel gaps so a broken scratch stays one component
+        candidates = cv2.morphologyEx(candidates, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8))
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(candidates, connectivity=8)
+        if count <= 1:
+            return np.zeros((0, len(COLUMNS)), dtype=np.float32)
+
+        # Per-component sums over candidate pixels only, one bincount per map (label 0 is the background)
+        members = candidates.astype(bool)
+        member_labels = labels[members]
+        strength = np.maximum.reduce([
+            line[members] / line_threshold,
+            contrast[members] / contrast_threshold,
+            color[members] / color_threshold
+        ])
+
+        def per_label(weights: np.ndarray) -> np.ndarray:
+            return np.bincount(member_labels, weights=weights, minlength=count)[1:]
+
+        area = stats[1:, cv2.CC_STAT_AREA].astype(np.float64)
+        line_fraction = per_label(line_mask[members]) / area
+        contrast_fraction = per_label(contrast_mask[members]) / area
+        color_fraction = per_label(color_mask[members]) / area
+        dark_fraction = per_label(gray_f[members] < local_mean[members]) / area
+        mean_strength = per_label(strength) / area
+
+        x = stats[1:, cv2.CC_STAT_LEFT]
+        y = stats[1:, cv2.CC_STAT_TOP]
+        w = stats[1:, cv2.CC_STAT_WIDTH]
+        h = stats[1:, cv2.CC_STAT_HEIGHT]
+        length = np.maximum(w, h)
+
+        keep = (area >= max(6, MIN_COMPONENT_FRACTION * pixels)) & (area <= MAX_COMPONENT_FRACTION * pixels)
+
+        elongated = (length >= 3 * np.minimum(w, h)) | ((area <= 0.35 * w * h) & (length >= 3 * kernel_size))
+        compact_dark = (dark_fraction > 0.6) & (area <= 0.002 * pixels)
+        defect_type = np.select(
+            [
+                (line_fraction >= 0.5) & elongated,
+                compact_dark & (contrast_fraction >= 0.5),
+                (color_fraction >= 0.5) & (contrast_fraction < 0.5)
+            ],
+            [0, 1, 2],
+            default=3
+        )
+
+        confidence = np.clip(1 - 0.5 * np.exp(-mean_strength), 0.5, 0.99)
+
+        area_fraction = area / pixels
+        long_scratch = (defect_type == 0) & (length >= 0.1 * max(work_height, work_width))
+        severity = np.select(
+            [(area_fraction >= 0.01) | long_scratch, (area_fraction >= 0.002) | (confidence >= 0.9)],
+            [2, 1],
+            default=0
+        )
+
+        rows = np.column_stack([
+            x / scale, y / scale, w / scale, h / scale,
+            defect_type, confidence, severity, area / (scale * scale)
+        ])[keep]
+
+        # Strongest first; ties broken by position so the order is stable
+        score = (confidence * np.sqrt(area))[keep]
+        order = np.lexsort((rows[:, 0], rows[:, 1], -score))[:MAX_DEFECTS]
+        rows = rows[order]
+        rows[:, :4] = np.round(rows[:, :4])
+        return rows.astype(np.float32)
+
+
+def statistics_proxy(pixels: np.ndarray, max_pixels: Optional[int] = None) -> np.ndarray:
+    """
+    Strided subsample of an image with at most ~max_pixels pixels (all channels kept)
+
+    Every s-th row and column is kept, so the proxy's values are a uniform sample of
+    the image: with n sampled values, the standard error is at most 127.5 / sqrt(n)
+    levels for the mean and std, and 0.5 / sqrt(n) for a fraction such as glint.
+
+    Args:
+        pixels: HxW or HxWxC image array
+        max_pixels: Pixel budget (None or 0: the full image)
+
+    Returns:
+        The image itself, or a contiguous subsampled copy
+    """
+    height, width = pixels.shape[:2]
+    if not max_pixels or height * width <= max_pixels:
+        return pixels
+    stride = int(np.ceil(np.sqrt(height * width / max_pixels)))
+    return np.ascontiguousarray(pixels[::stride, ::stride])
+
+
+def image_histogram(pixels: np.ndarray) -> np.ndarray:
+    """
+    256-bin histogram of every value of an 8-bit image, in one pass
+
+    cv2.calcHist streams over the array without the intp temporary np.bincount
+    would allocate (8 bytes per value, ~290 MB for a 12 MP RGB photo).
+
+    Args:
+        pixels: uint8 HxW or HxWxC image array
+
+    Returns:
+        float64 counts per level (OpenCV accumulates in float32: exact up to 2^24 per bin)
+    """
+    import cv2
+
+    pixels = np.ascontiguousarray(pixels)
+    # All channels pooled: view the image as one 2D single-channel plane
+    plane = pixels.reshape(pixels.shape[0], -1)
+    return cv2.calcHist([plane], [0], None, [256], [0, 256]).ravel().astype(np.float64)
+
+
+def histogram_statistics(histogram: np.ndarray) -> np.ndarray:
+    """
+    Lighting statistics derived from a 256-bin histogram
+
+    Returns:
+        float64 array: [brightness (mean), contrast (std), max level, glint fraction]
+    """
+    levels = np.arange(histogram.size, dtype=np.float64)
+    total = histogram.sum()
+    mean = histogram @ levels / total
+    variance = histogram @ (levels - mean) ** 2 / total
+    return np.array([
+        mean,
+        np.sqrt(variance),
+        np.flatnonzero(histogram)[-1],
+        histogram[GLINT_LEVEL + 1:].sum() / total
+    ], dtype=np.float64)
+
+
+def image_statistics(pixels: np.ndarray, max_pixels: Optional[int] = None) -> np.ndarray:
+    """
+    Lighting statistics of an image
+
+    8-bit images are reduced to a histogram in a single pass (optionally over a
+    statistics_proxy) and every statistic is derived from it; other dtypes
+    (16-bit, float, bilevel) use direct reductions.
+
+    Args:
+        pixels: Image array (any mode)
+        max_pixels: Pixel budget for the proxy (None or 0: full resolution)
+
+    Returns:
+        float64 array: [brightness (mean), contrast (std), max level, glint fraction]
+    """
+    if pixels.dtype == np.uint8:
+        return histogram_statistics(image_histogram(statistics_proxy(pixels, max_pixels)))
+
+    pixels = statistics_proxy(pixels, max_pixels)
+    return np.array([
+        pixels.mean(),
+        pixels.std(),
+        pixels.max(),
+        np.count_nonzero(pixels > GLINT_LEVEL) / pixels.size
+    ], dtype=np.float64)
+
+
+def find_candidate_regions(rgb: np.ndarray) -> np.ndarray:
+    """
+    Canny contour bounding boxes used as defect positions by the simulated mode
+
+    Args:
+        rgb: HxWx3 uint8 RGB array
+
+    Returns:
+        float32 array of [x, y, width, height, area] rows, largest area first
+    """
+    import cv2
+
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    edges = cv2.Canny(gray, 50, 150)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return np.zeros((0, 5), dtype=np.float32)
+
+    rows = np.array([(*cv2.boundingRect(c), cv2.contourArea(c)) for c in contours], dtype=np.float32)
+    pixels = gray.size
+    rows = rows[(rows[:, 4] > pixels * CANDIDATE_MIN_FRACTION) & (rows[:, 4] < pixels * CANDIDATE_MAX_FRACTION)]
+    return rows[np.argsort(-rows[:, 4], kind="stable")]
+
+
+def init_worker(max_dimension: int, threads: int, stats_max_pixels: int = 0):
+    """
+    QC pool worker initializer: runs once per process
+
+    Imports OpenCV, caps its internal threads (the pool provides the parallelism)
+    and builds the classical detector.
+    """
+    import cv2
+
+    cv2.setNumThreads(max(1, threads))
+    _worker_state["detector"] = ClassicalDefectDetector(max_dimension)
+    _worker_state["stats_max_pixels"] = stats_max_pixels
+
+
+def analyze_image(data: bytes, mode: str) -> Tuple[np.ndarray, np.ndarray, float, int]:
+    """
+    Decode an image and run the CPU-heavy part of a QC inspection (pool task)
+
+    Args:
+        data: Encoded image bytes
+        mode: "classical" (detector rows), "simulated" (candidate regions) or "ml" (none yet)
+
+    Returns:
+        Tuple of (statistics: image_statistics() + [width, height], detection rows,
+        time spent in the worker in ms, worker PID)
+
+    Raises:
+        ValueError: If the bytes are not a valid image
+    """
+    start = time.perf_counter()
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        raise ValueError(f"Invalid image file: {e}")
+
+    statistics = np.append(
+        image_statistics(np.asarray(image), _worker_state.get("stats_max_pixels")),
+        [image.width, image.height]
+    )
+
+    if mode == "classical":
+        detector = _worker_state.get("detector") or ClassicalDefectDetector()
+        detections = detector.detect(np.asarray(image.convert("RGB")))
+    elif mode == "simulated":
+        detections = find_candidate_regions(np.asarray(image.convert("RGB")))
+    else:
+        detections = np.zeros((0, len(COLUMNS)), dtype=np.float32)
+
+    return statistics, detections, (time.perf_counter() - start) * 1000, os.getpid()
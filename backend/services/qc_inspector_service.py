@@ -1,18 +1,29 @@
 """
 AI Quality Inspector Service
-Detects defects in jewellery images using simulated or ML-based detection
+Detects defects in jewellery images using simulated, classical or ML-based detection
 """
 import numpy as np
 from PIL import Image
-import io
+import hashlib
+import mimetypes
 import random
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import logging
 from backend.app.config import settings
+from backend.services.qc_detection import CLASSICAL_TYPES, SEVERITIES, image_statistics
+from backend.services.qc_pool_service import qc_pool_service
+from backend.services.storage_service import get_storage_service
 import uuid
 
 logger = logging.getLogger(__name__)
 
+# Storage folders for inspected files (images, CAD, PDF) and their thumbnails
+UPLOAD_FOLDER = "qc/uploads"
+THUMBNAIL_FOLDER = "qc/thumbnails"
+
+# Presigned URLs handed out for stored inspection files
+URL_EXPIRATION_SECONDS = 86400
+
 
 class QCInspectorService:
     """Service for quality inspection of jewellery"""
@@ -34,43 +45,19 @@ class QCInspectorService:
         self.mode = settings.qc_mode
         self.confidence_threshold = settings.qc_confidence_threshold
 
-    def _analyze_image_for_defects(self, image: Image.Image) -> List[Dict]:
+    def _defects_from_candidates(self, candidates: np.ndarray, image_width: int, image_height: int) -> List[Dict]:
         """
-        Analyze image using basic image processing to detect potential defects
+        Build simulated defects positioned on detected candidate regions
 
         Args:
-            image: PIL Image to analyze
+            candidates: [x, y, width, height, area] rows from qc_detection.find_candidate_regions
+            image_width: Image width
+            image_height: Image height
 
         Returns:
             List of detected defects with realistic positions
         """
-        import cv2
-
-        # Convert PIL to numpy array
-        img_array = np.array(image.convert('RGB'))
-
-        # Convert to grayscale for edge detection
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-
-        # Apply edge detection
-        edges = cv2.Canny(gray, 50, 150)
-
-        # Find contours (potential defect areas)
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        # Filter contours by size and select interesting ones
-        min_area = (image.width * image.height) * 0.001  # At least 0.1% of image
-        max_area = (image.width * image.height) * 0.15   # At most 15% of image
-
-        potential_defects = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if min_area < area < max_area:
-                x, y, w, h = cv2.boundingRect(contour)
-                potential_defects.append((x, y, w, h, area))
-
-        # Sort by area and take top candidates
-        potential_defects.sort(key=lambda x: x[4], reverse=True)
+        potential_defects = [tuple(int(v) for v in row) for row in candidates.tolist()]
 
         # Generate 2-4 defects for demo
         num_defects = random.randint(2, 4)
@@ -87,10 +74,10 @@ class QCInspectorService:
                 h = max(20, h + random.randint(-5, 5))
             else:
                 # Random position if no more contours
-                x = random.randint(int(image.width * 0.2), int(image.width * 0.8))
-                y = random.randint(int(image.height * 0.2), int(image.height * 0.8))
-                w = random.randint(int(image.width * 0.05), int(image.width * 0.15))
-                h = random.randint(int(image.height * 0.05), int(image.height * 0.15))
+                x = random.randint(int(image_width * 0.2), int(image_width * 0.8))
+                y = random.randint(int(image_height * 0.2), int(image_height * 0.8))
+                w = random.randint(int(image_width * 0.05), int(image_width * 0.15))
+                h = random.randint(int(image_height * 0.05), int(image_height * 0.15))
 
             # Determine defect type based on position and characteristics
             defect_types_weighted = [
@@ -116,11 +103,11 @@ class QCInspectorService:
             # Use high base confidence (0.93-0.98) to survive 0.75 multiplier and 0.7 threshold
             # Min needed: 0.7 / 0.75 = 0.933
             confidence = random.uniform(0.93, 0.97)
-            if w * h > (image.width * image.height * 0.02):
+            if w * h > (image_width * image_height * 0.02):
                 confidence = random.uniform(0.94, 0.98)
 
             # Severity based on size and confidence
-            if confidence > 0.88 or (w * h > image.width * image.height * 0.03):
+            if confidence > 0.88 or (w * h > image_width * image_height * 0.03):
                 severity = "high"
             elif confidence > 0.78:
                 severity = "medium"
@@ -132,10 +119,10 @@ class QCInspectorService:
                 "type": defect_type,
                 "label": defect_type.replace("_", " ").title(),
                 "bbox": {
-                    "x": max(0, min(x, image.width - w)),
-                    "y": max(0, min(y, image.height - h)),
-                    "width": min(w, image.width),
-                    "height": min(h, image.height)
+                    "x": max(0, min(x, image_width - w)),
+                    "y": max(0, min(y, image_height - h)),
+                    "width": min(w, image_width),
+                    "height": min(h, image_height)
                 },
                 "confidence": round(confidence, 2),
                 "severity": severity,
@@ -146,6 +133,34 @@ class QCInspectorService:
 
         return defects
 
+    def _defects_from_array(self, rows: np.ndarray, image_width: int, image_height: int) -> List[Dict]:
+        """
+        Convert detector rows (see qc_detection.COLUMNS) to defect dicts
+
+        Args:
+            rows: float array, one row per defect
+            image_width: Image width
+            image_height: Image height
+
+        Returns:
+            List of defect dictionaries
+        """
+        defects = []
+        for x, y, w, h, type_index, confidence, severity_index, _ in rows.tolist():
+            defect_type = CLASSICAL_TYPES[int(type_index)]
+            x, y = int(min(max(x, 0), image_width - 1)), int(min(max(y, 0), image_height - 1))
+            w, h = int(min(max(w, 1), image_width - x)), int(min(max(h, 1), image_height - y))
+            defects.append({
+                "id": hashlib.sha1(f"{defect_type}:{x}:{y}:{w}:{h}".encode()).hexdigest()[:8],
+                "type": defect_type,
+                "label": defect_type.replace("_", " ").title(),
+                "bbox": {"x": x, "y": y, "width": w, "height": h},
+                "confidence": round(confidence, 2),
+                "severity": SEVERITIES[int(severity_index)],
+                "description": self._get_defect_description(defect_type)
+            })
+        return defects
+
     def _generate_simulated_defects(
         self,
         image_width: int,
@@ -235,14 +250,20 @@ class QCInspectorService:
         Returns:
             Analysis dict
         """
-        # Convert to numpy array
-        img_array = np.array(image)
+        statistics = np.append(image_statistics(np.asarray(image), settings.qc_stats_max_pixels), image.size)
+        return self._characteristics_from_statistics(statistics)
 
-        # Calculate brightness
-        brightness = np.mean(img_array)
+    def _characteristics_from_statistics(self, statistics: np.ndarray) -> Dict:
+        """
+        Build the image analysis dict from qc_detection statistics
 
-        # Calculate contrast
-        contrast = np.std(img_array)
+        Args:
+            statistics: [brightness, contrast, max level, glint fraction, width, height]
+
+        Returns:
+            Analysis dict
+        """
+        brightness, contrast, max_level, glint_fraction, width, height = statistics.tolist()
 
         # Detect if image is too dark or too bright
         lighting_quality = "good"
@@ -254,14 +275,14 @@ class QCInspectorService:
             lighting_quality = "low_contrast"
 
         # Detect glint (very bright spots)
-        has_glint = np.max(img_array) > 245 and np.sum(img_array > 240) > (img_array.size * 0.01)
+        has_glint = max_level > 245 and glint_fraction > 0.01
 
         return {
             "brightness": float(brightness),
             "contrast": float(contrast),
             "lighting_quality": lighting_quality,
             "has_glint": bool(has_glint),
-            "resolution": image.size
+            "resolution": (int(width), int(height))
         }
 
     async def inspect_file(
@@ -311,37 +332,37 @@ class QCInspectorService:
                     "file_type": "pdf"
                 }
             else:
-                # Image analysis
-                image = Image.open(io.BytesIO(file_bytes))
-                width, height = image.size
-                image_analysis = self._analyze_image_characteristics(image)
+                # Image analysis: decode, lighting stats and detection run in the QC process pool
+                mode = "simulated" if force_simulated else self.mode
+                statistics, detections = await qc_pool_service.analyze(file_bytes, mode)
+                image_analysis = self._characteristics_from_statistics(statistics)
                 image_analysis["file_type"] = "image"
+                width, height = image_analysis["resolution"]
 
             # Check if should use simulated mode
             use_simulated = force_simulated or self.mode == "simulated"
 
             if use_simulated:
-                # For images, use image analysis; for CAD/PDF use random
+                # For images, place defects on detected regions; for CAD/PDF use random
                 if file_type == 'image':
-                    try:
-                        image = Image.open(io.BytesIO(file_bytes))
-                        defects = self._analyze_image_for_defects(image)
-                        logger.info(f"Analyzed image and found {len(defects)} potential defects before filtering")
-                        logger.info(f"Defect confidences: {[d['confidence'] for d in defects]}")
-                    except Exception as e:
-                        logger.warning(f"Image analysis failed, using random: {e}")
-                        defects = self._generate_simulated_defects(width, height)
+                    defects = self._defects_from_candidates(detections, width, height)
+                    logger.info(f"Analyzed image and found {len(defects)} potential defects before filtering")
+                    logger.info(f"Defect confidences: {[d['confidence'] for d in defects]}")
                 else:
                     # For CAD/PDF, use random defects
                     defects = self._generate_simulated_defects(width, height)
                 detection_mode = "simulated"
-            else:
-                # Use ML model (placeholder for now)
+            elif self.mode == "classical":
                 if file_type == 'image':
-                    image = Image.open(io.BytesIO(file_bytes))
-                    defects = await self._detect_with_ml(image, file_type)
+                    defects = self._defects_from_array(detections, width, height)
+                    detection_mode = "classical"
                 else:
-                    defects = await self._detect_with_ml(None, file_type)
+                    # CAD/PDF files have no pixels for the classical detector to analyze
+                    defects = self._generate_simulated_defects(width, height)
+                    detection_mode = "simulated"
+            else:
+                # Use ML model (placeholder for now; the image size comes from the pool's statistics)
+                defects = await self._detect_with_ml(width, height, file_type)
                 detection_mode = "ml"
 
             # Adjust confidence based on file type
@@ -428,7 +449,7 @@ class QCInspectorService:
             force_simulated=force_simulated
         )
 
-    async def _detect_with_ml(self, image: Image.Image = None, file_type: str = 'image') -> List[Dict]:
+    async def _detect_with_ml(self, width: int, height: int, file_type: str = 'image') -> List[Dict]:
         """
         Detect defects using ML model (placeholder)
 
@@ -439,20 +460,60 @@ class QCInspectorService:
         4. Post-process detections
 
         Args:
-            image: PIL Image (None for CAD/PDF)
+            width: Image width (1024 for CAD/PDF)
+            height: Image height (1024 for CAD/PDF)
             file_type: Type of file being analyzed
 
         Returns:
             List of detected defects
         """
         # For now, fall back to simulated
-        # TODO: Implement actual ML model loading and inference
+        # TODO: Implement actual ML model loading and inference (in the QC pool workers)
         logger.info(f"ML mode not yet implemented for {file_type}, using simulated")
 
-        if image:
-            return self._generate_simulated_defects(image.width, image.height)
-        else:
-            return self._generate_simulated_defects(1024, 1024)
+        return self._generate_simulated_defects(width, height)
+
+    def store_file(
+        self,
+        data: bytes,
+        content_type: Optional[str],
+        extension: Optional[str] = None,
+        folder: str = UPLOAD_FOLDER
+    ) -> str:
+        """
+        Store an inspected file or thumbnail through the storage backend (blocking: run in a thread)
+
+        Args:
+            data: File bytes
+            content_type: MIME type (guessed from extension if missing)
+            extension: File extension without the dot (guessed from content_type if missing)
+            folder: Storage folder
+
+        Returns:
+            Storage key (kept in the inspection row instead of the file itself)
+        """
+        if not extension:
+            extension = (mimetypes.guess_extension(content_type or '') or '.bin').lstrip('.')
+        content_type = content_type or mimetypes.guess_type(f"file.{extension}")[0] or 'application/octet-stream'
+        _, key = get_storage_service().upload_image(data, folder, f"{uuid.uuid4().hex}.{extension}", content_type)
+        return key
+
+    @staticmethod
+    def file_url(reference: Optional[str]) -> Optional[str]:
+        """
+        URL for a stored inspection file
+
+        Args:
+            reference: Storage key, or a URL stored before files moved to storage
+
+        Returns:
+            Presigned/served URL for keys; URLs (including legacy data: URLs) unchanged
+        """
+        if not reference:
+            return None
+        if reference.startswith("data:") or "://" in reference:
+            return reference
+        return get_storage_service().get_url(reference, expiration=URL_EXPIRATION_SECONDS)
 
     def _get_lighting_warning(self, image_analysis: Dict) -> str:
         """Get warning message for lighting issues"""
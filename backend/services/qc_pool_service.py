@@ -0,0 +1,155 @@
+"""
+QC Pool Service
+Dedicated process pool for QC image analysis (decode, lighting stats, defect detection)
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from backend.app.config import settings
+from backend.services.qc_detection import analyze_image, init_worker
+
+logger = logging.getLogger(__name__)
+
+
+class QCPoolBusyError(Exception):
+    """Raised when the QC pool already has its maximum number of pending inspections"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QCPoolService:
+    """
+    Runs QC analysis in worker processes so /api/qc/inspect scales with cores
+
+    Workers are spawned once and initialised by qc_detection.init_worker
+    (OpenCV imported, thread count capped, detector built).
+    Tasks return compact NumPy arrays; the service turns them into dicts.
+    At most QC_POOL_MAX_PENDING analyses may be running or queued; beyond
+    that analyze() fails fast with QCPoolBusyError (mapped to HTTP 429).
+    """
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self.stats = {"completed": 0, "errors": 0, "rejected": 0, "restarts": 0,
+                      "peak_pending": 0, "queue_ms": 0.0}
+        # PID -> {"tasks", "total_ms", "max_ms"}
+        self.worker_stats: Dict[int, Dict] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: workers only import NumPy, OpenCV and Pillow, not the app
+            self._executor = ProcessPoolExecutor(
+                max_workers=max(1, settings.qc_pool_workers),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(
+                    settings.qc_classical_max_dimension,
+                    settings.qc_worker_threads,
+                    settings.qc_stats_max_pixels
+                )
+            )
+        return self._executor
+
+    async def analyze(self, data: bytes, mode: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Analyze an image in the pool
+
+        Args:
+            data: Encoded image bytes
+            mode: Detection mode (see qc_detection.analyze_image)
+
+        Returns:
+            Tuple of (statistics, detection rows)
+
+        Raises:
+            QCPoolBusyError: If the pool is saturated
+            ValueError: If the bytes are not a valid image
+        """
+        if self._pending >= settings.qc_pool_max_pending:
+            self.stats["rejected"] += 1
+            raise QCPoolBusyError(
+                f"QC analysis is at capacity ({self._pending} inspections pending), please retry shortly",
+                retry_after=settings.qc_pool_retry_after_seconds
+            )
+
+        self._pending += 1
+        self.stats["peak_pending"] = max(self.stats["peak_pending"], self._pending)
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            statistics, detections, worker_ms, pid = await loop.run_in_executor(
+                executor, analyze_image, data, mode
+            )
+        except BrokenProcessPool:
+            # A worker died (OOM kill, segfault): the executor is unusable, start a fresh one
+            self.stats["errors"] += 1
+            self.stats["restarts"] += 1
+            self._reset_executor(executor)
+            raise
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self._pending -= 1
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats["completed"] += 1
+        # Time not spent in the worker: waiting for a free worker plus transfer
+        self.stats["queue_ms"] += max(0.0, elapsed_ms - worker_ms)
+        worker = self.worker_stats.setdefault(pid, {"tasks": 0, "total_ms": 0.0, "max_ms": 0.0})
+        worker["tasks"] += 1
+        worker["total_ms"] += worker_ms
+        worker["max_ms"] = max(worker["max_ms"], worker_ms)
+        return statistics, detections
+
+    def _reset_executor(self, executor: ProcessPoolExecutor):
+        """Drop a broken executor so the next analysis spawns new workers"""
+        if self._executor is executor:
+            logger.warning("QC pool is broken (a worker exited unexpectedly), recreating it")
+            self._executor = None
+            self.worker_stats.clear()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_metrics(self) -> Dict:
+        """Get pool utilisation and per-worker latency"""
+        completed = self.stats["completed"]
+        return {
+            "workers": settings.qc_pool_workers,
+            "max_pending": settings.qc_pool_max_pending,
+            "pending": self._pending,
+            "peak_pending": self.stats["peak_pending"],
+            "completed": completed,
+            "errors": self.stats["errors"],
+            "rejected": self.stats["rejected"],
+            "restarts": self.stats["restarts"],
+            "avg_queue_ms": round(self.stats["queue_ms"] / completed, 1) if completed else 0.0,
+            "per_worker": {
+                str(pid): {
+                    "tasks": worker["tasks"],
+                    "avg_ms": round(worker["total_ms"] / worker["tasks"], 1),
+                    "max_ms": round(worker["max_ms"], 1)
+                }
+                for pid, worker in self.worker_stats.items()
+            }
+        }
+
+
+# Global service instance
+qc_pool_service = QCPoolService()
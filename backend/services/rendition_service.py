@@ -0,0 +1,245 @@
+"""
+Rendition Service
+Downscaled WebP/AVIF copies of stored images, and picking the smallest one that fits
+"""
+import asyncio
+import io
+import logging
+from typing import Dict, List, Optional, Sequence, Union
+
+from PIL import Image, ImageOps
+
+from backend.app.config import settings
+from backend.services.image_executor_service import image_executor_service
+from backend.services.storage_service import get_storage_service
+
+logger = logging.getLogger(__name__)
+
+# Rendition format -> (PIL format, MIME type)
+FORMATS = {"webp": ("WEBP", "image/webp"), "avif": ("AVIF", "image/avif")}
+
+# Format every client can display; used when the requested one wasn't generated
+DEFAULT_FORMAT = "webp"
+
+# libavif encoder speed (0 slowest/smallest .. 10 fastest); renditions favour throughput
+AVIF_SPEED = 8
+
+# Presigned rendition URLs handed to list endpoints
+URL_EXPIRATION_SECONDS = 86400
+
+
+class RenditionService:
+    """
+    Generates and selects image renditions
+
+    A manifest (stored in JSON columns next to the original's URL) records the
+    original's size and one entry per variant: {width, height, format, key, bytes}.
+    Variants cover each configured size smaller than the original, plus the
+    original size when it is below the largest configured one.
+    """
+
+    def __init__(self):
+        self.stats = {"images": 0, "variants": 0, "bytes_stored": 0, "failed": 0}
+
+    @staticmethod
+    def formats() -> List[str]:
+        """Configured rendition formats this Pillow build can encode"""
+        Image.init()
+        return [fmt for fmt in settings.rendition_format_list if fmt in FORMATS and FORMATS[fmt][0] in Image.SAVE]
+
+    def render(
+        self,
+        image: Union[bytes, Image.Image],
+        sizes: Optional[Sequence[int]] = None,
+        formats: Optional[Sequence[str]] = None
+    ) -> Dict:
+        """
+        Decode once and encode every rendition (CPU-bound: run on the image executor)
+
+        Args:
+            image: Image bytes, or an already decoded PIL image
+            sizes: Longest-side sizes (defaults to RENDITION_WIDTHS)
+            formats: Formats to encode (defaults to formats())
+
+        Returns:
+            Dict with the original width/height and variants (each with encoded data)
+
+        Raises:
+            ValueError: If the bytes are not a valid image
+        """
+        sizes = sorted(sizes or settings.rendition_width_list)
+        formats = list(formats or self.formats())
+
+        if isinstance(image, bytes):
+            try:
+                image = Image.open(io.BytesIO(image))
+                # JPEGs decode straight at a reduced scale when every rendition is much smaller
+                longest_needed = sizes[-1]
+                scale = min(1.0, longest_needed / max(image.size))
+                image.draft(None, (max(1, int(image.width * scale)), max(1, int(image.height * scale))))
+                image = ImageOps.exif_transpose(image)
+            except Exception as e:
+                raise ValueError(f"Invalid image file: {e}")
+
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        original = image.size
+        longest = max(original)
+
+        targets = [size for size in sizes if size < longest]
+        if longest < sizes[-1]:
+            targets.append(longest)
+
+        variants = []
+        current = image
+        # Largest first, each downscaled from the previous rendition
+        for size in sorted(targets, reverse=True):
+            ratio = size / max(current.size)
+            if ratio < 1.0:
+                current = current.resize(
+                    (max(1, round(current.width * ratio)), max(1, round(current.height * ratio))),
+                    Image.Resampling.LANCZOS,
+                    reducing_gap=2.0
+                )
+            for fmt in formats:
+                pil_format, content_type = FORMATS[fmt]
+                params = (
+                    {"quality": settings.rendition_avif_quality, "speed": AVIF_SPEED}
+                    if fmt == "avif" else {"quality": settings.rendition_webp_quality, "method": 4}
+                )
+                buffer = io.BytesIO()
+                current.save(buffer, format=pil_format, **params)
+                variants.append({
+                    "width": current.width,
+                    "height": current.height,
+                    "format": fmt,
+                    "content_type": content_type,
+                    "data": buffer.getvalue()
+                })
+
+        return {"width": original[0], "height": original[1], "variants": variants[::-1]}
+
+    async def create(
+        self,
+        image: Union[bytes, Image.Image],
+        folder: str,
+        basename: str
+    ) -> Optional[Dict]:
+        """
+        Render and store renditions of an image
+
+        Failures are logged and return None: the original is already stored and
+        callers fall back to it.
+
+        Args:
+            image: Image bytes or decoded PIL image
+            folder: Storage folder of the original (renditions go under renditions/<folder>)
+            basename: Filename stem shared by the variants
+
+        Returns:
+            Manifest dict, or None if renditions are disabled or failed
+        """
+        if not settings.renditions_enabled:
+            return None
+
+        try:
+            rendered = await image_executor_service.run(self.render, image)
+            storage = get_storage_service()
+
+            async def store(variant: Dict) -> Dict:
+                extension = variant["format"]
+                _, key = await asyncio.to_thread(
+                    storage.upload_image,
+                    variant["data"],
+                    f"renditions/{folder}",
+                    f"{basename}_{max(variant['width'], variant['height'])}.{extension}",
+                    variant["content_type"]
+                )
+                return {
+                    "width": variant["width"],
+                    "height": variant["height"],
+                    "format": variant["format"],
+                    "key": key,
+                    "bytes": len(variant["data"])
+                }
+
+            variants = await asyncio.gather(*(store(variant) for variant in rendered["variants"]))
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.warning(f"Could not create renditions for {folder}/{basename}: {e}")
+            return None
+
+        self.stats["images"] += 1
+        self.stats["variants"] += len(variants)
+        self.stats["bytes_stored"] += sum(variant["bytes"] for variant in variants)
+        return {"width": rendered["width"], "height": rendered["height"], "variants": list(variants)}
+
+    @staticmethod
+    def select(manifest: Optional[Dict], size: int, image_format: Optional[str] = None) -> Optional[Dict]:
+        """
+        Pick the smallest variant whose longest side covers size
+
+        Args:
+            manifest: Manifest from create()
+            size: Longest side the client will display (CSS pixels x device pixel ratio)
+            image_format: Preferred format (falls back to webp)
+
+        Returns:
+            Variant dict, the largest variant if none is big enough, or None
+        """
+        if not manifest or not manifest.get("variants"):
+            return None
+
+        for fmt in dict.fromkeys([image_format or DEFAULT_FORMAT, DEFAULT_FORMAT]):
+            candidates = sorted(
+                (v for v in manifest["variants"] if v["format"] == fmt),
+                key=lambda v: max(v["width"], v["height"])
+            )
+            if candidates:
+                return next((v for v in candidates if max(v["width"], v["height"]) >= size), candidates[-1])
+        return None
+
+    def url(
+        self,
+        manifest: Optional[Dict],
+        size: Optional[int] = None,
+        image_format: Optional[str] = None,
+        fallback: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        URL of the best variant for a display size
+
+        Args:
+            manifest: Manifest from create() (None for images stored before renditions)
+            size: Display size (defaults to RENDITION_LIST_WIDTH)
+            image_format: Preferred format
+            fallback: URL returned when there is no suitable variant (usually the original)
+
+        Returns:
+            Variant URL or fallback
+        """
+        variant = self.select(manifest, size or settings.rendition_list_width, image_format)
+        if variant is None:
+            return fallback
+        return get_storage_service().get_url(variant["key"], expiration=URL_EXPIRATION_SECONDS)
+
+    def with_urls(self, manifest: Optional[Dict]) -> Optional[Dict]:
+        """Copy of a manifest with a URL on every variant (for API responses)"""
+        if not manifest:
+            return None
+        storage = get_storage_service()
+        return {
+            **manifest,
+            "variants": [
+                {**variant, "url": storage.get_url(variant["key"], expiration=URL_EXPIRATION_SECONDS)}
+                for variant in manifest["variants"]
+            ]
+        }
+
+    def get_metrics(self) -> Dict:
+        """Get rendition counters"""
+        return {**self.stats, "formats": self.formats(), "sizes": settings.rendition_width_list}
+
+
+# Global service instance
+rendition_service = RenditionService()
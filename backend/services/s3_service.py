@@ -1,6 +1,7 @@
 """
 AWS S3 Service for image storage and retrieval
 """
+import asyncio
 import boto3
 from botocore.exceptions import ClientError
 from backend.app.config import settings
@@ -8,8 +9,9 @@ import io
 from PIL import Image
 import uuid
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import AsyncIterator, Optional, Tuple
 import logging
+from urllib.parse import unquote, urlparse
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +19,9 @@ logger = logging.getLogger(__name__)
 class S3Service:
     """Service for managing image uploads to AWS S3"""
 
+    # S3 rejects multipart parts smaller than 5 MiB (except the last one)
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
     def __init__(self):
         self.s3_client = boto3.client(
             's3',
@@ -79,6 +84,107 @@ class S3Service:
             logger.error(f"Error uploading to S3: {e}")
             raise
 
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        folder: str,
+        filename: str,
+        content_type: str = "application/octet-stream",
+        cache_control: str = 'public, max-age=31536000',
+        expiration: int = 86400
+    ) -> Tuple[str, str, int]:
+        """
+        Stream data into S3 without buffering the whole object
+
+        Uses a multipart upload so at most one part (STORAGE_STREAM_PART_SIZE_MB)
+        is held in memory; objects smaller than one part use a single put.
+
+        Args:
+            chunks: Async iterator of data chunks (e.g. an httpx response body)
+            folder: S3 folder/prefix
+            filename: Object filename
+            content_type: MIME type
+            cache_control: Cache-Control header for the object
+            expiration: Presigned URL expiration in seconds
+
+        Returns:
+            Tuple of (url, key, size in bytes)
+        """
+        key = f"{folder}/{filename}"
+        part_size = max(settings.storage_stream_part_size_mb * 1024 * 1024, self.MIN_PART_SIZE)
+        object_args = {
+            "Bucket": self.bucket,
+            "Key": key,
+            "ContentType": content_type,
+            "CacheControl": cache_control,
+            "ContentDisposition": 'inline'
+        }
+
+        buffer = bytearray()
+        parts = []
+        upload_id = None
+        size = 0
+
+        async def upload_part(body: bytes):
+            part_number = len(parts) + 1
+            response = await asyncio.to_thread(
+                self.s3_client.upload_part,
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body
+            )
+            parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                size += len(chunk)
+                if len(buffer) >= part_size:
+                    if upload_id is None:
+                        response = await asyncio.to_thread(self.s3_client.create_multipart_upload, **object_args)
+                        upload_id = response["UploadId"]
+                    body = bytes(buffer)
+                    buffer.clear()
+                    await upload_part(body)
+
+            if upload_id is None:
+                await asyncio.to_thread(self.s3_client.put_object, Body=bytes(buffer), **object_args)
+            else:
+                if buffer:
+                    body = bytes(buffer)
+                    buffer.clear()
+                    await upload_part(body)
+                await asyncio.to_thread(
+                    self.s3_client.complete_multipart_upload,
+                    Bucket=self.bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": parts}
+                )
+        except BaseException as e:
+            logger.error(f"Error streaming to S3 ({key}): {e!r}")
+            if upload_id is not None:
+                try:
+                    await asyncio.to_thread(
+                        self.s3_client.abort_multipart_upload,
+                        Bucket=self.bucket,
+                        Key=key,
+                        UploadId=upload_id
+                    )
+                except Exception as abort_error:
+                    logger.warning(f"Could not abort multipart upload {upload_id}: {abort_error}")
+            raise
+
+        url = self.generate_presigned_url(key, expiration=expiration)
+        if not url:
+            # Fallback to direct URL if presigned generation fails
+            url = f"https://s3.{settings.aws_region}.amazonaws.com/{self.bucket}/{key}"
+
+        logger.info(f"Streamed {size} bytes to S3: {key} ({len(parts) or 1} part(s))")
+        return url, key, size
+
     def upload_from_pil(
         self,
         image: Image.Image,
@@ -175,6 +281,19 @@ class S3Service:
             logger.error(f"Error creating thumbnail: {e}")
             raise
 
+    def download_image(self, key: str) -> bytes:
+        """
+        Read an image back from S3
+
+        Args:
+            key: S3 key of the image
+
+        Returns:
+            Object bytes
+        """
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=key)
+        return response['Body'].read()
+
     def delete_image(self, key: str) -> bool:
         """
         Delete image from S3
@@ -221,6 +340,47 @@ class S3Service:
             logger.error(f"Error generating presigned URL: {e}")
             return None
 
+    def get_url(self, key: str, expiration: int = 3600) -> str:
+        """
+        Get a URL for a stored object
+
+        Args:
+            key: S3 key
+            expiration: URL expiration in seconds
+
+        Returns:
+            Presigned URL, or the direct object URL if signing fails
+        """
+        url = self.generate_presigned_url(key, expiration)
+        return url or f"https://s3.{settings.aws_region}.amazonaws.com/{self.bucket}/{key}"
+
+    def key_from_url(self, url: Optional[str]) -> Optional[str]:
+        """
+        Recover the object key from a URL of this bucket (presigned or direct)
+
+        Stored presigned URLs expire; the key lets callers read the object or sign it again.
+
+        Args:
+            url: Virtual-hosted (bucket.s3...amazonaws.com/key) or path-style (s3...amazonaws.com/bucket/key) URL
+
+        Returns:
+            S3 key, or None if the URL doesn't point into this bucket
+        """
+        if not url:
+            return None
+        parsed = urlparse(url)
+        host = parsed.hostname or ""
+        path = unquote(parsed.path)
+        if not host.endswith("amazonaws.com"):
+            return None
+        if host.startswith(f"{self.bucket}."):
+            key = path.lstrip("/")
+        elif path.startswith(f"/{self.bucket}/"):
+            key = path[len(self.bucket) + 2:]
+        else:
+            return None
+        return key or None
+
 
 # Global S3 service instance
 s3_service = S3Service()
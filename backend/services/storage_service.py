@@ -0,0 +1,24 @@
+"""
+Storage backend selection
+Picks S3 or local filesystem storage based on STORAGE_BACKEND
+"""
+from typing import Union
+
+from backend.app.config import settings
+from backend.services.local_storage_service import LocalStorageService, local_storage_service
+from backend.services.s3_service import S3Service, s3_service
+
+
+def get_storage_service() -> Union[S3Service, LocalStorageService]:
+    """
+    Get the configured storage backend
+
+    Both backends expose upload_image(), upload_stream(), download_image(),
+    get_url() and delete_image() with the same signatures.
+
+    Returns:
+        s3_service, or local_storage_service when STORAGE_BACKEND=local
+    """
+    if settings.storage_backend == "local":
+        return local_storage_service
+    return s3_service
@@ -0,0 +1,218 @@
+"""
+Template Gallery Service
+Pre-generates one preview image per template prompt so template browsing is instant
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backend.app.config import settings
+from backend.models.database import SessionLocal, TemplatePreview
+from backend.services.ai_designer_service import ai_designer_service, design_cache
+from backend.services.s3_service import s3_service
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateGalleryService:
+    """Resumable, idempotent warm-up job for template preview images"""
+
+    # Realism mode used for previews (matches the designer's default)
+    PREVIEW_REALISM_MODE = "realistic"
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.state = {
+            "running": False,
+            "total": 0,
+            "already_materialized": 0,
+            "generated": 0,
+            "failed": 0,
+            "started_at": None,
+            "finished_at": None
+        }
+
+    @staticmethod
+    def template_key(category: str, style_preset: str, prompt: str) -> str:
+        """Stable identifier for a template prompt's preview with the current image model"""
+        # The model is part of the key so previews are regenerated when it changes
+        return design_cache.make_key("template", category, style_preset, prompt, ai_designer_service.default_model)
+
+    def iter_templates(self) -> Iterator[Tuple[str, str, str]]:
+        """Yield (category, style_preset, prompt) for every curated template"""
+        for category, styles in ai_designer_service.TEMPLATE_PROMPTS.items():
+            for style_preset, prompts in styles.items():
+                for prompt in prompts:
+                    yield category, style_preset, prompt
+
+    def _ready_keys(self) -> set:
+        """Template keys that already have a stored preview"""
+        db = SessionLocal()
+        try:
+            rows = db.query(TemplatePreview.template_key).filter(TemplatePreview.status == "ready").all()
+            return {row[0] for row in rows}
+        finally:
+            db.close()
+
+    def _save_preview(self, key: str, category: str, style_preset: str, prompt: str, **fields):
+        """Upsert the preview row for a template (committed per entry so the job can resume)"""
+        db = SessionLocal()
+        try:
+            preview = db.query(TemplatePreview).filter(TemplatePreview.template_key == key).first()
+            if not preview:
+                preview = TemplatePreview(
+                    template_key=key,
+                    category=category,
+                    style_preset=style_preset,
+                    prompt=prompt
+                )
+                db.add(preview)
+            for name, value in fields.items():
+                setattr(preview, name, value)
+            preview.updated_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+
+    async def _materialize(self, category: str, style_preset: str, prompt: str):
+        """Generate and store the preview for one template"""
+        key = self.template_key(category, style_preset, prompt)
+        enhanced_prompt = ai_designer_service.enhance_prompt(
+            prompt, category, style_preset, self.PREVIEW_REALISM_MODE
+        )
+
+        try:
+            images = await ai_designer_service.generate_with_dalle(
+                enhanced_prompt,
+                num_images=1,
+                size=settings.image_size,
+                quality=settings.image_quality
+            )
+            image = images[0]
+
+            await asyncio.to_thread(
+                self._save_preview, key, category, style_preset, prompt,
+                image_s3_key=image["s3_key"],
+                model_version=image["model"],
+                status="ready",
+                error=None
+            )
+
+            # Seed the design cache so generating from this template is also instant
+            if settings.design_cache_enabled:
+                cache_key = ai_designer_service.design_cache_key(enhanced_prompt, 1)
+                await ai_designer_service.cache_generation(cache_key, images, {})
+
+            self.state["generated"] += 1
+            logger.info(f"Template preview ready: {category}/{style_preset} - {prompt[:40]}")
+
+        except Exception as e:
+            self.state["failed"] += 1
+            logger.error(f"Template preview failed for {category}/{style_preset}: {e}")
+            await asyncio.to_thread(
+                self._save_preview, key, category, style_preset, prompt,
+                status="failed",
+                error=str(e)
+            )
+
+    async def warm(self) -> Dict:
+        """
+        Generate previews for every template that isn't materialized yet
+
+        Safe to re-run: entries with a ready preview are skipped, failed ones are retried.
+
+        Returns:
+            Job state summary
+        """
+        templates = list(self.iter_templates())
+        ready = await asyncio.to_thread(self._ready_keys)
+        pending = [t for t in templates if self.template_key(*t) not in ready]
+
+        self.state.update({
+            "running": True,
+            "total": len(templates),
+            "already_materialized": len(templates) - len(pending),
+            "generated": 0,
+            "failed": 0,
+            "started_at": datetime.utcnow().isoformat(),
+            "finished_at": None
+        })
+        logger.info(f"Template warm-up: {len(pending)} of {len(templates)} previews to generate")
+
+        semaphore = asyncio.Semaphore(max(1, settings.template_warmup_concurrency))
+
+        async def materialize_bounded(template: Tuple[str, str, str]):
+            async with semaphore:
+                await self._materialize(*template)
+
+        try:
+            await asyncio.gather(*(materialize_bounded(t) for t in pending))
+        finally:
+            self.state["running"] = False
+            self.state["finished_at"] = datetime.utcnow().isoformat()
+
+        logger.info(f"Template warm-up finished: {self.state}")
+        return dict(self.state)
+
+    def start(self) -> bool:
+        """
+        Start the warm-up job in the background if it isn't already running
+
+        Returns:
+            True if a new job was started
+        """
+        if self._task is not None and not self._task.done():
+            return False
+        self._task = asyncio.get_running_loop().create_task(self.warm())
+        return True
+
+    async def stop(self):
+        """Cancel a running warm-up job (progress so far is kept)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _load_previews(self, category: str, style_preset: str, prompts: List[str]) -> List[Dict]:
+        """Look up preview rows and presign their images (blocking: run in a thread)"""
+        keys = {self.template_key(category, style_preset, prompt): prompt for prompt in prompts}
+
+        db = SessionLocal()
+        try:
+            rows = db.query(TemplatePreview).filter(TemplatePreview.template_key.in_(list(keys))).all()
+            by_key = {row.template_key: row for row in rows}
+        finally:
+            db.close()
+
+        previews = []
+        for key, prompt in keys.items():
+            row = by_key.get(key)
+            image_url = None
+            if row is not None and row.status == "ready" and row.image_s3_key:
+                image_url = s3_service.generate_presigned_url(row.image_s3_key, expiration=86400)
+            previews.append({
+                "prompt": prompt,
+                "image_url": image_url,
+                "status": row.status if row is not None else "pending"
+            })
+        return previews
+
+    async def get_previews(self, category: str, style_preset: str, prompts: List[str]) -> List[Dict]:
+        """
+        Get ready-made preview URLs for template prompts
+
+        Args:
+            category: Jewellery category
+            style_preset: Style preset
+            prompts: Template prompts
+
+        Returns:
+            List of {prompt, image_url, status} (image_url is None if not materialized)
+        """
+        return await asyncio.to_thread(self._load_previews, category, style_preset, prompts)
+
+# Global service instance
+template_gallery_service = TemplateGalleryService()
@@ -0,0 +1,264 @@
+"""
+Tripo Task Poller Service
+One shared scheduler for all in-flight Tripo tasks, with progress-aware exponential backoff
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from backend.app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tripo statuses that mean "keep polling"
+IN_PROGRESS_STATUSES = ("queued", "running")
+
+
+class _PolledTask:
+    """Scheduling state for one tracked Tripo task"""
+
+    def __init__(self, task_id: str, max_wait: float, future: asyncio.Future, interval: float):
+        now = time.monotonic()
+        self.task_id = task_id
+        self.progress_hooks: List[Callable[[int], Awaitable[None]]] = []
+        self.waiters = 0
+        self.future = future
+        self.deadline = now + max_wait
+        self.interval = interval
+        self.next_poll_at = now + interval
+        self.status = "submitted"
+        self.state_since = now
+        self.progress: Optional[int] = None
+        self.progress_at = now
+        self.errors = 0
+        self.checking = False
+
+
+class TripoTaskPoller:
+    """
+    Polls every tracked Tripo task from a single loop
+
+    Each tick starts a check for every task that is due (bounded concurrency) without
+    waiting for them, then sleeps until the next one is due or a check finishes, so
+    one slow status request doesn't hold back the others. A task's interval grows exponentially while it reports no
+    progress, and is set from its estimated time to completion while it does, with
+    jitter so tasks submitted together don't poll in lockstep.
+    """
+
+    def __init__(self, fetch_status: Callable[[str], Awaitable[Dict]]):
+        """
+        Args:
+            fetch_status: Coroutine returning the Tripo task "data" object for a task ID
+        """
+        self.fetch_status = fetch_status
+        self._tasks: Dict[str, _PolledTask] = {}
+        self._runner: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._checks: set = set()
+        self.stats = {"polls_total": 0, "errors_total": 0, "succeeded": 0, "failed": 0, "timed_out": 0}
+        self._state_times: Dict[str, Dict[str, float]] = {}
+
+    def _record_state_time(self, task: _PolledTask, now: float):
+        duration = now - task.state_since
+        entry = self._state_times.setdefault(task.status, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        entry["count"] += 1
+        entry["total_seconds"] += duration
+        entry["max_seconds"] = max(entry["max_seconds"], duration)
+
+    def _set_state(self, task: _PolledTask, status: str):
+        if status != task.status:
+            now = time.monotonic()
+            self._record_state_time(task, now)
+            task.status = status
+            task.state_since = now
+
+    def _finish(self, task: _PolledTask, result: Optional[Dict] = None, error: Optional[Exception] = None):
+        self._record_state_time(task, time.monotonic())
+        self._tasks.pop(task.task_id, None)
+        if task.future.done():
+            return
+        if error is not None:
+            task.future.set_exception(error)
+        else:
+            task.future.set_result(result)
+
+    def _schedule(self, task: _PolledTask, progress: Optional[int]):
+        """Pick the next poll time from reported progress, or back off exponentially"""
+        now = time.monotonic()
+        min_interval = settings.tripo_poll_min_interval_seconds
+        max_interval = settings.tripo_poll_max_interval_seconds
+
+        if progress is not None and task.progress is not None and progress > task.progress:
+            # Progressing: aim for roughly halfway to the estimated finish
+            rate = (progress - task.progress) / max(now - task.progress_at, 1e-3)
+            interval = (100 - progress) / rate / 2
+        else:
+            interval = task.interval * settings.tripo_poll_backoff_factor
+
+        if progress is not None and progress != task.progress:
+            task.progress = progress
+            task.progress_at = now
+
+        task.interval = min(max(interval, min_interval), max_interval)
+        jitter = settings.tripo_poll_jitter
+        delay = task.interval * random.uniform(1 - jitter, 1 + jitter)
+        task.next_poll_at = min(now + delay, task.deadline)
+
+    async def _check(self, task: _PolledTask, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                data = await self.fetch_status(task.task_id)
+            except Exception as e:
+                self.stats["errors_total"] += 1
+                task.errors += 1
+                logger.warning(f"Error polling Tripo task {task.task_id} ({task.errors}/{settings.tripo_poll_max_errors}): {e}")
+                if task.errors >= settings.tripo_poll_max_errors:
+                    self.stats["failed"] += 1
+                    self._finish(task, error=e)
+                else:
+                    self._schedule(task, None)
+                return
+
+        self.stats["polls_total"] += 1
+        task.errors = 0
+        status = data.get("status")
+        self._set_state(task, status)
+
+        if status == "success":
+            self.stats["succeeded"] += 1
+            self._finish(task, result=data)
+        elif status == "failed":
+            self.stats["failed"] += 1
+            self._finish(task, error=Exception(f"Task failed: {data.get('error', 'Unknown error')}"))
+        elif status in IN_PROGRESS_STATUSES:
+            progress = data.get("progress")
+            progress = int(progress) if progress is not None else None
+            if progress is not None:
+                for on_progress in list(task.progress_hooks):
+                    try:
+                        await on_progress(progress)
+                    except Exception as e:
+                        logger.warning(f"Progress hook failed for Tripo task {task.task_id}: {e}")
+
+            if time.monotonic() >= task.deadline:
+                self.stats["timed_out"] += 1
+                self._finish(task, error=Exception("Task timeout: exceeded maximum wait time"))
+            else:
+                self._schedule(task, progress)
+        else:
+            self.stats["failed"] += 1
+            self._finish(task, error=Exception(f"Unknown status: {status}"))
+
+    async def _check_in_background(self, task: _PolledTask, semaphore: asyncio.Semaphore):
+        try:
+            await self._check(task, semaphore)
+        except Exception as e:
+            logger.error(f"Unexpected error checking Tripo task {task.task_id}: {e}", exc_info=True)
+            self._finish(task, error=e)
+        finally:
+            task.checking = False
+            self._wakeup.set()
+
+    async def _run(self):
+        """Scheduler loop; exits when no tasks are left"""
+        semaphore = asyncio.Semaphore(max(1, settings.tripo_poll_max_concurrent_checks))
+        try:
+            while self._tasks:
+                self._wakeup.clear()
+                now = time.monotonic()
+                waiting = [task for task in self._tasks.values() if not task.checking]
+                for task in waiting:
+                    if task.next_poll_at <= now:
+                        task.checking = True
+                        check = asyncio.create_task(self._check_in_background(task, semaphore))
+                        self._checks.add(check)
+                        check.add_done_callback(self._checks.discard)
+
+                next_due = min((task.next_poll_at for task in waiting if not task.checking), default=None)
+                timeout = max(next_due - now, 0) if next_due is not None else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for check in list(self._checks):
+                check.cancel()
+
+    def _ensure_running(self):
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.create_task(self._run())
+        else:
+            self._wakeup.set()
+
+    async def wait_for(
+        self,
+        task_id: str,
+        max_wait: float = 300,
+        on_progress: Optional[Callable[[int], Awaitable[None]]] = None
+    ) -> Dict:
+        """
+        Track a Tripo task until it finishes
+
+        Callers waiting on a task that is already tracked share its poll and result.
+
+        Args:
+            task_id: Tripo task ID
+            max_wait: Maximum wait time in seconds
+            on_progress: Optional hook called with Tripo's progress percentage
+
+        Returns:
+            Task result data
+
+        Raises:
+            Exception: If the task fails, times out or cannot be polled
+        """
+        task = self._tasks.get(task_id)
+        if task is None:
+            future = asyncio.get_running_loop().create_future()
+            task = _PolledTask(task_id, max_wait, future, settings.tripo_poll_min_interval_seconds)
+            self._tasks[task_id] = task
+        else:
+            task.deadline = max(task.deadline, time.monotonic() + max_wait)
+
+        task.waiters += 1
+        if on_progress is not None:
+            task.progress_hooks.append(on_progress)
+        self._ensure_running()
+        try:
+            # Shielded so one caller cancelling doesn't cancel the result for the others
+            return await asyncio.shield(task.future)
+        finally:
+            task.waiters -= 1
+            if on_progress is not None:
+                task.progress_hooks.remove(on_progress)
+            # Last caller gone (e.g. shutdown): stop tracking the task
+            if task.waiters == 0 and self._tasks.get(task_id) is task:
+                del self._tasks[task_id]
+                if not task.future.done():
+                    task.future.cancel()
+
+    def get_metrics(self) -> Dict:
+        """Get queue depth and time-in-state metrics"""
+        now = time.monotonic()
+        by_state: Dict[str, int] = {}
+        for task in self._tasks.values():
+            by_state[task.status] = by_state.get(task.status, 0) + 1
+
+        time_in_state = {}
+        for state, entry in self._state_times.items():
+            time_in_state[state] = {
+                "count": entry["count"],
+                "avg_seconds": round(entry["total_seconds"] / entry["count"], 2) if entry["count"] else 0.0,
+                "max_seconds": round(entry["max_seconds"], 2)
+            }
+
+        return {
+            **self.stats,
+            "queue_depth": len(self._tasks),
+            "by_state": by_state,
+            "oldest_in_state_seconds": round(max((now - t.state_since for t in self._tasks.values()), default=0.0), 2),
+            "time_in_state": time_in_state
+        }
@@ -0,0 +1,236 @@
+"""
+Try-On Batch Service
+Renders one body photo with many jewelry pieces, streaming per-item results
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+from backend.app.config import settings
+from backend.models.mongodb import TrialUsageModel
+from backend.services.http_client_service import http_client_service
+from backend.services.image_executor_service import image_executor_service
+from backend.services.s3_service import s3_service
+from backend.services.virtual_tryon_service import virtual_tryon_service
+from backend.utils.image_hash import perceptual_hash
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchItem:
+    """One jewelry piece in a batch (uploaded bytes, a stored design image, or an image URL)"""
+    index: int
+    source: str
+    jewelry_type: str
+    jewelry_description: Optional[str] = None
+    data: Optional[bytes] = None
+    image_url: Optional[str] = None
+    image_key: Optional[str] = None  # S3 key of a design image (its stored URL may have expired)
+    design_id: Optional[int] = None
+
+
+class TryOnBatchJob:
+    """State of one batch; results are kept so a disconnected client can fetch them later"""
+
+    def __init__(self, user_id: str, total: int):
+        self.id = f"batch_{uuid.uuid4().hex}"
+        self.user_id = user_id
+        self.total = total
+        self.status = "running"
+        self.results: List[Dict] = []
+        self.created_at = time.time()
+        self.completed_at: Optional[float] = None
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+    def summary(self) -> Dict:
+        succeeded = [r for r in self.results if r["success"]]
+        return {
+            "type": "summary",
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "completed": len(self.results),
+            "succeeded": len(succeeded),
+            "failed": len(self.results) - len(succeeded),
+            "cached": sum(1 for r in succeeded if r.get("cached")),
+            "elapsed_seconds": round((self.completed_at or time.time()) - self.created_at, 2)
+        }
+
+    def to_dict(self) -> Dict:
+        return {**self.summary(), "results": sorted(self.results, key=lambda r: r["index"])}
+
+
+class TryOnBatchService:
+    """Runs batch try-ons with bounded concurrency, encoding the body photo once"""
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, TryOnBatchJob]" = OrderedDict()
+        self.stats = {"batches": 0, "items": 0, "succeeded": 0, "failed": 0}
+
+    async def start(
+        self,
+        user_id: str,
+        body_data: bytes,
+        items: List[BatchItem],
+        force_regenerate: bool = False
+    ) -> TryOnBatchJob:
+        """
+        Prepare the body photo and start rendering in the background
+
+        Args:
+            user_id: MongoDB user ID
+            body_data: Body photo bytes (prepared and hashed once for all items)
+            items: Jewelry pieces to render
+            force_regenerate: Skip try-on cache lookups
+
+        Each generation reserves a trial against the user's stored counter when it
+        starts (so concurrent batches can't overspend it) and refunds it if it fails;
+        results served from the user's own try-on cache are free.
+
+        Returns:
+            Running job (iterate events() for NDJSON lines)
+
+        Raises:
+            ValueError: If the body photo is not a readable image
+        """
+        body_part, body_hash = await asyncio.gather(
+            image_executor_service.run(virtual_tryon_service.prepare_inline_image, body_data),
+            image_executor_service.run(perceptual_hash, body_data)
+        )
+
+        job = TryOnBatchJob(user_id, len(items))
+        self._jobs[job.id] = job
+        while len(self._jobs) > settings.tryon_batch_retained_jobs:
+            self._jobs.popitem(last=False)
+
+        self.stats["batches"] += 1
+        job.task = asyncio.create_task(
+            self._run(job, items, body_part, body_hash, force_regenerate)
+        )
+        logger.info(f"Try-on batch {job.id}: {len(items)} items for user {user_id}")
+        return job
+
+    async def _run(self, job: TryOnBatchJob, items, body_part, body_hash, force_regenerate):
+        # Every item takes an admission slot under this user, so stay within the per-user cap
+        semaphore = asyncio.Semaphore(max(1, min(settings.tryon_batch_concurrency, settings.tryon_max_per_user)))
+
+        async def run_item(item: BatchItem):
+            async with semaphore:
+                result = await self._render_item(job, item, body_part, body_hash, force_regenerate)
+            job.results.append(result)
+            self.stats["items"] += 1
+            self.stats["succeeded" if result["success"] else "failed"] += 1
+            job.events.put_nowait(result)
+
+        try:
+            await asyncio.gather(*(run_item(item) for item in items))
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        finally:
+            job.completed_at = time.time()
+            job.events.put_nowait(job.summary())
+            job.events.put_nowait(None)
+
+    async def _render_item(self, job, item: BatchItem, body_part, body_hash, force_regenerate) -> Dict:
+        base = {"type": "item", "job_id": job.id, "index": item.index, "source": item.source, "design_id": item.design_id}
+        reserved = False
+        try:
+            data = item.data
+            if data is None and item.image_key:
+                data = await asyncio.to_thread(s3_service.download_image, item.image_key)
+            elif data is None:
+                client = http_client_service.get_client("default")
+                response = await client.get(item.image_url, follow_redirects=True, timeout=30.0)
+                response.raise_for_status()
+                data = response.content
+
+            jewelry_part = await image_executor_service.run(virtual_tryon_service.prepare_inline_image, data, True)
+            cache_key = None
+            if settings.tryon_cache_enabled:
+                cache_key = await virtual_tryon_service.tryon_cache_key(
+                    job.user_id, None, data, item.jewelry_type, item.jewelry_description, body_hash=body_hash
+                )
+
+            # The user's own cached result costs no trial
+            if cache_key is not None and not force_regenerate:
+                cached = await virtual_tryon_service.cached_tryon(cache_key)
+                if cached:
+                    return self._item_result(base, cached)
+
+            # Reserve a trial against the stored counter before generating
+            trial_status = await asyncio.to_thread(TrialUsageModel.reserve_usage, job.user_id, "virtual_tryon")
+            if not trial_status["allowed"]:
+                return {**base, "success": False, "error": "trial_limit_reached"}
+            reserved = True
+
+            result = await virtual_tryon_service.generate_tryon(
+                body_image=body_part,
+                jewelry_image=jewelry_part,
+                jewelry_type=item.jewelry_type,
+                jewelry_description=item.jewelry_description or "",
+                cache_key=cache_key,
+                force_regenerate=True,  # Already looked up above
+                user_id=job.user_id
+            )
+            return self._item_result(base, result)
+
+        except Exception as e:
+            if reserved:
+                try:
+                    await asyncio.to_thread(TrialUsageModel.refund_usage, job.user_id, "virtual_tryon")
+                except Exception as refund_error:
+                    logger.error(f"Error refunding try-on trial for batch {job.id}: {refund_error}")
+            logger.warning(f"Try-on batch {job.id} item {item.index} ({item.source}) failed: {e}")
+            return {**base, "success": False, "error": str(e)}
+
+    @staticmethod
+    def _item_result(base: Dict, result: Dict) -> Dict:
+        return {
+            **base,
+            "success": True,
+            "cached": result["cached"],
+            "result_url": result["result_url"],
+            "s3_key": result["s3_key"],
+            "image_size": result.get("image_size"),
+            "queue": result.get("queue")
+        }
+
+    async def events(self, job: TryOnBatchJob) -> AsyncIterator[Dict]:
+        """
+        Stream a job's lines: a header, one line per item as it finishes, then a summary
+
+        Args:
+            job: Job returned by start()
+
+        Yields:
+            Event dicts
+        """
+        yield {"type": "batch", "job_id": job.id, "total": job.total}
+        while True:
+            event = await job.events.get()
+            if event is None:
+                return
+            yield event
+
+    def get_job(self, job_id: str) -> Optional[TryOnBatchJob]:
+        """Get a recent batch job"""
+        return self._jobs.get(job_id)
+
+    def get_metrics(self) -> Dict:
+        """Get batch counters"""
+        return {
+            **self.stats,
+            "running": sum(1 for job in self._jobs.values() if job.status == "running")
+        }
+
+
+# Global service instance
+tryon_batch_service = TryOnBatchService()
@@ -0,0 +1,174 @@
+"""
+Try-On Progress Service
+Stage-by-stage progress events for try-on generation, plus per-stage latency stats
+"""
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from backend.utils.events import event_broker
+
+logger = logging.getLogger(__name__)
+
+# Recent durations kept per stage for the latency percentiles in /metrics
+STAGE_SAMPLES = 500
+
+# Request IDs remembered for ownership and reuse checks
+MAX_TRACKED_REQUESTS = 1000
+
+
+class RequestIdInUseError(Exception):
+    """Raised when a client-chosen request ID is already tracked"""
+
+
+class TryOnProgress:
+    """
+    Progress of one try-on request
+
+    stage() closes the running stage and starts the next one; complete() or
+    fail() publish the final event. Untracked instances (no request ID) only
+    feed the latency stats.
+    """
+
+    def __init__(self, service: "TryOnProgressService", request_id: Optional[str], user_id: Optional[str]):
+        self.service = service
+        self.request_id = request_id
+        self.user_id = user_id
+        self.started_at = time.perf_counter()
+        self.stages: List[Dict[str, Any]] = []
+        self._current: Optional[str] = None
+        self._current_started: float = self.started_at
+
+    @property
+    def timings_ms(self) -> Dict[str, float]:
+        """Completed stage durations (a retried stage is summed)"""
+        timings: Dict[str, float] = {}
+        for entry in self.stages:
+            timings[entry["stage"]] = round(timings.get(entry["stage"], 0.0) + entry["duration_ms"], 1)
+        return timings
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started_at) * 1000, 1)
+
+    def _publish(self, status: str, info: Dict, final: bool = False):
+        if self.request_id is None:
+            return
+        event_broker.publish(self.service.channel(self.user_id, self.request_id), {
+            "request_id": self.request_id,
+            "stage": self._current if not final else status,
+            "status": status,
+            "elapsed_ms": self._elapsed_ms(),
+            "stages": list(self.stages),
+            **info,
+            "final": final
+        })
+
+    def end_stage(self):
+        """Close the running stage and record its duration"""
+        if self._current is None:
+            return
+        duration_ms = round((time.perf_counter() - self._current_started) * 1000, 1)
+        self.stages.append({"stage": self._current, "duration_ms": duration_ms})
+        self.service.record_stage(self._current, duration_ms)
+        self._current = None
+
+    def stage(self, name: str, **info):
+        """
+        Start a stage (closing the previous one)
+
+        Args:
+            name: Stage name (preparing, queued, sending, receiving, storing, retrying, ...)
+            **info: Extra JSON-serialisable fields for the event
+        """
+        self.end_stage()
+        self._current = name
+        self._current_started = time.perf_counter()
+        logger.debug(f"Try-on {self.request_id or '-'}: {name}")
+        self._publish("running", info)
+
+    def complete(self, **info):
+        """Publish the final success event"""
+        self.end_stage()
+        self.service.stats["completed"] += 1
+        self.service.record_stage("total", self._elapsed_ms())
+        self._publish("completed", info, final=True)
+
+    def fail(self, error: Any):
+        """Publish the final failure event"""
+        failed_stage = self._current
+        self.end_stage()
+        self.service.stats["failed"] += 1
+        self._publish("failed", {"error": error, "failed_stage": failed_stage}, final=True)
+
+
+class TryOnProgressService:
+    """Creates progress trackers and aggregates stage latencies"""
+
+    def __init__(self):
+        self._owners: "OrderedDict[str, str]" = OrderedDict()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self.stats = {"tracked": 0, "completed": 0, "failed": 0}
+
+    @staticmethod
+    def channel(user_id: str, request_id: str) -> str:
+        """Event channel for a request (scoped to its owner, so replay never crosses users)"""
+        return f"tryon-progress:{user_id}:{request_id}"
+
+    def track(self, request_id: Optional[str] = None, user_id: Optional[str] = None) -> TryOnProgress:
+        """
+        Start tracking a try-on request
+
+        Args:
+            request_id: ID the client streams progress for (generated if None and user_id is given)
+            user_id: Owner allowed to read the progress stream (None = stats only, no events)
+
+        Returns:
+            Progress tracker
+
+        Raises:
+            RequestIdInUseError: If request_id was already used (its events may still be replayed)
+        """
+        if user_id is None:
+            return TryOnProgress(self, None, None)
+
+        user_id = str(user_id)
+        request_id = request_id or f"tryon_{uuid.uuid4().hex}"
+        if request_id in self._owners or event_broker.get_history(self.channel(user_id, request_id)):
+            raise RequestIdInUseError(f"request_id {request_id} is already in use, pick a new one")
+
+        self._owners[request_id] = user_id
+        self._owners.move_to_end(request_id)
+        while len(self._owners) > MAX_TRACKED_REQUESTS:
+            self._owners.popitem(last=False)
+        self.stats["tracked"] += 1
+        return TryOnProgress(self, request_id, user_id)
+
+    def owner(self, request_id: str) -> Optional[str]:
+        """User who started a tracked request (None if unknown or not started yet)"""
+        return self._owners.get(request_id)
+
+    def record_stage(self, stage: str, duration_ms: float):
+        """Add a stage duration to the latency stats"""
+        self._samples.setdefault(stage, deque(maxlen=STAGE_SAMPLES)).append(duration_ms)
+        self._counts[stage] = self._counts.get(stage, 0) + 1
+
+    def get_metrics(self) -> Dict:
+        """Get request counters and per-stage latency (over the last STAGE_SAMPLES per stage)"""
+        stages = {}
+        for stage, samples in self._samples.items():
+            ordered = sorted(samples)
+            stages[stage] = {
+                "count": self._counts[stage],
+                "avg_ms": round(sum(ordered) / len(ordered), 1),
+                "p50_ms": ordered[len(ordered) // 2],
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max_ms": ordered[-1]
+            }
+        return {**self.stats, "stages": stages}
+
+
+# Global service instance
+tryon_progress_service = TryOnProgressService()
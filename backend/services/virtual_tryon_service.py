@@ -5,18 +5,61 @@ Implements AI-powered jewelry overlay using Gemini's image generation capabiliti
 import google.generativeai as genai
 from backend.app.config import settings
 from backend.services.s3_service import s3_service
-from typing import List, Dict, Optional, Tuple
+from backend.services.admission_service import AdmissionController, AdmissionRejectedError
+from backend.services.cache_service import ResultCache
+from backend.services.http_client_service import http_client_service
+from backend.services.image_executor_service import image_executor_service
+from backend.services.tryon_progress_service import tryon_progress_service, TryOnProgress
+from backend.utils.image_hash import perceptual_hash, hash_distance
+from backend.utils.inline_data_stream import InlineDataExtractor, sniff_image_type
+from typing import List, Dict, Optional, Tuple, Union
 import logging
 import base64
 import io
+import math
 from PIL import Image
 import os
 from pathlib import Path
-import httpx
 import asyncio
+import random
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import httpx
 
 logger = logging.getLogger(__name__)
 
+# Formats Gemini accepts as inline data without re-encoding (PIL format -> MIME type)
+PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png"}
+PASSTHROUGH_MODES = {"JPEG": ("RGB", "L"), "PNG": ("RGB", "RGBA", "L", "LA")}
+
+# Response body read size, and how many decoded image bytes to buffer before choosing the content type
+STREAM_CHUNK_SIZE = 64 * 1024
+HEADER_BYTES = 64 * 1024
+
+# Gemini statuses retried with backoff
+RETRYABLE_STATUSES = (429, 503)
+
+# An image for Gemini: PIL image, raw upload bytes, or a part from prepare_inline_image()
+InlineImage = Union[Image.Image, bytes, Dict]
+
+# Generated try-ons keyed on perceptual hashes of the input pair + jewelry type/description
+tryon_cache = ResultCache(
+    "tryon",
+    max_entries=settings.tryon_cache_max_entries,
+    ttl_seconds=settings.tryon_cache_ttl_seconds,
+    use_redis=settings.cache_use_redis
+)
+
+# Caps concurrent Gemini try-on calls; the rest wait in a fair FIFO queue
+tryon_admission = AdmissionController(
+    "gemini_tryon",
+    max_in_flight=settings.tryon_max_in_flight,
+    max_queue=settings.tryon_max_queue,
+    max_per_user=settings.tryon_max_per_user,
+    expected_seconds=settings.tryon_expected_seconds
+)
+
 
 class VirtualTryOnService:
     """Service for AI-powered virtual try-on using Gemini 2.5 Flash Image Preview"""
@@ -28,6 +71,12 @@ class VirtualTryOnService:
         # Use Gemini 2.5 Flash with image generation capabilities
         self.model_name = "gemini-2.5-flash-image-preview"
 
+        # Recently seen (request params, body hash, jewelry hash) so near-identical
+        # uploads (a hash bit flipped by re-encoding) resolve to the same cache key.
+        # Params include the user ID, so snapping never crosses users.
+        self._known_hashes: "OrderedDict[Tuple[str, str, str], None]" = OrderedDict()
+        self.stats = {"retries": 0}
+
         logger.info(f"🎨 Virtual Try-On Service initialized with {self.model_name}")
 
     def _image_to_base64(self, image: Image.Image) -> Tuple[str, str]:
@@ -63,6 +112,203 @@ class VirtualTryOnService:
             logger.error(f"Error converting image to base64: {e}")
             raise
 
+    def prepare_inline_image(self, data: bytes, keep_alpha: bool = False) -> Dict:
+        """
+        Prepare uploaded image bytes for a Gemini inline_data part
+
+        JPEG/PNG uploads within the size limits are sent as-is (no decode or
+        re-encode). Anything else is decoded once, downscaled to
+        TRYON_MAX_IMAGE_DIMENSION and encoded once.
+
+        Args:
+            data: Uploaded image bytes
+            keep_alpha: Keep transparency (PNG output) when re-encoding, e.g. for jewelry cut-outs
+
+        Returns:
+            Dict with mime_type, base64 data, size, and whether the original bytes were used
+
+        Raises:
+            ValueError: If the bytes are not a readable image
+        """
+        max_dimension = settings.tryon_max_image_dimension
+
+        try:
+            # Only parses the header; pixels are decoded lazily
+            image = Image.open(io.BytesIO(data))
+        except Exception as e:
+            raise ValueError(f"Invalid image file: {e}")
+
+        if (
+            image.format in PASSTHROUGH_FORMATS
+            and image.mode in PASSTHROUGH_MODES[image.format]
+            and max(image.size) <= max_dimension
+            and len(data) <= settings.tryon_inline_max_bytes
+        ):
+            return {
+                "mime_type": PASSTHROUGH_FORMATS[image.format],
+                "data": base64.b64encode(data).decode("ascii"),
+                "size": image.size,
+                "passthrough": True
+            }
+
+        # One bounded downscale. For JPEG, draft mode lets the decoder scale by 1/2..1/8
+        # during decoding; allowing it to land slightly under the cap (>= 3/4 of it)
+        # avoids a full-resolution decode of large phone photos
+        if image.format == "JPEG":
+            scale = (max_dimension * 3 / 4) / max(image.size)
+            image.draft("RGB", tuple(math.ceil(dim * scale) for dim in image.size))
+        has_alpha = keep_alpha and (image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        if has_alpha:
+            image.save(buffer, format="PNG")
+            mime_type = "image/png"
+        else:
+            image.save(buffer, format="JPEG", quality=85)
+            mime_type = "image/jpeg"
+
+        return {
+            "mime_type": mime_type,
+            "data": base64.b64encode(buffer.getvalue()).decode("ascii"),
+            "size": image.size,
+            "passthrough": False
+        }
+
+    def _to_inline_part(self, image: InlineImage, keep_alpha: bool = False) -> Dict:
+        """
+        Build a Gemini inline_data part
+
+        Args:
+            image: PIL image, raw image bytes, or a part from prepare_inline_image()
+            keep_alpha: Keep transparency when bytes need re-encoding
+
+        Returns:
+            {"inline_data": {"mime_type", "data"}}
+        """
+        if isinstance(image, dict):
+            prepared = image
+        elif isinstance(image, (bytes, bytearray)):
+            prepared = self.prepare_inline_image(bytes(image), keep_alpha=keep_alpha)
+        else:
+            data, mime_type = self._image_to_base64(image)
+            prepared = {"mime_type": mime_type, "data": data}
+
+        return {
+            "inline_data": {
+                "mime_type": prepared["mime_type"],
+                "data": prepared["data"]
+            }
+        }
+
+    @staticmethod
+    def _decode_image(data: bytes) -> Image.Image:
+        """Decode image bytes fully (runs on the image executor)"""
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return image
+
+    async def _stream_result_to_storage(
+        self,
+        response: httpx.Response,
+        basename: str,
+        progress: Optional[TryOnProgress] = None
+    ) -> Tuple[str, str, int, Optional[Tuple[int, int]]]:
+        """
+        Decode the inline image from a streaming Gemini response straight into S3
+
+        Args:
+            response: Open streaming response from generateContent
+            basename: Result filename without extension
+            progress: Optional tracker; "storing" starts once the whole response has arrived
+
+        Returns:
+            Tuple of (url, key, size in bytes, (width, height) or None)
+
+        Raises:
+            ValueError: If the response contains no image
+        """
+        extractor = InlineDataExtractor()
+
+        async def image_chunks():
+            async for raw in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                for chunk in extractor.feed(raw):
+                    yield chunk
+            for chunk in extractor.close():
+                yield chunk
+            if progress is not None:
+                progress.stage("storing")
+
+        # Wait for the first image bytes: they decide the content type and
+        # an empty/refused response never creates an object
+        chunks = image_chunks()
+        header = b""
+        async for chunk in chunks:
+            header += chunk
+            if len(header) >= HEADER_BYTES:
+                break
+
+        if not header:
+            logger.error(f"No image in Gemini response; text parts: {extractor.texts}")
+            raise ValueError("No image data found in response")
+
+        content_type = sniff_image_type(header) or extractor.mime_type or "image/png"
+        extension = "jpg" if content_type == "image/jpeg" else content_type.split("/")[-1]
+
+        async def body():
+            yield header
+            async for chunk in chunks:
+                yield chunk
+
+        url, key, size = await s3_service.upload_stream(
+            body(),
+            folder="tryon",
+            filename=f"{basename}.{extension}",
+            content_type=content_type
+        )
+        return url, key, size, self._image_size_from_header(header)
+
+    @staticmethod
+    def _retry_delay(response: httpx.Response, attempt: int) -> float:
+        """
+        Seconds to wait before retrying a rate-limited/unavailable Gemini call
+
+        Args:
+            response: The 429/503 response
+            attempt: Zero-based attempt number
+
+        Returns:
+            Retry-After (seconds or HTTP date) if given, else exponential backoff with jitter
+        """
+        retry_after = response.headers.get("retry-after")
+        delay = None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    delay = None
+        if delay is None:
+            delay = settings.tryon_retry_base_delay_seconds * (2 ** attempt) * random.uniform(0.8, 1.2)
+        return min(max(delay, 0.0), settings.tryon_retry_max_delay_seconds)
+
+    @staticmethod
+    def _image_size_from_header(header: bytes) -> Optional[Tuple[int, int]]:
+        """Read image dimensions from its leading bytes (header only, no pixel decode)"""
+        try:
+            return Image.open(io.BytesIO(header)).size
+        except Exception:
+            return None
+
+    async def _prepare_part(self, image: InlineImage, keep_alpha: bool = False) -> Dict:
+        """Build an inline_data part, doing any PIL work on the image executor"""
+        if isinstance(image, dict):
+            return self._to_inline_part(image)
+        return await image_executor_service.run(self._to_inline_part, image, keep_alpha)
+
     async def _url_to_image(self, url: str) -> Image.Image:
         """
         Download image from URL and convert to PIL Image
@@ -76,17 +322,18 @@ class VirtualTryOnService:
         try:
             logger.info(f"Fetching image from: {url}")
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    url,
-                    headers={"User-Agent": "Mozilla/5.0 (compatible; JewelTechBot/1.0)"},
-                    follow_redirects=True
-                )
-                response.raise_for_status()
+            client = http_client_service.get_client("default")
+            response = await client.get(
+                url,
+                headers={"User-Agent": "Mozilla/5.0 (compatible; JewelTechBot/1.0)"},
+                follow_redirects=True,
+                timeout=30.0
+            )
+            response.raise_for_status()
 
-                image = Image.open(io.BytesIO(response.content))
-                logger.info(f"Successfully loaded image. Size: {image.size}, Mode: {image.mode}")
-                return image
+            image = await image_executor_service.run(self._decode_image, response.content)
+            logger.info(f"Successfully loaded image. Size: {image.size}, Mode: {image.mode}")
+            return image
 
         except Exception as e:
             logger.error(f"Error fetching image from {url}: {e}")
@@ -94,10 +341,12 @@ class VirtualTryOnService:
 
     async def generate_tryon_image(
         self,
-        person_image: Image.Image,
-        jewelry_image: Image.Image,
+        person_image: InlineImage,
+        jewelry_image: InlineImage,
         jewelry_type: str = "jewelry",
-        jewelry_description: str = ""
+        jewelry_description: str = "",
+        user_id: Optional[str] = None,
+        progress: Optional[TryOnProgress] = None
     ) -> Dict:
         """
         Generate virtual try-on image using Gemini 2.5 Flash Image Preview
@@ -106,20 +355,26 @@ class VirtualTryOnService:
         showing the person wearing the jewelry, rather than simple compositing.
 
         Args:
-            person_image: PIL Image of the person
-            jewelry_image: PIL Image of the jewelry
+            person_image: Person image (PIL image, raw bytes, or prepare_inline_image() part)
+            jewelry_image: Jewelry image (PIL image, raw bytes, or prepare_inline_image() part)
             jewelry_type: Type of jewelry (ring, bracelet, necklace, earring)
             jewelry_description: Additional description of the jewelry
+            user_id: Caller identity for the admission controller's per-user cap
+            progress: Tracker for stage events (preparing, queued, sending, receiving, storing);
+                the caller publishes the final event
 
         Returns:
-            Dict with generated image and metadata
+            Dict with generated image and metadata ("queue" has the position/ETA on arrival and time waited)
+
+        Raises:
+            AdmissionRejectedError: If the try-on queue is full, the user is at their cap,
+                or Gemini is still rate limited (429/503) after the last retry
         """
+        progress = progress or tryon_progress_service.track()
         try:
             logger.info("=" * 80)
             logger.info("🎨 STARTING VIRTUAL TRY-ON GENERATION WITH GEMINI 2.5")
             logger.info("=" * 80)
-            logger.info(f"📸 Person image size: {person_image.size}, mode: {person_image.mode}")
-            logger.info(f"💍 Jewelry image size: {jewelry_image.size}, mode: {jewelry_image.mode}")
             logger.info(f"📋 Jewelry type: {jewelry_type}")
             logger.info(f"📝 Description: {jewelry_description}")
             logger.info("-" * 80)
@@ -148,27 +403,22 @@ Instructions:
 
 Create a high-quality, professional model-style composite image showing the person in either a sitting or standing pose, naturally wearing the jewelry piece against the specified background color."""
 
-            # Convert images to base64
-            logger.info("🔄 Converting images to base64...")
-            person_b64, person_mime = self._image_to_base64(person_image)
-            jewelry_b64, jewelry_mime = self._image_to_base64(jewelry_image)
+            # Convert images to inline parts (uploads that need no processing pass straight through)
+            if not (isinstance(person_image, dict) and isinstance(jewelry_image, dict)):
+                progress.stage("preparing")
+            person_part, jewelry_part = await asyncio.gather(
+                self._prepare_part(person_image),
+                self._prepare_part(jewelry_image, keep_alpha=True)
+            )
+            for name, part in (("Person", person_part), ("Jewelry", jewelry_part)):
+                logger.info(f"{name} image: {part['inline_data']['mime_type']}, {len(part['inline_data']['data'])} base64 chars")
 
             # Prepare request payload for Gemini API
             # Using the REST API format from the Node.js code
             parts = [
                 {"text": prompt},
-                {
-                    "inline_data": {
-                        "mime_type": person_mime,
-                        "data": person_b64
-                    }
-                },
-                {
-                    "inline_data": {
-                        "mime_type": jewelry_mime,
-                        "data": jewelry_b64
-                    }
-                }
+                person_part,
+                jewelry_part
             ]
 
             request_payload = {
@@ -187,89 +437,75 @@ Create a high-quality, professional model-style composite image showing the pers
             # Make direct REST API call using httpx
             api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model_name}:generateContent"
 
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(
-                    api_url,
-                    json=request_payload,
-                    headers={
-                        "x-goog-api-key": settings.gemini_api_key,
-                        "Content-Type": "application/json"
-                    }
-                )
-                response.raise_for_status()
-                response_data = response.json()
-
-            logger.info("✅ Received response from Gemini API")
-
-            # Extract the base64 image data from response
-            candidate = response_data.get("candidates", [{}])[0]
-            if not candidate or "content" not in candidate or "parts" not in candidate["content"]:
-                logger.error(f"Invalid response structure: {response_data}")
-                raise ValueError("No content parts found in response")
-
-            # Look for inline_data or inlineData in the response parts
-            base64_image_data = None
-            for part in candidate["content"]["parts"]:
-                # Check for both camelCase (inlineData) and snake_case (inline_data) formats
-                if "inlineData" in part and "data" in part["inlineData"]:
-                    base64_image_data = part["inlineData"]["data"]
-                    logger.info("Found image data in inlineData format")
-                    break
-                elif "inline_data" in part and "data" in part["inline_data"]:
-                    base64_image_data = part["inline_data"]["data"]
-                    logger.info("Found image data in inline_data format")
-                    break
-
-            if not base64_image_data:
-                # Fallback: try to extract from the entire response text
-                import json
-                response_text = json.dumps(response_data)
-                import re
-                data_match = re.search(r'"data":\s*"([^"]*)"', response_text)
-                if data_match:
-                    base64_image_data = data_match.group(1)
-                    logger.info("Found image data using fallback regex")
-
-            if not base64_image_data:
-                logger.error(f"Full response: {response_data}")
-                raise ValueError("No image data found in response")
-
-            # Decode base64 to PIL Image
-            logger.info("🖼️  Decoding base64 image data...")
-            image_bytes = base64.b64decode(base64_image_data)
-            generated_image = Image.open(io.BytesIO(image_bytes))
-
-            logger.info(f"✅ Generated image decoded. Size: {generated_image.size}, Mode: {generated_image.mode}")
-
-            # Upload to S3 using s3_service
+            # Stream the response: the inline image is base64-decoded as it arrives and
+            # piped into S3, so the full JSON body / image is never held in memory at once
             import uuid
-            import datetime
 
-            logger.info("☁️  Uploading to S3...")
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             unique_id = str(uuid.uuid4())[:8]
-            result_filename = f"tryon_{timestamp}_{unique_id}.png"
-
-            # Upload to S3
-            s3_url, s3_key = s3_service.upload_from_pil(
-                generated_image,
-                folder="tryon",
-                filename=result_filename,
-                format="PNG"
-            )
+            result_basename = f"tryon_{timestamp}_{unique_id}"
+
+            # Bounded concurrency: each attempt waits for a Gemini slot (FIFO, per-user capped)
+            # and gives it back before backing off, so a retrying request doesn't idle a slot
+            client = http_client_service.get_client("gemini")
+            for attempt in range(settings.tryon_max_retries + 1):
+                progress.stage("queued", **tryon_admission.queue_status())
+                async with tryon_admission.slot(user_id) as ticket:
+                    progress.stage("sending", attempt=attempt + 1, queue=ticket.to_dict())
+                    async with client.stream(
+                        "POST",
+                        api_url,
+                        json=request_payload,
+                        headers={
+                            "x-goog-api-key": settings.gemini_api_key,
+                            "Content-Type": "application/json"
+                        },
+                        timeout=120.0
+                    ) as response:
+                        retry_delay = None
+                        if response.status_code in RETRYABLE_STATUSES:
+                            retry_delay = self._retry_delay(response, attempt)
+                            if attempt >= settings.tryon_max_retries:
+                                # Still rate limited after every retry: tell the client to back off
+                                raise AdmissionRejectedError(
+                                    f"Try-on service is busy (Gemini returned {response.status_code}), please retry shortly",
+                                    retry_after=max(1, math.ceil(retry_delay))
+                                )
+                        else:
+                            if response.is_error:
+                                await response.aread()
+                            response.raise_for_status()
+
+                            logger.info("✅ Receiving response from Gemini API")
+                            progress.stage("receiving")
+                            s3_url, s3_key, image_bytes_size, image_size = await self._stream_result_to_storage(
+                                response, result_basename, progress
+                            )
+
+                if retry_delay is None:
+                    break
+                self.stats["retries"] += 1
+                progress.stage("retrying", status_code=response.status_code, delay_seconds=round(retry_delay, 1))
+                logger.warning(
+                    f"Gemini returned {response.status_code}, retrying in {retry_delay:.1f}s "
+                    f"(attempt {attempt + 1}/{settings.tryon_max_retries})"
+                )
+                await asyncio.sleep(retry_delay)
 
+            progress.end_stage()
             logger.info(f"✅ Uploaded to S3: {s3_url}")
-            logger.info(f"   🔑 S3 Key: {s3_key}")
+            logger.info(f"   🔑 S3 Key: {s3_key} ({image_bytes_size} bytes, {image_size})")
 
             result = {
                 "success": True,
                 "result_url": s3_url,
                 "s3_url": s3_url,
                 "s3_key": s3_key,
-                "size": len(image_bytes),
-                "image_size": generated_image.size,
+                "size": image_bytes_size,
+                "image_size": image_size,
                 "model_used": self.model_name,
                 "jewelry_type": jewelry_type,
+                "queue": ticket.to_dict(),
                 "message": "Virtual try-on generated successfully with Gemini 2.5 Flash!",
                 "generation_method": "gemini_ai_image_generation"
             }
@@ -290,15 +526,111 @@ Create a high-quality, professional model-style composite image showing the pers
             logger.error(f"🔍 Traceback:\n{traceback.format_exc()}")
             raise
 
+    async def tryon_cache_key(
+        self,
+        user_id: str,
+        body_data: Optional[bytes],
+        jewelry_data: bytes,
+        jewelry_type: str,
+        jewelry_description: Optional[str],
+        body_hash: Optional[str] = None
+    ) -> str:
+        """
+        Cache key for a try-on request
+
+        Keys are scoped to the user: results are only ever reused for the user
+        who uploaded the photos, in the in-process and Redis tiers alike.
+
+        Args:
+            user_id: MongoDB user ID of the requester
+            body_data: Uploaded body photo bytes (may be None if body_hash is given)
+            jewelry_data: Uploaded jewelry photo bytes
+            jewelry_type: Type of jewelry
+            jewelry_description: Text description of the jewelry
+            body_hash: Precomputed perceptual_hash() of the body photo (batch requests)
+
+        Returns:
+            Cache key (perceptual hashes make re-encoded/resized copies of a photo match)
+
+        Raises:
+            ValueError: If either upload is not a readable image
+        """
+        if body_hash is None:
+            body_hash, jewelry_hash = await asyncio.gather(
+                image_executor_service.run(perceptual_hash, body_data),
+                image_executor_service.run(perceptual_hash, jewelry_data)
+            )
+        else:
+            jewelry_hash = await image_executor_service.run(perceptual_hash, jewelry_data)
+        params = tryon_cache.make_key(str(user_id), jewelry_type, jewelry_description or "", self.model_name)
+        body_hash, jewelry_hash = self._snap_hashes(params, body_hash, jewelry_hash)
+        return tryon_cache.make_key(params, body_hash, jewelry_hash)
+
+    def _snap_hashes(self, params: str, body_hash: str, jewelry_hash: str) -> Tuple[str, str]:
+        """Replace a hash pair with the closest recently seen pair within tryon_cache_max_distance"""
+        max_distance = settings.tryon_cache_max_distance
+        best, best_distance = None, None
+        for entry in self._known_hashes:
+            if entry[0] != params:
+                continue
+            body_distance = hash_distance(entry[1], body_hash)
+            jewelry_distance = hash_distance(entry[2], jewelry_hash)
+            if body_distance > max_distance or jewelry_distance > max_distance:
+                continue
+            if best is None or body_distance + jewelry_distance < best_distance:
+                best, best_distance = entry, body_distance + jewelry_distance
+
+        entry = best or (params, body_hash, jewelry_hash)
+        self._known_hashes[entry] = None
+        self._known_hashes.move_to_end(entry)
+        while len(self._known_hashes) > settings.tryon_cache_max_entries:
+            self._known_hashes.popitem(last=False)
+        return entry[1], entry[2]
+
+    def _result_from_cache(self, cached: Dict) -> Dict:
+        """Rebuild a try-on result from a cache entry with a fresh presigned URL"""
+        url = s3_service.generate_presigned_url(cached["s3_key"], expiration=86400)
+        if not url:
+            url = f"https://s3.{settings.aws_region}.amazonaws.com/{s3_service.bucket}/{cached['s3_key']}"
+        return {
+            "success": True,
+            "result_url": url,
+            "s3_url": url,
+            **cached,
+            "image_size": tuple(cached["image_size"]) if cached.get("image_size") else None,
+            "message": "Virtual try-on loaded from cache",
+            "generation_method": "gemini_ai_image_generation"
+        }
+
+    async def cached_tryon(self, cache_key: str) -> Optional[Dict]:
+        """
+        Stored try-on for a cache key, without generating
+
+        Args:
+            cache_key: Key from tryon_cache_key()
+
+        Returns:
+            Result dict with "cached": True, or None on a miss
+        """
+        cached = await tryon_cache.get(cache_key)
+        if not cached:
+            return None
+        logger.info(f"Try-on cache hit: {cache_key[:12]}")
+        return {**self._result_from_cache(cached), "cached": True}
+
     async def generate_tryon(
         self,
-        body_image: Image.Image,
-        jewelry_image: Image.Image,
+        body_image: InlineImage,
+        jewelry_image: InlineImage,
         jewelry_type: str,
         jewelry_description: str,
         target_area: Optional[str] = None,
         use_examples: bool = False,
-        auto_detect: bool = False
+        auto_detect: bool = False,
+        cache_key: Optional[str] = None,
+        force_regenerate: bool = False,
+        user_id: Optional[str] = None,
+        progress: Optional[TryOnProgress] = None
     ) -> Dict:
         """
         Generate virtual try-on image (main entry point for compatibility)
@@ -307,25 +639,49 @@ Create a high-quality, professional model-style composite image showing the pers
         while using the new Gemini AI image generation approach.
 
         Args:
-            body_image: PIL Image (can be hand, neck, full body, etc.)
-            jewelry_image: PIL Image of the jewelry design
+            body_image: Body image (hand, neck, full body, etc.) as PIL image, bytes or prepared part
+            jewelry_image: Jewelry image as PIL image, bytes or prepared part
             jewelry_type: Type of jewelry (ring, bracelet, necklace, earring)
             jewelry_description: Text description of the jewelry
             target_area: Specific placement area (ignored - AI determines this)
             use_examples: Whether to use few-shot learning (ignored in new version)
             auto_detect: Whether to auto-detect body part (ignored - AI does this)
+            cache_key: Key from tryon_cache_key() to reuse/store the result (None disables caching)
+            force_regenerate: Skip the cache lookup (the new result still replaces the cached one)
+            user_id: Caller identity for the admission controller's per-user cap
+            progress: Optional tracker for stage events (see generate_tryon_image)
 
         Returns:
-            Dict with generated image and metadata
+            Dict with generated image and metadata ("cached" is True when no generation ran)
         """
-        # Simply delegate to the new AI generation method
-        return await self.generate_tryon_image(
+        use_cache = cache_key is not None and settings.tryon_cache_enabled
+
+        if use_cache and not force_regenerate:
+            if progress is not None:
+                progress.stage("cache_lookup")
+            cached = await self.cached_tryon(cache_key)
+            if cached:
+                if progress is not None:
+                    progress.end_stage()
+                return cached
+
+        # Delegate to the AI generation method
+        result = await self.generate_tryon_image(
             person_image=body_image,
             jewelry_image=jewelry_image,
             jewelry_type=jewelry_type,
-            jewelry_description=jewelry_description
+            jewelry_description=jewelry_description,
+            user_id=user_id,
+            progress=progress
         )
 
+        if use_cache:
+            await tryon_cache.set(cache_key, {
+                key: result[key] for key in ("s3_key", "size", "image_size", "model_used", "jewelry_type")
+            })
+
+        return {**result, "cached": False}
+
 
 # Global service instance
 virtual_tryon_service = VirtualTryOnService()
@@ -0,0 +1,105 @@
+"""
+In-process event broker
+Fans out progress/status events to Server-Sent Events (SSE) subscribers
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+
+class EventBroker:
+    """Publish/subscribe channels with a short replay history for late subscribers"""
+
+    def __init__(self, history_size: int = 50, history_ttl_seconds: int = 900):
+        self.history_size = history_size
+        self.history_ttl_seconds = history_ttl_seconds
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._history: Dict[str, Deque[Tuple[float, Dict]]] = {}
+
+    def _prune(self):
+        """Drop replay history for channels that have gone quiet"""
+        cutoff = time.time() - self.history_ttl_seconds
+        for channel in [c for c, h in self._history.items() if h and h[-1][0] < cutoff]:
+            if not self._subscribers.get(channel):
+                del self._history[channel]
+
+    def publish(self, channel: str, event: Dict):
+        """
+        Publish an event to a channel
+
+        Args:
+            channel: Channel name (e.g. "design-analysis:42")
+            event: JSON-serialisable event; set "final": True on the last event
+        """
+        self._prune()
+        history = self._history.setdefault(channel, deque(maxlen=self.history_size))
+        history.append((time.time(), event))
+
+        for queue in self._subscribers.get(channel, set()):
+            queue.put_nowait(event)
+
+    def get_history(self, channel: str) -> list:
+        """Get the replay history for a channel"""
+        return [event for _, event in self._history.get(channel, [])]
+
+    async def subscribe(
+        self,
+        channel: str,
+        timeout: Optional[float] = None,
+        replay: bool = True
+    ) -> AsyncIterator[Dict]:
+        """
+        Iterate over events on a channel until a final event or timeout
+
+        Args:
+            channel: Channel name
+            timeout: Max seconds to wait for the next event (None waits forever)
+            replay: Whether to first yield events published before subscribing
+
+        Yields:
+            Event dicts
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            if replay:
+                for event in self.get_history(channel):
+                    yield event
+                    if event.get("final"):
+                        return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    return
+                yield event
+                if event.get("final"):
+                    return
+        finally:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+
+def format_sse(data: Dict, event: Optional[str] = None) -> str:
+    """
+    Format a payload as a Server-Sent Events message
+
+    Args:
+        data: JSON-serialisable payload
+        event: Optional SSE event name
+
+    Returns:
+        SSE-formatted string
+    """
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, default=str)}\n\n"
+
+
+# Global event broker instance
+event_broker = EventBroker()
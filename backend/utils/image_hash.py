@@ -0,0 +1,58 @@
+"""
+Perceptual image hashing
+Difference hashes (dHash) that survive re-encoding, resizing and EXIF stripping
+"""
+import io
+
+from PIL import Image, ImageOps
+
+
+def perceptual_hash(data: bytes, hash_size: int = 8) -> str:
+    """
+    Compute a difference hash of an image
+
+    The image is reduced to a (hash_size + 1) x hash_size greyscale thumbnail and
+    each bit records whether a pixel is brighter than its right-hand neighbour, so
+    the same photo re-saved at another quality or size hashes identically.
+
+    Args:
+        data: Encoded image bytes
+        hash_size: Bits per row (the hash has hash_size**2 bits)
+
+    Returns:
+        Hex string of the hash
+
+    Raises:
+        ValueError: If the bytes are not a readable image
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        # JPEG: let the decoder downscale by up to 8x; we only need a tiny thumbnail
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    except Exception as e:
+        raise ValueError(f"Invalid image file: {e}")
+
+    pixels = image.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+
+def hash_distance(a: str, b: str) -> int:
+    """
+    Hamming distance between two perceptual hashes
+
+    Args:
+        a: Hex hash from perceptual_hash()
+        b: Hex hash from perceptual_hash()
+
+    Returns:
+        Number of differing bits
+    """
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
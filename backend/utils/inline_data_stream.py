@@ -0,0 +1,209 @@
+"""
+Incremental extraction of inline image data from Gemini generateContent responses
+Scans the JSON body chunk by chunk and base64-decodes the first inlineData part as it arrives
+"""
+import base64
+import codecs
+import re
+from typing import List, Optional
+
+# Object keys whose "data" member holds base64 image bytes (REST camelCase and SDK snake_case)
+INLINE_DATA_KEYS = ("inlineData", "inline_data")
+MIME_TYPE_KEYS = ("mimeType", "mime_type")
+
+# Longest text part kept for error reporting
+MAX_TEXT_CHARS = 2000
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class InlineDataExtractor:
+    """
+    Streaming scanner for a Gemini response body
+
+    Feed raw response bytes with feed(); it returns the decoded image bytes that
+    became available. Only the JSON skeleton is tracked (no values are built), so
+    memory stays at one network chunk plus at most three pending base64 chars,
+    however large the image is.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._carry = ""            # Incomplete escape sequence from the previous chunk
+        self._containers: List[str] = []   # "{" or "["
+        self._parent_keys: List[Optional[str]] = []  # Key each open container is stored under
+        self._key: Optional[str] = None    # Last key read in the innermost object
+        self._expect_key = False
+        self._in_string = False
+        self._string_role = None    # "key", "data", "mime", "text" or None (ignored value)
+        self._pieces: List[str] = []
+        self._b64_pending = ""
+        self.mime_type: Optional[str] = None
+        self.texts: List[str] = []
+        self.found = False          # An inline image part has started
+        self.complete = False       # The first inline image has been fully decoded
+
+    def _inline_parent(self) -> bool:
+        return bool(self._parent_keys) and self._parent_keys[-1] in INLINE_DATA_KEYS
+
+    def _value_key(self) -> Optional[str]:
+        return self._key if self._containers and self._containers[-1] == "{" else None
+
+    def _start_string(self):
+        self._in_string = True
+        self._pieces = []
+        if self._containers and self._containers[-1] == "{" and self._expect_key:
+            self._string_role = "key"
+            return
+
+        key = self._value_key()
+        if key == "data" and self._inline_parent() and not self.complete:
+            self._string_role = "data"
+            self.found = True
+        elif key in MIME_TYPE_KEYS and self._inline_parent():
+            self._string_role = "mime"
+        elif key == "text":
+            self._string_role = "text"
+        else:
+            self._string_role = None
+
+    def _append(self, text: str, out: List[bytes]):
+        if self._string_role == "data":
+            self._b64_pending += text.replace("\n", "").replace("\r", "")
+            usable = len(self._b64_pending) - len(self._b64_pending) % 4
+            if usable:
+                out.append(base64.b64decode(self._b64_pending[:usable]))
+                self._b64_pending = self._b64_pending[usable:]
+        elif self._string_role is not None:
+            self._pieces.append(text)
+
+    def _end_string(self, out: List[bytes]):
+        self._in_string = False
+        role = self._string_role
+        if role == "key":
+            self._key = "".join(self._pieces)
+            self._expect_key = False
+        elif role == "data":
+            if self._b64_pending:
+                # Unpadded tail
+                out.append(base64.b64decode(self._b64_pending + "=" * (-len(self._b64_pending) % 4)))
+                self._b64_pending = ""
+            self.complete = True
+        elif role == "mime" and self.mime_type is None:
+            self.mime_type = "".join(self._pieces)
+        elif role == "text" and sum(len(t) for t in self.texts) < MAX_TEXT_CHARS:
+            self.texts.append("".join(self._pieces)[:MAX_TEXT_CHARS])
+        self._pieces = []
+
+    def _scan_string(self, text: str, i: int, out: List[bytes]) -> int:
+        """Consume string content from text[i:]; returns the next index (len(text) if unfinished)"""
+        length = len(text)
+        while i < length:
+            match = _STRING_SPECIAL.search(text, i)
+            if match is None:
+                self._append(text[i:], out)
+                return length
+
+            j = match.start()
+            if j > i:
+                self._append(text[i:j], out)
+
+            if text[j] == '"':
+                self._end_string(out)
+                return j + 1
+
+            # Backslash escape (may be split across chunks)
+            if j + 1 >= length:
+                self._carry = text[j:]
+                return length
+            escape = text[j + 1]
+            if escape == "u":
+                if j + 6 > length:
+                    self._carry = text[j:]
+                    return length
+                self._append(chr(int(text[j + 2:j + 6], 16)), out)
+                i = j + 6
+            else:
+                self._append(_ESCAPES.get(escape, escape), out)
+                i = j + 2
+        return length
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """
+        Scan the next chunk of the response body
+
+        Args:
+            data: Raw response bytes
+
+        Returns:
+            Image byte chunks decoded from this input (possibly empty)
+        """
+        return self._scan(self._decoder.decode(data))
+
+    def _scan(self, text: str) -> List[bytes]:
+        text = self._carry + text
+        self._carry = ""
+        out: List[bytes] = []
+
+        i = 0
+        length = len(text)
+        while i < length:
+            if self._in_string:
+                i = self._scan_string(text, i, out)
+                continue
+
+            char = text[i]
+            if char == '"':
+                self._start_string()
+            elif char in "{[":
+                self._parent_keys.append(self._value_key())
+                self._containers.append(char)
+                self._expect_key = char == "{"
+                self._key = None
+            elif char in "}]":
+                if self._containers:
+                    self._containers.pop()
+                    self._key = self._parent_keys.pop()
+                self._expect_key = False
+            elif char == ",":
+                self._expect_key = bool(self._containers) and self._containers[-1] == "{"
+            i += 1
+
+        return out
+
+    def close(self) -> List[bytes]:
+        """
+        Finish the scan
+
+        Returns:
+            Any remaining image bytes
+
+        Raises:
+            ValueError: If the body ended inside the image data
+        """
+        out = self._scan(self._decoder.decode(b"", final=True))
+        if self.found and not self.complete:
+            raise ValueError("Response ended before the image data was complete")
+        return out
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """
+    Detect an image MIME type from its first bytes
+
+    Args:
+        header: Leading bytes of the image
+
+    Returns:
+        MIME type or None if unrecognised
+    """
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return None
@@ -0,0 +1,301 @@
+"""
+Mesh parsing and statistics
+Vectorized NumPy readers for GLB, OBJ and STL plus geometry stats. Kept free of
+app imports so it can run in a lightweight process-pool worker.
+"""
+import json
+import re
+import struct
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# glTF componentType -> NumPy dtype
+GLTF_COMPONENT_TYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32
+}
+GLTF_TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16}
+
+# Vertices closer than this (relative to the bounding box diagonal) are welded
+WELD_TOLERANCE = 1e-6
+
+OBJ_VERTEX_RE = re.compile(rb"^v[ \t]+(\S+)[ \t]+(\S+)[ \t]+(\S+)", re.M)
+OBJ_FACE_RE = re.compile(rb"^f[ \t]+(.*?)[ \t]*\r?$", re.M)
+OBJ_INDEX_RE = re.compile(rb"(?:^|\s)(-?\d+)")
+STL_VERTEX_RE = re.compile(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)")
+
+
+def detect_format(header: bytes, size: int) -> str:
+    """
+    Detect a mesh format from its first bytes (Tripo may return GLB whatever export was asked for)
+
+    Args:
+        header: First bytes of the file (at least 84)
+        size: Total file size in bytes
+
+    Returns:
+        "glb", "stl" or "obj"
+    """
+    if header[:4] == b"glTF":
+        return "glb"
+    if len(header) >= 84:
+        triangles = struct.unpack_from("<I", header, 80)[0]
+        if size == 84 + triangles * 50:
+            return "stl"
+    if header.lstrip()[:5].lower() == b"solid":
+        return "stl"
+    return "obj"
+
+
+def _node_matrix(node: Dict) -> np.ndarray:
+    """Local transform of a glTF node (matrix, or translation/rotation/scale)"""
+    if "matrix" in node:
+        return np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T
+
+    x, y, z, w = node.get("rotation", [0.0, 0.0, 0.0, 1.0])
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]
+    ])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.array(node.get("scale", [1.0, 1.0, 1.0]))
+    matrix[:3, 3] = node.get("translation", [0.0, 0.0, 0.0])
+    return matrix
+
+
+def _read_accessor(gltf: Dict, binary: memoryview, index: int) -> np.ndarray:
+    """Read a glTF accessor as an (count, components) array without copying the buffer"""
+    accessor = gltf["accessors"][index]
+    if "bufferView" not in accessor:
+        raise ValueError("Sparse or empty accessors are not supported")
+
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    dtype = np.dtype(GLTF_COMPONENT_TYPES[accessor["componentType"]])
+    components = GLTF_TYPE_SIZES[accessor["type"]]
+    count = accessor["count"]
+    offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    stride = view.get("byteStride") or dtype.itemsize * components
+
+    return np.ndarray(
+        shape=(count, components),
+        dtype=dtype,
+        buffer=binary,
+        offset=offset,
+        strides=(stride, dtype.itemsize)
+    )
+
+
+def _primitive_faces(mode: int, indices: np.ndarray) -> np.ndarray:
+    """Convert a primitive's index list to triangles"""
+    if mode == 4:  # TRIANGLES
+        return indices[: len(indices) // 3 * 3].reshape(-1, 3)
+    if mode == 5:  # TRIANGLE_STRIP (flip every other triangle to keep winding)
+        i = np.arange(len(indices) - 2)
+        faces = np.stack([indices[i], indices[i + 1], indices[i + 2]], axis=1)
+        faces[1::2, [1, 2]] = faces[1::2, [2, 1]]
+        return faces
+    if mode == 6:  # TRIANGLE_FAN
+        i = np.arange(1, len(indices) - 1)
+        return np.stack([np.full_like(i, indices[0]), indices[i], indices[i + 1]], axis=1)
+    return np.empty((0, 3), dtype=np.int64)  # points/lines have no faces
+
+
+def parse_glb(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse triangle geometry from a binary glTF, applying node transforms
+
+    Returns:
+        Tuple of (vertices float64 (N, 3), faces int64 (M, 3))
+    """
+    magic, version, _ = struct.unpack_from("<III", data, 0)
+    if magic != 0x46546C67 or version != 2:
+        raise ValueError("Not a glTF 2.0 binary")
+
+    json_length, _ = struct.unpack_from("<II", data, 12)
+    gltf = json.loads(data[20:20 + json_length])
+    binary = memoryview(b"")
+    bin_start = 20 + json_length
+    if bin_start + 8 <= len(data):
+        bin_length, _ = struct.unpack_from("<II", data, bin_start)
+        binary = memoryview(data)[bin_start + 8:bin_start + 8 + bin_length]
+
+    if "KHR_draco_mesh_compression" in gltf.get("extensionsUsed", []):
+        raise ValueError("Draco-compressed meshes are not supported")
+
+    # World transform for every node that references a mesh
+    nodes = gltf.get("nodes", [])
+    if gltf.get("scenes"):
+        roots = gltf["scenes"][gltf.get("scene", 0)].get("nodes", [])
+    else:
+        children = {child for node in nodes for child in node.get("children", [])}
+        roots = [i for i in range(len(nodes)) if i not in children]
+
+    instances: List[Tuple[int, np.ndarray]] = []
+    stack = [(i, np.eye(4)) for i in roots]
+    while stack:
+        node_index, parent = stack.pop()
+        node = nodes[node_index]
+        world = parent @ _node_matrix(node)
+        if "mesh" in node:
+            instances.append((node["mesh"], world))
+        stack.extend((child, world) for child in node.get("children", []))
+    if not instances:
+        instances = [(i, np.eye(4)) for i in range(len(gltf.get("meshes", [])))]
+
+    vertex_blocks, face_blocks = [], []
+    vertex_offset = 0
+    for mesh_index, world in instances:
+        for primitive in gltf["meshes"][mesh_index].get("primitives", []):
+            positions = _read_accessor(gltf, binary, primitive["attributes"]["POSITION"]).astype(np.float64)
+            if "indices" in primitive:
+                indices = _read_accessor(gltf, binary, primitive["indices"]).ravel().astype(np.int64)
+            else:
+                indices = np.arange(len(positions), dtype=np.int64)
+
+            vertex_blocks.append(positions @ world[:3, :3].T + world[:3, 3])
+            face_blocks.append(_primitive_faces(primitive.get("mode", 4), indices) + vertex_offset)
+            vertex_offset += len(positions)
+
+    if not vertex_blocks:
+        return np.empty((0, 3)), np.empty((0, 3), dtype=np.int64)
+    return np.concatenate(vertex_blocks), np.concatenate(face_blocks)
+
+
+def parse_obj(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a Wavefront OBJ (polygons are fan-triangulated)
+
+    Returns:
+        Tuple of (vertices float64 (N, 3), faces int64 (M, 3))
+    """
+    vertices = np.array(OBJ_VERTEX_RE.findall(data), dtype=np.float64).reshape(-1, 3)
+
+    face_lines = OBJ_FACE_RE.findall(data)
+    if not face_lines:
+        return vertices, np.empty((0, 3), dtype=np.int64)
+
+    # One vertex index per "v", "v/vt", "v//vn" or "v/vt/vn" token
+    face_blob = re.sub(rb"[ \t]+", b" ", b"\n".join(face_lines))
+    counts = np.char.count(np.array(face_blob.split(b"\n")), b" ") + 1
+    indices = np.array(OBJ_INDEX_RE.findall(face_blob), dtype=np.int64)
+    if counts.sum() != len(indices):
+        raise ValueError("Malformed OBJ face records")
+
+    # OBJ indices are 1-based; negative indices count back from the end
+    indices = np.where(indices < 0, indices + len(vertices), indices - 1)
+
+    # Fan triangulation: face k with n vertices -> (v0, vi, vi+1) for i in 1..n-2
+    triangles_per_face = np.maximum(counts - 2, 0)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    face_of_triangle = np.repeat(np.arange(len(counts)), triangles_per_face)
+    first_triangle = np.concatenate([[0], np.cumsum(triangles_per_face)[:-1]])
+    i = np.arange(len(face_of_triangle)) - first_triangle[face_of_triangle] + 1
+    base = starts[face_of_triangle]
+    faces = np.stack([indices[base], indices[base + i], indices[base + i + 1]], axis=1)
+    return vertices, faces
+
+
+def parse_stl(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a binary or ASCII STL (one vertex triple per facet, welded later)
+
+    Returns:
+        Tuple of (vertices float64 (N, 3), faces int64 (M, 3))
+    """
+    triangles = struct.unpack_from("<I", data, 80)[0] if len(data) >= 84 else -1
+    if len(data) == 84 + triangles * 50:
+        record = np.dtype([("normal", "<f4", 3), ("vertices", "<f4", (3, 3)), ("attributes", "<u2")])
+        facets = np.frombuffer(data, dtype=record, count=triangles, offset=84)["vertices"]
+    else:
+        facets = np.array(STL_VERTEX_RE.findall(data), dtype=np.float64).reshape(-1, 3, 3)
+
+    vertices = facets.reshape(-1, 3).astype(np.float64)
+    return vertices, np.arange(len(vertices), dtype=np.int64).reshape(-1, 3)
+
+
+PARSERS = {"glb": parse_glb, "obj": parse_obj, "stl": parse_stl}
+
+
+def compute_stats(vertices: np.ndarray, faces: np.ndarray) -> Dict:
+    """
+    Compute geometry statistics for a triangle mesh
+
+    Vertices are welded by position first so seams (split UVs/normals, STL facets)
+    don't make a closed mesh look open.
+
+    Returns:
+        Dict with vertex/face counts, bounding box, surface area, volume and watertightness
+    """
+    if len(vertices) == 0 or len(faces) == 0:
+        return {
+            "vertices": int(len(vertices)), "faces": 0, "is_watertight": False,
+            "volume": None, "surface_area": 0.0, "bounding_box": None
+        }
+
+    bbox_min = vertices.min(axis=0)
+    bbox_max = vertices.max(axis=0)
+    extent = bbox_max - bbox_min
+
+    tolerance = max(float(np.linalg.norm(extent)) * WELD_TOLERANCE, 1e-12)
+    _, welded_index, inverse = np.unique(
+        np.round(vertices / tolerance).astype(np.int64), axis=0, return_index=True, return_inverse=True
+    )
+    welded_faces = inverse.reshape(-1)[faces]
+
+    # Drop degenerate triangles (repeated vertex after welding)
+    valid = (
+        (welded_faces[:, 0] != welded_faces[:, 1])
+        & (welded_faces[:, 1] != welded_faces[:, 2])
+        & (welded_faces[:, 0] != welded_faces[:, 2])
+    )
+    welded_faces = welded_faces[valid]
+
+    a, b, c = (vertices[welded_index][welded_faces[:, k]] for k in range(3))
+    cross = np.cross(b - a, c - a)
+    surface_area = float(0.5 * np.linalg.norm(cross, axis=1).sum())
+
+    # Closed 2-manifold: every undirected edge is shared by exactly two triangles
+    edges = np.sort(welded_faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    _, edge_counts = np.unique(edges, axis=0, return_counts=True)
+    is_watertight = bool(len(edge_counts) and np.all(edge_counts == 2))
+
+    # Divergence theorem; only meaningful for closed meshes
+    volume = float(abs(np.einsum("ij,ij->i", a, np.cross(b, c)).sum()) / 6.0) if is_watertight else None
+
+    return {
+        "vertices": int(len(vertices)),
+        "unique_vertices": int(len(welded_index)),
+        "faces": int(len(faces)),
+        "is_watertight": is_watertight,
+        "volume": volume,
+        "surface_area": surface_area,
+        "bounding_box": {
+            "min": bbox_min.tolist(),
+            "max": bbox_max.tolist(),
+            "size": extent.tolist()
+        }
+    }
+
+
+def analyze_mesh_file(path: str) -> Dict:
+    """
+    Parse a mesh file and compute its statistics (process-pool entry point)
+
+    Args:
+        path: Path to a GLB, OBJ or STL file
+
+    Returns:
+        Stats dict including the detected "source_format"
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    mesh_format = detect_format(data[:512], len(data))
+    vertices, faces = PARSERS[mesh_format](data)
+    return {**compute_stats(vertices, faces), "source_format": mesh_format}
@@ -0,0 +1,286 @@
+"""
+QC Image Migration
+Moves uploads stored inline as data: URLs in qc_inspections (and copied into rework
+evidence) to the storage backend, keeping only storage keys in the rows.
+
+Rows are processed in id order, batch by batch (one commit per batch), so the tool
+can be stopped and re-run at any time; migrated rows no longer match.
+
+Cleared rows only shrink the database file once it is compacted: pass --vacuum
+(SQLite VACUUM, PostgreSQL VACUUM FULL of the two tables, which locks them).
+
+Usage:
+    python -m backend.utils.migrate_qc_images [--batch-size 20] [--limit N] [--dry-run] [--vacuum]
+"""
+import argparse
+import base64
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote_to_bytes
+
+from sqlalchemy import String, cast, or_, text
+from sqlalchemy.orm import Session
+
+from backend.models.database import SessionLocal, QCInspection, ReworkJob, init_db
+from backend.services.qc_inspector_service import qc_inspector_service, UPLOAD_FOLDER, THUMBNAIL_FOLDER
+from backend.services.storage_service import get_storage_service
+
+logger = logging.getLogger(__name__)
+
+
+def decode_data_url(url: str) -> Tuple[bytes, str]:
+    """
+    Decode a data: URL
+
+    Args:
+        url: data:[<mediatype>][;base64],<data>
+
+    Returns:
+        Tuple of (bytes, content type)
+
+    Raises:
+        ValueError: If the URL is not a valid data URL
+    """
+    header, separator, payload = url.partition(",")
+    if not header.startswith("data:") or not separator:
+        raise ValueError("Not a data URL")
+    content_type = header[len("data:"):].split(";")[0] or "application/octet-stream"
+    if header.endswith(";base64"):
+        return base64.b64decode(payload, validate=True), content_type
+    return unquote_to_bytes(payload), content_type
+
+
+def database_size(db: Session) -> Optional[int]:
+    """Size of the database in bytes (SQLite and PostgreSQL; None for other backends)"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        page_count = db.execute(text("PRAGMA page_count")).scalar()
+        return page_count * db.execute(text("PRAGMA page_size")).scalar()
+    if dialect == "postgresql":
+        return db.execute(text("SELECT pg_database_size(current_database())")).scalar()
+    return None
+
+
+def vacuum_database(db: Session) -> bool:
+    """
+    Compact the database so space freed by cleared rows is returned to the filesystem
+
+    Returns:
+        False if the backend isn't supported
+    """
+    db.commit()
+    engine = db.get_bind()
+    if engine.dialect.name not in ("sqlite", "postgresql"):
+        logger.warning(f"Don't know how to vacuum a {engine.dialect.name} database, skipping")
+        return False
+
+    # VACUUM can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if engine.dialect.name == "sqlite":
+            connection.exec_driver_sql("VACUUM")
+        else:
+            # Plain VACUUM only makes the space reusable; FULL rewrites the tables
+            connection.exec_driver_sql(f"VACUUM FULL {QCInspection.__tablename__}, {ReworkJob.__tablename__}")
+    return True
+
+
+class QCImageMigration:
+    """One migration run: uploads each distinct data URL once and tracks what was cleared from rows"""
+
+    def __init__(self, db: Session, dry_run: bool = False):
+        self.db = db
+        self.dry_run = dry_run
+        # SHA-256 of a data URL -> storage key (evidence images repeat their inspection's URL)
+        self.keys: Dict[str, str] = {}
+        # (digest, size) of files uploaded for the row being migrated
+        self._row_uploads: List[Tuple[str, int]] = []
+        self.stats = {
+            "inspections": 0,
+            "rework_jobs": 0,
+            "files_uploaded": 0,
+            "bytes_uploaded": 0,
+            "bytes_cleared": 0,
+            "failed": 0
+        }
+
+    def _store(self, url: str, folder: str) -> str:
+        """Upload a data URL's content (once per distinct URL) and return its key"""
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        if digest not in self.keys:
+            data, content_type = decode_data_url(url)
+            if self.dry_run:
+                self.keys[digest] = f"{folder}/dry-run-{digest[:16]}"
+            else:
+                self.keys[digest] = qc_inspector_service.store_file(data, content_type, folder=folder)
+            self._row_uploads.append((digest, len(data)))
+            self.stats["files_uploaded"] += 1
+            self.stats["bytes_uploaded"] += len(data)
+        return self.keys[digest]
+
+    def _discard_row_uploads(self):
+        """Delete what a failed row uploaded (it keeps its data URLs) so later rows upload afresh"""
+        for digest, size in self._row_uploads:
+            key = self.keys.pop(digest)
+            if not self.dry_run and not get_storage_service().delete_image(key):
+                logger.warning(f"Could not delete orphaned upload {key}")
+            self.stats["files_uploaded"] -= 1
+            self.stats["bytes_uploaded"] -= size
+        self._row_uploads = []
+
+    def _finish_batch(self):
+        if self.dry_run:
+            self.db.rollback()
+        else:
+            self.db.commit()
+
+    def migrate_inspections(self, batch_size: int, limit: Optional[int] = None):
+        """Move data-URL files and thumbnails of QC inspections to storage"""
+        last_id = 0
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            # IDs first, rows one at a time: a batch's data URLs are never all in memory
+            ids = [row_id for (row_id,) in self.db.query(QCInspection.id).filter(
+                QCInspection.id > last_id,
+                or_(QCInspection.item_image_url.like("data:%"), QCInspection.item_thumbnail_url.like("data:%"))
+            ).order_by(QCInspection.id).limit(size).all()]
+            if not ids:
+                break
+
+            for row_id in ids:
+                inspection = self.db.get(QCInspection, row_id)
+                self._row_uploads = []
+                try:
+                    cleared = 0
+                    image_url, thumbnail_url = inspection.item_image_url, inspection.item_thumbnail_url
+                    if image_url and image_url.startswith("data:"):
+                        inspection.item_image_key = self._store(image_url, UPLOAD_FOLDER)
+                        inspection.item_image_url = None
+                        cleared += len(image_url)
+                    if thumbnail_url and thumbnail_url.startswith("data:"):
+                        # Inspections whose thumbnail failed stored the image URL twice
+                        folder = UPLOAD_FOLDER if thumbnail_url == image_url else THUMBNAIL_FOLDER
+                        inspection.item_thumbnail_key = self._store(thumbnail_url, folder)
+                        inspection.item_thumbnail_url = None
+                        cleared += len(thumbnail_url)
+                    # Flush per row so the old value isn't held until the batch commits
+                    self.db.flush()
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    logger.warning(f"Could not migrate inspection {row_id}: {e}")
+                    self.db.expire(inspection)
+                    self._discard_row_uploads()
+                    continue
+                self.stats["inspections"] += 1
+                self.stats["bytes_cleared"] += cleared
+
+            self._finish_batch()
+            last_id = ids[-1]
+            if remaining is not None:
+                remaining -= len(ids)
+            logger.info(f"Inspections up to id {last_id}: {self.stats['inspections']} migrated, "
+                        f"{self.stats['bytes_cleared']} bytes cleared from rows")
+
+    def migrate_rework_jobs(self, batch_size: int):
+        """Replace data-URL evidence images of rework jobs with storage keys"""
+        last_id = 0
+        while True:
+            ids = [row_id for (row_id,) in self.db.query(ReworkJob.id).filter(
+                ReworkJob.id > last_id,
+                cast(ReworkJob.evidence_images, String).like('%"data:%')
+            ).order_by(ReworkJob.id).limit(batch_size).all()]
+            if not ids:
+                break
+
+            for row_id in ids:
+                rework = self.db.get(ReworkJob, row_id)
+                self._row_uploads = []
+                try:
+                    evidence: List[Optional[str]] = []
+                    cleared = 0
+                    for image in rework.evidence_images or []:
+                        if isinstance(image, str) and image.startswith("data:"):
+                            evidence.append(self._store(image, UPLOAD_FOLDER))
+                            cleared += len(image)
+                        else:
+                            evidence.append(image)
+                    rework.evidence_images = evidence
+                    self.db.flush()
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    logger.warning(f"Could not migrate rework job {row_id}: {e}")
+                    self.db.expire(rework)
+                    self._discard_row_uploads()
+                    continue
+                self.stats["rework_jobs"] += 1
+                self.stats["bytes_cleared"] += cleared
+
+            self._finish_batch()
+            last_id = ids[-1]
+
+
+def migrate_qc_images(
+    db: Optional[Session] = None,
+    batch_size: int = 20,
+    limit: Optional[int] = None,
+    dry_run: bool = False,
+    vacuum: bool = False
+) -> Dict:
+    """
+    Move data-URL QC uploads to the storage backend
+
+    Args:
+        db: Session to use (a new one is opened if None)
+        batch_size: Rows per commit
+        limit: Maximum number of inspections to migrate (rework jobs are always processed)
+        dry_run: Decode and count everything, but upload nothing and roll back
+        vacuum: Compact the database afterwards (ignored for dry runs)
+
+    Returns:
+        Stats dict (rows migrated, files uploaded, bytes uploaded/cleared from rows,
+        failures, database size in bytes before and after)
+    """
+    session = db or SessionLocal()
+    try:
+        size_before = database_size(session)
+        migration = QCImageMigration(session, dry_run=dry_run)
+        migration.migrate_inspections(batch_size, limit)
+        migration.migrate_rework_jobs(batch_size)
+        if vacuum and not dry_run:
+            vacuum_database(session)
+        return {**migration.stats, "database_bytes_before": size_before, "database_bytes_after": database_size(session)}
+    finally:
+        if db is None:
+            session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=20, help="Rows per commit")
+    parser.add_argument("--limit", type=int, help="Maximum number of inspections to migrate")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would move without uploading or saving")
+    parser.add_argument("--vacuum", action="store_true", help="Compact the database afterwards to return the cleared space")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Applies pending migrations (adds the storage key columns)
+    init_db()
+
+    stats = migrate_qc_images(batch_size=args.batch_size, limit=args.limit, dry_run=args.dry_run, vacuum=args.vacuum)
+
+    prefix = "[dry run] " if args.dry_run else ""
+    print(f"{prefix}Migrated {stats['inspections']} inspections and {stats['rework_jobs']} rework jobs")
+    print(f"{prefix}Uploaded {stats['files_uploaded']} files ({stats['bytes_uploaded'] / 1024 / 1024:.1f} MB)")
+    print(f"{prefix}Cleared {stats['bytes_cleared'] / 1024 / 1024:.1f} MB of data URLs from rows")
+    if stats["database_bytes_before"] is not None:
+        print(f"{prefix}Database size: {stats['database_bytes_before'] / 1024 / 1024:.1f} MB before, "
+              f"{stats['database_bytes_after'] / 1024 / 1024:.1f} MB after")
+    if not args.vacuum and not args.dry_run and stats["bytes_cleared"]:
+        print("The database file only shrinks once compacted: re-run with --vacuum")
+    if stats["failed"]:
+        print(f"{prefix}{stats['failed']} rows failed (see log) and were left unchanged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Local Tripo3D API stand-in
+Implements the upload/task/poll/download endpoints used by Model3DService so the 3D
+pipeline can be exercised without network access or API credits.
+
+Use in-process (tests):
+    await http_client_service.set_transport("tripo", httpx.ASGITransport(app=tripo_stub_app))
+    await http_client_service.set_transport("default", httpx.ASGITransport(app=tripo_stub_app))
+
+Or run standalone and set TRIPO_API_BASE_URL=http://localhost:8765:
+    python -m backend.utils.tripo_stub
+"""
+import json
+import struct
+import uuid
+
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.responses import Response
+
+# Progress added per status poll (100 / STEP polls until success)
+PROGRESS_STEP = 50
+
+tripo_stub_app = FastAPI(title="Tripo3D stand-in")
+tripo_stub_app.state.tasks = {}
+tripo_stub_app.state.fail_next = False  # Set True to make the next task fail
+
+
+def _stub_glb() -> bytes:
+    """A GLB containing a closed unit tetrahedron"""
+    positions = struct.pack("<12f", 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 1)
+    indices = struct.pack("<12H", 0, 2, 1, 0, 1, 3, 0, 3, 2, 1, 2, 3)
+    binary = positions + indices
+    gltf = {
+        "asset": {"version": "2.0"},
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1}]}],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": len(positions)},
+            {"buffer": 0, "byteOffset": len(positions), "byteLength": len(indices)}
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": 4, "type": "VEC3"},
+            {"bufferView": 1, "componentType": 5123, "count": 12, "type": "SCALAR"}
+        ]
+    }
+    json_chunk = json.dumps(gltf).encode()
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    chunks = (
+        struct.pack("<II", len(json_chunk), 0x4E4F534A) + json_chunk
+        + struct.pack("<II", len(binary), 0x004E4942) + binary
+    )
+    return struct.pack("<III", 0x46546C67, 2, 12 + len(chunks)) + chunks
+
+
+@tripo_stub_app.post("/upload")
+async def upload(file: UploadFile = File(...)):
+    await file.read()
+    return {"code": 0, "data": {"image_token": uuid.uuid4().hex}}
+
+
+@tripo_stub_app.post("/task")
+async def create_task(request: Request):
+    body = await request.json()
+    task_id = uuid.uuid4().hex
+    tripo_stub_app.state.tasks[task_id] = {
+        "progress": 0,
+        "type": body.get("type"),
+        "fail": tripo_stub_app.state.fail_next
+    }
+    tripo_stub_app.state.fail_next = False
+    return {"code": 0, "data": {"task_id": task_id}}
+
+
+@tripo_stub_app.get("/task/{task_id}")
+async def get_task(task_id: str, request: Request):
+    task = tripo_stub_app.state.tasks.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    task["progress"] = min(100, task["progress"] + PROGRESS_STEP)
+    if task["progress"] < 100:
+        return {"code": 0, "data": {"task_id": task_id, "status": "running", "progress": task["progress"]}}
+    if task["fail"]:
+        return {"code": 0, "data": {"task_id": task_id, "status": "failed", "error": "stub failure"}}
+
+    return {"code": 0, "data": {
+        "task_id": task_id,
+        "status": "success",
+        "progress": 100,
+        "output": {"pbr_model": f"{str(request.base_url).rstrip('/')}/models/{task_id}.glb"}
+    }}
+
+
+@tripo_stub_app.get("/models/{task_id}.glb")
+async def download_model(task_id: str):
+    if task_id not in tripo_stub_app.state.tasks:
+        raise HTTPException(status_code=404, detail="Model not found")
+    return Response(content=_stub_glb(), media_type="model/gltf-binary")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(tripo_stub_app, host="127.0.0.1", port=8765)
@@ -0,0 +1,122 @@
+"""
+Benchmark: peak RSS of moving a generated 3D model from Tripo into storage
+
+Compares the old buffered path (response.content -> put_object) with the streaming
+path (httpx response -> S3 multipart upload). Each mode runs in a fresh subprocess
+so peak RSS (ru_maxrss) is measured independently. S3 is replaced by a client that
+discards the uploaded bytes; the model is served from an in-memory generator.
+
+Usage:
+    python -m benchmarks.bench_3d_model_transfer [--size-mb 200] [--jobs 4]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+
+import httpx
+
+CHUNK = 64 * 1024
+
+
+class DiscardingS3Client:
+    """boto3 stand-in that drops uploaded bodies"""
+
+    def put_object(self, Body, **kwargs):
+        return {}
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "bench"}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        return {"ETag": str(PartNumber)}
+
+    def complete_multipart_upload(self, **kwargs):
+        return {}
+
+    def abort_multipart_upload(self, **kwargs):
+        return {}
+
+    def generate_presigned_url(self, *args, **kwargs):
+        return "https://example.com/model.glb"
+
+
+def _model_transport(size: int) -> httpx.MockTransport:
+    async def body():
+        sent = 0
+        block = b"\0" * CHUNK
+        while sent < size:
+            n = min(CHUNK, size - sent)
+            sent += n
+            yield block[:n]
+
+    async def handler(request):
+        return httpx.Response(200, content=body(), headers={"content-type": "model/gltf-binary"})
+
+    return httpx.MockTransport(handler)
+
+
+def _peak_rss_mb() -> float:
+    # Linux reports KiB, macOS bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+async def _run(mode: str, size: int, jobs: int):
+    from backend.services.model_3d_service import model_3d_service
+    from backend.services.http_client_service import http_client_service
+    from backend.services import storage_service
+    from backend.services.s3_service import s3_service
+
+    s3_service.s3_client = DiscardingS3Client()
+    storage_service.settings.storage_backend = "s3"
+    await http_client_service.set_transport("default", _model_transport(size))
+
+    async def buffered(i: int):
+        client = http_client_service.get_client("default")
+        response = await client.get("http://tripo/model.glb")
+        model_bytes = response.content
+        await asyncio.to_thread(s3_service.s3_client.put_object, Bucket="b", Key=f"m{i}", Body=model_bytes)
+        return len(model_bytes)
+
+    async def streaming(i: int):
+        _, _, n, _ = await model_3d_service._stream_model_to_storage("http://tripo/model.glb", f"m{i}.glb", "model/gltf-binary")
+        return n
+
+    worker = buffered if mode == "buffered" else streaming
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    sizes = await asyncio.gather(*(worker(i) for i in range(jobs)))
+    elapsed = time.perf_counter() - start
+    assert all(n == size for n in sizes)
+    print(f"{mode:>9}: peak RSS {_peak_rss_mb():8.1f} MB (baseline {baseline:.1f} MB), {elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=200, help="Model size per job")
+    parser.add_argument("--jobs", type=int, default=4, help="Concurrent jobs")
+    parser.add_argument("--mode", choices=["buffered", "streaming"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        asyncio.run(_run(args.mode, args.size_mb * 1024 * 1024, args.jobs))
+        return
+
+    print(f"{args.jobs} concurrent jobs x {args.size_mb} MB model")
+    for mode in ("buffered", "streaming"):
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_3d_model_transfer",
+             "--mode", mode, "--size-mb", str(args.size_mb), "--jobs", str(args.jobs)],
+            check=True
+        )
+
+
+if __name__ == "__main__":
+    main()
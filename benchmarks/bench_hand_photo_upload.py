@@ -0,0 +1,129 @@
+"""
+Benchmark: CPU time and peak RSS of processing an upload-hand-photo request
+
+Compares the previous path (verify -> re-open -> decode -> resize -> JPEG, then a
+second full decode of the upload for the thumbnail) with the single-decode
+_render_hand_photo (one decode, JPEG draft scaling for very large uploads,
+thumbnail rendered from the already-downscaled pixels). Uploads are not included.
+Peak RSS is measured per mode in a fresh subprocess.
+
+Usage:
+    python -m benchmarks.bench_hand_photo_upload [--repeat 10]
+"""
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+
+from PIL import Image
+
+from benchmarks.bench_3d_model_transfer import _peak_rss_mb
+from benchmarks.bench_tryon_encoding import _photo
+
+CASES = [
+    ("1600x1200 JPEG", (1600, 1200), "JPEG"),
+    ("4032x3024 JPEG (phone)", (4032, 3024), "JPEG"),
+    ("8000x6000 JPEG", (8000, 6000), "JPEG"),
+    ("2400x1800 PNG", (2400, 1800), "PNG"),
+]
+
+
+def legacy_upload(contents: bytes):
+    """The previous _process_hand_photo + _make_thumbnail path"""
+    image = Image.open(io.BytesIO(contents))
+    image.verify()
+    image = Image.open(io.BytesIO(contents))
+    if max(image.size) > 2048:
+        ratio = 2048 / max(image.size)
+        image = image.resize(tuple(int(dim * ratio) for dim in image.size), Image.Resampling.LANCZOS)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+
+    thumbnail = Image.open(io.BytesIO(contents))
+    thumbnail.thumbnail((300, 300), Image.Resampling.LANCZOS)
+    thumbnail_buffer = io.BytesIO()
+    thumbnail.save(thumbnail_buffer, format="PNG")
+    return buffer.getvalue(), image.size, thumbnail_buffer.getvalue()
+
+
+def _render():
+    from backend.routers.tryon import _render_hand_photo
+    return _render_hand_photo
+
+
+def _cpu_ms(fn, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat * 1000
+
+
+def _rss_growth_mb(fn) -> float:
+    """Peak RSS growth while fn runs (Linux: resets the high-water mark first)"""
+    def status_mb(field: str) -> float:
+        with open("/proc/self/status") as f:
+            line = next(line for line in f if line.startswith(field))
+        return int(line.split()[1]) / 1024
+
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        baseline = status_mb("VmRSS:")
+        fn()
+        return status_mb("VmHWM:") - baseline
+    except OSError:
+        baseline = _peak_rss_mb()
+        fn()
+        return _peak_rss_mb() - baseline
+
+
+def _run_rss(mode: str, path: str):
+    render = _render()
+    with open(path, "rb") as f:
+        data = f.read()
+    fn = legacy_upload if mode == "legacy" else render
+    print(f"{_rss_growth_mb(lambda: fn(data)):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--mode", choices=["legacy", "single"], help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        _run_rss(args.mode, args.input)
+        return
+
+    render = _render()
+    print(f"{'input':<24} {'legacy ms':>10} {'new ms':>8} {'speedup':>8} {'legacy +MB':>11} {'new +MB':>8}")
+    for name, size, fmt in CASES:
+        data = _photo(size, fmt)
+        assert legacy_upload(data)[1] == render(data)[1]
+        legacy = _cpu_ms(lambda: legacy_upload(data), args.repeat)
+        new = _cpu_ms(lambda: render(data), args.repeat)
+        # Peak RSS growth, each mode in its own process
+        with tempfile.NamedTemporaryFile(suffix=f".{fmt.lower()}") as upload:
+            upload.write(data)
+            upload.flush()
+            rss = {
+                mode: subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_hand_photo_upload", "--mode", mode, "--input", upload.name],
+                    check=True, capture_output=True, text=True
+                ).stdout.strip()
+                for mode in ("legacy", "single")
+            }
+        print(f"{name:<24} {legacy:>10.1f} {new:>8.1f} {legacy / new:>7.1f}x {rss['legacy']:>11} {rss['single']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: CPU time of the QC lighting statistics on 12 MP photos
+
+Compares the previous _analyze_image_characteristics reductions (np.mean, np.std,
+np.max and np.sum(pixels > 240): four full passes plus a boolean temporary) with
+the fused single-pass histogram kernel, at full resolution and on the strided
+proxy (QC_STATS_MAX_PIXELS). Reports the proxy's largest error against the exact values.
+Decoding is not included.
+
+Usage:
+    python -m benchmarks.bench_qc_image_stats [--repeat 10] [--max-pixels 1000000]
+"""
+import argparse
+import io
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+
+import numpy as np
+from PIL import Image
+
+from backend.services.qc_detection import GLINT_LEVEL, image_statistics
+from benchmarks.bench_tryon_encoding import _photo
+
+CASES = [
+    ("4000x3000 RGB photo", (4000, 3000), "RGB"),
+    ("4000x3000 RGBA photo", (4000, 3000), "RGBA"),
+    ("4000x3000 glinty RGB", (4000, 3000), "glint"),
+]
+
+
+def legacy_statistics(pixels: np.ndarray) -> np.ndarray:
+    """The previous _analyze_image_characteristics reductions"""
+    return np.array([
+        np.mean(pixels),
+        np.std(pixels),
+        np.max(pixels),
+        np.sum(pixels > GLINT_LEVEL) / pixels.size
+    ])
+
+
+def _pixels(size, kind: str) -> np.ndarray:
+    mode = "RGBA" if kind == "RGBA" else "RGB"
+    pixels = np.array(Image.open(io.BytesIO(_photo(size, "PNG", mode))))
+    if kind == "glint":
+        # Saturated specular spots over ~3% of the frame
+        rng = np.random.default_rng(1)
+        for x, y in rng.integers(0, min(size), (60, 2)):
+            pixels[y:y + 100, x:x + 60] = 255
+    return pixels
+
+
+def _cpu_ms(fn, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--max-pixels", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{'input':<22} {'legacy ms':>10} {'fused ms':>9} {'proxy ms':>9} {'speedup':>8} "
+          f"{'d mean':>7} {'d std':>7} {'d glint':>8}")
+    for name, size, kind in CASES:
+        pixels = _pixels(size, kind)
+        exact = legacy_statistics(pixels)
+        assert np.allclose(image_statistics(pixels), exact)
+        error = np.abs(image_statistics(pixels, args.max_pixels) - exact)
+
+        legacy = _cpu_ms(lambda: legacy_statistics(pixels), args.repeat)
+        fused = _cpu_ms(lambda: image_statistics(pixels), args.repeat)
+        proxy = _cpu_ms(lambda: image_statistics(pixels, args.max_pixels), args.repeat)
+        print(f"{name:<22} {legacy:>10.1f} {fused:>9.1f} {proxy:>9.1f} {legacy / proxy:>7.0f}x "
+              f"{error[0]:>7.3f} {error[1]:>7.3f} {error[3]:>8.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: CPU time to turn try-on uploads into Gemini inline_data parts
+
+Compares the previous path (decode -> convert -> LANCZOS resize -> re-encode -> base64)
+with VirtualTryOnService.prepare_inline_image (pass-through for acceptable JPEG/PNG,
+one bounded downscale otherwise).
+
+Usage:
+    python -m benchmarks.bench_tryon_encoding [--repeat 20]
+"""
+import argparse
+import io
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+
+import numpy as np
+from PIL import Image
+
+from backend.services.virtual_tryon_service import virtual_tryon_service
+
+
+def _photo(size, fmt: str, mode: str = "RGB") -> bytes:
+    """Noisy gradient (compresses like a real photo, unlike a flat colour)"""
+    w, h = size
+    rng = np.random.default_rng(0)
+    base = np.linspace(0, 255, w, dtype=np.float32)[None, :, None] * np.ones((h, 1, 3), np.float32)
+    pixels = np.clip(base + rng.normal(0, 12, (h, w, 3)), 0, 255).astype(np.uint8)
+    image = Image.fromarray(pixels)
+    if mode == "RGBA":
+        image.putalpha(Image.fromarray(np.full((h, w), 200, np.uint8)))
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+    return buffer.getvalue()
+
+
+def legacy_part(data: bytes, keep_alpha: bool) -> dict:
+    """The previous router + _image_to_base64 path"""
+    image = Image.open(io.BytesIO(data)).convert("RGBA" if keep_alpha else "RGB")
+    if max(image.size) > 2048:
+        ratio = 2048 / max(image.size)
+        image = image.resize(tuple(int(d * ratio) for d in image.size), Image.Resampling.LANCZOS)
+    b64, mime = virtual_tryon_service._image_to_base64(image)
+    return {"mime_type": mime, "data": b64}
+
+
+def _cpu_ms(fn, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cases = [
+        ("1600x1200 JPEG body photo", _photo((1600, 1200), "JPEG"), False),
+        ("1024x1024 RGBA PNG jewelry", _photo((1024, 1024), "PNG", "RGBA"), True),
+        ("4032x3024 JPEG body photo", _photo((4032, 3024), "JPEG"), False),
+        ("1200x1200 WebP jewelry", _photo((1200, 1200), "WEBP"), True),
+    ]
+
+    print(f"{'input':<30} {'legacy ms':>10} {'new ms':>8} {'speedup':>8}  path")
+    for name, data, keep_alpha in cases:
+        legacy = _cpu_ms(lambda: legacy_part(data, keep_alpha), args.repeat)
+        new = _cpu_ms(lambda: virtual_tryon_service.prepare_inline_image(data, keep_alpha), args.repeat)
+        passthrough = virtual_tryon_service.prepare_inline_image(data, keep_alpha)["passthrough"]
+        print(f"{name:<30} {legacy:>10.1f} {new:>8.1f} {legacy / new:>7.1f}x  {'pass-through' if passthrough else 're-encoded'}")
+
+
+if __name__ == "__main__":
+    main()
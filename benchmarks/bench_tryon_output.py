@@ -0,0 +1,117 @@
+"""
+Benchmark: peak RSS of turning a Gemini try-on response into a stored image
+
+Compares the previous path (response.json() -> base64 decode -> PIL decode ->
+PNG re-encode -> put_object) with the streaming path (incremental JSON scan ->
+chunked base64 decode -> S3 upload). Each mode runs in a fresh subprocess so peak
+RSS (ru_maxrss) is measured independently. S3 is replaced by a client that
+discards uploads; the Gemini response is served from memory.
+
+Usage:
+    python -m benchmarks.bench_tryon_output [--size 1536] [--jobs 4]
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+
+import httpx
+import numpy as np
+from PIL import Image
+
+from benchmarks.bench_3d_model_transfer import DiscardingS3Client, _peak_rss_mb
+
+CHUNK = 64 * 1024
+
+
+def _response_body(size: int) -> bytes:
+    """Gemini generateContent response carrying a noisy size x size PNG"""
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (size, size, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG", compress_level=1)
+    return json.dumps({
+        "candidates": [{"content": {"parts": [
+            {"text": "Here is the image"},
+            {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(buffer.getvalue()).decode()}}
+        ]}}]
+    }).encode()
+
+
+def _gemini_transport(body: bytes) -> httpx.MockTransport:
+    async def stream():
+        for i in range(0, len(body), CHUNK):
+            yield body[i:i + CHUNK]
+
+    async def handler(request):
+        return httpx.Response(200, content=stream(), headers={"content-type": "application/json"})
+
+    return httpx.MockTransport(handler)
+
+
+async def _run(mode: str, size: int, jobs: int):
+    from backend.services.http_client_service import http_client_service
+    from backend.services.s3_service import s3_service
+    from backend.services.virtual_tryon_service import virtual_tryon_service
+
+    body = _response_body(size)
+    s3_service.s3_client = DiscardingS3Client()
+    await http_client_service.set_transport("gemini", _gemini_transport(body))
+    client = http_client_service.get_client("gemini")
+
+    async def legacy(i: int):
+        response = await client.post("http://gemini/generate", json={})
+        data = response.json()["candidates"][0]["content"]["parts"][1]["inlineData"]["data"]
+        image_bytes = base64.b64decode(data)
+        image = Image.open(io.BytesIO(image_bytes))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        await asyncio.to_thread(s3_service.s3_client.put_object, Key=f"t{i}", Body=buffer.getvalue())
+        return len(image_bytes)
+
+    async def streaming(i: int):
+        async with client.stream("POST", "http://gemini/generate", json={}) as response:
+            _, _, n, _ = await virtual_tryon_service._stream_result_to_storage(response, f"t{i}")
+        return n
+
+    worker = legacy if mode == "legacy" else streaming
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    sizes = await asyncio.gather(*(worker(i) for i in range(jobs)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{mode:>9}: peak RSS {_peak_rss_mb():7.1f} MB (baseline {baseline:.1f} MB, "
+        f"response {len(body) / 1e6:.1f} MB, image {sizes[0] / 1e6:.1f} MB), {elapsed:.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=1536, help="Generated image width/height")
+    parser.add_argument("--jobs", type=int, default=4, help="Concurrent try-ons")
+    parser.add_argument("--mode", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        asyncio.run(_run(args.mode, args.size, args.jobs))
+        return
+
+    print(f"{args.jobs} concurrent try-ons, {args.size}x{args.size} output")
+    for mode in ("legacy", "streaming"):
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_tryon_output",
+             "--mode", mode, "--size", str(args.size), "--jobs", str(args.jobs)],
+            check=True
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Test the background 3D generation job queue against the local Tripo stand-in
+(claims across processes, attempt limits, refunds and the progress event stream)
+"""
+import asyncio
+import io
+import json
+import os
+from datetime import datetime, timedelta
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.main import app
+from backend.models.database import Base
+from backend.routers import designer as designer_router
+from backend.services import model_3d_job_service as job_module
+from backend.services import model_3d_service as model_3d_module
+from backend.services.http_client_service import http_client_service
+from backend.services.local_storage_service import local_storage_service
+from backend.utils.auth import get_current_user, get_current_verified_user
+from backend.utils.events import event_broker
+from backend.utils.tripo_stub import tripo_stub_app
+
+USER = {"_id": "user-1", "username": "tester", "is_verified": True}
+
+
+def _png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 180, 40)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _setup(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(job_module, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(local_storage_service, "base_path", tmp_path)
+    monkeypatch.setattr(model_3d_module.settings, "storage_backend", "local")
+    monkeypatch.setattr(model_3d_module.model_3d_service, "api_key", "test-key")
+    monkeypatch.setattr(model_3d_module.model_3d_service, "api_base_url", "http://tripo")
+    monkeypatch.setattr(model_3d_module.settings, "tripo_poll_min_interval_seconds", 0.01)
+    monkeypatch.setattr(model_3d_module.settings, "tripo_poll_max_interval_seconds", 0.05)
+
+    usage = {"reserved": 0, "refunded": 0}
+
+    def reserve(user_id, feature, count=1):
+        usage["reserved"] += count
+        return {"allowed": True}
+
+    def refund(user_id, feature, count=1):
+        usage["refunded"] += count
+        return count
+
+    monkeypatch.setattr(designer_router.TrialUsageModel, "reserve_usage", reserve)
+    monkeypatch.setattr(job_module.TrialUsageModel, "refund_usage", refund)
+    return usage
+
+
+async def _use_stub_transports():
+    await http_client_service.set_transport("tripo", httpx.ASGITransport(app=tripo_stub_app))
+    await http_client_service.set_transport("default", httpx.ASGITransport(app=tripo_stub_app))
+
+
+async def _restore_transports():
+    await job_module.model_3d_job_service.stop()
+    await http_client_service.set_transport("tripo", None)
+    await http_client_service.set_transport("default", None)
+
+
+async def _wait_for(job_id: str, client: httpx.AsyncClient) -> dict:
+    for _ in range(200):
+        job = (await client.get(f"/api/designer/3d-jobs/{job_id}")).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_3d_job_runs_in_background(monkeypatch, tmp_path):
+    usage = _setup(monkeypatch, tmp_path)
+    app.dependency_overrides[get_current_user] = lambda: USER
+    app.dependency_overrides[get_current_verified_user] = lambda: USER
+
+    async def run():
+        await _use_stub_transports()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                submitted = await client.post(
+                    "/api/designer/3d-jobs",
+                    files={"file": ("ring.png", _png_bytes(), "image/png")},
+                    data={"export_format": "glb"}
+                )
+                assert submitted.status_code == 202, submitted.text
+                job_id = submitted.json()["job_id"]
+                return job_id, await _wait_for(job_id, client)
+        finally:
+            await _restore_transports()
+
+    try:
+        job_id, job = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert job["status"] == "succeeded", job
+    assert job["progress"] == 100
+    assert job["tripo_task_id"]
+    assert job["result"]["model_url"].endswith(f"3d_model_{job_id}.glb")
+    # Model was streamed into (local) storage
+    model_path = tmp_path / "3d-models" / f"3d_model_{job_id}.glb"
+    assert model_path.read_bytes()[:4] == b"glTF"
+    assert job["result"]["file_size"] == model_path.stat().st_size
+    # Stats come from the actual mesh (the stand-in serves a unit tetrahedron)
+    stats = job["result"]["stats"]
+    assert (stats["vertices"], stats["faces"], stats["is_watertight"]) == (4, 4, True)
+    assert abs(stats["volume"] - 1 / 6) < 1e-6
+    # The trial was reserved at submit and kept
+    assert usage == {"reserved": 1, "refunded": 0}
+
+    stages = [event["stage"] for event in event_broker.get_history(job_module.model_3d_job_service.channel(job_id))]
+    assert stages.index("uploading") < stages.index("generating") < stages.index("storing") < stages.index("completed")
+    # Input image is cleaned up once the job finishes
+    assert not list((tmp_path / "3d-job-inputs").iterdir())
+
+
+def test_interrupted_job_resumes_tripo_task(monkeypatch, tmp_path):
+    usage = _setup(monkeypatch, tmp_path)
+
+    async def run():
+        await _use_stub_transports()
+        try:
+            # A job that was polling Tripo when the server stopped
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=tripo_stub_app), base_url="http://tripo") as tripo:
+                task_id = (await tripo.post("/task", json={"type": "image_to_model"})).json()["data"]["task_id"]
+
+            (tmp_path / "3d-job-inputs").mkdir()
+            (tmp_path / "3d-job-inputs" / "3d_resume.png").write_bytes(_png_bytes())
+            job_module.model_3d_job_service._create_job(
+                id="3d_resume", user_id="user-1", input_path="3d-job-inputs/3d_resume.png",
+                export_format="glb", remove_background=True,
+                status="running", stage="generating", progress=40, tripo_task_id=task_id, attempts=1,
+                updated_at=datetime.utcnow() - timedelta(hours=1)
+            )
+
+            await job_module.model_3d_job_service.start()
+            for _ in range(200):
+                job = await job_module.model_3d_job_service.get_job("3d_resume")
+                if job["status"] != "running":
+                    return task_id, job
+                await asyncio.sleep(0.02)
+            raise AssertionError("Resumed job did not finish")
+        finally:
+            await _restore_transports()
+
+    task_id, job = asyncio.run(run())
+
+    assert job["status"] == "succeeded", job
+    assert job["tripo_task_id"] == task_id
+    assert job["attempts"] == 2
+    assert usage == {"reserved": 0, "refunded": 0}
+    stages = [event["stage"] for event in event_broker.get_history(job_module.model_3d_job_service.channel("3d_resume"))]
+    assert "uploading" not in stages
+
+
+def test_unfinished_job_is_claimed_by_one_process(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    # Two API processes sharing the database, both starting up with the same queued job
+    services = [job_module.Model3DJobService(), job_module.Model3DJobService()]
+
+    async def run():
+        await _use_stub_transports()
+        try:
+            (tmp_path / "3d-job-inputs").mkdir()
+            (tmp_path / "3d-job-inputs" / "3d_shared.png").write_bytes(_png_bytes())
+            services[0]._create_job(
+                id="3d_shared", user_id="user-1", input_path="3d-job-inputs/3d_shared.png",
+                export_format="glb", remove_background=True, status="queued", stage="queued", progress=0
+            )
+            # A job another process is still working on is left alone
+            services[0]._create_job(
+                id="3d_busy", user_id="user-1", input_path="3d-job-inputs/3d_busy.png",
+                export_format="glb", remove_background=True, status="running", stage="generating", progress=40,
+                updated_at=datetime.utcnow()
+            )
+
+            await asyncio.gather(*(service.start() for service in services))
+            for _ in range(200):
+                job = await services[0].get_job("3d_shared")
+                if job["status"] not in ("queued", "running"):
+                    return job, await services[0].get_job("3d_busy")
+                await asyncio.sleep(0.02)
+            raise AssertionError("Job did not finish")
+        finally:
+            for service in services:
+                await service.stop()
+            await _restore_transports()
+
+    job, busy = asyncio.run(run())
+
+    assert job["status"] == "succeeded", job
+    assert job["attempts"] == 1
+    assert sum(service.stats["succeeded"] for service in services) == 1
+    assert busy["status"] == "running" and busy["attempts"] == 0
+
+
+def test_failed_job_refunds_the_trial(monkeypatch, tmp_path):
+    usage = _setup(monkeypatch, tmp_path)
+    monkeypatch.setattr(model_3d_module.model_3d_service, "api_key", None)
+    app.dependency_overrides[get_current_user] = lambda: USER
+    app.dependency_overrides[get_current_verified_user] = lambda: USER
+
+    async def run():
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                submitted = await client.post(
+                    "/api/designer/3d-jobs",
+                    files={"file": ("ring.png", _png_bytes(), "image/png")},
+                    data={"export_format": "glb"}
+                )
+                assert submitted.status_code == 202, submitted.text
+                return await _wait_for(submitted.json()["job_id"], client)
+        finally:
+            await job_module.model_3d_job_service.stop()
+
+    try:
+        job = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert job["status"] == "failed" and "API key" in job["error"]
+    assert usage == {"reserved": 1, "refunded": 1}
+
+
+def test_job_that_keeps_killing_its_worker_is_failed(monkeypatch, tmp_path):
+    usage = _setup(monkeypatch, tmp_path)
+    monkeypatch.setattr(job_module.settings, "generation_3d_max_attempts", 3)
+    service = job_module.Model3DJobService()
+    (tmp_path / "3d-job-inputs").mkdir()
+    (tmp_path / "3d-job-inputs" / "3d_crashy.png").write_bytes(_png_bytes())
+    # Three processes already died running it
+    service._create_job(
+        id="3d_crashy", user_id="user-1", input_path="3d-job-inputs/3d_crashy.png",
+        export_format="glb", remove_background=True, status="running", stage="generating", progress=40,
+        attempts=3, updated_at=datetime.utcnow() - timedelta(hours=1)
+    )
+
+    asyncio.run(service._run_job("3d_crashy"))
+    job = asyncio.run(service.get_job("3d_crashy"))
+
+    assert job["status"] == "failed" and "gave up after 3" in job["error"] and job["attempts"] == 4
+    assert usage == {"reserved": 0, "refunded": 1}
+    assert not (tmp_path / "3d-job-inputs" / "3d_crashy.png").exists()
+
+
+def test_events_joined_midway_never_go_backwards(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    app.dependency_overrides[get_current_user] = lambda: USER
+    service = job_module.model_3d_job_service
+    channel = service.channel("3d_midway")
+    start = datetime.utcnow() - timedelta(minutes=1)
+
+    def event(progress, seconds, **fields):
+        return {"job_id": "3d_midway", "status": "running", "progress": progress,
+                "updated_at": (start + timedelta(seconds=seconds)).isoformat(), "final": False, **fields}
+
+    # The client connects when the job is at 60%; the broker still holds the earlier events
+    service._create_job(
+        id="3d_midway", user_id="user-1", input_path="3d-job-inputs/3d_midway.png",
+        export_format="glb", remove_background=True, status="running", stage="generating", progress=60,
+        updated_at=start + timedelta(seconds=3)
+    )
+    for progress, seconds in ((0, 0), (20, 1), (40, 2), (60, 3), (80, 4)):
+        event_broker.publish(channel, event(progress, seconds))
+    event_broker.publish(channel, event(100, 5, status="succeeded", final=True))
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/api/designer/3d-jobs/3d_midway/events")
+
+    try:
+        response = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    progress = [json.loads(line[len("data: "):])["progress"] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert progress == [60, 80, 100]
@@ -0,0 +1,61 @@
+"""
+Test database initialization: new databases are created and stamped, and databases
+created before migrations existed are brought up to date by the Alembic revisions
+"""
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+
+from backend.models.database import BASELINE_REVISION, Base, _alembic_config, init_db
+
+
+def _engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+
+
+def _revision(engine) -> str:
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def _schema_diff(engine):
+    with engine.connect() as connection:
+        return compare_metadata(MigrationContext.configure(connection), Base.metadata)
+
+
+def test_new_database_is_created_and_stamped(tmp_path):
+    engine = _engine(tmp_path)
+    init_db(engine)
+
+    assert _revision(engine) == "0006"
+    assert _schema_diff(engine) == []
+    # Running again is a no-op
+    init_db(engine)
+    assert _revision(engine) == "0006"
+
+
+def test_pre_migration_database_is_upgraded(tmp_path):
+    engine = _engine(tmp_path)
+    init_db(engine)
+    # Roll back to the baseline schema and drop the version table, as in a database
+    # created by create_all before Alembic was introduced
+    with engine.begin() as connection:
+        command.downgrade(_alembic_config(connection), BASELINE_REVISION)
+        connection.execute(text("DROP TABLE alembic_version"))
+        connection.execute(text("INSERT INTO designs (id, prompt) VALUES (1, 'signet ring')"))
+    inspector = inspect(engine)
+    assert "template_previews" not in inspector.get_table_names()
+    assert "analysis_status" not in {column["name"] for column in inspector.get_columns("designs")}
+
+    init_db(engine)
+
+    assert _revision(engine) == "0006"
+    assert _schema_diff(engine) == []
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT analysis_status FROM designs WHERE id = 1")).scalar() == "completed"
@@ -0,0 +1,290 @@
+"""
+Test deferred design analysis: /generate with defer_analysis returns before Claude runs,
+the background follow-up patches the design, and /analysis and /analysis/stream report it.
+Gallery renditions are likewise encoded after the response and stored on the design
+(and in the design cache, for designs created from a cache hit).
+"""
+import asyncio
+import io
+import json
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.config import settings
+from backend.app.main import app
+from backend.models.database import Base, Design, get_db
+from backend.routers import designer as designer_router
+from backend.services import ai_designer_service as designer_service_module
+from backend.services import cache_service
+from backend.services.ai_designer_service import ai_designer_service, design_cache
+from backend.services.local_storage_service import local_storage_service
+from backend.utils.auth import get_current_user
+from backend.utils.events import EventBroker
+
+USER = {"_id": "user-1", "username": "tester"}
+ANALYSIS = {"materials": ["platinum", "sapphire"], "colors": ["blue"], "confidence": 0.82}
+
+
+def _events(text: str) -> list:
+    return [json.loads(line[len("data: "):]) for line in text.splitlines() if line.startswith("data: ")]
+
+
+def _setup(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'designs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(designer_router, "SessionLocal", Session)
+    # Design IDs restart in every test database: don't replay another test's events
+    monkeypatch.setattr(designer_router, "event_broker", EventBroker())
+    monkeypatch.setattr(designer_router.TrialUsageModel, "check_trial_limit", lambda user_id, feature: {"allowed": True})
+    monkeypatch.setattr(designer_router.TrialUsageModel, "record_usage", lambda user_id, feature: {})
+    monkeypatch.setattr(settings, "renditions_enabled", False)
+    calls = []
+
+    async def fake_generate(prompt, num_images, size, quality):
+        return [{"url": "https://example.com/d.png", "s3_key": "designs/d.png", "seed": "dalle_1", "revised_prompt": prompt,
+                 "model": "dall-e-3"}]
+
+    async def fake_analysis(image_url, prompt):
+        calls.append(image_url)
+        return ANALYSIS
+
+    monkeypatch.setattr(ai_designer_service, "generate_with_dalle", fake_generate)
+    monkeypatch.setattr(ai_designer_service, "analyze_design_with_claude", fake_analysis)
+
+    def override_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_current_user] = lambda: USER
+    return Session, calls
+
+
+def _client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=10)
+
+
+def test_deferred_analysis_is_completed_in_the_background(monkeypatch, tmp_path):
+    _, calls = _setup(monkeypatch, tmp_path)
+
+    async def run():
+        async with _client() as client:
+            generated = await client.post("/api/designer/generate", json={
+                "prompt": "sapphire cocktail ring", "category": "ring", "style_preset": "minimalist",
+                "num_images": 1, "defer_analysis": True, "use_cache": False
+            })
+            design_id = generated.json()["design_id"]
+            analysis = await client.get(f"/api/designer/designs/{design_id}/analysis")
+            stream = await client.get(f"/api/designer/designs/{design_id}/analysis/stream")
+            return generated, analysis, stream
+
+    try:
+        generated, analysis, stream = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert generated.status_code == 200, generated.text
+    body = generated.json()
+    assert body["analysis_status"] == "pending" and body["confidence"] is None and body["materials"] == []
+    assert calls == ["https://example.com/d.png"]
+
+    expected = {"design_id": body["design_id"], "analysis_status": "completed", "materials": ["platinum", "sapphire"],
+                "colors": ["blue"], "confidence": 0.82}
+    assert analysis.json() == expected
+    # Already complete: the stream emits it once and closes
+    assert _events(stream.text) == [expected]
+
+
+def test_analysis_runs_inline_without_defer(monkeypatch, tmp_path):
+    _, calls = _setup(monkeypatch, tmp_path)
+
+    async def run():
+        async with _client() as client:
+            return await client.post("/api/designer/generate", json={
+                "prompt": "sapphire cocktail ring", "category": "ring", "style_preset": "minimalist",
+                "num_images": 1, "use_cache": False
+            })
+
+    try:
+        generated = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    body = generated.json()
+    assert body["analysis_status"] == "completed" and body["materials"] == ["platinum", "sapphire"]
+    assert len(calls) == 1
+
+
+def test_stream_waits_for_pending_analysis(monkeypatch, tmp_path):
+    Session, _ = _setup(monkeypatch, tmp_path)
+    db = Session()
+    design = Design(prompt="pear drop earrings", analysis_status="pending")
+    db.add(design)
+    db.commit()
+    design_id = design.id
+    db.close()
+
+    async def run():
+        async with _client() as client:
+            stream = asyncio.create_task(client.get(f"/api/designer/designs/{design_id}/analysis/stream"))
+            await asyncio.sleep(0.1)
+            assert not stream.done()
+            pending = await client.get(f"/api/designer/designs/{design_id}/analysis")
+            await designer_router._complete_design_analysis(design_id, "https://example.com/e.png", "pear drop earrings")
+            return pending, await stream
+
+    try:
+        pending, stream = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert pending.json()["analysis_status"] == "pending"
+    events = _events(stream.text)
+    assert len(events) == 1 and events[0]["final"]
+    assert events[0]["analysis_status"] == "completed" and events[0]["materials"] == ["platinum", "sapphire"]
+
+    db = Session()
+    stored = db.get(Design, design_id)
+    assert stored.analysis_status == "completed" and stored.confidence_score == 0.82
+    db.close()
+
+
+def test_analysis_of_unknown_design_is_404(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+
+    async def run():
+        async with _client() as client:
+            return (await client.get("/api/designer/designs/999/analysis"),
+                    await client.get("/api/designer/designs/999/analysis/stream"))
+
+    try:
+        analysis, stream = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert analysis.status_code == 404 and stream.status_code == 404
+
+
+def _use_renditions(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "renditions_enabled", True)
+    monkeypatch.setattr(settings, "rendition_formats", "webp")
+    monkeypatch.setattr(settings, "storage_backend", "local")
+    monkeypatch.setattr(local_storage_service, "base_path", tmp_path)
+    original = io.BytesIO()
+    Image.new("RGB", (800, 400), (200, 160, 40)).save(original, format="PNG")
+    downloads = []
+
+    def fake_download(key):
+        downloads.append(key)
+        return original.getvalue()
+
+    monkeypatch.setattr(designer_service_module.s3_service, "download_image", fake_download)
+    return downloads
+
+
+def _generate_design(use_cache=False):
+    async def run():
+        async with _client() as client:
+            return await client.post("/api/designer/generate", json={
+                "prompt": "sapphire cocktail ring", "category": "ring", "style_preset": "minimalist",
+                "num_images": 1, "use_cache": use_cache
+            })
+
+    try:
+        return asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_renditions_are_stored_after_the_response(monkeypatch, tmp_path):
+    Session, _ = _setup(monkeypatch, tmp_path)
+    downloads = _use_renditions(monkeypatch, tmp_path)
+
+    generated = _generate_design()
+
+    assert generated.status_code == 200, generated.text
+    assert generated.json()["images"][0]["renditions"] is None
+    assert downloads == ["designs/d.png"]
+
+    db = Session()
+    stored = db.get(Design, generated.json()["design_id"])
+    assert [v["width"] for v in stored.renditions[0]["variants"]] == [160, 320, 640, 800]
+    assert all((tmp_path / v["key"]).exists() for v in stored.renditions[0]["variants"])
+    db.close()
+
+
+def test_designs_from_the_cache_reuse_renditions(monkeypatch, tmp_path):
+    Session, _ = _setup(monkeypatch, tmp_path)
+    downloads = _use_renditions(monkeypatch, tmp_path)
+    monkeypatch.setattr(settings, "design_cache_enabled", True)
+    monkeypatch.setattr(design_cache, "local", cache_service.TTLCache(16, 3600))
+    monkeypatch.setattr(design_cache, "use_redis", False)
+    monkeypatch.setattr(designer_service_module.s3_service, "generate_presigned_url",
+                        lambda key, expiration=3600: f"https://signed.example.com/{key}")
+
+    overrides = dict(app.dependency_overrides)
+    first = _generate_design(use_cache=True)
+    app.dependency_overrides.update(overrides)
+    second = _generate_design(use_cache=True)
+
+    assert second.json()["cached"] and downloads == ["designs/d.png"]
+    assert [v["width"] for v in second.json()["images"][0]["renditions"]["variants"]] == [160, 320, 640, 800]
+    db = Session()
+    first_row, second_row = db.get(Design, first.json()["design_id"]), db.get(Design, second.json()["design_id"])
+    assert second_row.renditions == first_row.renditions and second_row.renditions[0]
+    db.close()
+
+
+def test_deleted_design_still_gets_a_final_event(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    app.dependency_overrides.clear()
+
+    asyncio.run(designer_router._complete_design_analysis(999, "https://example.com/e.png", "pear drop earrings"))
+
+    assert designer_router.event_broker.get_history("design-analysis:999") == [
+        {"design_id": 999, "analysis_status": "deleted", "final": True}
+    ]
+
+
+def test_failed_analysis_settles_the_row(monkeypatch, tmp_path):
+    Session, _ = _setup(monkeypatch, tmp_path)
+    db = Session()
+    design = Design(prompt="pear drop earrings", analysis_status="pending")
+    db.add(design)
+    db.commit()
+    design_id = design.id
+    db.close()
+
+    async def malformed_analysis(image_url, prompt):
+        return ["not", "a", "dict"]
+
+    monkeypatch.setattr(ai_designer_service, "analyze_design_with_claude", malformed_analysis)
+
+    async def run():
+        await designer_router._complete_design_analysis(design_id, "https://example.com/e.png", "pear drop earrings")
+        async with _client() as client:
+            return await client.get(f"/api/designer/designs/{design_id}/analysis/stream")
+
+    try:
+        stream = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    final = designer_router.event_broker.get_history(f"design-analysis:{design_id}")[-1]
+    assert final["analysis_status"] == "failed" and final["final"]
+    db = Session()
+    assert db.get(Design, design_id).analysis_status == "failed"
+    db.close()
+    # Late subscribers get the settled status right away instead of waiting for an event
+    assert _events(stream.text)[0]["analysis_status"] == "failed"
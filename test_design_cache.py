@@ -0,0 +1,161 @@
+"""
+Test the designer generation cache: miss then hit for an identical prompt,
+TTL expiry, the Redis tier, and falling back to the in-process tier when Redis is down
+"""
+import asyncio
+import json
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+from backend.app.config import settings
+from backend.services import ai_designer_service as designer_module
+from backend.services import cache_service as cache_module
+from backend.services.ai_designer_service import ai_designer_service, design_cache
+
+ANALYSIS = {"materials": ["gold"], "colors": ["yellow"], "confidence": 0.9}
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the redis.asyncio client"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+class DownRedis:
+    """Redis client whose server is unreachable"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def get(self, key):
+        self.calls += 1
+        raise ConnectionError("Connection refused")
+
+    async def set(self, key, value, ex=None):
+        self.calls += 1
+        raise ConnectionError("Connection refused")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+def _setup(monkeypatch, redis_client=None):
+    monkeypatch.setattr(settings, "design_cache_enabled", True)
+    monkeypatch.setattr(design_cache, "local", cache_module.TTLCache(16, 3600))
+    monkeypatch.setattr(design_cache, "ttl_seconds", 3600)
+    monkeypatch.setattr(design_cache, "stats", dict.fromkeys(design_cache.stats, 0))
+    monkeypatch.setattr(design_cache, "use_redis", redis_client is not None)
+    monkeypatch.setattr(cache_module, "_redis_client", redis_client)
+    monkeypatch.setattr(cache_module, "_redis_down_until", 0.0)
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock.time)
+    monkeypatch.setattr(
+        designer_module.s3_service, "generate_presigned_url",
+        lambda key, expiration=3600: f"https://signed.example.com/{key}?t={clock.now}"
+    )
+
+    generations = []
+
+    async def fake_generate(prompt, num_images, size, quality):
+        generations.append(prompt)
+        return [{"url": f"https://example.com/designs/{len(generations)}.png", "s3_key": f"designs/{len(generations)}.png",
+                 "seed": f"dalle_{len(generations)}", "revised_prompt": prompt, "model": "dall-e-3", "timings": {}}]
+
+    async def fake_analysis(image_url, prompt):
+        return ANALYSIS
+
+    monkeypatch.setattr(ai_designer_service, "generate_with_dalle", fake_generate)
+    monkeypatch.setattr(ai_designer_service, "analyze_design_with_claude", fake_analysis)
+    return generations, clock
+
+
+def _generate(prompt="Rose gold   band with PAVE diamonds"):
+    return asyncio.run(ai_designer_service.generate_design(prompt, "ring", "minimalist", num_images=1))
+
+
+def test_identical_prompt_hits_the_cache(monkeypatch):
+    generations, _ = _setup(monkeypatch)
+
+    first = _generate()
+    second = _generate("rose gold band with pave diamonds")
+
+    assert len(generations) == 1
+    assert not first["cached"] and second["cached"]
+    assert second["cache_key"] == first["cache_key"]
+    # Hits return the stored image under a fresh presigned URL, with the stored analysis
+    assert second["images"][0]["s3_key"] == "designs/1.png"
+    assert second["images"][0]["url"].startswith("https://signed.example.com/designs/1.png")
+    assert second["materials"] == ["gold"] and second["analysis_status"] == "completed"
+    assert design_cache.get_stats()["hits"] == 1 and design_cache.get_stats()["misses"] == 1
+
+    _generate("rose gold band with pave emeralds")
+    assert len(generations) == 2
+
+
+def test_use_cache_false_and_disabled_cache_skip_lookup(monkeypatch):
+    generations, _ = _setup(monkeypatch)
+    _generate()
+
+    asyncio.run(ai_designer_service.generate_design("Rose gold band with pave diamonds", "ring", "minimalist",
+                                                    num_images=1, use_cache=False))
+    monkeypatch.setattr(settings, "design_cache_enabled", False)
+    result = _generate()
+
+    assert len(generations) == 3 and result["cache_key"] is None
+
+
+def test_expired_entries_are_regenerated(monkeypatch):
+    generations, clock = _setup(monkeypatch)
+
+    _generate()
+    clock.now += 3599
+    assert _generate()["cached"]
+    clock.now += 2
+    assert not _generate()["cached"]
+
+    assert len(generations) == 2
+
+
+def test_redis_tier_serves_other_processes(monkeypatch):
+    redis = FakeRedis()
+    generations, _ = _setup(monkeypatch, redis)
+
+    first = _generate()
+    stored = json.loads(redis.data[f"jeweltech:designs:{first['cache_key']}"])
+    assert stored["images"][0]["s3_key"] == "designs/1.png"
+
+    # Another worker: empty in-process tier, same Redis
+    monkeypatch.setattr(design_cache, "local", cache_module.TTLCache(16, 3600))
+    assert _generate()["cached"]
+    assert len(generations) == 1 and design_cache.get_stats()["redis_hits"] == 1
+
+
+def test_unreachable_redis_falls_back_to_the_local_tier(monkeypatch):
+    redis = DownRedis()
+    generations, clock = _setup(monkeypatch, redis)
+
+    first = _generate()
+    second = _generate()
+
+    assert not first["cached"] and second["cached"] and len(generations) == 1
+    # The first failure backs off: Redis is not retried until REDIS_RETRY_SECONDS have passed
+    assert redis.calls == 1
+    assert cache_module._redis_down_until == clock.now + cache_module.REDIS_RETRY_SECONDS
+    assert design_cache.get_stats()["redis"] is False
@@ -0,0 +1,99 @@
+"""
+Test the multi-image design fan-out: generations run concurrently up to
+design_generation_concurrency, and a failed image doesn't fail the design
+"""
+import asyncio
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import pytest
+
+from backend.app.config import settings
+from backend.services import ai_designer_service as designer_module
+from backend.services.ai_designer_service import ai_designer_service
+
+
+class FakeImages:
+    """Async OpenAI images stand-in that records peak concurrency and fails selected calls"""
+
+    def __init__(self, fail_calls=()):
+        self.fail_calls = set(fail_calls)
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+
+    async def generate(self, **kwargs):
+        self.calls += 1
+        call = self.calls
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.05)
+            if call in self.fail_calls:
+                raise RuntimeError("content policy violation")
+            return SimpleNamespace(data=[SimpleNamespace(b64_json="aGVsbG8=", revised_prompt=kwargs["prompt"])])
+        finally:
+            self.in_flight -= 1
+
+
+def _use_fakes(monkeypatch, images: FakeImages):
+    monkeypatch.setattr(designer_module, "openai_client", SimpleNamespace(images=images))
+    monkeypatch.setattr(ai_designer_service, "default_model", "gpt-image-1")
+    monkeypatch.setattr(ai_designer_service, "openai_semaphore", asyncio.Semaphore(8))
+    monkeypatch.setattr(settings, "max_images_per_generation", 4)
+    monkeypatch.setattr(
+        designer_module.s3_service, "upload_image",
+        lambda image_data, folder, filename, content_type: (f"https://example.com/{folder}/{filename}", f"{folder}/{filename}")
+    )
+
+    async def no_inline_renditions(*args, **kwargs):
+        raise AssertionError("renditions are encoded after the design is returned")
+
+    monkeypatch.setattr(designer_module.rendition_service, "create", no_inline_renditions)
+
+
+def _generate(num_images: int):
+    return asyncio.run(ai_designer_service.generate_design(
+        "twisted band ring", "ring", "minimalist", num_images=num_images, defer_analysis=True, use_cache=False
+    ))
+
+
+def test_partial_failure_returns_the_successful_images(monkeypatch):
+    images = FakeImages(fail_calls={2})
+    _use_fakes(monkeypatch, images)
+
+    result = _generate(4)
+
+    assert images.calls == 4
+    assert len(result["images"]) == 3 and result["failed_images"] == 1
+    assert len({image["s3_key"] for image in result["images"]}) == 3
+    for image in result["images"]:
+        assert set(image["timings"]) == {"generate_ms", "upload_ms", "total_ms"}
+        assert image["timings"]["generate_ms"] >= 40
+        assert image["renditions"] is None
+
+
+def test_every_generation_failing_raises(monkeypatch):
+    _use_fakes(monkeypatch, FakeImages(fail_calls={1, 2}))
+
+    with pytest.raises(RuntimeError, match="content policy"):
+        _generate(2)
+
+
+def test_fan_out_is_bounded_by_design_generation_concurrency(monkeypatch):
+    images = FakeImages()
+    _use_fakes(monkeypatch, images)
+    monkeypatch.setattr(settings, "design_generation_concurrency", 2)
+
+    result = _generate(4)
+
+    assert len(result["images"]) == 4 and result["failed_images"] == 0
+    assert images.peak == 2
+
+    monkeypatch.setattr(settings, "design_generation_concurrency", 4)
+    images.peak = 0
+    _generate(4)
+    assert images.peak == 4
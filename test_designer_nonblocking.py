@@ -0,0 +1,87 @@
+"""
+Test that the AI designer pipeline does not block the event loop
+A slow (simulated) DALL-E call must not delay concurrent /health requests
+"""
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+
+from backend.app.main import app
+from backend.models.database import get_db
+from backend.routers import designer as designer_router
+from backend.services import ai_designer_service as designer_module
+from backend.utils.auth import get_current_user
+
+GENERATION_DELAY = 1.0
+
+
+class FakeImages:
+    """Stand-in for the async OpenAI images resource with a slow generate()"""
+
+    async def generate(self, **kwargs):
+        await asyncio.sleep(GENERATION_DELAY)
+        return SimpleNamespace(data=[SimpleNamespace(b64_json="aGVsbG8=", revised_prompt=kwargs["prompt"])])
+
+
+class FakeSession:
+    """Minimal SQLAlchemy session stand-in"""
+
+    def add(self, obj):
+        self.obj = obj
+
+    def commit(self):
+        pass
+
+    def refresh(self, obj):
+        obj.id = 1
+
+
+def test_generate_does_not_block_health(monkeypatch):
+    monkeypatch.setattr(designer_module, "openai_client", SimpleNamespace(images=FakeImages()))
+    monkeypatch.setattr(designer_module.s3_service, "upload_image", lambda **kw: ("https://example.com/d.png", "designs/d.png"))
+
+    async def fake_analysis(image_url, prompt):
+        return {"materials": ["gold"], "colors": ["gold"], "confidence": 0.9}
+
+    monkeypatch.setattr(designer_module.ai_designer_service, "analyze_design_with_claude", fake_analysis)
+    monkeypatch.setattr(designer_router.TrialUsageModel, "check_trial_limit", lambda user_id, feature: {"allowed": True})
+    monkeypatch.setattr(designer_router.TrialUsageModel, "record_usage", lambda user_id, feature: {})
+    monkeypatch.setattr(designer_router.settings, "renditions_enabled", False)
+
+    app.dependency_overrides[get_current_user] = lambda: {"_id": "user-1", "username": "tester"}
+    app.dependency_overrides[get_db] = lambda: FakeSession()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            generate_task = asyncio.create_task(client.post("/api/designer/generate", json={
+                "prompt": "solitaire ring with round diamond",
+                "category": "ring",
+                "style_preset": "minimalist",
+                "num_images": 1
+            }))
+            await asyncio.sleep(0.1)
+
+            start = time.perf_counter()
+            health = await client.get("/health")
+            health_latency = time.perf_counter() - start
+
+            generate_response = await generate_task
+            return health, health_latency, generate_response
+
+    try:
+        health, health_latency, generate_response = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert health.status_code == 200
+    assert generate_response.status_code == 200, generate_response.text
+    assert generate_response.json()["images"][0]["url"] == "https://example.com/d.png"
+    # /health must answer while the generation is still in flight
+    assert health_latency < GENERATION_DELAY / 2
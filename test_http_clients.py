@@ -0,0 +1,74 @@
+"""
+Test the shared HTTP client registry: one pool per provider, lifecycle and pool metrics
+"""
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+
+from backend.app.config import settings
+from backend.services.http_client_service import HTTPClientService
+
+
+async def _keepalive_server():
+    """Minimal HTTP/1.1 server that keeps connections open between requests"""
+    async def handle(reader, writer):
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def test_one_client_per_provider_until_shutdown():
+    async def run():
+        service = HTTPClientService()
+        await service.startup()
+        gemini = service.get_client("gemini")
+        assert service.get_client("gemini") is gemini
+        assert service.get_client("s3-presigned") is service.get_client("default")
+
+        await service.shutdown()
+        assert gemini.is_closed
+        assert service.get_client("gemini") is not gemini
+        await service.shutdown()
+
+    asyncio.run(run())
+
+
+def test_metrics_count_requests_errors_and_connection_reuse(monkeypatch):
+    monkeypatch.setattr(settings, "http_max_connections_per_pool", 4)
+
+    async def run():
+        service = HTTPClientService()
+        server = await _keepalive_server()
+        port = server.sockets[0].getsockname()[1]
+        try:
+            client = service.get_client("tripo")
+            for _ in range(3):
+                assert (await client.get(f"http://127.0.0.1:{port}/status")).text == "ok"
+
+            await service.set_transport("gemini", httpx.MockTransport(lambda request: httpx.Response(503)))
+            assert (await service.get_client("gemini").post("http://gemini/generate")).status_code == 503
+            return service.get_metrics()
+        finally:
+            await service.shutdown()
+            server.close()
+            await server.wait_closed()
+
+    metrics = asyncio.run(run())
+
+    tripo = metrics["tripo"]
+    assert tripo["requests_total"] == tripo["completed_total"] == 3
+    assert tripo["requests_in_flight"] == 0 and tripo["errors_total"] == 0
+    # Keep-alive: three requests over one pooled connection
+    assert tripo["connections_opened_total"] == 1 and tripo["connection_reuse"] == 0.667
+    assert tripo["max_connections"] == 4 and tripo["active"]
+    assert metrics["gemini"]["errors_total"] == 1
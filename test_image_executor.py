@@ -0,0 +1,162 @@
+"""
+Test the shared image-processing executor and its backpressure on the try-on routes
+"""
+import asyncio
+import io
+import os
+import threading
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+import pytest
+from PIL import Image
+
+from backend.app.main import app
+from backend.routers import tryon as tryon_router
+from backend.services.image_executor_service import ImageExecutorService, ImageExecutorBusyError, settings
+
+
+def _jpeg_bytes(size=(3000, 1500)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (180, 140, 120)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_executor_rejects_when_saturated(monkeypatch):
+    monkeypatch.setattr(settings, "image_executor_max_pending", 2)
+    executor = ImageExecutorService()
+    release = threading.Event()
+
+    async def run():
+        blocked = [asyncio.ensure_future(executor.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(ImageExecutorBusyError):
+            await executor.run(sum, [1, 2])
+        release.set()
+        await asyncio.gather(*blocked)
+        return await executor.run(sum, [1, 2])
+
+    try:
+        assert asyncio.run(run()) == 3
+    finally:
+        executor.shutdown()
+
+    metrics = executor.get_metrics()
+    assert metrics["rejected"] == 1
+    assert metrics["peak_pending"] == 2
+    assert metrics["pending"] == 0
+
+
+def test_failed_jobs_are_counted_as_errors_not_completed():
+    executor = ImageExecutorService()
+
+    async def run():
+        await executor.run(sum, [1, 2])
+        with pytest.raises(ValueError):
+            await executor.run(int, "not a number")
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+
+    metrics = executor.get_metrics()
+    assert (metrics["completed"], metrics["errors"], metrics["pending"]) == (1, 1, 0)
+
+
+def test_hand_photo_upload_runs_on_executor(monkeypatch):
+    monkeypatch.setattr(settings, "renditions_enabled", False)
+    uploads = []
+
+    def fake_upload(data, folder, filename=None, content_type="image/png"):
+        uploads.append((folder, content_type, Image.open(io.BytesIO(data)).size))
+        return f"https://cdn/{folder}/x", f"{folder}/x"
+
+    monkeypatch.setattr(tryon_router.s3_service, "upload_image", fake_upload)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(
+                "/api/tryon/upload-hand-photo",
+                files={"file": ("hand.jpg", _jpeg_bytes(), "image/jpeg")}
+            )
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200, response.text
+    assert response.json()["dimensions"] == {"width": 2048, "height": 1024}
+    assert sorted(uploads) == [
+        ("tryon/hand-photos", "image/jpeg", (2048, 1024)),
+        ("tryon/thumbnails", "image/png", (300, 150))
+    ]
+
+
+def test_hand_photo_upload_stores_renditions(monkeypatch):
+    monkeypatch.setattr(settings, "rendition_formats", "webp")
+    uploads = []
+
+    def fake_upload(data, folder, filename=None, content_type="image/png"):
+        uploads.append((folder, content_type, Image.open(io.BytesIO(data)).size))
+        return f"https://cdn/{folder}/{len(uploads)}", f"{folder}/{filename or 'photo'}"
+
+    monkeypatch.setattr(tryon_router.s3_service, "upload_image", fake_upload)
+    monkeypatch.setattr(tryon_router.s3_service, "get_url", lambda key, expiration=3600: f"https://signed/{key}")
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(
+                "/api/tryon/upload-hand-photo",
+                files={"file": ("hand.jpg", _jpeg_bytes(), "image/jpeg")}
+            )
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert sorted(uploads) == [
+        ("renditions/tryon/hand-photos", "image/webp", (160, 80)),
+        ("renditions/tryon/hand-photos", "image/webp", (320, 160)),
+        ("renditions/tryon/hand-photos", "image/webp", (640, 320)),
+        ("renditions/tryon/hand-photos", "image/webp", (1280, 640)),
+        ("tryon/hand-photos", "image/jpeg", (2048, 1024))
+    ]
+    assert body["thumbnail_url"].startswith("https://signed/renditions/tryon/hand-photos/") and body["thumbnail_url"].endswith("_320.webp")
+    assert [v["width"] for v in body["renditions"]["variants"]] == [160, 320, 640, 1280]
+
+
+def test_truncated_hand_photo_is_rejected(monkeypatch):
+    monkeypatch.setattr(tryon_router.s3_service, "upload_image", lambda *args, **kwargs: pytest.fail("nothing should be uploaded"))
+    truncated = _jpeg_bytes()[:2000]
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(
+                "/api/tryon/upload-hand-photo",
+                files={"file": ("hand.jpg", truncated, "image/jpeg")}
+            )
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid image file"
+
+
+def test_saturated_executor_returns_429(monkeypatch):
+    monkeypatch.setattr(settings, "image_executor_max_pending", 0)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(
+                "/api/tryon/composite-tryon",
+                files={
+                    "body_photo": ("hand.jpg", _jpeg_bytes((64, 64)), "image/jpeg"),
+                    "jewelry_photo": ("ring.jpg", _jpeg_bytes((64, 64)), "image/jpeg")
+                }
+            )
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == str(settings.image_executor_retry_after_seconds)
@@ -0,0 +1,165 @@
+"""
+Test mesh parsing/statistics and the cached process-pool analysis service
+(including recovery from a dead worker)
+"""
+import asyncio
+import json
+import os
+import struct
+from concurrent.futures.process import BrokenProcessPool
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import numpy as np
+import pytest
+
+from backend.services import mesh_analysis_service as mesh_module
+from backend.utils.mesh_stats import analyze_mesh_file, compute_stats, detect_format, parse_obj, parse_stl
+
+# Unit cube: quads, "v/vt" and "v//vn" tokens, irregular spacing and negative indices
+CUBE_OBJ = b"""# cube
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+v 0 0 1
+v 1 0 1
+v 1 1 1
+v 0 1 1
+vt 0 0
+f 1/1 4/1 3/1 2/1
+f 5/1 6/1 7/1 8/1
+f 1//1 2//1 6//1 5//1
+f 2 3 7 6
+f  3 4   8 7 
+f -8 -4 -1 -5
+"""
+
+
+def _cube_triangles() -> np.ndarray:
+    vertices, faces = parse_obj(CUBE_OBJ)
+    return vertices[faces]
+
+
+def _binary_stl(triangles: np.ndarray) -> bytes:
+    record = np.zeros(len(triangles), dtype=[("normal", "<f4", 3), ("vertices", "<f4", (3, 3)), ("attributes", "<u2")])
+    record["vertices"] = triangles
+    return b"\0" * 80 + struct.pack("<I", len(triangles)) + record.tobytes()
+
+
+def _glb(vertices: np.ndarray, faces: np.ndarray, node: dict) -> bytes:
+    positions = vertices.astype("<f4").tobytes()
+    indices = faces.astype("<u4").tobytes()
+    binary = positions + indices
+    gltf = {
+        "asset": {"version": "2.0"},
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"children": [1]}, {"mesh": 0, **node}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1}]}],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": len(positions)},
+            {"buffer": 0, "byteOffset": len(positions), "byteLength": len(indices)}
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": len(vertices), "type": "VEC3"},
+            {"bufferView": 1, "componentType": 5125, "count": faces.size, "type": "SCALAR"}
+        ]
+    }
+    json_chunk = json.dumps(gltf).encode()
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    chunks = struct.pack("<II", len(json_chunk), 0x4E4F534A) + json_chunk + struct.pack("<II", len(binary), 0x004E4942) + binary
+    return struct.pack("<III", 0x46546C67, 2, 12 + len(chunks)) + chunks
+
+
+def test_obj_cube_stats():
+    stats = compute_stats(*parse_obj(CUBE_OBJ))
+
+    assert (stats["vertices"], stats["faces"]) == (8, 12)
+    assert stats["is_watertight"] is True
+    assert stats["volume"] == pytest.approx(1.0)
+    assert stats["surface_area"] == pytest.approx(6.0)
+    assert stats["bounding_box"]["size"] == [1.0, 1.0, 1.0]
+
+
+def test_stl_binary_and_ascii_are_welded():
+    triangles = _cube_triangles()
+    binary = _binary_stl(triangles)
+    ascii_stl = b"solid cube\n" + b"".join(
+        b"facet normal 0 0 0\nouter loop\n"
+        + b"".join(b"vertex %f %f %f\n" % tuple(point) for point in triangle)
+        + b"endloop\nendfacet\n"
+        for triangle in triangles
+    ) + b"endsolid cube\n"
+
+    for data in (binary, ascii_stl):
+        assert detect_format(data[:512], len(data)) == "stl"
+        stats = compute_stats(*parse_stl(data))
+        assert stats["unique_vertices"] == 8
+        assert stats["is_watertight"] is True
+        assert stats["volume"] == pytest.approx(1.0)
+
+
+def test_glb_applies_node_transforms(tmp_path):
+    vertices, faces = parse_obj(CUBE_OBJ)
+    path = tmp_path / "cube.glb"
+    path.write_bytes(_glb(vertices, faces, {"scale": [2, 2, 2], "translation": [10, 0, 0]}))
+
+    stats = analyze_mesh_file(str(path))
+
+    assert stats["source_format"] == "glb"
+    assert stats["volume"] == pytest.approx(8.0)
+    assert stats["bounding_box"]["min"] == pytest.approx([10.0, 0.0, 0.0])
+
+
+def test_open_mesh_is_not_watertight():
+    vertices, faces = parse_obj(CUBE_OBJ)
+
+    stats = compute_stats(vertices, faces[:-2])
+
+    assert stats["is_watertight"] is False
+    assert stats["volume"] is None
+
+
+def test_analysis_runs_in_pool_and_is_cached(tmp_path, monkeypatch):
+    path = tmp_path / "cube.obj"
+    path.write_bytes(CUBE_OBJ)
+    monkeypatch.setattr(mesh_module.mesh_stats_cache, "use_redis", False)
+    service = mesh_module.MeshAnalysisService()
+
+    async def run():
+        first = await service.analyze(str(path), "cube-hash")
+        second = await service.analyze(str(path), "cube-hash")
+        return first, second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        service.shutdown()
+
+    assert first["cached"] is False and second["cached"] is True
+    assert second["faces"] == 12
+    assert service.get_metrics()["analyzed"] == 1
+
+
+def test_broken_pool_is_recreated(tmp_path, monkeypatch):
+    path = tmp_path / "cube.obj"
+    path.write_bytes(CUBE_OBJ)
+    monkeypatch.setattr(mesh_module.mesh_stats_cache, "use_redis", False)
+    service = mesh_module.MeshAnalysisService()
+
+    try:
+        asyncio.run(service.analyze(str(path), "cube-before"))
+        for process in list(service._executor._processes.values()):
+            process.kill()
+            process.join()
+
+        with pytest.raises(BrokenProcessPool):
+            asyncio.run(service.analyze(str(path), "cube-broken"))
+        stats = asyncio.run(service.analyze(str(path), "cube-after"))
+    finally:
+        service.shutdown()
+
+    assert stats["faces"] == 12
+    assert service.get_metrics()["restarts"] == 1
@@ -0,0 +1,224 @@
+"""
+Test tray inspection (/api/qc/inspect-batch): multipart and zip input, NDJSON stream,
+one bulk insert, trials reserved up front and refunded for unsaved items, zip size and
+corruption checks
+"""
+import asyncio
+import io
+import json
+import os
+import zipfile
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+import numpy as np
+import pytest
+from PIL import Image
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.config import settings
+from backend.app.main import app
+from backend.models.database import Base, QCInspection, get_db
+from backend.routers import qc_inspector as qc_router
+from backend.services.local_storage_service import local_storage_service
+from backend.services.qc_inspector_service import qc_inspector_service
+from backend.services.qc_pool_service import qc_pool_service
+from backend.utils.auth import get_current_user
+
+USER = {"_id": 7, "username": "inspector"}
+
+
+def _photo(seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 255, (30, 40, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).resize((640, 480), Image.Resampling.BICUBIC).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _zip(entries) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _run_batch(monkeypatch, tmp_path, trial_status, **request):
+    responses, rows, inserts, usage = _run_batches(monkeypatch, tmp_path, trial_status, [request])
+    return responses[0], rows, inserts, usage
+
+
+def _run_batches(monkeypatch, tmp_path, trial_status, requests):
+    """Post trays concurrently against one trial counter; usage lists ("reserve"/"refund", count)"""
+    usage = []
+    used = {"count": 0}
+
+    def reserve_usage(user_id, feature, count=1):
+        if trial_status.get("unlimited"):
+            remaining = -1
+        else:
+            remaining = trial_status["remaining"] - used["count"]
+            if count > remaining:
+                return {**trial_status, "allowed": False, "remaining": max(0, remaining)}
+        used["count"] += count
+        usage.append(("reserve", count))
+        return {**trial_status, "allowed": True, "remaining": remaining, "reserved": count}
+
+    def refund_usage(user_id, feature, count=1):
+        used["count"] -= count
+        usage.append(("refund", count))
+        return count
+
+    monkeypatch.setattr(qc_inspector_service, "mode", "classical")
+    monkeypatch.setattr(settings, "storage_backend", "local")
+    monkeypatch.setattr(local_storage_service, "base_path", tmp_path / "storage")
+    monkeypatch.setattr(qc_router.TrialUsageModel, "reserve_usage", reserve_usage)
+    monkeypatch.setattr(qc_router.TrialUsageModel, "refund_usage", refund_usage)
+    monkeypatch.setattr(qc_router.TrialUsageModel, "record_usage", lambda *args: pytest.fail("trials must be reserved up front"))
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'qc.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    inserts = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_inserts(conn, cursor, statement, *args):
+        if statement.startswith("INSERT INTO qc_inspections"):
+            inserts.append(statement)
+
+    session = sessionmaker(bind=engine)()
+
+    def override_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_current_user] = lambda: USER
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=60) as client:
+            return await asyncio.gather(*(client.post("/api/qc/inspect-batch", **request) for request in requests))
+
+    try:
+        responses = asyncio.run(run())
+        rows = session.query(QCInspection).order_by(QCInspection.id).all()
+        return responses, rows, inserts, usage
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+        qc_pool_service.shutdown()
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_multipart_batch_streams_items_and_bulk_inserts(monkeypatch, tmp_path):
+    files = [("files", (f"piece{i}.jpg", _photo(i), "image/jpeg")) for i in range(4)]
+    files.append(("files", ("notes.txt", b"not an image", "text/plain")))
+
+    response, rows, inserts, usage = _run_batch(
+        monkeypatch, tmp_path, {"allowed": True, "unlimited": True},
+        files=files, data={"item_reference": "tray-9"}
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = _lines(response)
+    assert lines[0] == {"type": "batch", "total": 5}
+    items = {line["index"]: line for line in lines if line["type"] == "item"}
+    assert sorted(items) == [0, 1, 2, 3, 4]
+    assert all(items[i]["success"] and items[i]["detection_mode"] == "classical" for i in range(4))
+    assert not items[4]["success"]
+
+    summary = lines[-1]
+    assert summary["type"] == "summary" and summary["succeeded"] == 4 and summary["failed"] == 1
+    assert [row.item_reference for row in rows] == [f"tray-9/piece{i}.jpg" for i in range(4)]
+    assert {int(k): v for k, v in summary["inspection_ids"].items()} == {i: rows[i].id for i in range(4)}
+    # SQLite can't return IDs of a multi-row INSERT in parameter order, so SQLAlchemy
+    # inserts row by row there; PostgreSQL gets one INSERT for the tray
+    assert len(inserts) == 4 and all(statement.endswith("RETURNING id") for statement in inserts)
+    assert usage == [("reserve", 5), ("refund", 1)]
+
+
+def test_zip_batch_respects_trial_budget(monkeypatch, tmp_path):
+    archive = _zip([("tray/a.png", _photo(1)), ("tray/b.jpg", _photo(2)), ("tray/c.jpg", _photo(3)), ("__MACOSX/tray/._a.png", b"x")])
+
+    response, rows, _, usage = _run_batch(
+        monkeypatch, tmp_path, {"allowed": True, "unlimited": False, "remaining": 2, "limit": 3},
+        files={"archive": ("tray.zip", archive, "application/zip")}
+    )
+
+    assert response.status_code == 200, response.text
+    lines = _lines(response)
+    assert lines[0]["total"] == 3
+    items = {line["index"]: line for line in lines if line["type"] == "item"}
+    assert items[2] == {"type": "item", "index": 2, "source": "tray/c.jpg", "success": False, "error": "trial_limit_reached"}
+    assert len(rows) == 2 and usage == [("reserve", 2)]
+
+
+def test_concurrent_trays_cannot_share_remaining_trials(monkeypatch, tmp_path):
+    trays = [
+        {"files": [("files", (f"tray{t}_piece{i}.jpg", _photo(10 * t + i), "image/jpeg")) for i in range(2)]}
+        for t in range(2)
+    ]
+
+    responses, rows, _, usage = _run_batches(
+        monkeypatch, tmp_path, {"allowed": True, "unlimited": False, "remaining": 2, "limit": 3}, trays
+    )
+
+    assert sorted(response.status_code for response in responses) == [200, 402]
+    assert len(rows) == 2 and usage == [("reserve", 2)]
+
+
+def test_unsaved_trays_refund_their_trials(monkeypatch, tmp_path):
+    def failing_insert(table):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(qc_router, "insert", failing_insert)
+    files = [("files", (f"piece{i}.jpg", _photo(i), "image/jpeg")) for i in range(2)]
+
+    response, rows, _, usage = _run_batch(monkeypatch, tmp_path, {"allowed": True, "unlimited": True}, files=files)
+
+    summary = _lines(response)[-1]
+    assert summary["type"] == "summary" and not summary["success"]
+    assert not rows and usage == [("reserve", 2), ("refund", 2)]
+
+
+def test_invalid_batches_are_rejected(monkeypatch, tmp_path):
+    response, rows, _, usage = _run_batch(
+        monkeypatch, tmp_path, {"allowed": True, "unlimited": True},
+        files={"archive": ("tray.zip", b"not a zip", "application/zip")}
+    )
+    assert response.status_code == 400 and not rows and not usage
+
+    monkeypatch.setattr(qc_router.settings, "qc_batch_max_items", 2)
+    files = [("files", (f"piece{i}.jpg", _photo(i), "image/jpeg")) for i in range(3)]
+    response, _, _, _ = _run_batch(monkeypatch, tmp_path, {"allowed": True, "unlimited": True}, files=files)
+    assert response.status_code == 400
+
+
+def test_oversized_or_corrupt_archives_are_rejected(monkeypatch, tmp_path):
+    archive = _zip([(f"tray/piece{i}.jpg", _photo(i)) for i in range(2)])
+    monkeypatch.setattr(qc_router.settings, "qc_batch_max_archive_mb", 0)
+    response, rows, _, usage = _run_batch(
+        monkeypatch, tmp_path, {"allowed": True, "unlimited": True},
+        files={"archive": ("tray.zip", archive, "application/zip")}
+    )
+    assert response.status_code == 400 and "too large" in response.json()["detail"]
+    assert not rows and not usage
+
+    # A stored entry whose bytes no longer match the CRC in its header
+    monkeypatch.setattr(qc_router.settings, "qc_batch_max_archive_mb", 500)
+    photo = _photo(0)
+    corrupt = bytearray(_zip([("piece.jpg", photo)]))
+    offset = bytes(corrupt).index(photo[:64]) + len(photo) // 2
+    corrupt[offset] ^= 0xFF
+    response, rows, _, _ = _run_batch(
+        monkeypatch, tmp_path, {"allowed": True, "unlimited": True},
+        files={"archive": ("tray.zip", bytes(corrupt), "application/zip")}
+    )
+    assert response.status_code == 400 and "Corrupt zip entry" in response.json()["detail"]
+    assert not rows
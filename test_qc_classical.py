@@ -0,0 +1,74 @@
+"""
+Test the deterministic classical QC detector (qc_mode=classical)
+"""
+import asyncio
+import io
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from backend.services.qc_detection import CLASSICAL_TYPES, ClassicalDefectDetector
+from backend.services.qc_inspector_service import qc_inspector_service
+
+
+def _item(scratch=False, pits=False, highlight=True, size=1200) -> np.ndarray:
+    """Gold-coloured disc on a white background, with optional defects"""
+    rng = np.random.default_rng(1)
+    image = np.full((size, size, 3), 245, np.float32)
+    yy, xx = np.mgrid[:size, :size]
+    disc = np.hypot(yy - size / 2, xx - size / 2) < size * 0.38
+    shade = 150 + 40 * (xx / size)
+    image[disc] = np.stack([shade * 1.1, shade * 0.95, shade * 0.6], axis=-1)[disc]
+    image = (image + rng.normal(0, 3, image.shape)).clip(0, 255).astype(np.uint8)
+    if highlight:
+        cv2.circle(image, (int(size * 0.4), int(size * 0.38)), int(size * 0.04), (255, 255, 255), -1)
+    if scratch:
+        cv2.line(image, (int(size * 0.35), int(size * 0.55)), (int(size * 0.6), int(size * 0.7)), (70, 60, 40), 3)
+    if pits:
+        for cx, cy in ((0.6, 0.35), (0.65, 0.4)):
+            cv2.circle(image, (int(size * cx), int(size * cy)), 5, (40, 35, 25), -1)
+    return image
+
+
+def _jpeg(pixels: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def test_detects_scratch_and_porosity_but_not_highlights():
+    rows = ClassicalDefectDetector().detect(_item(scratch=True, pits=True))
+    types = [CLASSICAL_TYPES[int(row[4])] for row in rows]
+
+    assert types[0] == "scratch"
+    assert types.count("casting_porosity") == 2
+    x, y, w, h = rows[0][:4]
+    # Scratch runs from (420, 660) to (720, 840)
+    assert x <= 425 and y <= 665 and x + w >= 715 and y + h >= 835
+
+    assert len(ClassicalDefectDetector().detect(_item())) == 0
+
+
+def test_classical_mode_is_deterministic(monkeypatch):
+    monkeypatch.setattr(qc_inspector_service, "mode", "classical")
+    data = _jpeg(_item(scratch=True, pits=True))
+
+    first = asyncio.run(qc_inspector_service.inspect_file(data, file_type="image", has_cad_file=True))
+    second = asyncio.run(qc_inspector_service.inspect_file(data, file_type="image", has_cad_file=True))
+
+    assert first["detection_mode"] == "classical"
+    assert first["defects"] and first["defects"] == second["defects"]
+    assert first["status"] == "failed"
+
+
+def test_clean_item_passes_in_classical_mode(monkeypatch):
+    monkeypatch.setattr(qc_inspector_service, "mode", "classical")
+
+    result = asyncio.run(qc_inspector_service.inspect_file(_jpeg(_item()), file_type="image", has_cad_file=True))
+
+    assert result["status"] == "passed" and result["defects"] == []
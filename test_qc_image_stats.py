@@ -0,0 +1,57 @@
+"""
+Test the fused QC lighting statistics (one histogram pass, strided proxy with bounded error)
+"""
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import numpy as np
+import pytest
+
+from backend.services.qc_detection import GLINT_LEVEL, image_histogram, image_statistics, statistics_proxy
+
+
+def _legacy(pixels: np.ndarray) -> list:
+    return [pixels.mean(), pixels.std(), pixels.max(), np.sum(pixels > GLINT_LEVEL) / pixels.size]
+
+
+def _photo(shape, seed=0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    base = np.linspace(0, 255, shape[1])[None, :]
+    if len(shape) == 3:
+        base = base[..., None]
+    return np.clip(base + rng.normal(0, 30, shape), 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("shape", [(480, 640, 3), (480, 640, 4), (480, 640)])
+def test_fused_statistics_match_separate_passes(shape):
+    pixels = _photo(shape)
+
+    np.testing.assert_allclose(image_statistics(pixels), _legacy(pixels), rtol=1e-9, atol=1e-9)
+    histogram = image_histogram(pixels)
+    assert histogram.sum() == pixels.size and histogram[255] == np.count_nonzero(pixels == 255)
+
+
+def test_proxy_error_is_within_the_sampling_bound():
+    pixels = _photo((3000, 4000, 3), seed=1)
+    max_pixels = 250_000
+
+    proxy = statistics_proxy(pixels, max_pixels)
+    assert proxy.shape[0] * proxy.shape[1] <= max_pixels and proxy.flags["C_CONTIGUOUS"]
+
+    exact = image_statistics(pixels)
+    estimate = image_statistics(pixels, max_pixels)
+    # 4 standard errors of a uniform sample of proxy.size values
+    samples = proxy.size
+    assert abs(estimate[0] - exact[0]) < 4 * 127.5 / np.sqrt(samples)
+    assert abs(estimate[1] - exact[1]) < 4 * 127.5 / np.sqrt(samples)
+    assert abs(estimate[3] - exact[3]) < 4 * 0.5 / np.sqrt(samples)
+
+
+def test_small_and_non_8bit_images():
+    pixels = _photo((100, 100, 3))
+    assert statistics_proxy(pixels, 1_000_000) is pixels
+
+    wide = (np.arange(40_000, dtype=np.uint16).reshape(200, 200) * 7)
+    np.testing.assert_allclose(image_statistics(wide), _legacy(wide))
@@ -0,0 +1,128 @@
+"""
+Test the QC process pool (worker initialisation, compact results, backpressure, per-worker stats,
+recovery from a dead worker)
+"""
+import asyncio
+import io
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+import numpy as np
+import pytest
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.config import settings
+from backend.app.main import app
+from backend.models.database import Base, get_db
+from backend.routers import qc_inspector as qc_router
+from backend.services.local_storage_service import local_storage_service
+from backend.services.qc_detection import COLUMNS, analyze_image
+from backend.services.qc_inspector_service import qc_inspector_service
+from backend.services.qc_pool_service import qc_pool_service
+from backend.utils.auth import get_current_user
+
+USER = {"_id": 7, "username": "inspector"}
+
+
+def _photo(size=(640, 480)) -> bytes:
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (size[1] // 16, size[0] // 16, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels).resize(size, Image.Resampling.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _post_inspections(monkeypatch, tmp_path, count):
+    monkeypatch.setattr(qc_router.TrialUsageModel, "check_trial_limit", lambda user_id, feature: {"allowed": True})
+    monkeypatch.setattr(settings, "storage_backend", "local")
+    monkeypatch.setattr(local_storage_service, "base_path", tmp_path / "storage")
+    monkeypatch.setattr(qc_router.TrialUsageModel, "record_usage", lambda user_id, feature: None)
+    engine = create_engine(f"sqlite:///{tmp_path / 'qc.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    def override_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_current_user] = lambda: USER
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            responses = await asyncio.gather(*(
+                client.post("/api/qc/inspect", files={"file": (f"piece{i}.jpg", _photo(), "image/jpeg")}, data={"has_cad_file": "true"})
+                for i in range(count)
+            ))
+            return responses, await client.get("/metrics")
+
+    try:
+        return asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_analyze_image_returns_compact_arrays():
+    statistics, detections, worker_ms, pid = analyze_image(_photo(), "classical")
+
+    assert statistics.shape == (6,) and statistics[4:].tolist() == [640, 480]
+    assert detections.dtype == np.float32 and detections.shape[1] == len(COLUMNS)
+    assert worker_ms > 0 and pid == os.getpid()
+
+    with np.testing.assert_raises(ValueError):
+        analyze_image(b"not an image", "classical")
+
+
+def test_inspections_run_in_worker_processes(monkeypatch, tmp_path):
+    monkeypatch.setattr(qc_inspector_service, "mode", "classical")
+    try:
+        (first, second, third), metrics = _post_inspections(monkeypatch, tmp_path, 3)
+    finally:
+        qc_pool_service.shutdown()
+
+    for response in (first, second, third):
+        assert response.status_code == 200, response.text
+        assert response.json()["detection_mode"] == "classical"
+    assert first.json()["defects"] == second.json()["defects"]
+
+    pool = metrics.json()["qc_pool"]
+    assert pool["completed"] >= 3 and pool["pending"] == 0
+    assert str(os.getpid()) not in pool["per_worker"]
+    assert sum(worker["tasks"] for worker in pool["per_worker"].values()) >= 3
+
+
+def test_saturated_pool_returns_429(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "qc_pool_max_pending", 0)
+    rejected = qc_pool_service.stats["rejected"]
+
+    (response,), _ = _post_inspections(monkeypatch, tmp_path, 1)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(settings.qc_pool_retry_after_seconds)
+    assert qc_pool_service.stats["rejected"] == rejected + 1
+
+
+def test_broken_pool_is_recreated():
+    try:
+        asyncio.run(qc_pool_service.analyze(_photo(), "classical"))
+        broken = qc_pool_service._executor
+        restarts = qc_pool_service.stats["restarts"]
+        for process in list(broken._processes.values()):
+            process.kill()
+            process.join()
+
+        with pytest.raises(BrokenProcessPool):
+            asyncio.run(qc_pool_service.analyze(_photo(), "classical"))
+        statistics, _ = asyncio.run(qc_pool_service.analyze(_photo(), "classical"))
+    finally:
+        qc_pool_service.shutdown()
+
+    assert statistics[4:].tolist() == [640, 480]
+    assert qc_pool_service.stats["restarts"] == restarts + 1
@@ -0,0 +1,182 @@
+"""
+Test QC upload storage: /api/qc/inspect keeps storage keys (not data URLs) in the row,
+and the migration tool moves legacy data-URL rows out in batches (cleaning up after
+failed rows and optionally compacting the database)
+"""
+import asyncio
+import base64
+import io
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+import numpy as np
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.config import settings
+from backend.app.main import app
+from backend.models.database import Base, QCInspection, ReworkJob, get_db
+from backend.routers import qc_inspector as qc_router
+from backend.services.local_storage_service import local_storage_service
+from backend.services.qc_inspector_service import qc_inspector_service
+from backend.services.qc_pool_service import qc_pool_service
+from backend.utils.auth import get_current_user
+from backend.utils.migrate_qc_images import decode_data_url, migrate_qc_images
+
+USER = {"_id": 7, "username": "inspector"}
+
+
+def _photo(seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _data_url(data: bytes, content_type: str) -> str:
+    return f"data:{content_type};base64,{base64.b64encode(data).decode()}"
+
+
+def _setup(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "storage_backend", "local")
+    monkeypatch.setattr(local_storage_service, "base_path", tmp_path / "storage")
+    engine = create_engine(f"sqlite:///{tmp_path / 'qc.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def _stored(key: str) -> bytes:
+    return (local_storage_service.base_path / key).read_bytes()
+
+
+def _stored_files(tmp_path) -> list:
+    storage = tmp_path / "storage"
+    return sorted(str(path.relative_to(storage)) for path in storage.rglob("*") if path.is_file())
+
+
+def test_inspect_stores_keys_and_resolves_urls(monkeypatch, tmp_path):
+    session = _setup(monkeypatch, tmp_path)
+    monkeypatch.setattr(qc_inspector_service, "mode", "classical")
+    monkeypatch.setattr(qc_router.TrialUsageModel, "check_trial_limit", lambda user_id, feature: {"allowed": True})
+    monkeypatch.setattr(qc_router.TrialUsageModel, "record_usage", lambda user_id, feature: None)
+
+    def override_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_current_user] = lambda: USER
+    photo = _photo()
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=60) as client:
+            inspected = await client.post("/api/qc/inspect", files={"file": ("ring.jpg", photo, "image/jpeg")})
+            listed = await client.get("/api/qc/inspections", params={"user_id": USER["_id"]})
+            fetched = await client.get(f"/api/qc/inspections/{inspected.json()['inspection_id']}")
+            return inspected, listed, fetched
+
+    try:
+        inspected, listed, fetched = asyncio.run(run())
+        row = session.query(QCInspection).one()
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+        qc_pool_service.shutdown()
+
+    assert inspected.status_code == 200, inspected.text
+    assert row.item_image_url is None and row.item_thumbnail_url is None
+    assert row.item_image_key.startswith("qc/uploads/") and row.item_image_key.endswith(".jpg")
+    assert row.item_thumbnail_key.startswith("qc/thumbnails/")
+    assert _stored(row.item_image_key) == photo
+    assert Image.open(io.BytesIO(_stored(row.item_thumbnail_key))).format == "PNG"
+
+    image_url = local_storage_service.get_url(row.item_image_key)
+    thumbnail_url = local_storage_service.get_url(row.item_thumbnail_key)
+    assert inspected.json()["image_url"] == image_url and inspected.json()["thumbnail_url"] == thumbnail_url
+    assert fetched.json()["image_url"] == image_url
+    assert listed.json()["inspections"][0]["thumbnail_url"] == thumbnail_url
+
+
+def test_decode_data_url():
+    assert decode_data_url("data:image/png;base64,aGk=") == (b"hi", "image/png")
+    assert decode_data_url("data:,a%20b") == (b"a b", "application/octet-stream")
+
+
+def test_migration_moves_data_urls_in_batches(monkeypatch, tmp_path):
+    session = _setup(monkeypatch, tmp_path)
+    photos = [_photo(seed) for seed in range(3)]
+    image_urls = [_data_url(photo, "image/jpeg") for photo in photos]
+    thumbnail_url = _data_url(b"\x89PNG thumbnail", "image/png")
+    session.add_all([
+        QCInspection(user_id=7, item_image_url=image_urls[0], item_thumbnail_url=thumbnail_url),
+        # Thumbnail failed: the image URL was stored twice
+        QCInspection(user_id=7, item_image_url=image_urls[1], item_thumbnail_url=image_urls[1]),
+        QCInspection(user_id=7, item_image_url=image_urls[2]),
+        QCInspection(user_id=7, item_image_key="qc/uploads/already.jpg"),
+    ])
+    session.add(ReworkJob(defect_type="scratch", evidence_images=[image_urls[0], "https://example.com/x.jpg"]))
+    session.commit()
+    cleared = sum(map(len, image_urls)) + len(image_urls[0]) + len(thumbnail_url) + len(image_urls[1])
+
+    dry_run = migrate_qc_images(db=session, batch_size=2, dry_run=True)
+    assert dry_run["inspections"] == 3 and dry_run["bytes_cleared"] == cleared
+    assert not (tmp_path / "storage").exists() or not any((tmp_path / "storage").rglob("*.*"))
+    assert session.query(QCInspection).filter(QCInspection.item_image_url.isnot(None)).count() == 3
+
+    stats = migrate_qc_images(db=session, batch_size=2)
+    assert stats.pop("database_bytes_before") > 0 and stats.pop("database_bytes_after") > 0
+    session.expire_all()
+    rows = session.query(QCInspection).order_by(QCInspection.id).all()
+    rework = session.query(ReworkJob).one()
+
+    assert stats == {
+        "inspections": 3, "rework_jobs": 1, "files_uploaded": 4,
+        "bytes_uploaded": sum(map(len, photos)) + len(b"\x89PNG thumbnail"),
+        "bytes_cleared": cleared, "failed": 0
+    }
+    assert all(row.item_image_url is None and row.item_thumbnail_url is None for row in rows)
+    assert [_stored(row.item_image_key) for row in rows[:3]] == photos
+    assert rows[0].item_thumbnail_key.startswith("qc/thumbnails/")
+    assert rows[1].item_thumbnail_key == rows[1].item_image_key and rows[2].item_thumbnail_key is None
+    assert rows[3].item_image_key == "qc/uploads/already.jpg"
+    # Evidence copied from the inspection reuses its upload
+    assert rework.evidence_images == [rows[0].item_image_key, "https://example.com/x.jpg"]
+
+    assert migrate_qc_images(db=session)["inspections"] == 0
+    session.close()
+
+
+def test_failed_row_deletes_its_uploads(monkeypatch, tmp_path):
+    session = _setup(monkeypatch, tmp_path)
+    image_url = _data_url(_photo(), "image/jpeg")
+    # The image uploads, then the thumbnail fails to decode
+    session.add(QCInspection(user_id=7, item_image_url=image_url, item_thumbnail_url="data:image/png;base64,not base64!"))
+    session.add(ReworkJob(defect_type="scratch", evidence_images=[image_url]))
+    session.commit()
+
+    stats = migrate_qc_images(db=session)
+    session.expire_all()
+    inspection = session.query(QCInspection).one()
+    rework = session.query(ReworkJob).one()
+
+    assert stats["failed"] == 1 and stats["inspections"] == 0 and stats["rework_jobs"] == 1
+    assert inspection.item_image_url == image_url and inspection.item_image_key is None
+    # The evidence image was uploaded again rather than pointing at the deleted file
+    assert stats["files_uploaded"] == 1 and _stored_files(tmp_path) == [rework.evidence_images[0]]
+    assert _stored(rework.evidence_images[0]) == _photo()
+    session.close()
+
+
+def test_vacuum_shrinks_the_database(monkeypatch, tmp_path):
+    session = _setup(monkeypatch, tmp_path)
+    session.add_all([QCInspection(user_id=7, item_image_url=_data_url(_photo(seed), "image/jpeg")) for seed in range(20)])
+    session.commit()
+
+    stats = migrate_qc_images(db=session, vacuum=True)
+
+    assert stats["inspections"] == 20
+    assert stats["database_bytes_after"] < stats["database_bytes_before"] - stats["bytes_cleared"] // 2
+    session.close()
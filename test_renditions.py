@@ -0,0 +1,120 @@
+"""
+Test WebP/AVIF renditions (generation, storage, smallest-suitable selection in list endpoints)
+"""
+import asyncio
+import io
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+import numpy as np
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.main import app
+from backend.models.database import Base, Design, get_db
+from backend.services import rendition_service as rendition_module
+from backend.services.rendition_service import rendition_service
+
+
+def _photo(size=(1000, 500), fmt="JPEG", mode="RGB") -> bytes:
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (size[1] // 10, size[0] // 10, len(mode)), dtype=np.uint8)
+    image = Image.fromarray(pixels, mode).resize(size, Image.Resampling.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def _use_local_storage(monkeypatch, tmp_path):
+    monkeypatch.setattr(rendition_module.settings, "storage_backend", "local")
+    from backend.services.local_storage_service import local_storage_service
+    monkeypatch.setattr(local_storage_service, "base_path", tmp_path)
+    return local_storage_service
+
+
+def test_render_covers_configured_sizes_below_the_original(monkeypatch):
+    monkeypatch.setattr(rendition_module.settings, "rendition_widths", "160,320,640,1280")
+    result = rendition_service.render(_photo((1000, 500)), formats=["webp"])
+
+    assert (result["width"], result["height"]) == (1000, 500)
+    assert [(v["width"], v["height"]) for v in result["variants"]] == [(160, 80), (320, 160), (640, 320), (1000, 500)]
+    for variant in result["variants"]:
+        decoded = Image.open(io.BytesIO(variant["data"]))
+        assert decoded.format == "WEBP" and decoded.size == (variant["width"], variant["height"])
+
+
+def test_render_keeps_transparency_and_encodes_avif_when_available():
+    formats = rendition_service.formats()
+    result = rendition_service.render(_photo((400, 400), "PNG", "RGBA"), sizes=[160], formats=formats)
+
+    assert {v["format"] for v in result["variants"]} == set(formats)
+    webp = next(v for v in result["variants"] if v["format"] == "webp")
+    assert Image.open(io.BytesIO(webp["data"])).mode == "RGBA"
+
+
+def test_select_picks_smallest_covering_variant():
+    manifest = {"variants": [
+        {"width": w, "height": w // 2, "format": fmt, "key": f"{w}.{fmt}"}
+        for w in (160, 320, 640) for fmt in ("webp", "avif")
+    ]}
+
+    assert rendition_service.select(manifest, 300)["key"] == "320.webp"
+    assert rendition_service.select(manifest, 320, "avif")["key"] == "320.avif"
+    assert rendition_service.select(manifest, 2000)["key"] == "640.webp"
+    webp_only = {"variants": [v for v in manifest["variants"] if v["format"] == "webp"]}
+    assert rendition_service.select(webp_only, 100, "avif")["key"] == "160.webp"
+    assert rendition_service.select(None, 100) is None
+
+
+def test_create_stores_variants_and_list_returns_smallest(monkeypatch, tmp_path):
+    storage = _use_local_storage(monkeypatch, tmp_path)
+    monkeypatch.setattr(rendition_module.settings, "rendition_formats", "webp")
+    original = _photo((1024, 1024), "PNG")
+
+    manifest = asyncio.run(rendition_service.create(original, "designs", "design_test"))
+
+    assert [v["width"] for v in manifest["variants"]] == [160, 320, 640, 1024]
+    smallest = manifest["variants"][0]
+    assert (tmp_path / smallest["key"]).read_bytes()[:4] == b"RIFF"
+    assert sum(v["bytes"] for v in manifest["variants"][:2]) * 5 < len(original)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'designs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Design(user_id=7, category="Ring", prompt="new", generated_images=["https://full/new.png"], renditions=[manifest]),
+        Design(user_id=7, category="Ring", prompt="old", generated_images=["https://full/old.png"])
+    ])
+    session.commit()
+
+    def override_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/api/designer/designs", params={"user_id": 7, "image_width": 300})
+
+    try:
+        response = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+    assert response.status_code == 200, response.text
+    thumbnails = {d["prompt"]: d["thumbnail"] for d in response.json()["designs"]}
+    assert thumbnails["new"] == storage.get_url(manifest["variants"][1]["key"])
+    assert thumbnails["old"] == "https://full/old.png"
+
+
+def test_disabled_renditions_store_nothing(monkeypatch, tmp_path):
+    _use_local_storage(monkeypatch, tmp_path)
+    monkeypatch.setattr(rendition_module.settings, "renditions_enabled", False)
+
+    assert asyncio.run(rendition_service.create(_photo(), "designs", "x")) is None
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,111 @@
+"""
+Test streamed uploads to S3 (multipart) and local storage
+"""
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import pytest
+
+from backend.services import s3_service as s3_module
+from backend.services.local_storage_service import LocalStorageService
+from backend.services.s3_service import S3Service
+
+MB = 1024 * 1024
+
+
+class FakeMultipartClient:
+    """Records the boto3 calls made by S3Service.upload_stream"""
+
+    def __init__(self, fail_on_part=None):
+        self.calls = []
+        self.part_sizes = []
+        self.fail_on_part = fail_on_part
+
+    def create_multipart_upload(self, **kwargs):
+        self.calls.append("create")
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        if PartNumber == self.fail_on_part:
+            raise RuntimeError("network error")
+        self.calls.append("part")
+        self.part_sizes.append(len(Body))
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, MultipartUpload, **kwargs):
+        self.calls.append("complete")
+        self.completed_parts = MultipartUpload["Parts"]
+
+    def abort_multipart_upload(self, **kwargs):
+        self.calls.append("abort")
+
+    def put_object(self, Body, **kwargs):
+        self.calls.append("put")
+        self.part_sizes.append(len(Body))
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://example.com/{Params['Key']}"
+
+
+async def _chunks(total: int, chunk_size: int = 64 * 1024):
+    sent = 0
+    while sent < total:
+        size = min(chunk_size, total - sent)
+        sent += size
+        yield b"x" * size
+
+
+def _s3_with(client, monkeypatch) -> S3Service:
+    monkeypatch.setattr(s3_module.settings, "storage_stream_part_size_mb", 5)
+    service = S3Service()
+    service.s3_client = client
+    return service
+
+
+def test_large_stream_uses_bounded_multipart_parts(monkeypatch):
+    client = FakeMultipartClient()
+    service = _s3_with(client, monkeypatch)
+
+    url, key, size = asyncio.run(service.upload_stream(_chunks(12 * MB), "3d-models", "m.glb", "model/gltf-binary"))
+
+    assert (key, size) == ("3d-models/m.glb", 12 * MB)
+    assert url == "https://example.com/3d-models/m.glb"
+    assert client.calls == ["create", "part", "part", "part", "complete"]
+    # Every part but the last is at least 5 MiB, and none holds much more than one part
+    assert all(5 * MB <= part < 6 * MB for part in client.part_sizes[:-1])
+    assert sum(client.part_sizes) == 12 * MB
+    assert [p["PartNumber"] for p in client.completed_parts] == [1, 2, 3]
+
+
+def test_small_stream_uses_single_put(monkeypatch):
+    client = FakeMultipartClient()
+    service = _s3_with(client, monkeypatch)
+
+    _, _, size = asyncio.run(service.upload_stream(_chunks(100_000), "3d-models", "m.stl"))
+
+    assert size == 100_000
+    assert client.calls == ["put"]
+
+
+def test_failed_stream_aborts_multipart_upload(monkeypatch):
+    client = FakeMultipartClient(fail_on_part=2)
+    service = _s3_with(client, monkeypatch)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.upload_stream(_chunks(12 * MB), "3d-models", "m.glb"))
+
+    assert client.calls[-1] == "abort"
+
+
+def test_local_stream_writes_file_atomically(tmp_path):
+    storage = LocalStorageService(base_path=str(tmp_path))
+
+    url, path, size = asyncio.run(storage.upload_stream(_chunks(3 * MB), "3d-models", "m.obj"))
+
+    assert path == "3d-models/m.obj"
+    assert size == 3 * MB
+    assert (tmp_path / path).stat().st_size == 3 * MB
+    assert not (tmp_path / "3d-models" / "m.obj.part").exists()
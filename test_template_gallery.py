@@ -0,0 +1,97 @@
+"""
+Test the template gallery warm-up: resumable and idempotent, regenerates when the
+image model changes, and /templates serves the stored previews
+"""
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.config import settings
+from backend.app.main import app
+from backend.models.database import Base, TemplatePreview
+from backend.services import template_gallery_service as gallery_module
+from backend.services.ai_designer_service import ai_designer_service
+from backend.services.template_gallery_service import TemplateGalleryService
+
+TEMPLATES = {"ring": {"bridal": ["solitaire ring", "halo ring"]}, "necklace": {"minimalist": ["pearl pendant"]}}
+
+
+def _setup(monkeypatch, tmp_path, fail_prompts=()):
+    engine = create_engine(f"sqlite:///{tmp_path / 'gallery.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(gallery_module, "SessionLocal", Session)
+    monkeypatch.setattr(ai_designer_service, "TEMPLATE_PROMPTS", TEMPLATES)
+    monkeypatch.setattr(ai_designer_service, "default_model", "dall-e-3")
+    monkeypatch.setattr(settings, "design_cache_enabled", False)
+    monkeypatch.setattr(gallery_module.s3_service, "generate_presigned_url", lambda key, expiration=3600: f"https://signed.example.com/{key}")
+    generated = []
+
+    async def fake_generate(prompt, num_images, size, quality):
+        generated.append(prompt)
+        if any(failing in prompt for failing in fail_prompts):
+            raise RuntimeError("content policy violation")
+        return [{"s3_key": f"designs/{len(generated)}.png", "model": ai_designer_service.default_model}]
+
+    monkeypatch.setattr(ai_designer_service, "generate_with_dalle", fake_generate)
+    return Session, generated
+
+
+def test_warm_up_is_idempotent_and_retries_failures(monkeypatch, tmp_path):
+    failing = {"halo ring"}
+    Session, generated = _setup(monkeypatch, tmp_path, fail_prompts=failing)
+    service = TemplateGalleryService()
+
+    first = asyncio.run(service.warm())
+    assert (first["total"], first["generated"], first["failed"]) == (3, 2, 1)
+
+    # Ready previews are skipped; the failed one is retried
+    failing.clear()
+    generated.clear()
+    second = asyncio.run(service.warm())
+    assert (second["already_materialized"], second["generated"], second["failed"]) == (2, 1, 0)
+    assert len(generated) == 1 and "halo ring" in generated[0]
+
+    db = Session()
+    rows = db.query(TemplatePreview).all()
+    assert len(rows) == 3 and {row.status for row in rows} == {"ready"} and {row.error for row in rows} == {None}
+    db.close()
+
+
+def test_changing_the_model_regenerates_previews(monkeypatch, tmp_path):
+    _, generated = _setup(monkeypatch, tmp_path)
+    service = TemplateGalleryService()
+    asyncio.run(service.warm())
+    old_key = service.template_key("ring", "bridal", "solitaire ring")
+
+    monkeypatch.setattr(ai_designer_service, "default_model", "gpt-image-1")
+    assert service.template_key("ring", "bridal", "solitaire ring") != old_key
+    previews = asyncio.run(service.get_previews("ring", "bridal", ["solitaire ring"]))
+    assert previews == [{"prompt": "solitaire ring", "image_url": None, "status": "pending"}]
+
+    state = asyncio.run(service.warm())
+    assert state["already_materialized"] == 0 and state["generated"] == 3 and len(generated) == 6
+
+
+def test_templates_endpoint_includes_previews(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    asyncio.run(gallery_module.template_gallery_service.warm())
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/api/designer/templates", json={
+                "category": "ring", "style_preset": "bridal", "include_previews": True
+            })
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200, response.text
+    previews = response.json()["previews"]
+    assert [p["prompt"] for p in previews] == ["solitaire ring", "halo ring"]
+    assert all(p["status"] == "ready" and p["image_url"].startswith("https://signed.example.com/designs/") for p in previews)
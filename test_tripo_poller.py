@@ -0,0 +1,140 @@
+"""
+Test the shared Tripo task poller: one loop for many tasks, backoff, and metrics
+"""
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import pytest
+
+from backend.services import tripo_poller_service as poller_module
+from backend.services.tripo_poller_service import TripoTaskPoller
+
+
+def _fast_polling(monkeypatch):
+    monkeypatch.setattr(poller_module.settings, "tripo_poll_min_interval_seconds", 0.01)
+    monkeypatch.setattr(poller_module.settings, "tripo_poll_max_interval_seconds", 0.08)
+    monkeypatch.setattr(poller_module.settings, "tripo_poll_backoff_factor", 2.0)
+    monkeypatch.setattr(poller_module.settings, "tripo_poll_jitter", 0.0)
+
+
+def test_poller_tracks_many_tasks_with_backoff(monkeypatch):
+    _fast_polling(monkeypatch)
+    polls = {}
+    finish_at = {}
+
+    async def fetch_status(task_id):
+        polls[task_id] = polls.get(task_id, 0) + 1
+        loop_time = asyncio.get_running_loop().time()
+        if loop_time >= finish_at[task_id]:
+            return {"status": "success", "output": {"pbr_model": f"https://example.com/{task_id}.glb"}}
+        # No progress reported: the poller should back off exponentially
+        return {"status": "queued"}
+
+    async def run():
+        poller = TripoTaskPoller(fetch_status)
+        now = asyncio.get_running_loop().time()
+        for i in range(50):
+            finish_at[f"task-{i}"] = now + 0.3
+        results = await asyncio.gather(*(poller.wait_for(task_id, max_wait=5) for task_id in finish_at))
+        return poller, results
+
+    poller, results = asyncio.run(run())
+
+    assert all(result["status"] == "success" for result in results)
+    # A fixed 10 ms interval would need ~30 polls per task over 300 ms
+    assert max(polls.values()) <= 10
+    metrics = poller.get_metrics()
+    assert metrics["queue_depth"] == 0
+    assert metrics["succeeded"] == 50
+    assert metrics["time_in_state"]["queued"]["count"] == 50
+
+
+def test_poller_reports_progress_and_failures(monkeypatch):
+    _fast_polling(monkeypatch)
+    progress_seen = []
+    progress = {"ok": 0}
+
+    async def fetch_status(task_id):
+        if task_id == "bad":
+            return {"status": "failed", "error": "mesh error"}
+        progress["ok"] += 25
+        if progress["ok"] >= 100:
+            return {"status": "success", "output": {}}
+        return {"status": "running", "progress": progress["ok"]}
+
+    async def on_progress(percent):
+        progress_seen.append(percent)
+
+    async def run():
+        poller = TripoTaskPoller(fetch_status)
+        ok = await poller.wait_for("ok", max_wait=5, on_progress=on_progress)
+        with pytest.raises(Exception, match="mesh error"):
+            await poller.wait_for("bad", max_wait=5)
+        return poller, ok
+
+    poller, ok = asyncio.run(run())
+
+    assert ok["status"] == "success"
+    assert progress_seen == [25, 50, 75]
+    assert poller.get_metrics()["failed"] == 1
+
+
+def test_slow_status_check_does_not_hold_back_other_tasks(monkeypatch):
+    _fast_polling(monkeypatch)
+
+    async def fetch_status(task_id):
+        if task_id == "slow":
+            await asyncio.sleep(0.5)
+        return {"status": "success", "output": {}}
+
+    async def run():
+        poller = TripoTaskPoller(fetch_status)
+        loop = asyncio.get_running_loop()
+        slow = asyncio.create_task(poller.wait_for("slow", max_wait=5))
+        await asyncio.sleep(0.05)
+        started = loop.time()
+        await poller.wait_for("fast", max_wait=5)
+        fast_seconds = loop.time() - started
+        await slow
+        return fast_seconds
+
+    assert asyncio.run(run()) < 0.2
+
+
+def test_duplicate_waiters_share_one_poll(monkeypatch):
+    _fast_polling(monkeypatch)
+    polls = []
+    progress_a, progress_b = [], []
+
+    async def fetch_status(task_id):
+        polls.append(task_id)
+        if len(polls) >= 3:
+            return {"status": "success", "output": {"pbr_model": "https://example.com/a.glb"}}
+        return {"status": "running", "progress": 40 * len(polls)}
+
+    async def run():
+        poller = TripoTaskPoller(fetch_status)
+
+        async def record_a(percent):
+            progress_a.append(percent)
+
+        async def record_b(percent):
+            progress_b.append(percent)
+
+        # A third caller giving up must not cancel the task for the others
+        quitter = asyncio.create_task(poller.wait_for("task-1", max_wait=5))
+        first = asyncio.create_task(poller.wait_for("task-1", max_wait=5, on_progress=record_a))
+        second = asyncio.create_task(poller.wait_for("task-1", max_wait=5, on_progress=record_b))
+        await asyncio.sleep(0)
+        quitter.cancel()
+        return poller, await first, await second
+
+    poller, first, second = asyncio.run(run())
+
+    assert first == second and first["status"] == "success"
+    assert polls == ["task-1"] * 3
+    assert progress_a == progress_b == [40, 80]
+    assert poller.get_metrics()["queue_depth"] == 0
@@ -0,0 +1,212 @@
+"""
+Test admission control (bounded concurrency, FIFO queue, per-user caps) and Gemini retries
+"""
+import asyncio
+import base64
+import io
+import json
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+import pytest
+from PIL import Image
+
+from backend.app.main import app
+from backend.services import virtual_tryon_service as tryon_module
+from backend.services.admission_service import AdmissionController, AdmissionRejectedError
+from backend.services.http_client_service import http_client_service
+from backend.utils.auth import get_current_user
+
+
+def _controller(**overrides) -> AdmissionController:
+    options = {"max_in_flight": 1, "max_queue": 10, "max_per_user": 2, "expected_seconds": 10.0}
+    options.update(overrides)
+    return AdmissionController("test", **options)
+
+
+def test_requests_run_in_arrival_order_with_bounded_concurrency():
+    controller = _controller(max_in_flight=2)
+    order, peak = [], []
+
+    async def call(user: str, index: int):
+        async with controller.slot(user) as ticket:
+            order.append(index)
+            peak.append(controller.get_metrics()["in_flight"])
+            await asyncio.sleep(0.01)
+            return ticket.to_dict()
+
+    async def run():
+        return await asyncio.gather(*(call(f"user-{i}", i) for i in range(6)))
+
+    tickets = asyncio.run(run())
+
+    assert order == list(range(6))
+    assert max(peak) == 2
+    assert [t["position_on_arrival"] for t in tickets] == [0, 0, 1, 2, 3, 4]
+    # Two slots at 10s each: positions 1-2 wait one round, 3-4 two rounds
+    assert [t["eta_seconds_on_arrival"] for t in tickets[2:]] == [10.0, 10.0, 20.0, 20.0]
+    assert controller.get_metrics()["queued"] == 0
+
+
+def test_per_user_cap_and_full_queue_are_rejected():
+    controller = _controller(max_queue=2)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold(user):
+            async with controller.slot(user):
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold(user)) for user in ("a", "a", "b")]
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejectedError, match="in progress"):
+            await controller.acquire("a")
+        with pytest.raises(AdmissionRejectedError, match="queue is full") as full:
+            await controller.acquire("c")
+
+        status = controller.queue_status("b")
+        release.set()
+        await asyncio.gather(*tasks)
+        return full.value.retry_after, status
+
+    retry_after, status = asyncio.run(run())
+
+    assert retry_after >= 1
+    assert status["in_flight"] == 1 and status["queued"] == 2
+    assert status["your_requests"]["waiting"] == [{"position": 2, "eta_seconds": 20.0, "waited_seconds": pytest.approx(0, abs=0.5)}]
+    assert controller.stats["rejected"] == 2
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    controller = _controller()
+
+    async def run():
+        first = await controller.acquire("a")
+        waiter = asyncio.create_task(controller.acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        queued = controller.get_metrics()["queued"]
+        controller.release(first)
+        return queued
+
+    assert asyncio.run(run()) == 0
+    assert controller.get_metrics()["in_flight"] == 0
+    assert controller.queue_status("b")["your_requests"]["total"] == 0
+
+
+class FakeS3Client:
+    def put_object(self, **kwargs):
+        pass
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://example.com/{Params['Key']}"
+
+
+def _gemini_body() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), (3, 3, 68)).save(buffer, format="PNG")
+    part = {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(buffer.getvalue()).decode()}}
+    return json.dumps({"candidates": [{"content": {"parts": [part]}}]}).encode()
+
+
+def _generate(monkeypatch, responses):
+    monkeypatch.setattr(tryon_module.s3_service, "s3_client", FakeS3Client())
+    monkeypatch.setattr(tryon_module.settings, "tryon_retry_base_delay_seconds", 0.01)
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        # The Gemini slot must be free while backing off
+        assert tryon_module.tryon_admission.get_metrics()["in_flight"] == 0
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(tryon_module.asyncio, "sleep", fake_sleep)
+    queue = list(responses)
+    part = {"mime_type": "image/png", "data": "AAAA"}
+
+    async def run():
+        await http_client_service.set_transport("gemini", httpx.MockTransport(lambda request: queue.pop(0)))
+        try:
+            return await tryon_module.virtual_tryon_service.generate_tryon_image(part, part, "ring", "", user_id="u1")
+        finally:
+            await http_client_service.set_transport("gemini", None)
+
+    return asyncio.run(run()), sleeps
+
+
+def test_rate_limited_calls_are_retried_honouring_retry_after(monkeypatch):
+    result, sleeps = _generate(monkeypatch, [
+        httpx.Response(429, headers={"Retry-After": "7"}, json={"error": "rate limited"}),
+        httpx.Response(503, json={"error": "unavailable"}),
+        httpx.Response(200, content=_gemini_body())
+    ])
+
+    assert result["success"]
+    assert sleeps[0] == 7.0
+    # No Retry-After on the 503: exponential backoff (attempt 1 -> ~2x base delay)
+    assert 0.015 <= sleeps[1] <= 0.025
+    assert result["queue"]["position_on_arrival"] == 0
+
+
+def test_retries_give_up_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(tryon_module.settings, "tryon_max_retries", 1)
+
+    # Still rate limited after the last retry: surfaced as a 429 with Retry-After
+    with pytest.raises(AdmissionRejectedError, match="busy") as rejected:
+        _generate(monkeypatch, [httpx.Response(429), httpx.Response(503, headers={"Retry-After": "12"})])
+
+    assert rejected.value.retry_after == 12
+    assert tryon_module.tryon_admission.get_metrics()["in_flight"] == 0
+
+
+def test_other_errors_are_not_retried(monkeypatch):
+    with pytest.raises(httpx.HTTPStatusError):
+        _generate(monkeypatch, [httpx.Response(400, json={"error": "bad request"})])
+
+
+def test_queue_status_endpoint():
+    app.dependency_overrides[get_current_user] = lambda: {"_id": "user-1", "username": "tester"}
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/api/tryon/queue-status")
+
+    try:
+        response = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["max_in_flight"] == tryon_module.tryon_admission.max_in_flight
+    assert body["your_requests"] == {"waiting": [], "total": 0}
+
+
+def test_composite_tryon_counts_against_the_callers_cap(monkeypatch):
+    monkeypatch.setattr(tryon_module.tryon_admission, "max_per_user", 0)
+    photo = io.BytesIO()
+    Image.new("RGB", (64, 64), (180, 140, 120)).save(photo, format="JPEG")
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(
+                "/api/tryon/composite-tryon",
+                files={
+                    "body_photo": ("hand.jpg", photo.getvalue(), "image/jpeg"),
+                    "jewelry_photo": ("ring.jpg", photo.getvalue(), "image/jpeg")
+                },
+                data={"user_id": "42", "mode": "generative"}
+            )
+
+    response = asyncio.run(run())
+
+    # Rejected by the per-user cap before Gemini is called
+    assert response.status_code == 429, response.text
+    assert "try-ons in progress" in response.json()["detail"]
@@ -0,0 +1,293 @@
+"""
+Test batch try-on (one body photo, many jewelry pieces, NDJSON results),
+including saved designs whose stored presigned URLs have expired
+"""
+import asyncio
+import io
+import json
+import os
+import threading
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+import numpy as np
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.main import app
+from backend.models.database import Base, Design, get_db
+from backend.routers import tryon as tryon_router
+from backend.services import tryon_batch_service as batch_module
+from backend.services import virtual_tryon_service as tryon_module
+from backend.services.http_client_service import http_client_service
+from backend.utils.auth import get_current_user
+
+USER = {"_id": "user-1", "username": "tester"}
+
+
+def _photo(seed: int) -> bytes:
+    noise = np.random.default_rng(seed).integers(0, 255, (12, 16, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(noise).resize((160, 120), Image.Resampling.BICUBIC).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _setup(monkeypatch, remaining=None, fail_seed=None):
+    """Fake Gemini and trial storage; remaining is the stored trial count (None = unlimited)"""
+    tryon_module.tryon_cache.local._entries.clear()
+    tryon_module.virtual_tryon_service._known_hashes.clear()
+    state = {"running": 0, "peak": 0, "body_prepares": 0, "usage": 0, "remaining": remaining, "generations": []}
+    failing = _photo(fail_seed) if fail_seed is not None else None
+    real_prepare = tryon_module.virtual_tryon_service.prepare_inline_image
+    lock = threading.Lock()
+
+    def counting_prepare(data, keep_alpha=False):
+        if not keep_alpha:
+            state["body_prepares"] += 1
+        return real_prepare(data, keep_alpha)
+
+    async def fake_generate(person_image, jewelry_image, jewelry_type, jewelry_description, user_id=None, progress=None):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(0.01)
+        state["running"] -= 1
+        if failing is not None and jewelry_image["data"] == real_prepare(failing, True)["data"]:
+            raise RuntimeError("Gemini returned no image")
+        state["generations"].append(user_id)
+        key = f"tryon/{user_id}/result_{jewelry_image['data'][-12:]}.png"
+        return {
+            "success": True, "result_url": f"https://s3/{key}", "s3_url": f"https://s3/{key}", "s3_key": key,
+            "size": 123, "image_size": (160, 120), "model_used": "gemini", "jewelry_type": jewelry_type,
+            "message": "ok", "generation_method": "gemini_ai_image_generation"
+        }
+
+    def check_trial_limit(user_id, feature):
+        if state["remaining"] is None:
+            return {"allowed": True, "unlimited": True}
+        return {"allowed": state["remaining"] > 0, "remaining": state["remaining"], "limit": 3}
+
+    def reserve_usage(user_id, feature, count=1):
+        with lock:
+            if state["remaining"] is not None:
+                if state["remaining"] < count:
+                    return {"allowed": False}
+                state["remaining"] -= count
+            state["usage"] += count
+        return {"allowed": True}
+
+    def refund_usage(user_id, feature, count=1):
+        with lock:
+            if state["remaining"] is not None:
+                state["remaining"] += count
+            state["usage"] -= count
+        return count
+
+    monkeypatch.setattr(tryon_module.virtual_tryon_service, "prepare_inline_image", counting_prepare)
+    monkeypatch.setattr(tryon_module.virtual_tryon_service, "generate_tryon_image", fake_generate)
+    monkeypatch.setattr(tryon_module.s3_service, "generate_presigned_url", lambda key, expiration=3600: f"https://signed/{key}")
+    monkeypatch.setattr(tryon_router.TrialUsageModel, "check_trial_limit", check_trial_limit)
+    monkeypatch.setattr(batch_module.TrialUsageModel, "reserve_usage", reserve_usage)
+    monkeypatch.setattr(batch_module.TrialUsageModel, "refund_usage", refund_usage)
+    return state
+
+
+async def _post_batch(client, jewelry_seeds):
+    files = [("body_photo", ("hand.png", _photo(100), "image/png"))]
+    files += [("jewelry_photos", (f"ring_{seed}.png", _photo(seed), "image/png")) for seed in jewelry_seeds]
+    response = await client.post("/api/tryon/batch", files=files, data={"jewelry_type": "ring"})
+    assert response.status_code == 200, response.text
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _items(lines):
+    return [line for line in lines if line["type"] == "item"]
+
+
+def _client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def test_batch_streams_items_with_bounded_concurrency(monkeypatch):
+    state = _setup(monkeypatch, fail_seed=4)
+    app.dependency_overrides[get_current_user] = lambda: USER
+
+    async def run():
+        async with _client() as client:
+            lines = await _post_batch(client, [1, 2, 3, 4, 5])
+            return lines, await client.get(f"/api/tryon/batch/{lines[0]['job_id']}")
+
+    try:
+        lines, job = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert lines[0] == {"type": "batch", "job_id": lines[0]["job_id"], "total": 5}
+    items = _items(lines)
+    assert sorted(item["index"] for item in items) == [0, 1, 2, 3, 4]
+    failed = [item for item in items if not item["success"]]
+    assert [item["source"] for item in failed] == ["ring_4.png"]
+    assert "no image" in failed[0]["error"]
+
+    summary = lines[-1]
+    assert (summary["type"], summary["succeeded"], summary["failed"], summary["cached"]) == ("summary", 4, 1, 0)
+    assert state["body_prepares"] == 1
+    assert state["peak"] == min(tryon_module.settings.tryon_batch_concurrency, tryon_module.settings.tryon_max_per_user)
+    # The failed item's reservation was refunded
+    assert state["usage"] == 4
+
+    assert job.status_code == 200
+    assert job.json()["status"] == "completed"
+    assert [r["index"] for r in job.json()["results"]] == [0, 1, 2, 3, 4]
+
+
+def test_batch_respects_remaining_trials(monkeypatch):
+    state = _setup(monkeypatch, remaining=2)
+    app.dependency_overrides[get_current_user] = lambda: USER
+
+    async def run():
+        async with _client() as client:
+            return await _post_batch(client, [1, 2, 3])
+
+    try:
+        items = _items(asyncio.run(run()))
+    finally:
+        app.dependency_overrides.clear()
+
+    assert sum(item["success"] for item in items) == 2
+    assert [item["error"] for item in items if not item["success"]] == ["trial_limit_reached"]
+    assert state["usage"] == 2 and state["remaining"] == 0
+
+
+def test_parallel_batches_share_the_stored_trial_count(monkeypatch):
+    state = _setup(monkeypatch, remaining=3)
+    app.dependency_overrides[get_current_user] = lambda: USER
+
+    async def run():
+        async with _client() as client:
+            return await asyncio.gather(*(_post_batch(client, [seed, seed + 10, seed + 20]) for seed in (1, 2, 3)))
+
+    try:
+        batches = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    items = [item for lines in batches for item in _items(lines)]
+    assert sum(item["success"] for item in items) == 3
+    assert sum(item.get("error") == "trial_limit_reached" for item in items) == 6
+    assert len(state["generations"]) == 3 and state["usage"] == 3 and state["remaining"] == 0
+
+
+def test_cached_items_are_free_but_only_for_their_own_user(monkeypatch):
+    state = _setup(monkeypatch)
+    user = {"value": USER}
+    app.dependency_overrides[get_current_user] = lambda: user["value"]
+
+    async def run():
+        async with _client() as client:
+            await _post_batch(client, [1, 2])
+            # One trial left: the two repeats come from the cache, the new piece uses the trial
+            state["remaining"] = 1
+            own = await _post_batch(client, [1, 2, 3])
+            # Another user with the same photos and one trial: no hits from user-1's results
+            state["remaining"] = 1
+            user["value"] = {"_id": "user-2", "username": "other"}
+            other = await _post_batch(client, [1, 2])
+            return own, other
+
+    try:
+        own, other = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    own_items = sorted(_items(own), key=lambda item: item["index"])
+    assert all(item["success"] for item in own_items)
+    assert [item["cached"] for item in own_items] == [True, True, False]
+    other_items = _items(other)
+    assert sum(item["success"] for item in other_items) == 1
+    assert all(not item.get("cached") for item in other_items)
+    assert [item["error"] for item in other_items if not item["success"]] == ["trial_limit_reached"]
+    assert state["generations"] == ["user-1", "user-1", "user-1", "user-2"]
+
+
+def test_batch_job_is_private_and_validated():
+    app.dependency_overrides[get_current_user] = lambda: USER
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            missing = await client.get("/api/tryon/batch/batch_unknown")
+            empty = await client.post(
+                "/api/tryon/batch", files={"body_photo": ("hand.png", _photo(1), "image/png")}
+            )
+            bad_ids = await client.post(
+                "/api/tryon/batch",
+                files={"body_photo": ("hand.png", _photo(1), "image/png")},
+                data={"design_ids": "1,abc"}
+            )
+            return missing, empty, bad_ids
+
+    try:
+        missing, empty, bad_ids = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert missing.status_code == 404
+    assert empty.status_code == 400
+    assert bad_ids.status_code == 400
+
+
+def test_design_items_are_read_from_storage_not_their_expired_url(monkeypatch, tmp_path):
+    _setup(monkeypatch)
+    monkeypatch.setattr(batch_module.s3_service, "bucket", "jeweltech-designs")
+    engine = create_engine(f"sqlite:///{tmp_path / 'designs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    # Presigned for a day when the design was generated, long since expired
+    expired = ("https://jeweltech-designs.s3.amazonaws.com/designs/design_dalle_old.png"
+               "?X-Amz-Algorithm=AWS4-HMAC-SHA256&X-Amz-Date=20250101T000000Z&X-Amz-Expires=86400&X-Amz-Signature=abc")
+    session.add(Design(id=5, category="Ring", prompt="old catalog ring", generated_images=[expired]))
+    session.commit()
+    downloads = []
+
+    def download_image(key):
+        downloads.append(key)
+        return _photo(7)
+
+    monkeypatch.setattr(batch_module.s3_service, "download_image", download_image)
+    app.dependency_overrides[get_current_user] = lambda: USER
+    app.dependency_overrides[get_db] = lambda: session
+
+    async def run():
+        await http_client_service.set_transport("default", httpx.MockTransport(lambda request: httpx.Response(403)))
+        try:
+            async with _client() as client:
+                response = await client.post(
+                    "/api/tryon/batch",
+                    files={"body_photo": ("hand.png", _photo(100), "image/png")},
+                    data={"design_ids": "5"}
+                )
+                return [json.loads(line) for line in response.text.splitlines()]
+        finally:
+            await http_client_service.set_transport("default", None)
+
+    try:
+        lines = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+    (item,) = _items(lines)
+    assert item["success"], item
+    assert item["design_id"] == 5 and downloads == ["designs/design_dalle_old.png"]
+
+
+def test_key_from_url_only_accepts_this_bucket(monkeypatch):
+    monkeypatch.setattr(batch_module.s3_service, "bucket", "jeweltech-designs")
+    key_from_url = batch_module.s3_service.key_from_url
+
+    assert key_from_url("https://jeweltech-designs.s3.eu-west-1.amazonaws.com/designs/a%20b.png?X-Amz-Signature=x") == "designs/a b.png"
+    assert key_from_url("https://s3.us-east-1.amazonaws.com/jeweltech-designs/designs/c.png") == "designs/c.png"
+    assert key_from_url("https://other-bucket.s3.amazonaws.com/designs/c.png") is None
+    assert key_from_url("https://oaidalleapiprodscus.blob.core.windows.net/private/img.png") is None
@@ -0,0 +1,131 @@
+"""
+Test the try-on result cache (perceptual-hash keys, hits skip generation and trial usage)
+"""
+import asyncio
+import io
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+import numpy as np
+from PIL import Image
+
+from backend.app.main import app
+from backend.routers import tryon as tryon_router
+from backend.services import virtual_tryon_service as tryon_module
+from backend.utils.auth import get_current_user
+from backend.utils.image_hash import perceptual_hash, hash_distance
+
+USER = {"_id": "user-1", "username": "tester"}
+
+
+def _photo(seed: int) -> Image.Image:
+    noise = np.random.default_rng(seed).integers(0, 255, (12, 16, 3), dtype=np.uint8)
+    return Image.fromarray(noise).resize((640, 480), Image.Resampling.BICUBIC)
+
+
+def _encode(image: Image.Image, fmt: str, **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **params)
+    return buffer.getvalue()
+
+
+def test_perceptual_hash_ignores_reencoding_and_resizing():
+    photo = _photo(1)
+    original = perceptual_hash(_encode(photo, "PNG"))
+
+    assert hash_distance(perceptual_hash(_encode(photo, "JPEG", quality=70)), original) <= 2
+    assert hash_distance(perceptual_hash(_encode(photo.resize((320, 240)), "JPEG", quality=90)), original) <= 2
+    assert hash_distance(perceptual_hash(_encode(_photo(2), "PNG")), original) > 16
+
+
+def _setup(monkeypatch):
+    tryon_module.tryon_cache.local._entries.clear()
+    tryon_module.virtual_tryon_service._known_hashes.clear()
+    generations, usage = [], []
+
+    async def fake_generate(person_image, jewelry_image, jewelry_type, jewelry_description, user_id=None, progress=None):
+        generations.append(user_id)
+        key = f"tryon/result_{len(generations)}.png"
+        return {
+            "success": True, "result_url": f"https://s3/{key}", "s3_url": f"https://s3/{key}", "s3_key": key,
+            "size": 123, "image_size": (640, 480), "model_used": "gemini", "jewelry_type": jewelry_type,
+            "message": "ok", "generation_method": "gemini_ai_image_generation"
+        }
+
+    monkeypatch.setattr(tryon_module.virtual_tryon_service, "generate_tryon_image", fake_generate)
+    monkeypatch.setattr(tryon_module.s3_service, "generate_presigned_url", lambda key, expiration=3600: f"https://signed/{key}")
+    monkeypatch.setattr(tryon_router.TrialUsageModel, "check_trial_limit", lambda user_id, feature: {"allowed": True})
+    monkeypatch.setattr(tryon_router.TrialUsageModel, "record_usage", lambda user_id, feature: usage.append(feature))
+    return generations, usage
+
+
+async def _post(client, body_bytes, jewelry_bytes, **extra):
+    response = await client.post(
+        "/api/tryon/generate-ai-tryon",
+        files={
+            "body_photo": ("hand.jpg", body_bytes, "image/jpeg"),
+            "jewelry_photo": ("ring.png", jewelry_bytes, "image/png")
+        },
+        data={"jewelry_type": "ring", "jewelry_description": "Gold  band", **extra}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_repeat_tryon_is_served_from_cache(monkeypatch):
+    generations, usage = _setup(monkeypatch)
+    app.dependency_overrides[get_current_user] = lambda: USER
+    body, jewelry = _photo(3), _encode(_photo(4), "PNG")
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = await _post(client, _encode(body, "JPEG", quality=95), jewelry)
+            # Same photo, re-saved at a lower quality
+            repeat = await _post(client, _encode(body, "JPEG", quality=60), jewelry)
+            forced = await _post(client, _encode(body, "JPEG", quality=95), jewelry, force_regenerate="true")
+            after_forced = await _post(client, _encode(body, "JPEG", quality=95), jewelry)
+            return first, repeat, forced, after_forced
+
+    try:
+        first, repeat, forced, after_forced = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert not first["cached"] and first["s3_key"] == "tryon/result_1.png"
+    assert repeat["cached"] and repeat["s3_key"] == "tryon/result_1.png"
+    assert repeat["result_url"] == "https://signed/tryon/result_1.png"
+    assert not forced["cached"] and forced["s3_key"] == "tryon/result_2.png"
+    assert after_forced["cached"] and after_forced["s3_key"] == "tryon/result_2.png"
+    assert len(generations) == 2
+    assert usage == ["virtual_tryon", "virtual_tryon"]
+    assert tryon_module.tryon_cache.get_stats()["hits"] >= 2
+
+
+def test_cached_results_are_not_shared_between_users(monkeypatch):
+    generations, usage = _setup(monkeypatch)
+    current = {"user": USER}
+    app.dependency_overrides[get_current_user] = lambda: current["user"]
+    body, jewelry = _encode(_photo(3), "JPEG", quality=95), _encode(_photo(4), "PNG")
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = await _post(client, body, jewelry)
+            # Another user uploads the same photos (one re-encoded, within snapping distance)
+            current["user"] = {"_id": "user-2", "username": "other"}
+            other = await _post(client, body, jewelry)
+            other_reencoded = await _post(client, _encode(_photo(3), "JPEG", quality=60), jewelry)
+            return first, other, other_reencoded
+
+    try:
+        first, other, other_reencoded = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert not first["cached"] and first["s3_key"] == "tryon/result_1.png"
+    assert not other["cached"] and other["s3_key"] == "tryon/result_2.png"
+    assert other_reencoded["cached"] and other_reencoded["s3_key"] == "tryon/result_2.png"
+    assert generations == ["user-1", "user-2"]
+    assert usage == ["virtual_tryon", "virtual_tryon"]
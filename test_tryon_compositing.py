@@ -0,0 +1,160 @@
+"""
+Test the local try-on compositing engine (composite-tryon mode=preview)
+"""
+import asyncio
+import base64
+import io
+import json
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+import numpy as np
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.main import app
+from backend.models import database as database_module
+from backend.models.database import Base, TryOn
+from backend.routers import tryon as tryon_router
+from backend.services import virtual_tryon_service as tryon_module
+from backend.services.compositing_service import compositing_service
+
+
+def _encode(image: Image.Image, fmt: str = "PNG") -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def _body(size=(100, 80)) -> bytes:
+    return _encode(Image.new("RGB", size, (255, 255, 255)))
+
+
+def _bar(size=(40, 10), color=(255, 0, 0, 255)) -> bytes:
+    return _encode(Image.new("RGBA", size, color))
+
+
+def _pixels(result: dict) -> np.ndarray:
+    return np.asarray(Image.open(io.BytesIO(result["data"])).convert("RGB")).astype(int)
+
+
+def test_overlay_centre_is_placed_at_transform_position():
+    result = compositing_service.composite(_body(), _bar(), {"x": 50, "y": 40})
+    pixels = _pixels(result)
+
+    assert result["image_size"] == (100, 80)
+    assert pixels[40, 50, 0] > 200 and pixels[40, 50, 1] < 60   # red at the centre
+    assert pixels[40, 25].min() > 200                           # bar spans x 30..70 only
+    assert pixels[30, 50].min() > 200                           # and y 35..45
+
+
+def test_rotation_scale_and_opacity_follow_canvas_semantics():
+    rotated = _pixels(compositing_service.composite(_body(), _bar(), {"x": 50, "y": 40, "rotation": 90}))
+    # A horizontal 40x10 bar rotated 90 degrees is vertical
+    assert rotated[25, 50, 1] < 60 and rotated[40, 30].min() > 200
+
+    scaled = _pixels(compositing_service.composite(_body(), _bar(), {"x": 50, "y": 40, "scale": 0.5}))
+    assert scaled[40, 62].min() > 200 and scaled[40, 58, 1] < 60
+
+    faded = _pixels(compositing_service.composite(_body(), _bar(), {"x": 50, "y": 40, "opacity": 0.5}))
+    assert 100 < faded[40, 50, 1] < 155 and faded[40, 50, 0] > 200
+
+
+def test_hue_shift_and_transparent_pixels():
+    overlay = Image.new("RGBA", (40, 10), (255, 0, 0, 255))
+    overlay.paste((0, 0, 0, 0), (0, 0, 20, 10))   # left half fully transparent
+    result = compositing_service.composite(_body(), _encode(overlay), {"x": 50, "y": 40, "hue": 120})
+    pixels = _pixels(result)
+
+    assert pixels[40, 60, 1] > pixels[40, 60, 0]   # red rotated towards green
+    assert pixels[40, 40].min() > 200               # transparent half leaves the photo untouched
+
+
+def test_large_photos_are_previewed_at_bounded_size():
+    result = compositing_service.composite(
+        _encode(Image.new("RGB", (4000, 3000), (255, 255, 255)), "JPEG"),
+        _bar((400, 100)),
+        {"x": 2000, "y": 1500},
+        max_dimension=1280
+    )
+    pixels = _pixels(result)
+
+    assert result["image_size"] == (1280, 960)
+    assert pixels[480, 640, 1] < 60 and pixels[480, 560].min() > 200
+
+
+def test_anchor_points_place_overlay_when_no_position_given():
+    resolved = compositing_service.resolve_transform(
+        {"scale": 2}, {"knuckle": {"x": 50, "y": 20}, "base": {"x": 50, "y": 60}}, (100, 80)
+    )
+    assert (resolved["x"], resolved["y"], resolved["rotation"], resolved["scale"]) == (50, 40, 0, 2)
+
+
+def test_preview_mode_composites_without_gemini(monkeypatch):
+    async def no_generation(*args, **kwargs):
+        raise AssertionError("preview must not call Gemini")
+
+    monkeypatch.setattr(tryon_module.virtual_tryon_service, "generate_tryon_image", no_generation)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            ok = await client.post(
+                "/api/tryon/composite-tryon",
+                files={"body_photo": ("hand.png", _body(), "image/png"), "jewelry_photo": ("ring.png", _bar(), "image/png")},
+                data={"mode": "preview", "transform": json.dumps({"x": 50, "y": 40, "rotation": 15})}
+            )
+            bad = await client.post(
+                "/api/tryon/composite-tryon",
+                files={"body_photo": ("hand.png", _body(), "image/png"), "jewelry_photo": ("ring.png", _bar(), "image/png")},
+                data={"mode": "preview", "transform": json.dumps({"opacity": 3})}
+            )
+            return ok, bad
+
+    ok, bad = asyncio.run(run())
+
+    assert ok.status_code == 200, ok.text
+    body = ok.json()
+    assert body["generation_method"] == "local_composite"
+    assert body["result_url"].startswith("data:image/jpeg;base64,")
+    assert Image.open(io.BytesIO(base64.b64decode(body["result_url"].split(",", 1)[1]))).size == (100, 80)
+    assert body["transform"]["rotation"] == 15
+    assert bad.status_code == 400
+
+
+def test_saved_preview_is_written_to_the_database(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tryons.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(database_module, "SessionLocal", Session)
+    monkeypatch.setattr(tryon_router.settings, "renditions_enabled", False)
+    monkeypatch.setattr(
+        tryon_router.s3_service, "upload_image",
+        lambda data, folder, filename=None, content_type="image/png": (f"https://cdn/{folder}/p.jpg", f"{folder}/p.jpg")
+    )
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(
+                "/api/tryon/composite-tryon",
+                files={"body_photo": ("hand.png", _body(), "image/png"), "jewelry_photo": ("ring.png", _bar(), "image/png")},
+                data={
+                    "mode": "preview", "save_to_db": "true", "jewelry_type": "ring",
+                    "anchor_points": json.dumps({"knuckle": {"x": 50, "y": 20}, "base": {"x": 50, "y": 60}})
+                }
+            )
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["s3_url"] == "https://cdn/tryon/previews/p.jpg"
+    db = Session()
+    tryon = db.get(TryOn, body["tryon_id"])
+    assert tryon.snapshot_url == body["s3_url"] and tryon.finger_type == "ring"
+    assert tryon.anchor_points["knuckle"] == {"x": 50, "y": 20}
+    assert tryon.overlay_transform["x"] == 50
+    db.close()
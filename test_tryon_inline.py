@@ -0,0 +1,72 @@
+"""
+Test the try-on inline image fast path (pass-through vs. single bounded re-encode)
+"""
+import base64
+import io
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import pytest
+from PIL import Image
+
+from backend.services.virtual_tryon_service import virtual_tryon_service
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def _decode(part: dict) -> Image.Image:
+    return Image.open(io.BytesIO(base64.b64decode(part["data"])))
+
+
+def test_acceptable_uploads_pass_through_unchanged():
+    jpeg = _encode(Image.new("RGB", (800, 600), (120, 80, 60)), "JPEG")
+    png = _encode(Image.new("RGBA", (300, 300), (255, 215, 0, 128)), "PNG")
+
+    body = virtual_tryon_service.prepare_inline_image(jpeg)
+    jewelry = virtual_tryon_service.prepare_inline_image(png, keep_alpha=True)
+
+    assert body["passthrough"] and body["mime_type"] == "image/jpeg"
+    assert base64.b64decode(body["data"]) == jpeg
+    assert jewelry["passthrough"] and jewelry["mime_type"] == "image/png"
+    assert base64.b64decode(jewelry["data"]) == png
+
+
+def test_oversized_jpeg_is_downscaled_once():
+    jpeg = _encode(Image.new("RGB", (4000, 3000), (10, 20, 30)), "JPEG")
+
+    part = virtual_tryon_service.prepare_inline_image(jpeg)
+
+    assert not part["passthrough"]
+    assert part["mime_type"] == "image/jpeg"
+    assert 1536 <= max(_decode(part).size) <= 2048
+
+
+def test_other_formats_are_reencoded_keeping_alpha():
+    webp = _encode(Image.new("RGBA", (400, 400), (255, 0, 0, 100)), "WEBP")
+
+    jewelry = virtual_tryon_service.prepare_inline_image(webp, keep_alpha=True)
+    body = virtual_tryon_service.prepare_inline_image(webp)
+
+    assert jewelry["mime_type"] == "image/png" and _decode(jewelry).mode == "RGBA"
+    assert body["mime_type"] == "image/jpeg" and _decode(body).mode == "RGB"
+
+
+def test_inline_part_accepts_pil_bytes_and_prepared():
+    image = Image.new("RGB", (64, 64))
+    data = _encode(image, "PNG")
+    prepared = virtual_tryon_service.prepare_inline_image(data)
+
+    for source in (image, data, prepared):
+        part = virtual_tryon_service._to_inline_part(source)
+        assert set(part["inline_data"]) == {"mime_type", "data"}
+
+
+def test_invalid_bytes_raise_value_error():
+    with pytest.raises(ValueError):
+        virtual_tryon_service.prepare_inline_image(b"not an image")
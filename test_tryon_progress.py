@@ -0,0 +1,184 @@
+"""
+Test try-on progress events (SSE stream per request ID) and per-stage latency stats
+"""
+import asyncio
+import base64
+import io
+import json
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+import pytest
+from PIL import Image
+
+from backend.app.main import app
+from backend.routers import tryon as tryon_router
+from backend.services import virtual_tryon_service as tryon_module
+from backend.services.http_client_service import http_client_service
+from backend.services.tryon_progress_service import tryon_progress_service, RequestIdInUseError
+from backend.utils.auth import get_current_user
+
+USER = {"_id": "user-1", "username": "tester"}
+
+
+class FakeS3Client:
+    def put_object(self, **kwargs):
+        pass
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://example.com/{Params['Key']}"
+
+
+def _png(color=(3, 3, 68)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 24), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _gemini_body() -> bytes:
+    part = {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(_png()).decode()}}
+    return json.dumps({"candidates": [{"content": {"parts": [part]}}]}).encode()
+
+
+def _events(text: str) -> list:
+    return [json.loads(line[len("data: "):]) for line in text.splitlines() if line.startswith("data: ")]
+
+
+def _setup(monkeypatch, trial_status):
+    tryon_module.tryon_cache.local._entries.clear()
+    monkeypatch.setattr(tryon_module.s3_service, "s3_client", FakeS3Client())
+    monkeypatch.setattr(tryon_router.TrialUsageModel, "check_trial_limit", lambda user_id, feature: trial_status)
+    monkeypatch.setattr(tryon_router.TrialUsageModel, "record_usage", lambda user_id, feature: None)
+    app.dependency_overrides[get_current_user] = lambda: USER
+
+
+async def _post_with_progress(client, request_id):
+    stream = asyncio.create_task(client.get(f"/api/tryon/progress/{request_id}"))
+    await asyncio.sleep(0.05)
+    response = await client.post(
+        "/api/tryon/generate-ai-tryon",
+        files={"body_photo": ("hand.png", _png((200, 150, 120)), "image/png"), "jewelry_photo": ("ring.png", _png(), "image/png")},
+        data={"jewelry_type": "ring", "jewelry_description": "gold band", "request_id": request_id}
+    )
+    return response, await stream
+
+
+def test_progress_stream_reports_each_stage(monkeypatch):
+    _setup(monkeypatch, {"allowed": True, "unlimited": True})
+
+    async def run():
+        await http_client_service.set_transport("gemini", httpx.MockTransport(lambda request: httpx.Response(200, content=_gemini_body())))
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response, stream = await _post_with_progress(client, "req-progress-1")
+                metrics = await client.get("/metrics")
+                return response, stream, metrics
+        finally:
+            await http_client_service.set_transport("gemini", None)
+            app.dependency_overrides.clear()
+
+    response, stream, metrics = asyncio.run(run())
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["request_id"] == "req-progress-1"
+    assert set(body["timings_ms"]) == {"preparing", "cache_lookup", "queued", "sending", "receiving", "storing"}
+
+    events = _events(stream.text)
+    assert [e["stage"] for e in events] == ["preparing", "cache_lookup", "queued", "sending", "receiving", "storing", "completed"]
+    final = events[-1]
+    assert final["final"] and final["status"] == "completed"
+    assert final["result_url"] == body["result_url"]
+    assert [s["stage"] for s in final["stages"]] == ["preparing", "cache_lookup", "queued", "sending", "receiving", "storing"]
+
+    stages = metrics.json()["tryon_stages"]["stages"]
+    assert stages["sending"]["count"] >= 1 and stages["total"]["p95_ms"] >= stages["total"]["p50_ms"]
+
+
+def test_rejected_request_ends_the_stream(monkeypatch):
+    _setup(monkeypatch, {"allowed": False, "limit": 3})
+
+    async def run():
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await _post_with_progress(client, "req-progress-2")
+        finally:
+            app.dependency_overrides.clear()
+
+    response, stream = asyncio.run(run())
+
+    assert response.status_code == 402
+    events = _events(stream.text)
+    assert len(events) == 1
+    assert events[0]["status"] == "failed" and events[0]["error"]["error"] == "trial_limit_reached"
+
+
+def test_progress_is_private_and_request_id_validated():
+    tryon_progress_service.track("req-other-user", "user-2").fail("done")
+    app.dependency_overrides[get_current_user] = lambda: USER
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            other = await client.get("/api/tryon/progress/req-other-user")
+            invalid = await client.post(
+                "/api/tryon/generate-ai-tryon",
+                files={"body_photo": ("hand.png", _png(), "image/png"), "jewelry_photo": ("ring.png", _png(), "image/png")},
+                data={"jewelry_type": "ring", "request_id": "bad id!"}
+            )
+            return other, invalid
+
+    try:
+        other, invalid = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert other.status_code == 404
+    assert invalid.status_code == 400
+
+
+def test_reused_request_id_is_rejected(monkeypatch):
+    _setup(monkeypatch, {"allowed": False, "limit": 3})
+
+    async def run():
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                first, _ = await _post_with_progress(client, "req-progress-3")
+                again = await client.post(
+                    "/api/tryon/generate-ai-tryon",
+                    files={"body_photo": ("hand.png", _png(), "image/png"), "jewelry_photo": ("ring.png", _png(), "image/png")},
+                    data={"jewelry_type": "ring", "request_id": "req-progress-3"}
+                )
+                return first, again
+        finally:
+            app.dependency_overrides.clear()
+
+    first, again = asyncio.run(run())
+
+    assert first.status_code == 402
+    assert again.status_code == 409 and "already in use" in again.json()["detail"]
+
+
+def test_other_users_cannot_replay_progress_events(monkeypatch):
+    monkeypatch.setattr(tryon_router.settings, "sse_timeout_seconds", 0.2)
+    tryon_progress_service.track("req-victim", "user-2").complete(result_url="https://example.com/private.png")
+    # Even once the owner is forgotten, the events live on user-2's channel only
+    tryon_progress_service._owners.pop("req-victim")
+    app.dependency_overrides[get_current_user] = lambda: USER
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/api/tryon/progress/req-victim")
+
+    try:
+        stream = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert stream.status_code == 200
+    assert "private.png" not in stream.text and _events(stream.text) == []
+    # user-2 can't start a new request under the same ID while its events may still replay
+    with pytest.raises(RequestIdInUseError):
+        tryon_progress_service.track("req-victim", "user-2")
@@ -0,0 +1,120 @@
+"""
+Test streaming extraction of Gemini try-on output straight into storage
+"""
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+
+import httpx
+import pytest
+from PIL import Image
+
+from backend.services import virtual_tryon_service as tryon_module
+from backend.services.http_client_service import http_client_service
+from backend.utils.inline_data_stream import InlineDataExtractor
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Key, Body, ContentType, **kwargs):
+        self.objects[Key] = (ContentType, Body)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://example.com/{Params['Key']}"
+
+
+def _png(size=(320, 200)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (3, 3, 68)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _response_body(image: bytes, key: str = "inlineData") -> bytes:
+    body = {
+        "candidates": [{
+            "content": {
+                "role": "model",
+                "parts": [
+                    {"text": "Here is the \"try-on\" image"},
+                    {key: {"mimeType": "image/png", "data": base64.b64encode(image).decode()}}
+                ]
+            },
+            "finishReason": "STOP"
+        }],
+        "usageMetadata": {"promptTokenCount": 10, "details": [{"data": "not-an-image"}]}
+    }
+    # Escaped slashes are valid JSON and must not corrupt the base64 payload
+    return json.dumps(body).replace("/", "\\/").encode()
+
+
+@pytest.mark.parametrize("key", ["inlineData", "inline_data"])
+def test_extractor_decodes_image_across_arbitrary_chunks(key):
+    image = os.urandom(50_001)
+    raw = _response_body(image, key)
+
+    for seed in range(10):
+        rng = random.Random(seed)
+        extractor = InlineDataExtractor()
+        out, i = [], 0
+        while i < len(raw):
+            step = rng.randint(1, 4096)
+            out += extractor.feed(raw[i:i + step])
+            i += step
+        out += extractor.close()
+
+        assert b"".join(out) == image
+        assert extractor.mime_type == "image/png"
+        assert extractor.texts == ['Here is the "try-on" image']
+
+
+def test_truncated_image_is_an_error():
+    raw = _response_body(os.urandom(1000))
+    extractor = InlineDataExtractor()
+    extractor.feed(raw[:len(raw) // 2])
+    with pytest.raises(ValueError):
+        extractor.close()
+
+
+def _run_generation(monkeypatch, body: bytes):
+    fake_s3 = FakeS3Client()
+    monkeypatch.setattr(tryon_module.s3_service, "s3_client", fake_s3)
+    part = {"mime_type": "image/png", "data": base64.b64encode(_png((8, 8))).decode()}
+
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+        await http_client_service.set_transport("gemini", transport)
+        try:
+            return await tryon_module.virtual_tryon_service.generate_tryon_image(part, part, "ring", "gold band")
+        finally:
+            await http_client_service.set_transport("gemini", None)
+
+    return fake_s3, asyncio.run(run())
+
+
+def test_generated_image_is_streamed_to_storage_without_reencoding(monkeypatch):
+    image = _png()
+    fake_s3, result = _run_generation(monkeypatch, _response_body(image))
+
+    content_type, stored = fake_s3.objects[result["s3_key"]]
+    assert stored == image
+    assert content_type == "image/png"
+    assert result["s3_key"].startswith("tryon/tryon_") and result["s3_key"].endswith(".png")
+    assert result["size"] == len(image)
+    assert result["image_size"] == (320, 200)
+
+
+def test_response_without_image_uploads_nothing(monkeypatch):
+    body = json.dumps({"candidates": [{"content": {"parts": [{"text": "I can't do that"}]}}]}).encode()
+
+    with pytest.raises(ValueError):
+        fake_s3, _ = _run_generation(monkeypatch, body)
+
+    assert not tryon_module.s3_service.s3_client.objects